@@ -77,6 +77,9 @@ def upload_frontend(outputs):
             api_url = stack_outputs[key]
             break
 
+    # The API's edge cache is optional; reads go straight to the API without it
+    read_api_url = stack_outputs.get("ApiCacheUrl") or stack_outputs.get("ApiCacheUrlOutput") or api_url
+
     # Look for CloudFront Distribution ID
     distribution_id = None
     for key in ["CloudFrontDistributionId", "CloudFrontDistributionIdOutput"]:
@@ -119,7 +122,8 @@ def upload_frontend(outputs):
 
     # Also create a config file as backup method
     config_content = f"""window.APP_CONFIG = {{
-  API_URL: "{api_url}"
+  API_URL: "{api_url}",
+  READ_API_URL: "{read_api_url}"
 }};"""
 
     config_path = build_dir / "config.js"
@@ -235,6 +239,7 @@ def main():
         custom_domain = get_output_value(["CustomDomain", "CustomDomainOutput"])
         distribution_id = get_output_value(["CloudFrontDistributionId", "CloudFrontDistributionIdOutput"])
         api_url = get_output_value(["ApiUrl", "ApiUrlOutput"])
+        api_cache_url = get_output_value(["ApiCacheUrl", "ApiCacheUrlOutput"])
         lambda_bucket = get_output_value(["LambdaPackagesBucket", "LambdaPackagesBucketOutput"])
         frontend_bucket = get_output_value(["FrontendBucket", "FrontendBucketOutput"])
 
@@ -245,6 +250,8 @@ def main():
         if cloudfront_url != "Not found":
             print(f"☁️  CloudFront URL:    {cloudfront_url}")
         print(f"🔗 API URL:           {api_url}")
+        if api_cache_url != "Not found":
+            print(f"⚡ API edge cache:    {api_cache_url}")
         print(f"📦 Lambda Bucket:     {lambda_bucket}")
         print(f"🗂️  Frontend Bucket:   {frontend_bucket}")
 
@@ -5,8 +5,36 @@ export GENERATE_SOURCEMAP=false
 export ESLINT_NO_DEV_ERRORS=true
 export CI=false
 
+# Gzipped size budgets in KB: the entry bundle is everything first paint waits for,
+# the total also covers the lazily loaded form and template chunks
+ENTRY_BUNDLE_BUDGET_KB=${ENTRY_BUNDLE_BUDGET_KB:-80}
+TOTAL_BUNDLE_BUDGET_KB=${TOTAL_BUNDLE_BUDGET_KB:-120}
+
 # Run the build command
-npm run build
+npm run build || exit $?
+
+gzip_kb() {
+  gzip -9 -c "$1" | wc -c | awk '{ printf "%d", ($1 + 1023) / 1024 }'
+}
+
+entry_kb=0
+total_kb=0
+for file in build/static/js/*.js; do
+  [ -f "$file" ] || continue
+  size_kb=$(gzip_kb "$file")
+  total_kb=$((total_kb + size_kb))
+  case "$(basename "$file")" in
+    main.*) entry_kb=$((entry_kb + size_kb)) ;;
+  esac
+  echo "  ${size_kb} KB  $(basename "$file")"
+done
+
+echo "📦 Entry bundle: ${entry_kb} KB gzipped (budget ${ENTRY_BUNDLE_BUDGET_KB} KB)"
+echo "📦 All JavaScript: ${total_kb} KB gzipped (budget ${TOTAL_BUNDLE_BUDGET_KB} KB)"
+
+if [ "$entry_kb" -gt "$ENTRY_BUNDLE_BUDGET_KB" ] || [ "$total_kb" -gt "$TOTAL_BUNDLE_BUDGET_KB" ]; then
+  echo "❌ Bundle size budget exceeded; lazy-load the new code or raise the budget deliberately"
+  exit 1
+fi
 
-# Exit with the build command's exit code
-exit $?
+exit 0
@@ -1,27 +1,56 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, lazy, Suspense } from 'react';
 import './App.css';
-import PackageForm from './components/PackageForm';
 import PackagesList from './components/PackagesList';
 import Alert from './components/Alert';
-import ApiStatus from './components/ApiStatus';
 import DownloadStatus from './components/DownloadStatus';
 import * as api from './services/api';
 
+// The layer list is what first paint needs; the form and the API status banner come
+// from their own chunks, fetched while the listing request is in flight
+const PackageForm = lazy(() => import(/* webpackChunkName: "package-form" */ './components/PackageForm'));
+const ApiStatus = lazy(() => import(/* webpackChunkName: "api-status" */ './components/ApiStatus'));
+
+const PanelLoading = () => (
+  <div className="loading">
+    <div className="spinner"></div>
+  </div>
+);
+
 function App() {
   const [packages, setPackages] = useState([]);
   const [loading, setLoading] = useState(false);
   const [alert, setAlert] = useState({ show: false, type: '', message: '' });
   const [downloadStatus, setDownloadStatus] = useState({ isDownloading: false, fileName: '' });
   const [searchQuery, setSearchQuery] = useState('');
+  const latestSearch = useRef('');
 
   useEffect(() => {
     loadPackages();
   }, []);
 
   const loadPackages = async (search = '') => {
+    latestSearch.current = search;
     try {
-      const packagesList = await api.getPackages(search);
-      setPackages(packagesList);
+      // A cached listing renders immediately; a newer one replaces it once revalidated,
+      // unless the user has moved on to a different search in the meantime. Without a
+      // cached copy, each page is shown as it arrives and a superseded search stops paging
+      const packagesList = await api.getPackages(search, {
+        onRevalidated: (fresh) => {
+          if (latestSearch.current === search) {
+            setPackages(fresh);
+          }
+        },
+        onPage: (received) => {
+          if (latestSearch.current !== search) {
+            return false;
+          }
+          setPackages(received);
+          return true;
+        }
+      });
+      if (latestSearch.current === search) {
+        setPackages(packagesList);
+      }
     } catch (error) {
       console.error('Error loading packages:', error);
       showAlert('error', 'Failed to load packages. Please check your API configuration.');
@@ -180,16 +209,20 @@ function App() {
             Create Layer
           </h2>
 
-          <ApiStatus />
+          <Suspense fallback={null}>
+            <ApiStatus />
+          </Suspense>
 
           {alert.show && (
             <Alert type={alert.type} message={alert.message} />
           )}
 
-          <PackageForm 
-            onSubmit={handlePackageCreated}
-            loading={loading}
-          />
+          <Suspense fallback={<PanelLoading />}>
+            <PackageForm 
+              onSubmit={handlePackageCreated}
+              loading={loading}
+            />
+          </Suspense>
         </div>
 
         <div className="packages-section">
@@ -1,13 +1,12 @@
 import React, { useState, useEffect } from 'react';
-import { checkHealth } from '../services/api';
+import { checkHealth, whenIdle } from '../services/api';
 
 const ApiStatus = () => {
   const [status, setStatus] = useState({ checking: true });
   const [showDetails, setShowDetails] = useState(false);
 
-  useEffect(() => {
-    checkApiHealth();
-  }, []);
+  // The health check is not needed for first paint; run it once the browser is idle
+  useEffect(() => whenIdle(checkApiHealth), []);
 
   const checkApiHealth = async () => {
     setStatus({ checking: true });
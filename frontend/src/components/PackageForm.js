@@ -1,6 +1,7 @@
-import React, { useState, useRef } from 'react';
-import Editor from '@monaco-editor/react';
-import CodeTemplates from './CodeTemplates';
+import React, { useState, lazy, Suspense } from 'react';
+
+// The template gallery is mostly source text; it is only downloaded when someone opens it
+const CodeTemplates = lazy(() => import(/* webpackChunkName: "code-templates" */ './CodeTemplates'));
 
 const PackageForm = ({ onSubmit, loading }) => {
   const [formData, setFormData] = useState({
@@ -13,6 +14,7 @@ const PackageForm = ({ onSubmit, loading }) => {
   });
   const [dependencies, setDependencies] = useState([]);
   const [dependencyInput, setDependencyInput] = useState('');
+  const [showTemplates, setShowTemplates] = useState(false);
 
   const platformOptions = [
     { value: 'manylinux2014_x86_64', label: 'x86_64 (Intel/AMD)' },
@@ -61,6 +63,11 @@ const PackageForm = ({ onSubmit, loading }) => {
     }
   };
 
+  // A template brings the dependencies its example handler needs
+  const handleTemplateLoad = (code, templateDependencies) => {
+    setDependencies(prev => [...prev, ...templateDependencies.filter(dep => !prev.includes(dep))]);
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -272,8 +279,23 @@ const PackageForm = ({ onSubmit, loading }) => {
               <i className="fas fa-exclamation-triangle"></i> Add at least one dependency to create a useful layer
             </div>
           )}
+
+          <button
+            type="button"
+            className="btn btn-secondary"
+            style={{ marginTop: '15px', fontSize: '0.8rem', padding: '6px 12px' }}
+            onClick={() => setShowTemplates(!showTemplates)}
+          >
+            <i className="fas fa-code"></i> {showTemplates ? 'Hide' : 'Start from a'} code template
+          </button>
         </div>
 
+        {showTemplates && (
+          <Suspense fallback={<div className="loading"><div className="spinner"></div></div>}>
+            <CodeTemplates onTemplateLoad={handleTemplateLoad} />
+          </Suspense>
+        )}
+
         <button 
           type="submit" 
           className="btn btn-primary"
@@ -1,88 +1,224 @@
-import React, { useState } from 'react';
+import React, { useState, useRef, useMemo, useCallback, useLayoutEffect, memo } from 'react';
+
+// Only the rows inside the scrolled window (plus this much above and below it) are rendered.
+// Rows are measured once on screen; until then each is assumed to be ESTIMATED_ROW_HEIGHT tall
+const ESTIMATED_ROW_HEIGHT = 190;
+const OVERSCAN_PX = 600;
+
+const formatFileSize = (bytes) => {
+  if (bytes === 0) return '0 Bytes';
+  const k = 1024;
+  const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+  const i = Math.floor(Math.log(bytes) / Math.log(k));
+  return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+};
+
+const formatDate = (dateString) => {
+  const date = new Date(dateString);
+  return date.toLocaleString();
+};
+
+const renderDependencies = (dependencies) => {
+  if (!dependencies || dependencies.length === 0) {
+    return <span className="no-dependencies">No dependencies</span>;
+  }
+
+  return (
+    <div className="dependencies-list">
+      {dependencies.map((dep, index) => (
+        <span key={index} className="dependency-tag">
+          {dep}
+        </span>
+      ))}
+    </div>
+  );
+};
+
+const renderPlatformInfo = (pkg) => {
+  const platform = pkg.platform ? pkg.platform.replace('manylinux2014_', '') : '';
+  const pythonVersion = pkg.pythonVersion || '';
+
+  if (platform || pythonVersion) {
+    return (
+      <div className="platform-info">
+        {pythonVersion && <span className="python-version">Python {pythonVersion}</span>}
+        {platform && <span className="platform-arch">{platform}</span>}
+      </div>
+    );
+  }
+  return null;
+};
+
+// A row only re-renders when its layer changes: same key and the same metadata ETag
+const sameRow = (prev, next) => (
+  prev.onDownload === next.onDownload &&
+  prev.pkg.key === next.pkg.key &&
+  prev.pkg.etag === next.pkg.etag &&
+  prev.pkg.lastModified === next.pkg.lastModified
+);
+
+const PackageRow = memo(({ pkg, onDownload }) => (
+  <div className="virtual-row" data-key={pkg.key}>
+    <div className="package-item">
+      <div className="package-header">
+        <div className="package-name">{pkg.fileName}</div>
+        <div className="package-meta">
+          <i className="fas fa-calendar"></i> {formatDate(pkg.lastModified)} |
+          <i className="fas fa-file"></i> {formatFileSize(pkg.size)}
+          {pkg.dependencyCount > 0 && (
+            <>
+              | <i className="fas fa-cube"></i> {pkg.dependencyCount} dependencies
+            </>
+          )}
+        </div>
+      </div>
+
+      {renderPlatformInfo(pkg)}
+
+      <div className="dependencies-section">
+        <div className="dependencies-label">Dependencies:</div>
+        {renderDependencies(pkg.dependencies)}
+      </div>
+
+      <button
+        className="btn btn-success"
+        onClick={() => onDownload(pkg.key, pkg.fileName)}
+      >
+        <i className="fas fa-download"></i> Download
+      </button>
+    </div>
+  </div>
+), sameRow);
+
+// Index of the row containing offset y, given each row's top offset (ascending)
+const rowAt = (offsets, y) => {
+  let low = 0;
+  let high = offsets.length - 2;
+  while (low < high) {
+    const middle = Math.ceil((low + high) / 2);
+    if (offsets[middle] <= y) {
+      low = middle;
+    } else {
+      high = middle - 1;
+    }
+  }
+  return Math.max(low, 0);
+};
 
 const PackagesList = ({ packages, onDownload, onSearch }) => {
   const [searchTerm, setSearchTerm] = useState('');
+  const [viewport, setViewport] = useState({ top: 0, height: 0 });
+  const [measured, setMeasured] = useState(0);
+  const listRef = useRef(null);
+  const rowsRef = useRef(null);
+  const rowHeights = useRef(new Map());
+  const scrollFrame = useRef(null);
 
-  const formatFileSize = (bytes) => {
-    if (bytes === 0) return '0 Bytes';
-    const k = 1024;
-    const sizes = ['Bytes', 'KB', 'MB', 'GB'];
-    const i = Math.floor(Math.log(bytes) / Math.log(k));
-    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+  // Rows keep a stable download handler even though the parent's changes every render
+  const latestOnDownload = useRef(onDownload);
+  latestOnDownload.current = onDownload;
+  const handleDownload = useCallback((key, fileName) => latestOnDownload.current(key, fileName), []);
+
+  // Top offset of every row, plus the total height as the last entry
+  const offsets = useMemo(() => {
+    const tops = new Array(packages.length + 1);
+    tops[0] = 0;
+    packages.forEach((pkg, index) => {
+      tops[index + 1] = tops[index] + (rowHeights.current.get(pkg.key) || ESTIMATED_ROW_HEIGHT);
+    });
+    return tops;
+    // measured changes whenever a row's height is recorded
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [packages, measured]);
+
+  const first = packages.length ? rowAt(offsets, Math.max(viewport.top - OVERSCAN_PX, 0)) : 0;
+  const last = packages.length
+    ? rowAt(offsets, viewport.top + (viewport.height || ESTIMATED_ROW_HEIGHT) + OVERSCAN_PX) + 1
+    : 0;
+
+  // Record the real height of the rows on screen; the offsets are recomputed only if one changed
+  useLayoutEffect(() => {
+    if (listRef.current && listRef.current.clientHeight !== viewport.height) {
+      setViewport({ top: listRef.current.scrollTop, height: listRef.current.clientHeight });
+    }
+    if (!rowsRef.current) {
+      return;
+    }
+    let changed = false;
+    Array.from(rowsRef.current.children).forEach((row) => {
+      const key = row.dataset.key;
+      if (key !== undefined && rowHeights.current.get(key) !== row.offsetHeight) {
+        rowHeights.current.set(key, row.offsetHeight);
+        changed = true;
+      }
+    });
+    if (changed) {
+      setMeasured((version) => version + 1);
+    }
+  });
+
+  // One viewport update per animation frame, however many scroll events arrive
+  const handleScroll = () => {
+    if (scrollFrame.current !== null) {
+      return;
+    }
+    scrollFrame.current = window.requestAnimationFrame(() => {
+      scrollFrame.current = null;
+      if (listRef.current) {
+        setViewport({ top: listRef.current.scrollTop, height: listRef.current.clientHeight });
+      }
+    });
   };
 
-  const formatDate = (dateString) => {
-    const date = new Date(dateString);
-    return date.toLocaleString();
+  const scrollToTop = () => {
+    if (listRef.current) {
+      listRef.current.scrollTop = 0;
+    }
+    setViewport((current) => ({ ...current, top: 0 }));
   };
 
   const handleSearchChange = (e) => {
     const value = e.target.value;
     setSearchTerm(value);
+    scrollToTop();
     onSearch(value);
   };
 
   const clearSearch = () => {
     setSearchTerm('');
+    scrollToTop();
     onSearch('');
   };
 
-  const renderDependencies = (dependencies) => {
-    if (!dependencies || dependencies.length === 0) {
-      return <span className="no-dependencies">No dependencies</span>;
-    }
-
-    return (
-      <div className="dependencies-list">
-        {dependencies.map((dep, index) => (
-          <span key={index} className="dependency-tag">
-            {dep}
-          </span>
-        ))}
+  const searchBox = (
+    <div className="search-box">
+      <div className="search-input-container">
+        <i className="fas fa-search search-icon"></i>
+        <input
+          type="text"
+          placeholder="Search layers by name or dependencies..."
+          value={searchTerm}
+          onChange={handleSearchChange}
+          className="search-input"
+        />
+        {searchTerm && (
+          <button className="clear-search" onClick={clearSearch}>
+            <i className="fas fa-times"></i>
+          </button>
+        )}
       </div>
-    );
-  };
-
-  const renderPlatformInfo = (pkg) => {
-    const platform = pkg.platform ? pkg.platform.replace('manylinux2014_', '') : '';
-    const pythonVersion = pkg.pythonVersion || '';
-    
-    if (platform || pythonVersion) {
-      return (
-        <div className="platform-info">
-          {pythonVersion && <span className="python-version">Python {pythonVersion}</span>}
-          {platform && <span className="platform-arch">{platform}</span>}
-        </div>
-      );
-    }
-    return null;
-  };
+    </div>
+  );
 
   if (packages.length === 0) {
     return (
       <div className="packages-section">
-        <div className="search-box">
-          <div className="search-input-container">
-            <i className="fas fa-search search-icon"></i>
-            <input
-              type="text"
-              placeholder="Search layers by name or dependencies..."
-              value={searchTerm}
-              onChange={handleSearchChange}
-              className="search-input"
-            />
-            {searchTerm && (
-              <button className="clear-search" onClick={clearSearch}>
-                <i className="fas fa-times"></i>
-              </button>
-            )}
-          </div>
-        </div>
-        
+        {searchBox}
+
         <div className="empty-state">
           <i className="fas fa-layer-group"></i>
           <p>
-            {searchTerm 
+            {searchTerm
               ? `No layers found matching "${searchTerm}"`
               : "No layers created yet. Create your first Lambda layer!"
             }
@@ -94,58 +230,19 @@ const PackagesList = ({ packages, onDownload, onSearch }) => {
 
   return (
     <div className="packages-section">
-      <div className="search-box">
-        <div className="search-input-container">
-          <i className="fas fa-search search-icon"></i>
-          <input
-            type="text"
-            placeholder="Search layers by name or dependencies..."
-            value={searchTerm}
-            onChange={handleSearchChange}
-            className="search-input"
-          />
-          {searchTerm && (
-            <button className="clear-search" onClick={clearSearch}>
-              <i className="fas fa-times"></i>
-            </button>
-          )}
+      {searchBox}
+
+      <div className="packages-list" ref={listRef} onScroll={handleScroll}>
+        <div style={{ height: offsets[first] }} />
+        <div ref={rowsRef}>
+          {packages.slice(first, last).map((pkg) => (
+            <PackageRow key={pkg.key} pkg={pkg} onDownload={handleDownload} />
+          ))}
         </div>
-      </div>
-      
-      <div className="packages-list">
-        {packages.map((pkg, index) => (
-          <div key={index} className="package-item">
-            <div className="package-header">
-              <div className="package-name">{pkg.fileName}</div>
-              <div className="package-meta">
-                <i className="fas fa-calendar"></i> {formatDate(pkg.lastModified)} | 
-                <i className="fas fa-file"></i> {formatFileSize(pkg.size)}
-                {pkg.dependencyCount > 0 && (
-                  <>
-                    | <i className="fas fa-cube"></i> {pkg.dependencyCount} dependencies
-                  </>
-                )}
-              </div>
-            </div>
-            
-            {renderPlatformInfo(pkg)}
-            
-            <div className="dependencies-section">
-              <div className="dependencies-label">Dependencies:</div>
-              {renderDependencies(pkg.dependencies)}
-            </div>
-            
-            <button 
-              className="btn btn-success" 
-              onClick={() => onDownload(pkg.key, pkg.fileName)}
-            >
-              <i className="fas fa-download"></i> Download
-            </button>
-          </div>
-        ))}
+        <div style={{ height: offsets[packages.length] - offsets[last] }} />
       </div>
     </div>
   );
 };
 
-export default PackagesList; 
\ No newline at end of file
+export default PackagesList;
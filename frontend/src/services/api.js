@@ -5,6 +5,11 @@ const API_BASE_URL = process.env.REACT_APP_API_URL ||
                      window.APP_CONFIG?.API_URL || 
                      'https://your-api-id.execute-api.your-region.amazonaws.com/prod';
 
+// Listings and manifests are read through the API's CloudFront edge cache when one is deployed
+const READ_API_URL = process.env.REACT_APP_READ_API_URL ||
+                     window.APP_CONFIG?.READ_API_URL ||
+                     API_BASE_URL;
+
 console.log('API Base URL:', API_BASE_URL);
 
 // Check if we're still using placeholder URL
@@ -97,6 +102,10 @@ export const createPackage = async (packageData) => {
     const response = await api.post('/packages', packageData, {
       timeout: calculatedTimeout
     });
+    // Long builds continue in the background (checkpointed or queued for the container worker)
+    if (response.status === 202 && response.data.buildId) {
+      return await waitForBuild(response.data.buildId);
+    }
     return response.data;
   } catch (error) {
     if (error.code === 'ECONNABORTED') {
@@ -106,22 +115,168 @@ export const createPackage = async (packageData) => {
   }
 };
 
-export const getPackages = async (searchQuery = '') => {
+const BUILD_POLL_INTERVAL_MS = 5000;
+
+export const getBuildStatus = async (buildId) => {
+  const response = await api.get(`/builds/${encodeURIComponent(buildId)}`);
+  return response.data;
+};
+
+// Poll a checkpointed or queued build until it finishes, then return its final result
+const waitForBuild = async (buildId) => {
+  console.log(`⏸️ Build ${buildId} continues in the background; polling for its result`);
+  for (;;) {
+    await new Promise((resolve) => setTimeout(resolve, BUILD_POLL_INTERVAL_MS));
+    const status = await getBuildStatus(buildId);
+    if (status.status !== 'running' && status.status !== 'queued') {
+      if (status.result) {
+        return status.result;
+      }
+      throw new Error(status.error || 'Build failed');
+    }
+    console.log(`🔄 Build ${buildId} is ${status.status}: ${status.completed} packages done`);
+  }
+};
+
+// Listings are cached per search query and filters in memory and localStorage, keyed by the
+// ETag the lister returns, so a revisit renders instantly and revalidation usually costs a 304
+const LISTING_CACHE_PREFIX = 'layerBuilder.packages:';
+const LISTING_CACHE_MAX_QUERIES = 20;
+const listingCache = new Map();
+
+const readListingCache = (cacheKey) => {
+  if (listingCache.has(cacheKey)) {
+    return listingCache.get(cacheKey);
+  }
   try {
-    console.log(`📦 Fetching packages list${searchQuery ? ` (search: "${searchQuery}")` : ''}...`);
-    const params = searchQuery ? { search: searchQuery } : {};
-    const response = await api.get('/packages', { params });
-    if (response.data.success) {
-      console.log(`✅ Found ${response.data.packages.length} packages`);
-      return response.data.packages;
-    } else {
+    const stored = JSON.parse(window.localStorage.getItem(LISTING_CACHE_PREFIX + cacheKey));
+    if (stored && stored.etag && Array.isArray(stored.packages)) {
+      listingCache.set(cacheKey, stored);
+      return stored;
+    }
+  } catch (error) {
+    console.warn('⚠️ Ignoring unreadable cached listing:', error.message);
+  }
+  return null;
+};
+
+const writeListingCache = (cacheKey, entry) => {
+  listingCache.set(cacheKey, entry);
+  try {
+    window.localStorage.setItem(LISTING_CACHE_PREFIX + cacheKey, JSON.stringify(entry));
+    // Keep only the most recently stored queries so localStorage stays small
+    const keys = Object.keys(window.localStorage)
+      .filter((key) => key.startsWith(LISTING_CACHE_PREFIX))
+      .map((key) => ({ key, storedAt: JSON.parse(window.localStorage.getItem(key))?.storedAt || 0 }))
+      .sort((a, b) => b.storedAt - a.storedAt);
+    keys.slice(LISTING_CACHE_MAX_QUERIES).forEach(({ key }) => window.localStorage.removeItem(key));
+  } catch (error) {
+    console.warn('⚠️ Could not persist listing cache:', error.message);
+  }
+};
+
+// Facet filters understood by the lister: platform, pythonVersion, minSize, maxSize,
+// createdAfter and createdBefore; empty values are left out
+const listingParams = (searchQuery, filters = {}) => {
+  const params = searchQuery ? { search: searchQuery } : {};
+  Object.keys(filters).sort().forEach((name) => {
+    if (filters[name] !== undefined && filters[name] !== null && filters[name] !== '') {
+      params[name] = String(filters[name]);
+    }
+  });
+  return params;
+};
+
+const listingCacheKey = (params) => new URLSearchParams(params).toString();
+
+// Layers per listing request; the list renders each page as soon as it arrives
+const LISTING_PAGE_SIZE = 100;
+
+// Returns the fresh listing, or null when the cached copy is still current (HTTP 304).
+// The listing is fetched a page at a time; onPage, when given, receives everything so far
+// after each page and can return false to stop (e.g. once the user has searched again).
+// The first page's ETag covers the whole listing, so it alone revalidates the cached copy
+const fetchPackages = async (searchQuery, cached, params, cacheKey, onPage) => {
+  let packages = [];
+  let cursor = null;
+  let etag = null;
+  do {
+    const pageParams = { ...params, limit: String(LISTING_PAGE_SIZE), ...(cursor ? { cursor } : {}) };
+    const headers = cached && !cursor ? { 'If-None-Match': cached.etag } : {};
+    const response = await api.get('/packages', {
+      baseURL: READ_API_URL,
+      params: pageParams,
+      headers,
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+
+    if (response.status === 304) {
+      console.log(`✅ Packages list unchanged${searchQuery ? ` (search: "${searchQuery}")` : ''}`);
+      return null;
+    }
+    if (!response.data.success) {
       throw new Error(response.data.error || 'Failed to load packages');
     }
+
+    // A page degraded by read errors has no ETag; the listing it belongs to is not cached
+    if (!cursor) {
+      etag = response.headers.etag;
+    } else if (!response.headers.etag) {
+      etag = null;
+    }
+    packages = packages.concat(response.data.packages);
+    cursor = response.data.nextCursor;
+    if (onPage && onPage(packages) === false) {
+      return packages;
+    }
+  } while (cursor);
+
+  if (etag) {
+    writeListingCache(cacheKey, { etag, packages, storedAt: Date.now() });
+  } else {
+    listingCache.delete(cacheKey);
+  }
+  console.log(`✅ Found ${packages.length} packages`);
+  return packages;
+};
+
+// Stale-while-revalidate: with onRevalidated, a cached listing is returned immediately and
+// onRevalidated is called later, with the whole listing, only if the server has a newer one.
+// Without a cached copy, onPage is called as each page arrives
+export const getPackages = async (searchQuery = '', { onRevalidated, onPage, filters } = {}) => {
+  try {
+    console.log(`📦 Fetching packages list${searchQuery ? ` (search: "${searchQuery}")` : ''}...`);
+    const params = listingParams(searchQuery, filters);
+    const cacheKey = listingCacheKey(params);
+    const cached = readListingCache(cacheKey);
+
+    if (cached && onRevalidated) {
+      fetchPackages(searchQuery, cached, params, cacheKey)
+        .then((fresh) => fresh && onRevalidated(fresh))
+        .catch((error) => console.warn('⚠️ Background revalidation failed:', error.message));
+      return cached.packages;
+    }
+
+    const fresh = await fetchPackages(searchQuery, cached, params, cacheKey, onPage);
+    return fresh || cached.packages;
   } catch (error) {
     throw handleApiError(error, 'loading packages');
   }
 };
 
+// Catalog totals and breakdowns by platform, Python version and month, plus top dependencies
+export const getPackageStats = async () => {
+  try {
+    const response = await api.get('/packages/stats', { baseURL: READ_API_URL });
+    if (response.data.success) {
+      return response.data;
+    }
+    throw new Error(response.data.error || 'Failed to load catalog statistics');
+  } catch (error) {
+    throw handleApiError(error, 'loading catalog statistics');
+  }
+};
+
 export const getDownloadUrl = async (s3Key) => {
   try {
     console.log('🔗 Generating download URL for:', s3Key);
@@ -136,11 +291,39 @@ export const getDownloadUrl = async (s3Key) => {
   }
 };
 
+export const getPackageManifest = async (s3Key) => {
+  try {
+    console.log('📋 Fetching manifest for:', s3Key);
+    const response = await api.get(`/packages/${encodeURIComponent(s3Key)}/manifest`, {
+      baseURL: READ_API_URL,
+    });
+    if (response.data.success) {
+      return response.data;
+    } else {
+      throw new Error(response.data.error || 'Failed to load manifest');
+    }
+  } catch (error) {
+    throw handleApiError(error, 'loading manifest');
+  }
+};
+
 // Add a health check function
+// Runs callback once the browser has nothing more urgent to do (or after timeout ms);
+// returns a function that cancels it, so it can be used as an effect cleanup
+export const whenIdle = (callback, timeout = 2000) => {
+  if (typeof window.requestIdleCallback === 'function') {
+    const handle = window.requestIdleCallback(() => callback(), { timeout });
+    return () => window.cancelIdleCallback(handle);
+  }
+  const handle = setTimeout(callback, Math.min(timeout, 200));
+  return () => clearTimeout(handle);
+};
+
 export const checkHealth = async () => {
   try {
     console.log('🏥 Checking API health...');
-    const response = await api.get('/packages');
+    // The stats endpoint answers from one precomputed object, unlike a full listing
+    await api.get('/packages/stats');
     return { healthy: true, url: API_BASE_URL };
   } catch (error) {
     return { 
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+import uuid
+
+CHECKPOINT_PREFIX = 'checkpoints/'
+# Time kept back from the Lambda budget to zip and upload finished work and re-invoke
+CHECKPOINT_RESERVE_SECONDS = int(os.environ.get('CHECKPOINT_RESERVE_SECONDS', '120'))
+# A build that cannot finish within this many invocations runs until the timeout instead
+MAX_BUILD_INVOCATIONS = int(os.environ.get('MAX_BUILD_INVOCATIONS', '6'))
+
+
+class BuildSuspended(Exception):
+    """Raised between packages when the time budget has run out and the build should checkpoint"""
+
+
+class TimeBudget:
+    """Remaining time of a Lambda invocation, less what a checkpoint needs"""
+
+    def __init__(self, context, reserve_seconds=CHECKPOINT_RESERVE_SECONDS):
+        self.context = context
+        self.reserve_seconds = reserve_seconds
+
+    def remaining_seconds(self):
+        return self.context.get_remaining_time_in_millis() / 1000
+
+    def exhausted(self):
+        return self.remaining_seconds() < self.reserve_seconds
+
+
+class BuildCheckpoint:
+    """Progress of one build, kept in S3 so that a fresh invocation can carry on from it.
+
+    The state lists the finished units (wheel files on the direct path, requirements on
+    the pip path) and the keys of zip parts holding their files. Nothing is written until
+    the build is first suspended, so builds that fit one invocation never touch S3 here.
+    """
+
+    def __init__(self, s3_client, bucket_name, state=None):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.state = state or {
+            'buildId': uuid.uuid4().hex,
+            'status': 'running',
+            'request': None,
+            'preflight': None,
+            'completed': [],
+            'failed': [],
+            'parts': [],
+            'invocations': 1,
+            'createdAt': time.time()
+        }
+
+    @property
+    def build_id(self):
+        return self.state['buildId']
+
+    @classmethod
+    def load(cls, s3_client, bucket_name, build_id):
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key=state_key(build_id))
+        except s3_client.exceptions.NoSuchKey:
+            return None
+        return cls(s3_client, bucket_name, json.loads(response['Body'].read()))
+
+    def can_suspend(self):
+        return self.state['invocations'] < MAX_BUILD_INVOCATIONS
+
+    def save(self):
+        self.state['updatedAt'] = time.time()
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=state_key(self.build_id),
+            Body=json.dumps(self.state),
+            ContentType='application/json'
+        )
+
+    def add_part(self, zip_path):
+        """Upload the zipped output of this invocation as the build's next part"""
+        part_key = f"{CHECKPOINT_PREFIX}{self.build_id}/part-{len(self.state['parts']):04d}.zip"
+        self.s3_client.upload_file(zip_path, self.bucket_name, part_key)
+        self.state['parts'].append(part_key)
+
+    def download_parts(self, dest_dir):
+        os.makedirs(dest_dir, exist_ok=True)
+        paths = []
+        for part_key in self.state['parts']:
+            path = os.path.join(dest_dir, os.path.basename(part_key))
+            self.s3_client.download_file(self.bucket_name, part_key, path)
+            paths.append(path)
+        return paths
+
+    def finish(self, response):
+        """Record the final response for status polling and drop the parts it was built from"""
+        self.state['status'] = 'succeeded' if response['statusCode'] < 400 else 'failed'
+        self.state['response'] = response
+        for part_key in self.state['parts']:
+            try:
+                self.s3_client.delete_object(Bucket=self.bucket_name, Key=part_key)
+            except Exception as e:
+                print(f"Could not delete checkpoint part {part_key}: {str(e)}")
+        self.state['parts'] = []
+        self.save()
+
+
+def state_key(build_id):
+    return f'{CHECKPOINT_PREFIX}{build_id}/state.json'
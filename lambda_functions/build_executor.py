@@ -0,0 +1,182 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import boto3
+
+from build_checkpoint import BuildCheckpoint
+from native_build import builder_function, host_architecture, platform_architecture
+
+sqs_client = boto3.client('sqs')
+lambda_client = boto3.client('lambda')
+
+# lambda: build inside the invocation; process: a local process pool (dev, CI, the worker);
+# queue: hand the build to the container worker; auto: queue heavy builds, run the rest here.
+# Whatever the mode, builds for another architecture go to that architecture's builder
+# function when one is deployed (see native_build).
+EXECUTOR_MODES = ('lambda', 'process', 'queue', 'auto')
+# Dependencies x variants above which auto mode sends a build to the container worker
+HEAVY_BUILD_WEIGHT = int(os.environ.get('HEAVY_BUILD_WEIGHT', '20'))
+PROCESS_MAX_WORKERS = int(os.environ.get('BUILD_PROCESS_WORKERS', str(max((os.cpu_count() or 2) // 2, 1))))
+
+_process_pool = None
+
+
+def build_weight(body):
+    """Rough cost of a build request: each dependency is resolved and installed once per variant"""
+    if body.get('layers'):
+        defaults = body.get('defaults') or {}
+        return sum(build_weight({**defaults, **layer}) for layer in body['layers'] if isinstance(layer, dict))
+    variants = len(body.get('platforms') or [None]) * len(body.get('pythonVersions') or [None])
+    return max(len(body.get('dependencies') or []), 1) * variants
+
+
+def target_architectures(body):
+    """Architectures of every layer a request asks for"""
+    if body.get('layers'):
+        defaults = body.get('defaults') or {}
+        layers = [{**defaults, **layer} for layer in body['layers'] if isinstance(layer, dict)]
+        return set().union(*(target_architectures(layer) for layer in layers)) if layers else set()
+    platforms = body.get('platforms') or [body.get('platform', 'manylinux2014_x86_64')]
+    return {platform_architecture(platform) for platform in platforms}
+
+
+def native_builder(body):
+    """Builder function for a request whose layers all target another architecture, if one is deployed"""
+    architectures = target_architectures(body)
+    if len(architectures) != 1:
+        return None
+    architecture = architectures.pop()
+    if architecture is None or architecture == host_architecture():
+        return None
+    return builder_function(architecture)
+
+
+def select_executor(body, s3_client):
+    """Pick the executor for a build from its target architecture, BUILD_EXECUTOR and, in auto mode, its weight"""
+    mode = os.environ.get('BUILD_EXECUTOR', 'auto').lower()
+    queue_url = os.environ.get('BUILD_QUEUE_URL')
+    if mode not in EXECUTOR_MODES:
+        print(f"Unknown BUILD_EXECUTOR {mode!r}; building in this invocation")
+        mode = 'lambda'
+    function_name = native_builder(body) if mode != 'process' else None
+    if function_name:
+        return NativeBuilderExecutor(s3_client, os.environ.get('BUCKET_NAME'), function_name)
+    if mode == 'auto':
+        mode = 'queue' if queue_url and build_weight(body) > HEAVY_BUILD_WEIGHT else 'lambda'
+    if mode == 'queue':
+        if not queue_url:
+            print("BUILD_EXECUTOR=queue without BUILD_QUEUE_URL; building in this invocation")
+            return LambdaExecutor()
+        return QueueExecutor(s3_client, os.environ.get('BUCKET_NAME'), queue_url)
+    if mode == 'process':
+        return ProcessExecutor()
+    return LambdaExecutor()
+
+
+class LambdaExecutor:
+    """Runs the build in the current invocation, with its time and memory limits"""
+    name = 'lambda'
+
+    def run(self, build, body, context):
+        return build(body, context)
+
+
+class ProcessExecutor:
+    """Runs builds in a pool of local processes so one host can build many layers at once.
+
+    The pool is shared by every executor in the process. Workers are spawned rather than
+    forked so they never share the parent's boto3 connections; build must therefore be a
+    module-level function. Workers get no Lambda context, so builds there never checkpoint.
+    """
+    name = 'process'
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or PROCESS_MAX_WORKERS
+
+    def pool(self):
+        global _process_pool
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+    def submit(self, build, body):
+        return self.pool().submit(build, body, None)
+
+    def run(self, build, body, context):
+        return self.submit(build, body).result()
+
+
+class QueueExecutor:
+    """Queues the build for the container worker and answers 202 with a pollable build ID"""
+    name = 'queue'
+
+    def __init__(self, s3_client, bucket_name, queue_url):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.queue_url = queue_url
+
+    def run(self, build, body, context):
+        job = BuildCheckpoint(self.s3_client, self.bucket_name)
+        job.state['status'] = 'queued'
+        job.state['executor'] = self.name
+        job.state['request'] = body
+        job.save()
+        sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps({'buildId': job.build_id}))
+        print(f"📨 Queued build {job.build_id} for the container worker (weight {build_weight(body)})")
+        return {
+            'statusCode': 202,
+            'body': json.dumps({
+                'success': True,
+                'status': 'queued',
+                'buildId': job.build_id,
+                'statusUrl': f'/builds/{job.build_id}',
+                'message': 'Build queued for a container worker'
+            })
+        }
+
+
+class NativeBuilderExecutor:
+    """Hands the build to the builder function running on the target architecture.
+
+    The build is recorded like a checkpointed one and the builder is invoked to resume it,
+    so it can compile sdists natively, checkpoint itself and report through GET /builds/{buildId}.
+    If the builder cannot be invoked, the build runs here with binary wheels only.
+    """
+    name = 'native'
+
+    def __init__(self, s3_client, bucket_name, function_name):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.function_name = function_name
+
+    def run(self, build, body, context):
+        job = BuildCheckpoint(self.s3_client, self.bucket_name)
+        job.state['executor'] = self.name
+        job.state['request'] = body
+        # Resuming counts an invocation; the builder's first one is number 1
+        job.state['invocations'] = 0
+        try:
+            job.save()
+            lambda_client.invoke(
+                FunctionName=self.function_name,
+                InvocationType='Event',
+                Payload=json.dumps({'resumeBuild': job.build_id})
+            )
+        except Exception as e:
+            print(f"Could not hand the build to {self.function_name}, building here: {str(e)}")
+            return build(body, context)
+        print(f"🏗️ Handed build {job.build_id} to {self.function_name}")
+        return {
+            'statusCode': 202,
+            'body': json.dumps({
+                'success': True,
+                'status': 'running',
+                'buildId': job.build_id,
+                'statusUrl': f'/builds/{job.build_id}',
+                'message': 'Build handed to a builder running on the target architecture'
+            })
+        }
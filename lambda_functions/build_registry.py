@@ -0,0 +1,199 @@
+import hashlib
+import json
+import threading
+import time
+
+# A lock older than the longest possible Lambda run belongs to a crashed build
+LOCK_TTL_SECONDS = 16 * 60
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+POLL_INTERVAL_SECONDS = 2
+
+INFLIGHT_PREFIX = 'inflight/'
+RESULTS_PREFIX = 'builds/'
+IDEMPOTENCY_PREFIX = 'idempotency/'
+
+
+def normalize_dependencies(dependencies):
+    """Canonical form of a dependency list: stripped, lower-cased, de-duplicated and sorted"""
+    return sorted({dep.strip().lower().replace('_', '-') for dep in dependencies or [] if dep.strip()})
+
+
+def build_fingerprint(request):
+    """Stable hash of everything that determines the output of a build request"""
+    if request.get('layers') is not None:
+        # A batch is identified by its layers, each with the batch defaults applied
+        defaults = request.get('defaults') or {}
+        layers = request['layers'] if isinstance(request['layers'], list) else []
+        canonical = {'layers': [build_fingerprint({**defaults, **layer}) for layer in layers if isinstance(layer, dict)]}
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+    canonical = {
+        'packageName': request.get('packageName', 'lambda-layer'),
+        'dependencies': normalize_dependencies(request.get('dependencies')),
+        'runtime': request.get('runtime', 'python3.12'),
+        'platforms': sorted(request.get('platforms') or [request.get('platform', 'manylinux2014_x86_64')]),
+        'pythonVersions': sorted(request.get('pythonVersions') or [request.get('pythonVersion', '3.12')]),
+        'installDependencies': bool(request.get('installDependencies', True)),
+        'upgradePackages': bool(request.get('upgradePackages', False)),
+        'profileImports': bool(request.get('profileImports', False)),
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_precondition_failure(error):
+    """A conditional write or delete lost to a concurrent change"""
+    return error.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+def idempotency_digest(idempotency_key):
+    """Client keys are hashed so arbitrary strings are safe to use in object keys"""
+    return hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest()
+
+
+class S3BuildRegistry:
+    """In-flight build registry backed by S3 conditional writes (If-None-Match)"""
+
+    def __init__(self, s3_client, bucket_name):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+
+    def acquire(self, fingerprint, owner):
+        """Try to become the one build for fingerprint; returns the current owner if someone else is"""
+        lock_key = f'{INFLIGHT_PREFIX}{fingerprint}.json'
+        lock = {'owner': owner, 'startedAt': time.time()}
+
+        condition = {'IfNoneMatch': '*'}
+        for _ in range(3):
+            try:
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=lock_key,
+                    Body=json.dumps(lock),
+                    ContentType='application/json',
+                    **condition
+                )
+                return None
+            except self.s3_client.exceptions.ClientError as e:
+                if not is_precondition_failure(e):
+                    raise
+
+            existing, etag = self._read_json_with_etag(lock_key)
+            if existing is None:
+                condition = {'IfNoneMatch': '*'}
+                continue
+            if time.time() - existing.get('startedAt', 0) < LOCK_TTL_SECONDS:
+                return existing['owner']
+
+            # The previous holder died without releasing the lock; take it over, but only if
+            # it is still that stale lock, so two waiters cannot both replace it and build
+            print(f"Taking over stale build lock {lock_key}")
+            condition = {'IfMatch': etag}
+
+        existing = self._read_json(lock_key)
+        return existing['owner'] if existing else None
+
+    def release(self, fingerprint, owner, response):
+        """Publish the build response for waiting requests and drop the in-flight lock"""
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=f'{RESULTS_PREFIX}{fingerprint}.json',
+            Body=json.dumps({'owner': owner, 'response': response}),
+            ContentType='application/json'
+        )
+        # A lock taken over after this build was presumed dead belongs to someone else now
+        lock_key = f'{INFLIGHT_PREFIX}{fingerprint}.json'
+        existing, etag = self._read_json_with_etag(lock_key)
+        if not existing or existing.get('owner') != owner:
+            return
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=lock_key, IfMatch=etag)
+        except self.s3_client.exceptions.ClientError as e:
+            if not is_precondition_failure(e):
+                raise
+
+    def wait_for_result(self, fingerprint, owner, timeout):
+        """Wait for the build owned by owner to finish; None if it vanished or ran out of time"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            result = self._read_json(f'{RESULTS_PREFIX}{fingerprint}.json')
+            if result and result.get('owner') == owner:
+                return result['response']
+            if self._read_json(f'{INFLIGHT_PREFIX}{fingerprint}.json') is None:
+                # Lock is gone but no result was written: the owner crashed
+                result = self._read_json(f'{RESULTS_PREFIX}{fingerprint}.json')
+                return result['response'] if result and result.get('owner') == owner else None
+            time.sleep(POLL_INTERVAL_SECONDS)
+        return None
+
+    def get_idempotent_response(self, idempotency_key):
+        """Return the stored record for a client idempotency key, if it has not expired"""
+        record = self._read_json(f'{IDEMPOTENCY_PREFIX}{idempotency_digest(idempotency_key)}.json')
+        if record and time.time() - record.get('storedAt', 0) < IDEMPOTENCY_TTL_SECONDS:
+            return record
+        return None
+
+    def put_idempotent_response(self, idempotency_key, fingerprint, response):
+        """Remember the response for a client idempotency key"""
+        record = {'fingerprint': fingerprint, 'response': response, 'storedAt': time.time()}
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=f'{IDEMPOTENCY_PREFIX}{idempotency_digest(idempotency_key)}.json',
+            Body=json.dumps(record),
+            ContentType='application/json'
+        )
+
+    def _read_json(self, key):
+        return self._read_json_with_etag(key)[0]
+
+    def _read_json_with_etag(self, key):
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            return json.loads(obj['Body'].read().decode('utf-8')), obj['ETag']
+        except self.s3_client.exceptions.NoSuchKey:
+            return None, None
+
+
+class LocalBuildRegistry:
+    """In-process stand-in for S3BuildRegistry, for local runs and tests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._results = {}
+        self._idempotency = {}
+
+    def acquire(self, fingerprint, owner):
+        with self._lock:
+            current = self._inflight.get(fingerprint)
+            if current:
+                return current['owner']
+            self._inflight[fingerprint] = {'owner': owner, 'done': threading.Event()}
+            return None
+
+    def release(self, fingerprint, owner, response):
+        with self._lock:
+            self._results[fingerprint] = {'owner': owner, 'response': response}
+            entry = self._inflight.pop(fingerprint, None)
+        if entry:
+            entry['done'].set()
+
+    def wait_for_result(self, fingerprint, owner, timeout):
+        with self._lock:
+            entry = self._inflight.get(fingerprint)
+        if entry and entry['owner'] == owner:
+            entry['done'].wait(timeout)
+        with self._lock:
+            result = self._results.get(fingerprint)
+        return result['response'] if result and result['owner'] == owner else None
+
+    def get_idempotent_response(self, idempotency_key):
+        with self._lock:
+            record = self._idempotency.get(idempotency_digest(idempotency_key))
+        if record and time.time() - record['storedAt'] < IDEMPOTENCY_TTL_SECONDS:
+            return record
+        return None
+
+    def put_idempotent_response(self, idempotency_key, fingerprint, response):
+        with self._lock:
+            self._idempotency[idempotency_digest(idempotency_key)] = {
+                'fingerprint': fingerprint, 'response': response, 'storedAt': time.time()
+            }
@@ -0,0 +1,246 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+
+from build_registry import LOCK_TTL_SECONDS
+from metrics import emit_metrics
+
+# interactive requests come from people waiting on the page; batch covers prewarming and
+# other bulk jobs, which may only use the first BATCH_BUILD_SLOTS slots so they can never
+# take the whole builder away from interactive users
+PRIORITY_CLASSES = ('interactive', 'batch')
+MAX_CONCURRENT_BUILDS = int(os.environ.get('MAX_CONCURRENT_BUILDS', '10'))
+MAX_BUILDS_PER_CLIENT = int(os.environ.get('MAX_BUILDS_PER_CLIENT', '2'))
+BATCH_BUILD_SLOTS = int(os.environ.get('BATCH_BUILD_SLOTS', '4'))
+# How long a request may queue for a slot before it is turned away with 429. Interactive
+# requests come through API Gateway, which gives up after 29 seconds, so their wait is capped
+# well below that to leave time for the build to start and answer
+INTERACTIVE_WAIT_LIMIT_SECONDS = 20
+MAX_WAIT_SECONDS = {
+    'interactive': min(int(os.environ.get('SCHEDULER_MAX_WAIT_SECONDS', '20')), INTERACTIVE_WAIT_LIMIT_SECONDS),
+    'batch': int(os.environ.get('SCHEDULER_BATCH_MAX_WAIT_SECONDS', '0')),
+}
+POLL_INTERVAL_SECONDS = 1
+MAX_POLL_INTERVAL_SECONDS = 5
+
+SLOTS_PREFIX = 'scheduler/slots/'
+WAITING_PREFIX = 'scheduler/waiting/'
+
+
+def direct_invocation(event):
+    """True for events sent with lambda:Invoke (prewarm, internal jobs), which only IAM principals can do.
+
+    API Gateway always adds a requestContext; callers on the public API choose their headers
+    and body, so nothing in them is trusted for admission.
+    """
+    return not event.get('requestContext')
+
+
+def client_identity(event):
+    """Who a build counts against: the authorizer's principal, else the caller's source IP.
+
+    The X-Client-Id header is only honoured on direct invocations.
+    """
+    if direct_invocation(event):
+        for key, value in (event.get('headers') or {}).items():
+            if key.lower() == 'x-client-id' and value:
+                return value
+    context = event.get('requestContext') or {}
+    principal = (context.get('authorizer') or {}).get('principalId')
+    if principal:
+        return principal
+    return (context.get('identity') or {}).get('sourceIp') or 'anonymous'
+
+
+def build_priority(event, body):
+    """interactive for API requests; direct invocations may ask for batch with X-Build-Priority or the body"""
+    if not direct_invocation(event):
+        return 'interactive'
+    priority = body.get('priority')
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'x-build-priority':
+            priority = value
+    priority = str(priority or 'interactive').lower()
+    return priority if priority in PRIORITY_CLASSES else 'interactive'
+
+
+def client_digest(client_id):
+    """Client IDs are hashed so arbitrary strings are safe to use in object keys"""
+    return hashlib.sha256(str(client_id).encode('utf-8')).hexdigest()[:16]
+
+
+def slot_limit(priority):
+    """Number of global slots a priority class may use"""
+    if priority == 'batch':
+        return min(BATCH_BUILD_SLOTS, MAX_CONCURRENT_BUILDS)
+    return MAX_CONCURRENT_BUILDS
+
+
+class BuildScheduler:
+    """Admission control in front of the builder.
+
+    A build needs one of MAX_BUILDS_PER_CLIENT slots for its client and one of the global
+    slots its priority class may use. Requests that find none free wait, polling with
+    backoff, up to their class's wait limit and are then rejected. Every decision is logged
+    as CloudWatch metrics: QueueWaitTime, QueueDepth, RunningBuilds, BuildsAdmitted and
+    BuildsRejected, by priority class.
+    """
+
+    def admit(self, client_id, priority, max_wait=None):
+        """Wait for slots; returns the admission to pass to release(), or None if the wait ran out"""
+        if max_wait is None:
+            max_wait = MAX_WAIT_SECONDS[priority]
+        build_id = uuid.uuid4().hex
+        digest = client_digest(client_id)
+        started = time.time()
+        delay = POLL_INTERVAL_SECONDS
+        waiting = False
+        try:
+            while True:
+                admission = self.try_acquire(digest, priority, build_id)
+                if admission:
+                    break
+                if time.time() - started + delay > max_wait:
+                    break
+                if not waiting:
+                    self.set_waiting(priority, build_id, True)
+                    waiting = True
+                self.pause(delay)
+                delay = min(delay * 2, MAX_POLL_INTERVAL_SECONDS)
+        finally:
+            if waiting:
+                self.set_waiting(priority, build_id, False)
+
+        waited_ms = int((time.time() - started) * 1000)
+        values = {'QueueWaitTime': waited_ms, 'QueueDepth': self.queue_depth()}
+        if admission:
+            values.update(RunningBuilds=admission['running'], BuildsAdmitted=1)
+            admission['waitedMs'] = waited_ms
+        else:
+            values['BuildsRejected'] = 1
+            print(f"🚦 Build for client {digest} ({priority}) rejected after waiting {waited_ms} ms")
+        emit_metrics(values, {'Priority': priority}, {'QueueWaitTime': 'Milliseconds'})
+        return admission
+
+    def pause(self, delay):
+        time.sleep(delay + random.uniform(0, delay / 2))
+
+
+class S3BuildScheduler(BuildScheduler):
+    """Scheduler whose slots are numbered objects claimed with S3 conditional writes (If-None-Match)"""
+
+    def __init__(self, s3_client, bucket_name):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+
+    def try_acquire(self, digest, priority, build_id):
+        client_key, _ = self._claim(f'{SLOTS_PREFIX}clients/{digest}/', MAX_BUILDS_PER_CLIENT, build_id)
+        if client_key is None:
+            return None
+        # Interactive builds take the highest free slot, leaving the batch slots for batch work
+        global_key, running = self._claim(
+            f'{SLOTS_PREFIX}global/', slot_limit(priority), build_id, reverse=priority == 'interactive'
+        )
+        if global_key is None:
+            self._delete(client_key)
+            return None
+        return {'buildId': build_id, 'priority': priority, 'slots': [client_key, global_key], 'running': running}
+
+    def release(self, admission):
+        for key in admission['slots']:
+            self._delete(key)
+
+    def set_waiting(self, priority, build_id, waiting):
+        key = f'{WAITING_PREFIX}{priority}/{build_id}'
+        if waiting:
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=b'')
+        else:
+            self._delete(key)
+
+    def queue_depth(self):
+        listing = self.s3_client.list_objects_v2(Bucket=self.bucket_name, Prefix=WAITING_PREFIX)
+        return listing.get('KeyCount', 0)
+
+    def _claim(self, prefix, limit, owner, reverse=False):
+        """Claim a free numbered slot under prefix; returns (key, slots now taken) or (None, slots taken)"""
+        listing = self.s3_client.list_objects_v2(Bucket=self.bucket_name, Prefix=prefix)
+        occupied = {obj['Key']: obj for obj in listing.get('Contents', [])}
+        taken = len(occupied)
+        slots = range(limit - 1, -1, -1) if reverse else range(limit)
+        for n in slots:
+            key = f'{prefix}{n:03d}'
+            if key in occupied:
+                if time.time() - occupied[key]['LastModified'].timestamp() < LOCK_TTL_SECONDS:
+                    continue
+                # The build holding this slot died without releasing it. Only the slot object
+                # that was listed is removed: if another request already reclaimed it, the
+                # ETag no longer matches and the slot stays taken
+                print(f"Removing stale scheduler slot {key}")
+                if not self._delete(key, etag=occupied[key]['ETag']):
+                    continue
+                taken -= 1
+            try:
+                self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=owner.encode('utf-8'), IfNoneMatch='*')
+                return key, taken + 1
+            except self.s3_client.exceptions.ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                    raise
+        return None, taken
+
+    def _delete(self, key, etag=None):
+        condition = {'IfMatch': etag} if etag else {}
+        try:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=key, **condition)
+            return True
+        except Exception as e:
+            print(f"Could not remove scheduler object {key}: {str(e)}")
+            return False
+
+
+class LocalBuildScheduler(BuildScheduler):
+    """In-process stand-in for S3BuildScheduler, for local runs and tests"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._global = {}
+        self._clients = {}
+        self._waiting = set()
+
+    def try_acquire(self, digest, priority, build_id):
+        with self._condition:
+            if self._clients.get(digest, 0) >= MAX_BUILDS_PER_CLIENT:
+                return None
+            limit = slot_limit(priority)
+            slots = range(limit - 1, -1, -1) if priority == 'interactive' else range(limit)
+            free = next((n for n in slots if n not in self._global), None)
+            if free is None:
+                return None
+            self._global[free] = build_id
+            self._clients[digest] = self._clients.get(digest, 0) + 1
+            return {'buildId': build_id, 'priority': priority, 'slots': [digest, free], 'running': len(self._global)}
+
+    def release(self, admission):
+        digest, slot = admission['slots']
+        with self._condition:
+            self._global.pop(slot, None)
+            self._clients[digest] = max(self._clients.get(digest, 0) - 1, 0)
+            self._condition.notify_all()
+
+    def set_waiting(self, priority, build_id, waiting):
+        with self._condition:
+            if waiting:
+                self._waiting.add(build_id)
+            else:
+                self._waiting.discard(build_id)
+
+    def queue_depth(self):
+        with self._condition:
+            return len(self._waiting)
+
+    def pause(self, delay):
+        # Woken as soon as a slot is released rather than on the next poll
+        with self._condition:
+            self._condition.wait(delay)
@@ -0,0 +1,70 @@
+import json
+import os
+import re
+
+from build_checkpoint import CHECKPOINT_PREFIX
+from layer_cdn import download_url
+from s3_storage import shared_s3_client
+
+s3_client = shared_s3_client()
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    # Progress changes with every invocation of the build; never serve it from a cache
+    'Cache-Control': 'no-store'
+}
+
+BUILD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+def lambda_handler(event, context):
+    """Report the progress, and finally the result, of a build that was checkpointed"""
+    try:
+        build_id = (event.get('pathParameters') or {}).get('buildId')
+        if not build_id or not BUILD_ID_PATTERN.match(build_id):
+            return error_response(400, 'A valid build ID is required')
+
+        bucket_name = os.environ['BUCKET_NAME']
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key=f'{CHECKPOINT_PREFIX}{build_id}/state.json')
+        except s3_client.exceptions.NoSuchKey:
+            return error_response(404, 'Build not found')
+        state = json.loads(response['Body'].read())
+
+        body = {
+            'success': state['status'] != 'failed',
+            'buildId': build_id,
+            'status': state['status'],
+            'invocations': state['invocations'],
+            'completed': len(state['completed']),
+            'createdAt': state['createdAt'],
+            'updatedAt': state.get('updatedAt')
+        }
+        if state.get('response'):
+            result = json.loads(state['response']['body'])
+            # Signed URLs stored with the result may have expired by the time anyone polls
+            if result.get('s3Key') and result.get('downloadUrl'):
+                result['downloadUrl'] = download_url(s3_client, bucket_name, result['s3Key'])
+            body['result'] = result
+            body['error'] = result.get('error')
+
+        return {
+            'statusCode': 200,
+            'headers': HEADERS,
+            'body': json.dumps(body)
+        }
+
+    except Exception as e:
+        print(f"Error reading build status: {str(e)}")
+        return error_response(500, f'Internal server error: {str(e)}')
+
+def error_response(status_code, message):
+    return {
+        'statusCode': status_code,
+        'headers': HEADERS,
+        'body': json.dumps({
+            'success': False,
+            'error': message
+        })
+    }
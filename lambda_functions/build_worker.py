@@ -0,0 +1,175 @@
+"""
+Long-running build worker for the queue executor.
+
+Runs in a container (worker/Dockerfile) next to the API, pulls build IDs from the SQS
+queue the builder Lambda writes to, and runs several builds at once in a process pool.
+There is no 15-minute limit here, so builds never checkpoint; progress and the final
+response go to the same checkpoints/<buildId>/state.json that GET /builds/{buildId} reads.
+
+The service scales on visible queue depth, which does not count messages being built. So
+while any build runs, the task holds ECS scale-in protection and is never chosen for scale-in.
+On SIGTERM (a deployment, or a task stopped by hand) the worker stops taking builds, waits up
+to BUILD_WORKER_STOP_GRACE_SECONDS for the running ones, then marks the rest queued again and
+makes their messages visible so another task picks them up at once.
+"""
+import argparse
+import json
+import os
+import signal
+import time
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import boto3
+
+from build_checkpoint import BuildCheckpoint
+from build_executor import ProcessExecutor
+from package_creator import create_layer
+from s3_storage import shared_s3_client
+
+s3_client = shared_s3_client()
+sqs_client = boto3.client('sqs')
+
+WORKER_CONCURRENCY = int(os.environ.get('BUILD_WORKER_CONCURRENCY', '2'))
+POLL_WAIT_SECONDS = 20
+# Below the container's stopTimeout (120 s, the Fargate maximum) so requeueing always happens
+STOP_GRACE_SECONDS = int(os.environ.get('BUILD_WORKER_STOP_GRACE_SECONDS', '90'))
+# As long as the queue's visibility timeout, after which a build is redelivered anyway
+PROTECTION_MINUTES = 120
+
+_stopping = False
+_stop_deadline = None
+
+
+class ScaleInProtection:
+    """ECS task scale-in protection through the agent endpoint; a no-op outside ECS"""
+
+    def __init__(self, agent_uri=None):
+        self.agent_uri = agent_uri or os.environ.get('ECS_AGENT_URI')
+        self.enabled = False
+
+    def update(self, enabled):
+        """Hold protection while builds run; each new build renews its expiry"""
+        if not self.agent_uri or (not enabled and not self.enabled):
+            return
+        state = {'ProtectionEnabled': enabled}
+        if enabled:
+            state['ExpiresInMinutes'] = PROTECTION_MINUTES
+        request = urllib.request.Request(
+            f'{self.agent_uri}/task-protection/v1/state',
+            data=json.dumps(state).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='PUT'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+            self.enabled = enabled
+        except Exception as e:
+            print(f"⚠️ Could not {'set' if enabled else 'clear'} scale-in protection: {str(e)}")
+
+
+def start_job(message, bucket_name, executor):
+    """Mark a queued build as running and start it; returns (job, future), or None for stale messages"""
+    build_id = json.loads(message['Body'])['buildId']
+    job = BuildCheckpoint.load(s3_client, bucket_name, build_id)
+    # A running job is a redelivery after a worker stopped mid-build; start it again
+    if job is None or job.state['status'] not in ('queued', 'running'):
+        print(f"Skipping build {build_id}: it is not waiting to run")
+        return None
+    job.state['status'] = 'running'
+    job.save()
+    print(f"🏗️ Starting build {build_id}")
+    return job, executor.submit(create_layer, job.state['request'])
+
+
+def finish_job(job, future):
+    try:
+        response = future.result()
+    except Exception as e:
+        print(f"❌ Build {job.build_id} crashed: {str(e)}")
+        response = {'statusCode': 500, 'body': json.dumps({'success': False, 'error': f'Build worker failed: {str(e)}'})}
+    job.finish(response)
+    print(f"✅ Build {job.build_id} finished with status {response['statusCode']}")
+
+
+def requeue_job(job, queue_url, receipt_handle):
+    """Hand a build this worker cannot finish back to the queue, marked as waiting to run"""
+    job.state['status'] = 'queued'
+    job.save()
+    sqs_client.change_message_visibility(QueueUrl=queue_url, ReceiptHandle=receipt_handle, VisibilityTimeout=0)
+    print(f"↩️ Requeued build {job.build_id}")
+
+
+def run_worker(queue_url, bucket_name, concurrency=WORKER_CONCURRENCY, executor=None, max_jobs=None,
+               protection=None):
+    """Pull and run builds until stopped (SIGTERM) or until max_jobs have finished"""
+    executor = executor or ProcessExecutor(concurrency)
+    protection = protection or ScaleInProtection()
+    inflight = {}
+    finished = 0
+
+    while (not _stopping or inflight) and (max_jobs is None or finished < max_jobs):
+        free = concurrency - len(inflight)
+        if free and not _stopping:
+            response = sqs_client.receive_message(
+                QueueUrl=queue_url,
+                MaxNumberOfMessages=min(free, 10),
+                WaitTimeSeconds=1 if inflight else POLL_WAIT_SECONDS
+            )
+            for message in response.get('Messages', []):
+                # Protected before the build starts, so scale-in never catches it unprotected
+                protection.update(True)
+                started = start_job(message, bucket_name, executor)
+                if started is None:
+                    sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
+                    continue
+                inflight[started[1]] = (started[0], message['ReceiptHandle'])
+
+        if inflight:
+            # Bounded even when every slot is busy, so a SIGTERM is noticed and the grace period enforced
+            done, _ = wait(list(inflight), timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, receipt_handle = inflight.pop(future)
+                finish_job(job, future)
+                sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=receipt_handle)
+                finished += 1
+
+        if _stopping and inflight and time.time() >= _stop_deadline:
+            for future, (job, receipt_handle) in inflight.items():
+                future.cancel()
+                requeue_job(job, queue_url, receipt_handle)
+            inflight.clear()
+        if not inflight:
+            protection.update(False)
+
+    return finished
+
+
+def stop(signum, frame):
+    """On SIGTERM take no new builds, and requeue those still running after the grace period"""
+    global _stopping, _stop_deadline
+    print(f"Stopping: running builds get {STOP_GRACE_SECONDS}s to finish before they are requeued")
+    _stopping = True
+    _stop_deadline = time.time() + STOP_GRACE_SECONDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued layer builds')
+    parser.add_argument('--queue-url', default=os.environ.get('BUILD_QUEUE_URL'))
+    parser.add_argument('--bucket', default=os.environ.get('BUCKET_NAME'))
+    parser.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    if not args.queue_url or not args.bucket:
+        parser.error('--queue-url and --bucket (or BUILD_QUEUE_URL and BUCKET_NAME) are required')
+
+    os.environ['BUCKET_NAME'] = args.bucket
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Build worker polling {args.queue_url} with {args.concurrency} concurrent builds")
+    run_worker(args.queue_url, args.bucket, args.concurrency)
+    # Builds requeued at shutdown may still be running in the pool; exit without joining them
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
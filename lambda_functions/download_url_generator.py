@@ -1,10 +1,14 @@
 import json
-import boto3
 import os
 from urllib.parse import unquote
 
-s3_client = boto3.client('s3')
+from handler_profiler import profiled
+from layer_cdn import download_url as layer_download_url
+from s3_storage import is_throttled, resolve_layer_key, shared_s3_client, throttled_response
 
+s3_client = shared_s3_client()
+
+@profiled
 def lambda_handler(event, context):
     try:
         # Get the S3 key from the path parameters
@@ -28,10 +32,9 @@ def lambda_handler(event, context):
         s3_key = unquote(s3_key)
         bucket_name = os.environ['BUCKET_NAME']
         
-        # Check if the object exists
-        try:
-            s3_client.head_object(Bucket=bucket_name, Key=s3_key)
-        except s3_client.exceptions.NoSuchKey:
+        # Check if the object exists, following GC aliases for collapsed duplicate builds
+        s3_key, head = resolve_layer_key(s3_client, bucket_name, s3_key)
+        if head is None:
             return {
                 'statusCode': 404,
                 'headers': {
@@ -45,14 +48,9 @@ def lambda_handler(event, context):
                 })
             }
         
-        # Generate presigned URL for download
+        # Generate a signed URL for download (CloudFront for layers when the CDN is deployed)
         try:
-            download_url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': bucket_name, 'Key': s3_key},
-                ExpiresIn=7200,  # 2 hours for more reliable downloads
-                HttpMethod='GET'
-            )
+            download_url = layer_download_url(s3_client, bucket_name, s3_key)
             print(f"Generated download URL for {s3_key}: {download_url[:50]}...")
         except Exception as url_error:
             print(f"Error generating presigned URL for {s3_key}: {str(url_error)}")
@@ -84,6 +82,14 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
+        # Throttling that outlasted the client's retries is transient; ask the caller to retry
+        if is_throttled(e):
+            print(f"S3 throttled the download: {str(e)}")
+            return throttled_response({
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Methods': 'GET, OPTIONS'
+            })
         print(f"Error generating download URL: {str(e)}")
         return {
             'statusCode': 500,
@@ -96,4 +102,4 @@ def lambda_handler(event, context):
                 'success': False,
                 'error': str(e)
             })
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,53 @@
+import os
+import uuid
+
+import boto3
+
+cloudfront_client = boto3.client('cloudfront')
+ssm_client = boto3.client('ssm')
+
+# The plain listing and the stats. A wildcard would also reach the ?search=, filter and page
+# variants, but it would drop every day-long /packages/<key>/manifest entry too, and wildcard
+# invalidations are limited to a handful in progress at once. Those variants carry a short
+# s-maxage (LISTING_QUERY_EDGE_TTL_SECONDS) and revalidate by ETag instead
+LISTING_PATHS = ['/packages', '/packages/stats']
+
+_distribution_id = None
+
+
+def api_distribution_id():
+    """ID of the CloudFront distribution in front of the API, or None when there is none.
+
+    The stack publishes it through SSM because passing it as a Lambda environment variable
+    would make the functions depend on the distribution that depends on their API.
+    """
+    global _distribution_id
+    if os.environ.get('API_DISTRIBUTION_ID'):
+        return os.environ['API_DISTRIBUTION_ID']
+    parameter_name = os.environ.get('API_DISTRIBUTION_PARAMETER')
+    if not parameter_name:
+        return None
+    if _distribution_id is None:
+        _distribution_id = ssm_client.get_parameter(Name=parameter_name)['Parameter']['Value']
+    return _distribution_id
+
+
+def purge_listing_cache(reason):
+    """Invalidate cached listings after the catalog changes; never fails the caller"""
+    try:
+        distribution_id = api_distribution_id()
+        if not distribution_id:
+            return None
+        response = cloudfront_client.create_invalidation(
+            DistributionId=distribution_id,
+            InvalidationBatch={
+                'Paths': {'Quantity': len(LISTING_PATHS), 'Items': LISTING_PATHS},
+                'CallerReference': f'{reason}-{uuid.uuid4().hex}'
+            }
+        )
+        invalidation_id = response['Invalidation']['Id']
+        print(f"🧹 Purged cached listings ({reason}): invalidation {invalidation_id}")
+        return invalidation_id
+    except Exception as e:
+        print(f"⚠️ Could not purge cached listings: {str(e)}")
+        return None
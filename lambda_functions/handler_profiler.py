@@ -0,0 +1,247 @@
+"""
+On-demand profiling of handler invocations.
+
+The @profiled decorator profiles an invocation when HANDLER_PROFILING=on, or, in request
+mode, when the request asks for it: `?profile=1`, an `X-Profile: 1` header or
+`"profile": true` in a JSON body. The API is public, so the default is off, which ignores
+those flags; request mode is meant to be switched on while investigating and then off.
+An invocation that is not profiled goes straight to the handler.
+
+A profiled invocation records:
+- a cProfile of the handler's thread, saved as a pstats file (`python -m pstats`, snakeviz);
+- wall-clock stack samples of every thread, saved in collapsed-stack form
+  (`flamegraph.pl profile.collapsed > flame.svg`, or paste into speedscope);
+- tracemalloc's peak and the lines that allocated the most still-live memory;
+- the duration, exit code and command of every subprocess.run call.
+
+Everything is written under profiles/<handler>/<day>/<id>. The key of the JSON summary
+is returned as `profileKey` in JSON responses and in the X-Profile-Key header.
+"""
+import cProfile
+import functools
+import json
+import marshal
+import os
+import pstats
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from s3_storage import shared_s3_client
+
+s3_client = shared_s3_client()
+
+PROFILES_PREFIX = 'profiles/'
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '5')) / 1000
+PROFILE_TOP_ENTRIES = 25
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def profiling_mode():
+    """off (default), request (profile when the request asks) or on (profile every invocation)"""
+    return os.environ.get('HANDLER_PROFILING', 'off').lower()
+
+
+def profiling_requested(event):
+    mode = profiling_mode()
+    if mode == 'on':
+        return True
+    if mode != 'request' or not isinstance(event, dict):
+        return False
+    if str((event.get('queryStringParameters') or {}).get('profile', '')).lower() in TRUE_VALUES:
+        return True
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'x-profile' and str(value).lower() in TRUE_VALUES:
+            return True
+    body = event.get('body')
+    if isinstance(body, dict):
+        return body.get('profile') is True
+    # Only bodies that mention the flag are parsed a second time
+    if isinstance(body, str) and '"profile"' in body:
+        try:
+            return json.loads(body).get('profile') is True
+        except (ValueError, AttributeError):
+            return False
+    return False
+
+
+def profiled(handler):
+    """Profile the decorated handler's invocations when asked to (see module docstring)"""
+    name = handler.__module__
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not profiling_requested(event):
+            return handler(event, context)
+        return InvocationProfile(name).run(handler, event, context)
+    return wrapper
+
+
+class StackSampler(threading.Thread):
+    """Counts the collapsed stack of every other thread at a fixed interval"""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != self.ident:
+                    self.stacks[collapsed_stack(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        """One `frame;frame;frame count` line per distinct stack, root first"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def collapsed_stack(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class InvocationProfile:
+    """Collects the profile of one invocation and uploads it to the packages bucket"""
+
+    def __init__(self, name):
+        self.name = name
+        self.profile_id = uuid.uuid4().hex
+        day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        self.key_prefix = f'{PROFILES_PREFIX}{name}/{day}/{self.profile_id}'
+        self.subprocesses = []
+
+    def timed_run(self, run):
+        @functools.wraps(run)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            returncode = None
+            try:
+                result = run(*args, **kwargs)
+                returncode = result.returncode
+                return result
+            finally:
+                command = args[0] if args else kwargs.get('args')
+                self.subprocesses.append({
+                    'command': ' '.join(map(str, command)) if isinstance(command, (list, tuple)) else str(command),
+                    'durationMs': round((time.perf_counter() - started) * 1000, 1),
+                    'returncode': returncode
+                })
+        return timed
+
+    def run(self, handler, event, context):
+        print(f"🔬 Profiling {self.name} invocation {self.profile_id}")
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        original_run = subprocess.run
+        subprocess.run = self.timed_run(original_run)
+        sampler = StackSampler()
+        sampler.start()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = handler(event, context)
+            finally:
+                profiler.disable()
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            sampler.stop()
+            subprocess.run = original_run
+            snapshot = tracemalloc.take_snapshot()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+
+        summary = {
+            'profileId': self.profile_id,
+            'handler': self.name,
+            'profiledAt': datetime.now(timezone.utc).isoformat(),
+            'durationMs': duration_ms,
+            'statusCode': response.get('statusCode') if isinstance(response, dict) else None,
+            'cpu': top_functions(profiler),
+            'memory': {'peakBytes': peak_bytes, 'top': top_allocations(snapshot)},
+            'subprocesses': self.subprocesses,
+            'stackSamples': sampler.samples,
+            'artifacts': {
+                'pstats': f'{self.key_prefix}.pstats',
+                'collapsedStacks': f'{self.key_prefix}.collapsed'
+            }
+        }
+        profiler.create_stats()
+        if self.upload(summary, marshal.dumps(profiler.stats), sampler.collapsed()):
+            return with_profile_key(response, f'{self.key_prefix}.json')
+        return response
+
+    def upload(self, summary, pstats_bytes, collapsed):
+        """Write the artifacts; a profile that cannot be stored never fails the request"""
+        bucket_name = os.environ.get('BUCKET_NAME')
+        if not bucket_name:
+            print("No BUCKET_NAME; profile not stored")
+            return False
+        try:
+            s3_client.put_object(Bucket=bucket_name, Key=summary['artifacts']['pstats'], Body=pstats_bytes,
+                                 ContentType='application/octet-stream')
+            s3_client.put_object(Bucket=bucket_name, Key=summary['artifacts']['collapsedStacks'],
+                                 Body=collapsed.encode('utf-8'), ContentType='text/plain')
+            s3_client.put_object(Bucket=bucket_name, Key=f'{self.key_prefix}.json',
+                                 Body=json.dumps(summary, indent=2), ContentType='application/json')
+        except Exception as e:
+            print(f"Could not store profile {self.profile_id}: {str(e)}")
+            return False
+        print(f"🔬 Profile stored at {self.key_prefix}.json ({summary['durationMs']} ms)")
+        return True
+
+
+def top_functions(profiler, limit=PROFILE_TOP_ENTRIES):
+    """Functions with the most cumulative time"""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        'function': f'{function} ({os.path.basename(filename)}:{line})',
+        'calls': calls,
+        'totalMs': round(total * 1000, 2),
+        'cumulativeMs': round(cumulative * 1000, 2)
+    } for (filename, line, function), (_, calls, total, cumulative, _) in rows]
+
+
+def top_allocations(snapshot, limit=PROFILE_TOP_ENTRIES):
+    """Source lines holding the most memory at the end of the invocation"""
+    return [{
+        'location': f'{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}',
+        'sizeBytes': stat.size,
+        'count': stat.count
+    } for stat in snapshot.statistics('lineno')[:limit]]
+
+
+def with_profile_key(response, profile_key):
+    """The response with profileKey in its JSON body and X-Profile-Key header; it is never cached"""
+    if not isinstance(response, dict):
+        return response
+    headers = dict(response.get('headers') or {}, **{'X-Profile-Key': profile_key, 'Cache-Control': 'no-store'})
+    response = dict(response, headers=headers)
+    try:
+        body = json.loads(response.get('body') or '')
+    except (TypeError, ValueError):
+        return response
+    if isinstance(body, dict):
+        response['body'] = json.dumps(dict(body, profileKey=profile_key))
+    return response
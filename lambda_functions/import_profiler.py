@@ -0,0 +1,113 @@
+import os
+import platform as host_platform
+import re
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)\s*$')
+IMPORT_TIMEOUT_SECONDS = 60
+PROFILER_MAX_WORKERS = int(os.environ.get('IMPORT_PROFILER_MAX_WORKERS', '4'))
+SLOWEST_SUBMODULES = 5
+# Entries in site-packages that are never importable top-level modules
+IGNORED_ENTRIES = ('__pycache__', 'bin')
+
+
+def find_interpreter(python_version):
+    """Locate an interpreter for python_version, or None if this host has none"""
+    if '%d.%d' % sys.version_info[:2] == python_version:
+        return sys.executable
+    return shutil.which(f'python{python_version}')
+
+
+def host_can_run(platform):
+    """True if wheels built for platform execute natively on this machine"""
+    return platform.endswith(host_platform.machine())
+
+
+def discover_top_level_modules(site_packages):
+    """Importable top-level packages and modules installed in a site-packages directory"""
+    modules = set()
+    for entry in os.listdir(site_packages):
+        path = os.path.join(site_packages, entry)
+        if entry in IGNORED_ENTRIES or entry.startswith('.'):
+            continue
+        if os.path.isdir(path):
+            if entry.isidentifier() and os.path.exists(os.path.join(path, '__init__.py')):
+                modules.add(entry)
+        elif entry.endswith('.py') and entry[:-3].isidentifier():
+            modules.add(entry[:-3])
+        elif entry.endswith('.so') and entry.split('.', 1)[0].isidentifier():
+            modules.add(entry.split('.', 1)[0])
+    return sorted(modules)
+
+
+def parse_import_times(stderr):
+    """Parse `python -X importtime` output into (module, self_us, cumulative_us) tuples"""
+    timings = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            timings.append((match.group(3), int(match.group(1)), int(match.group(2))))
+    return timings
+
+
+def profile_module(interpreter, site_packages, module):
+    """Import one module in a fresh interpreter and aggregate its import cost"""
+    code = f'import sys; sys.path.insert(0, {site_packages!r}); import {module}'
+    try:
+        result = subprocess.run(
+            [interpreter, '-I', '-X', 'importtime', '-c', code],
+            capture_output=True,
+            text=True,
+            timeout=IMPORT_TIMEOUT_SECONDS,
+            cwd=site_packages
+        )
+    except subprocess.TimeoutExpired:
+        return {'module': module, 'error': f'Import took longer than {IMPORT_TIMEOUT_SECONDS}s'}
+
+    timings = parse_import_times(result.stderr)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        return {'module': module, 'error': errors[-1] if errors else f'Exited with {result.returncode}'}
+
+    cumulative_us = next((cumulative for name, _, cumulative in timings if name == module), 0)
+    own = [(name, self_us) for name, self_us, _ in timings if name.split('.', 1)[0] == module]
+    return {
+        'module': module,
+        'cumulativeUs': cumulative_us,
+        'selfUs': sum(self_us for _, self_us in own),
+        'dependenciesUs': cumulative_us - sum(self_us for _, self_us in own),
+        'modulesImported': len(timings),
+        'slowestSubmodules': [
+            {'module': name, 'selfUs': self_us}
+            for name, self_us in sorted(own, key=lambda item: item[1], reverse=True)[:SLOWEST_SUBMODULES]
+        ]
+    }
+
+
+def profile_layer(site_packages, python_version, platform):
+    """Measure cold import cost of every top-level module in a freshly installed layer"""
+    interpreter = find_interpreter(python_version)
+    if not interpreter:
+        return {'skipped': True, 'reason': f'No Python {python_version} interpreter available on the builder'}
+    if not host_can_run(platform):
+        return {'skipped': True, 'reason': f'Builder is {host_platform.machine()}; cannot execute {platform} binaries'}
+
+    modules = discover_top_level_modules(site_packages)
+    print(f"Profiling import time of {len(modules)} modules with {interpreter}")
+
+    with ThreadPoolExecutor(max_workers=PROFILER_MAX_WORKERS) as executor:
+        results = list(executor.map(lambda module: profile_module(interpreter, site_packages, module), modules))
+
+    results.sort(key=lambda r: r.get('cumulativeUs', 0), reverse=True)
+    profiled = [r for r in results if 'error' not in r]
+    return {
+        'skipped': False,
+        'pythonVersion': python_version,
+        'modules': results,
+        'totalCumulativeUs': sum(r['cumulativeUs'] for r in profiled),
+        'slowestModule': profiled[0]['module'] if profiled else None,
+        'failedModules': [r['module'] for r in results if 'error' in r]
+    }
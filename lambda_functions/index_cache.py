@@ -0,0 +1,173 @@
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import time
+from pathlib import Path
+
+# pip's HTTP cache already revalidates index pages with If-None-Match / If-Modified-Since
+# (pip asks for them with max-age=0) and keeps immutable files such as PEP 658 metadata.
+# Keeping its cache directory in /tmp lets warm invocations and the separate pip
+# processes of one build answer repeated lookups with a 304 instead of a full page.
+INDEX_CACHE_DIR = os.environ.get('INDEX_CACHE_DIR', '/tmp/pip-cache')
+INDEX_CACHE_MAX_BYTES = int(os.environ.get('INDEX_CACHE_MAX_MB', '200')) * 1024 * 1024
+# The cache never takes more than half of the /tmp space it could grow into, so a container
+# with the default 512 MB of /tmp still has room for the next build's downloads and layer zip
+TMP_SHARE = 0.5
+# Index pages and metadata are small; anything larger is a cached wheel, which is not
+# worth shipping through S3 and is the first thing pruned when /tmp fills up
+SHARED_ENTRY_MAX_BYTES = 1024 * 1024
+INDEX_CACHE_S3_KEY = 'cache/pip-index.tar.gz'
+
+_restored_etag = None
+_saved_fingerprint = None
+
+
+def index_cache_mode():
+    """local (default) keeps the cache in /tmp, s3 also shares it between containers, off disables it"""
+    mode = os.environ.get('INDEX_CACHE', 'local').lower()
+    return mode if mode in ('local', 's3', 'off') else 'local'
+
+
+def pip_index_args():
+    """pip options that point lookups at the shared cache and, in mirror mode, a local directory.
+
+    INDEX_MIRROR_DIR is served as a PEP 503 index when it has a simple/ tree, otherwise as
+    a flat directory of wheels; either way nothing is fetched from the network.
+    """
+    args = []
+    mirror_dir = os.environ.get('INDEX_MIRROR_DIR')
+    if mirror_dir:
+        simple_dir = os.path.join(mirror_dir, 'simple')
+        if os.path.isdir(simple_dir):
+            args.extend(['--index-url', Path(simple_dir).resolve().as_uri()])
+        else:
+            args.extend(['--no-index', '--find-links', mirror_dir])
+
+    if index_cache_mode() == 'off':
+        args.append('--no-cache-dir')
+    else:
+        args.extend(['--cache-dir', INDEX_CACHE_DIR])
+    return args
+
+
+def cache_entries(cache_dir):
+    """(path, size, mtime) of every file in the cache"""
+    entries = []
+    for root, dirs, files in os.walk(cache_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+    return entries
+
+
+def cache_limit(cache_dir, cached_bytes, max_bytes):
+    """max_bytes, lowered to TMP_SHARE of the space the cache occupies plus what is still free"""
+    try:
+        free = shutil.disk_usage(cache_dir).free
+    except OSError:
+        return max_bytes
+    return min(max_bytes, int((cached_bytes + free) * TMP_SHARE))
+
+
+def prune_index_cache(cache_dir=None, max_bytes=INDEX_CACHE_MAX_BYTES):
+    """Keep the cache under max_bytes and its share of /tmp, dropping cached wheels first, oldest first"""
+    cache_dir = cache_dir or INDEX_CACHE_DIR
+    entries = cache_entries(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    max_bytes = cache_limit(cache_dir, total, max_bytes)
+    removed = 0
+    for path, size, _ in sorted(entries, key=lambda e: (e[1] <= SHARED_ENTRY_MAX_BYTES, e[2])):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        print(f"🧹 Pruned {removed} entries from the index cache ({total // (1024 * 1024)} MB left)")
+    return removed
+
+
+def shared_entries(cache_dir):
+    return sorted(
+        (path, size, mtime) for path, size, mtime in cache_entries(cache_dir)
+        if size <= SHARED_ENTRY_MAX_BYTES
+    )
+
+
+def fingerprint(entries, cache_dir):
+    digest = hashlib.sha256()
+    for path, size, mtime in entries:
+        digest.update(f'{os.path.relpath(path, cache_dir)}:{size}:{mtime}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def snapshot_members(tar, cache_dir):
+    """Regular files of the snapshot that land inside cache_dir; anything else is skipped"""
+    root = os.path.realpath(cache_dir)
+    members = []
+    for member in tar.getmembers():
+        target = os.path.realpath(os.path.join(root, member.name))
+        if member.isfile() and os.path.commonpath([root, target]) == root and target != root:
+            members.append(member)
+    return members
+
+
+def restore_index_cache(s3_client, bucket_name, cache_dir=None):
+    """Seed /tmp from the shared S3 snapshot, once per container and only if it changed"""
+    global _restored_etag, _saved_fingerprint
+    cache_dir = cache_dir or INDEX_CACHE_DIR
+    if index_cache_mode() != 's3':
+        return False
+    try:
+        head = s3_client.head_object(Bucket=bucket_name, Key=INDEX_CACHE_S3_KEY)
+        if head['ETag'] == _restored_etag:
+            return False
+        body = s3_client.get_object(Bucket=bucket_name, Key=INDEX_CACHE_S3_KEY)['Body'].read()
+        os.makedirs(cache_dir, exist_ok=True)
+        with tarfile.open(fileobj=io.BytesIO(body), mode='r:gz') as tar:
+            members = snapshot_members(tar, cache_dir)
+            tar.extractall(cache_dir, members, filter='data')
+        _restored_etag = head['ETag']
+        _saved_fingerprint = fingerprint(shared_entries(cache_dir), cache_dir)
+        print(f"📥 Restored {len(members)} index cache entries from S3")
+        return True
+    except Exception as e:
+        print(f"Index cache snapshot not restored: {str(e)}")
+        return False
+
+
+def save_index_cache(s3_client, bucket_name, cache_dir=None):
+    """Prune the local cache and, in s3 mode, upload its index pages and metadata if they changed"""
+    global _restored_etag, _saved_fingerprint
+    cache_dir = cache_dir or INDEX_CACHE_DIR
+    prune_index_cache(cache_dir)
+    if index_cache_mode() != 's3':
+        return False
+    try:
+        entries = shared_entries(cache_dir)
+        current = fingerprint(entries, cache_dir)
+        if not entries or current == _saved_fingerprint:
+            return False
+
+        started = time.time()
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+            for path, _, _ in entries:
+                tar.add(path, arcname=os.path.relpath(path, cache_dir))
+        response = s3_client.put_object(Bucket=bucket_name, Key=INDEX_CACHE_S3_KEY, Body=buffer.getvalue())
+        _restored_etag = response.get('ETag')
+        _saved_fingerprint = current
+        print(f"📤 Saved {len(entries)} index cache entries to S3 in {int((time.time() - started) * 1000)} ms")
+        return True
+    except Exception as e:
+        print(f"Index cache snapshot not saved: {str(e)}")
+        return False
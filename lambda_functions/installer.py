@@ -0,0 +1,161 @@
+"""
+Installer backends: the command that installs dependencies into a layer's site-packages.
+
+pip runs `python3 -m pip install` and is the reference layout. uv runs `uv pip install`,
+which resolves and installs the same wheels into the same --target layout in a fraction of
+the time. INSTALLER picks the default (pip, uv, or auto for uv whenever it is available)
+and a request can ask for one with "installer". uv is found through UV_BIN or PATH; a
+builder without it installs with pip.
+"""
+import os
+import re
+import shutil
+
+from index_cache import pip_index_args
+
+INSTALLER_MODES = ('pip', 'uv', 'auto')
+# manylinux2014_x86_64 (pip's --platform) is x86_64-manylinux2014 to uv's --python-platform
+PLATFORM_PATTERN = re.compile(r'^(?P<tag>.+)_(?P<arch>x86_64|aarch64)$')
+# Files uv leaves in a --target directory that pip does not write
+UV_ONLY_FILES = ('.lock',)
+UV_ONLY_DIST_INFO_FILES = ('uv_cache.json',)
+
+
+def uv_executable():
+    return os.environ.get('UV_BIN') or shutil.which('uv')
+
+
+def select_installer(requested=None):
+    """Installer for a build: the request's choice, else INSTALLER; uv falls back to pip when missing"""
+    mode = (requested or os.environ.get('INSTALLER', 'pip')).lower()
+    if mode not in INSTALLER_MODES:
+        print(f"Unknown installer {mode!r}; installing with pip")
+        mode = 'pip'
+    if mode in ('uv', 'auto'):
+        executable = uv_executable()
+        if executable:
+            return UvInstaller(executable)
+        if mode == 'uv':
+            print("uv is not available on this builder; installing with pip")
+    return PipInstaller()
+
+
+def uv_platform(platform):
+    match = PLATFORM_PATTERN.match(platform)
+    return f"{match.group('arch')}-{match.group('tag')}" if match else platform
+
+
+def env_enabled(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def uv_index_args(pip_args):
+    """pip's index and cache options in uv's spelling, plus those pip would read from PIP_* variables"""
+    args = []
+    for index, arg in enumerate(pip_args):
+        if arg == '--no-cache-dir':
+            args.append('--no-cache')
+        elif index and pip_args[index - 1] == '--cache-dir':
+            # uv's cache has its own layout; keep it beside pip's so both are pruned and shared together
+            args.append(os.path.join(arg, 'uv'))
+        else:
+            args.append(arg)
+    if os.environ.get('PIP_INDEX_URL') and '--index-url' not in args:
+        args.extend(['--index-url', os.environ['PIP_INDEX_URL']])
+    if '--extra-index-url' not in args:
+        for url in os.environ.get('PIP_EXTRA_INDEX_URL', '').split():
+            args.extend(['--extra-index-url', url])
+    if env_enabled('PIP_NO_INDEX') and '--no-index' not in args:
+        args.append('--no-index')
+    if '--find-links' not in args:
+        for link in os.environ.get('PIP_FIND_LINKS', '').split():
+            args.extend(['--find-links', link])
+    return args
+
+
+class PipInstaller:
+    """python3 -m pip install"""
+    name = 'pip'
+
+    def install_command(self, target_dir, platform, python_version, packages, upgrade=False, index_args=None,
+                        verbose=False):
+        """Install binary wheels for the target platform and Python into target_dir"""
+        command = [
+            'python3', '-m', 'pip', 'install',
+            '--target', target_dir,
+            '--implementation', 'cp',
+            '--python-version', python_version,
+            '--only-binary=:all:',
+            *(pip_index_args() if index_args is None else index_args),
+            '--disable-pip-version-check',
+            # Bytecode would be compiled by the builder's Python, not the layer's; uv writes none either
+            '--no-compile',
+            '--platform', platform
+        ]
+        if verbose:
+            command.append('-v')
+        if upgrade:
+            command.append('--upgrade')
+        return command + list(packages)
+
+    def host_command(self, target_dir, packages):
+        """Install for this builder's own platform and Python"""
+        return ['python3', '-m', 'pip', 'install', '--target', target_dir, '--no-compile', *packages]
+
+    def local_command(self, target_dir, wheel_dir, packages):
+        """Install for this builder from the wheels in wheel_dir only"""
+        return ['python3', '-m', 'pip', 'install', '--target', target_dir, '--no-index', '--no-cache-dir',
+                '--disable-pip-version-check', '--no-compile', '--find-links', wheel_dir, *packages]
+
+    def finish(self, target_dir):
+        """Bring target_dir to pip's layout; pip's own output already is"""
+
+
+class UvInstaller:
+    """uv pip install, with the same target layout as pip"""
+    name = 'uv'
+
+    def __init__(self, executable):
+        self.executable = executable
+
+    def install_command(self, target_dir, platform, python_version, packages, upgrade=False, index_args=None,
+                        verbose=False):
+        """Install binary wheels for the target platform and Python into target_dir"""
+        command = [
+            self.executable, 'pip', 'install',
+            '--target', target_dir,
+            '--python-version', python_version,
+            '--python-platform', uv_platform(platform),
+            '--only-binary', ':all:',
+            *uv_index_args(pip_index_args() if index_args is None else index_args)
+        ]
+        if verbose:
+            command.append('-v')
+        if upgrade:
+            command.append('--upgrade')
+        return command + list(packages)
+
+    def host_command(self, target_dir, packages):
+        """Install for this builder's own platform and Python"""
+        return [self.executable, 'pip', 'install', '--target', target_dir, '--python', 'python3',
+                *uv_index_args([]), *packages]
+
+    def local_command(self, target_dir, wheel_dir, packages):
+        """Install for this builder from the wheels in wheel_dir only"""
+        return [self.executable, 'pip', 'install', '--target', target_dir, '--python', 'python3',
+                '--no-index', '--no-cache', '--find-links', wheel_dir, *packages]
+
+    def finish(self, target_dir):
+        """Bring target_dir to pip's layout by removing uv's lock and cache records"""
+        for name in UV_ONLY_FILES:
+            path = os.path.join(target_dir, name)
+            if os.path.isfile(path):
+                os.remove(path)
+        if not os.path.isdir(target_dir):
+            return
+        for entry in os.listdir(target_dir):
+            if entry.endswith('.dist-info'):
+                for name in UV_ONLY_DIST_INFO_FILES:
+                    path = os.path.join(target_dir, entry, name)
+                    if os.path.isfile(path):
+                        os.remove(path)
@@ -0,0 +1,179 @@
+import hashlib
+import re
+import struct
+import zipfile
+
+
+def content_hash_from_entries(entries):
+    """Hash (name, crc, size) triples so identical contents match regardless of timestamps"""
+    digest = hashlib.sha256()
+    for name, crc, size in sorted(entries):
+        digest.update(f'{name}\0{crc:08x}\0{size}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def content_hash(zip_path):
+    """Content identity of a layer zip, independent of file mtimes and compression level"""
+    with zipfile.ZipFile(zip_path) as zf:
+        return content_hash_from_entries(
+            (info.filename, info.CRC, info.file_size) for info in zf.infolist() if not info.is_dir()
+        )
+
+
+# ZIP record layouts (APPNOTE.TXT), matching the struct formats used by zipfile
+EOCD_FORMAT = '<4s4H2LH'
+EOCD_SIGNATURE = b'PK\x05\x06'
+EOCD_SIZE = struct.calcsize(EOCD_FORMAT)
+ZIP64_LOCATOR_FORMAT = '<4sLQL'
+ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+ZIP64_LOCATOR_SIZE = struct.calcsize(ZIP64_LOCATOR_FORMAT)
+ZIP64_EOCD_FORMAT = '<4sQ2H2L4Q'
+ZIP64_EOCD_SIGNATURE = b'PK\x06\x06'
+ZIP64_EOCD_SIZE = struct.calcsize(ZIP64_EOCD_FORMAT)
+CENTRAL_DIR_FORMAT = '<4s4B4HL2L5H2L'
+CENTRAL_DIR_SIGNATURE = b'PK\x01\x02'
+CENTRAL_DIR_SIZE = struct.calcsize(CENTRAL_DIR_FORMAT)
+MAX_COMMENT_SIZE = 0xFFFF
+INITIAL_TAIL_SIZE = 16 * 1024
+SITE_PACKAGES_PATTERN = re.compile(r'^python/lib/python[^/]+/site-packages/')
+
+
+def read_zip_entries(read_range, object_size):
+    """List a zip's entries reading only its tail and central directory.
+
+    read_range(start, end) must return the bytes in the inclusive range [start, end].
+    """
+    # Layers carry no archive comment, so a small tail read almost always finds the
+    # EOCD record; fall back to the largest window a comment could need
+    for window in (INITIAL_TAIL_SIZE, EOCD_SIZE + MAX_COMMENT_SIZE + ZIP64_LOCATOR_SIZE):
+        tail_start = max(object_size - window, 0)
+        tail = read_range(tail_start, object_size - 1)
+        eocd_pos = tail.rfind(EOCD_SIGNATURE)
+        if eocd_pos >= 0 and len(tail) - eocd_pos >= EOCD_SIZE:
+            break
+        if tail_start == 0:
+            break
+    else:
+        eocd_pos = -1
+
+    if eocd_pos < 0 or len(tail) - eocd_pos < EOCD_SIZE:
+        raise ValueError('Not a zip file: end of central directory record not found')
+    (_, _, _, _, entry_count, cd_size, cd_offset, _) = struct.unpack(
+        EOCD_FORMAT, tail[eocd_pos:eocd_pos + EOCD_SIZE]
+    )
+
+    locator_pos = eocd_pos - ZIP64_LOCATOR_SIZE
+    if locator_pos >= 0 and tail[locator_pos:locator_pos + 4] == ZIP64_LOCATOR_SIGNATURE:
+        _, _, zip64_eocd_offset, _ = struct.unpack(ZIP64_LOCATOR_FORMAT, tail[locator_pos:eocd_pos])
+        record = fetch_range(read_range, tail, tail_start, zip64_eocd_offset, ZIP64_EOCD_SIZE)
+        if record[:4] != ZIP64_EOCD_SIGNATURE:
+            raise ValueError('Corrupt zip64 end of central directory record')
+        (_, _, _, _, _, _, _, entry_count, cd_size, cd_offset) = struct.unpack(ZIP64_EOCD_FORMAT, record)
+
+    central_directory = fetch_range(read_range, tail, tail_start, cd_offset, cd_size)
+    return parse_central_directory(central_directory, entry_count)
+
+
+def fetch_range(read_range, tail, tail_start, offset, length):
+    """Serve a byte range from the already-read tail when possible, otherwise read it"""
+    if length == 0:
+        return b''
+    if offset >= tail_start:
+        return tail[offset - tail_start:offset - tail_start + length]
+    return read_range(offset, offset + length - 1)
+
+
+def parse_central_directory(data, entry_count):
+    """Decode central directory file headers into entry dicts"""
+    entries = []
+    pos = 0
+    for _ in range(entry_count):
+        header = data[pos:pos + CENTRAL_DIR_SIZE]
+        if len(header) < CENTRAL_DIR_SIZE or header[:4] != CENTRAL_DIR_SIGNATURE:
+            raise ValueError('Corrupt zip central directory')
+        fields = struct.unpack(CENTRAL_DIR_FORMAT, header)
+        flags, compress_type, crc = fields[5], fields[6], fields[9]
+        compressed_size, file_size = fields[10], fields[11]
+        name_length, extra_length, comment_length = fields[12], fields[13], fields[14]
+        header_offset = fields[18]
+
+        pos += CENTRAL_DIR_SIZE
+        raw_name = data[pos:pos + name_length]
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = data[pos + name_length:pos + name_length + extra_length]
+        pos += name_length + extra_length + comment_length
+
+        file_size, compressed_size, header_offset = apply_zip64_extra(
+            extra, file_size, compressed_size, header_offset
+        )
+        entries.append({
+            'name': name,
+            'crc': crc,
+            'compressType': compress_type,
+            'compressedSize': compressed_size,
+            'uncompressedSize': file_size,
+            'headerOffset': header_offset
+        })
+    return entries
+
+
+def apply_zip64_extra(extra, file_size, compressed_size, header_offset):
+    """Replace 0xFFFFFFFF placeholders with the values stored in the zip64 extra field"""
+    while len(extra) >= 4:
+        tag, size = struct.unpack('<HH', extra[:4])
+        if tag == 0x0001:
+            values = list(struct.unpack(f'<{size // 8}Q', extra[4:4 + (size // 8) * 8]))
+            if file_size == 0xFFFFFFFF and values:
+                file_size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF and values:
+                compressed_size = values.pop(0)
+            if header_offset == 0xFFFFFFFF and values:
+                header_offset = values.pop(0)
+            break
+        extra = extra[4 + size:]
+    return file_size, compressed_size, header_offset
+
+
+def top_level_name(path):
+    """Top-level importable package (or file) a layer path belongs to"""
+    relative = SITE_PACKAGES_PATTERN.sub('', path)
+    top = relative.split('/', 1)[0]
+    if '/' not in relative and top.endswith('.py'):
+        return top[:-3]
+    return top
+
+
+def build_manifest(entries):
+    """Per-file and per-top-level-package size breakdown of a layer zip"""
+    files = [e for e in entries if not e['name'].endswith('/')]
+    packages = {}
+    for entry in files:
+        name = top_level_name(entry['name'])
+        package = packages.setdefault(name, {'name': name, 'files': 0, 'compressedSize': 0, 'uncompressedSize': 0})
+        package['files'] += 1
+        package['compressedSize'] += entry['compressedSize']
+        package['uncompressedSize'] += entry['uncompressedSize']
+
+    return {
+        'fileCount': len(files),
+        'compressedSize': sum(e['compressedSize'] for e in files),
+        'uncompressedSize': sum(e['uncompressedSize'] for e in files),
+        'contentHash': content_hash_from_entries((e['name'], e['crc'], e['uncompressedSize']) for e in files),
+        'packages': sorted(packages.values(), key=lambda p: p['uncompressedSize'], reverse=True),
+        'files': [
+            {'name': e['name'], 'compressedSize': e['compressedSize'], 'uncompressedSize': e['uncompressedSize']}
+            for e in files
+        ]
+    }
+
+
+def s3_range_reader(client, bucket_name, key, stats=None):
+    """read_range callback backed by S3 ranged GETs; stats collects requests and bytes read"""
+    def read_range(start, end):
+        response = client.get_object(Bucket=bucket_name, Key=key, Range=f'bytes={start}-{end}')
+        data = response['Body'].read()
+        if stats is not None:
+            stats['requests'] = stats.get('requests', 0) + 1
+            stats['bytesRead'] = stats.get('bytesRead', 0) + len(data)
+        return data
+    return read_range
@@ -0,0 +1,296 @@
+"""
+Precomputed catalog of every published layer, kept at index/catalog.json.
+
+The catalog holds the listing fields of each layer as columns (one list per field) plus
+running aggregates: layers and bytes per platform, Python version and month, and how
+many layers use each dependency. Builds append to it with conditional writes (If-Match
+on the catalog's ETag, retried on conflict), and the daily GC run rebuilds it from the
+metadata objects, so filtered listings and GET /packages/stats read one object instead
+of every metadata document.
+"""
+import hashlib
+import json
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from s3_storage import list_sharded
+
+CATALOG_KEY = 'index/catalog.json'
+# Bump whenever the catalog layout changes; older catalogs are rebuilt on first use
+CATALOG_FORMAT_VERSION = 1
+COLUMNS = (
+    'key', 'size', 'fileName', 'dependencies', 'runtime', 'platform', 'pythonVersion', 'packageType',
+    'installDependencies', 'upgradePackages', 'createdAt', 'contentHash', 'aliases', 'lastModified',
+    'etag', 'metadataKey'
+)
+FILTER_PARAMS = ('platform', 'pythonVersion', 'minSize', 'maxSize', 'createdAfter', 'createdBefore')
+TOP_DEPENDENCIES = 20
+# createdAt as builds record it (YYYYMMDD-HHMMSS, UTC); layer and metadata keys end with it too
+CREATED_AT_PATTERN = re.compile(r'^\d{8}-\d{6}$')
+KEY_CREATED_AT_PATTERN = re.compile(r'-(\d{8}-\d{6})(?:-[0-9a-f]{8})?\.json$')
+WRITE_ATTEMPTS = 8
+SCAN_MAX_WORKERS = 16
+
+
+def empty_catalog():
+    return {
+        'version': CATALOG_FORMAT_VERSION,
+        'columns': {column: [] for column in COLUMNS},
+        'aggregates': {'layers': 0, 'bytes': 0, 'byPlatform': {}, 'byPythonVersion': {}, 'byMonth': {},
+                       'dependencies': {}},
+        'updatedAt': None
+    }
+
+
+def catalog_row(metadata, metadata_key, etag='', last_modified=None):
+    """Listing fields for one layer, from its metadata document"""
+    return {
+        'key': metadata.get('packageKey', ''),
+        'size': metadata.get('packageSize', 0),
+        'fileName': metadata.get('packageName', 'Unknown'),
+        'dependencies': metadata.get('dependencies', []),
+        'runtime': metadata.get('runtime', ''),
+        'platform': metadata.get('platform', ''),
+        'pythonVersion': metadata.get('pythonVersion', ''),
+        'packageType': metadata.get('packageType', 'layer'),
+        'installDependencies': metadata.get('installDependencies', False),
+        'upgradePackages': metadata.get('upgradePackages', False),
+        'createdAt': metadata.get('createdAt', ''),
+        'contentHash': metadata.get('contentHash', ''),
+        'aliases': metadata.get('aliases', []),
+        'lastModified': last_modified or datetime.now(timezone.utc).isoformat(),
+        'etag': etag.strip('"'),
+        'metadataKey': metadata_key
+    }
+
+
+def dependency_name(requirement):
+    """Project name of a requirement string, without extras, specifiers or markers"""
+    return re.split(r'[\s<>=!~;\[(@]', requirement.strip(), maxsplit=1)[0].lower().replace('_', '-')
+
+
+def created_stamp(timestamp):
+    """A datetime or ISO 8601 string in createdAt's YYYYMMDD-HHMMSS form"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.astimezone(timezone.utc).strftime('%Y%m%d-%H%M%S')
+
+
+def listing_position(row):
+    """(build time, key) that listings sort on; unlike lastModified it stays put when GC rewrites metadata"""
+    created_at = row.get('createdAt') or ''
+    return (created_at if CREATED_AT_PATTERN.match(created_at) else created_stamp(row['lastModified']), row['key'])
+
+
+def object_position(obj):
+    """listing_position of a listed metadata object, from its key (or LastModified) without reading it"""
+    match = KEY_CREATED_AT_PATTERN.search(obj['Key'])
+    return (match.group(1) if match else created_stamp(obj['LastModified']), obj['Key'])
+
+
+def created_month(created_at):
+    """YYYY-MM of a createdAt timestamp (YYYYMMDD-HHMMSS)"""
+    return f'{created_at[:4]}-{created_at[4:6]}' if re.match(r'^\d{6}', created_at or '') else 'unknown'
+
+
+def count_row(aggregates, row, sign=1):
+    """Add a row to (or, with sign=-1, remove it from) the aggregates"""
+    size = row['size'] or 0
+    aggregates['layers'] += sign
+    aggregates['bytes'] += sign * size
+    for field, value in (('byPlatform', row['platform'] or 'unknown'),
+                         ('byPythonVersion', row['pythonVersion'] or 'unknown'),
+                         ('byMonth', created_month(row['createdAt']))):
+        group = aggregates[field].setdefault(value, {'layers': 0, 'bytes': 0})
+        group['layers'] += sign
+        group['bytes'] += sign * size
+        if group['layers'] <= 0:
+            del aggregates[field][value]
+    for name in {dependency_name(dep) for dep in row['dependencies'] or [] if dep.strip()}:
+        aggregates['dependencies'][name] = aggregates['dependencies'].get(name, 0) + sign
+        if aggregates['dependencies'][name] <= 0:
+            del aggregates['dependencies'][name]
+
+
+def add_rows(catalog, rows):
+    """Append rows for layers the catalog does not list yet"""
+    columns = catalog['columns']
+    known = set(columns['key'])
+    for row in rows:
+        if row['key'] in known:
+            continue
+        known.add(row['key'])
+        for column in COLUMNS:
+            columns[column].append(row[column])
+        count_row(catalog['aggregates'], row)
+
+
+def read_catalog(s3_client, bucket_name):
+    """(catalog, ETag); the catalog is None when it is missing or in an older format"""
+    try:
+        obj = s3_client.get_object(Bucket=bucket_name, Key=CATALOG_KEY)
+    except s3_client.exceptions.NoSuchKey:
+        return None, None
+    catalog = json.loads(obj['Body'].read().decode('utf-8'))
+    if catalog.get('version') != CATALOG_FORMAT_VERSION:
+        return None, obj['ETag']
+    return catalog, obj['ETag']
+
+
+def scan_catalog(s3_client, bucket_name):
+    """Build a catalog from scratch by reading every metadata document"""
+    listed = [obj for obj in list_sharded(s3_client, bucket_name, 'metadata/') if obj['Key'].endswith('.json')]
+
+    def read_row(obj):
+        try:
+            body = s3_client.get_object(Bucket=bucket_name, Key=obj['Key'])['Body'].read()
+            return catalog_row(json.loads(body.decode('utf-8')), obj['Key'], obj['ETag'],
+                               obj['LastModified'].isoformat())
+        except Exception as e:
+            print(f"Catalog skipped {obj['Key']}: {str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=SCAN_MAX_WORKERS) as executor:
+        rows = [row for row in executor.map(read_row, listed) if row]
+    catalog = empty_catalog()
+    add_rows(catalog, sorted(rows, key=listing_position))
+    return catalog
+
+
+def write_catalog(s3_client, bucket_name, change=None, rebuild=False):
+    """Apply change(catalog) and store the result, retrying when another writer got there first.
+
+    A missing or outdated catalog, or any catalog when rebuild is set, is replaced by a scan
+    of the metadata objects before the change is applied. Returns the catalog written, or
+    None after WRITE_ATTEMPTS conflicts.
+    """
+    for attempt in range(WRITE_ATTEMPTS):
+        catalog, etag = read_catalog(s3_client, bucket_name)
+        if catalog is None or rebuild:
+            catalog = scan_catalog(s3_client, bucket_name)
+        if change:
+            change(catalog)
+        catalog['updatedAt'] = datetime.now(timezone.utc).isoformat()
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=CATALOG_KEY,
+                Body=json.dumps(catalog, separators=(',', ':')),
+                ContentType='application/json',
+                **condition
+            )
+            return catalog
+        except s3_client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('PreconditionFailed', 'ConditionalRequestConflict',
+                                                               'NoSuchKey'):
+                raise
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+    print(f"Gave up updating {CATALOG_KEY} after {WRITE_ATTEMPTS} conflicting writes")
+    return None
+
+
+def record_layer(s3_client, bucket_name, metadata, metadata_key, etag=''):
+    """Add a freshly published layer to the catalog; never raises, the next GC run catches up"""
+    try:
+        row = catalog_row(metadata, metadata_key, etag)
+        return write_catalog(s3_client, bucket_name, lambda catalog: add_rows(catalog, [row])) is not None
+    except Exception as e:
+        print(f"Could not add {metadata_key} to the catalog: {str(e)}")
+        return False
+
+
+def rebuild_catalog(s3_client, bucket_name):
+    """Replace the catalog with a fresh scan, dropping layers that no longer exist"""
+    return write_catalog(s3_client, bucket_name, rebuild=True)
+
+
+def load_catalog(s3_client, bucket_name):
+    """(catalog, ETag) for readers, building the catalog on first use"""
+    catalog, etag = read_catalog(s3_client, bucket_name)
+    if catalog is None:
+        print("Catalog missing or outdated; building it from metadata")
+        rebuild_catalog(s3_client, bucket_name)
+        catalog, etag = read_catalog(s3_client, bucket_name)
+    return catalog, etag
+
+
+def catalog_etag(etag, query):
+    """Strong ETag of a response derived from the catalog version and the query that shaped it"""
+    digest = hashlib.sha256(f'{CATALOG_FORMAT_VERSION}\0{etag}\0{query}'.encode('utf-8'))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def parse_filters(params):
+    """Facet filters from query parameters; raises ValueError for malformed values"""
+    params = params or {}
+    filters = {}
+    for name in ('platform', 'pythonVersion'):
+        if params.get(name):
+            filters[name] = params[name]
+    for name in ('minSize', 'maxSize'):
+        if params.get(name):
+            if not str(params[name]).isdigit():
+                raise ValueError(f'{name} must be a size in bytes')
+            filters[name] = int(params[name])
+    for name in ('createdAfter', 'createdBefore'):
+        if params.get(name):
+            digits = params[name].replace('-', '')
+            if not re.match(r'^\d{4,14}$', digits):
+                raise ValueError(f'{name} must be a date such as 2024-01-31')
+            filters[name] = digits
+    return filters
+
+
+def filter_rows(catalog, filters, search_query=''):
+    """Listing items matching the filters and search, newest first, narrowing one column at a time"""
+    columns = catalog['columns']
+    indices = range(len(columns['key']))
+    for name in ('platform', 'pythonVersion'):
+        if name in filters:
+            indices = [i for i in indices if columns[name][i] == filters[name]]
+    if 'minSize' in filters:
+        indices = [i for i in indices if (columns['size'][i] or 0) >= filters['minSize']]
+    if 'maxSize' in filters:
+        indices = [i for i in indices if (columns['size'][i] or 0) <= filters['maxSize']]
+    if 'createdAfter' in filters or 'createdBefore' in filters:
+        created = [value.replace('-', '') for value in columns['createdAt']]
+        after = filters.get('createdAfter')
+        before = filters.get('createdBefore')
+        indices = [
+            i for i in indices
+            if (not after or created[i][:len(after)] >= after) and (not before or created[i][:len(before)] < before)
+        ]
+    if search_query:
+        def matches(i):
+            searchable = ' '.join(
+                [columns['fileName'][i], ' '.join(columns['dependencies'][i] or [])]
+                + [alias.get('packageName', '') for alias in columns['aliases'][i] or []]
+            ).lower()
+            return search_query in searchable
+        indices = [i for i in indices if matches(i)]
+
+    items = []
+    for i in indices:
+        item = {column: columns[column][i] for column in COLUMNS if column != 'metadataKey'}
+        item['dependencyCount'] = len(item['dependencies'] or [])
+        items.append(item)
+    items.sort(key=listing_position, reverse=True)
+    return items
+
+
+def catalog_stats(catalog):
+    """Totals, per-group counts and the most used dependencies, straight from the aggregates"""
+    aggregates = catalog['aggregates']
+    top = sorted(aggregates['dependencies'].items(), key=lambda item: (-item[1], item[0]))[:TOP_DEPENDENCIES]
+    return {
+        'totals': {'layers': aggregates['layers'], 'bytes': aggregates['bytes']},
+        'byPlatform': aggregates['byPlatform'],
+        'byPythonVersion': aggregates['byPythonVersion'],
+        'byMonth': dict(sorted(aggregates['byMonth'].items())),
+        'topDependencies': [{'name': name, 'layers': count} for name, count in top],
+        'updatedAt': catalog.get('updatedAt')
+    }
@@ -0,0 +1,77 @@
+"""
+Download links for layers, served through CloudFront when the layer CDN is deployed.
+
+With LAYER_CDN_DOMAIN and LAYER_CDN_KEY_PAIR_ID set, layers/ keys get CloudFront signed
+URLs (canned policy) for the /layers/* behavior of the frontend distribution, so repeat
+downloads of a layer come from the nearest edge instead of the regional bucket. Layer
+keys are never rewritten, so edges may keep them for a year. Anything else, or any
+failure to sign, falls back to an S3 presigned URL.
+
+The signing key is an RSA private key in PEM form, read from the SSM SecureString named
+by LAYER_CDN_PRIVATE_KEY_PARAMETER (or LAYER_CDN_PRIVATE_KEY directly, for local runs).
+Signing uses the cryptography package, which the Lambda runtime lacks; the stack ships it
+in a layer only when the CDN is deployed, so it is imported only when a URL is signed.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+import boto3
+from botocore.signers import CloudFrontSigner
+
+ssm_client = boto3.client('ssm')
+
+LAYER_CDN_PREFIX = 'layers/'
+DOWNLOAD_URL_EXPIRES_SECONDS = 7200
+# Layer keys carry a timestamp and random suffix and are never overwritten
+LAYER_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_signer = None
+
+
+def rsa_sha1_signer(pem):
+    """RSASSA-PKCS1-v1_5 with SHA-1, as CloudFront expects for signed URLs"""
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    key = serialization.load_pem_private_key(pem.encode('utf-8'), password=None)
+
+    def sign(message):
+        return key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+    return sign
+
+
+def cdn_signer():
+    """CloudFrontSigner for the layer CDN, or None when it is not configured"""
+    global _signer
+    key_pair_id = os.environ.get('LAYER_CDN_KEY_PAIR_ID')
+    if not os.environ.get('LAYER_CDN_DOMAIN') or not key_pair_id:
+        return None
+    if _signer is None:
+        pem = os.environ.get('LAYER_CDN_PRIVATE_KEY')
+        if not pem:
+            parameter = ssm_client.get_parameter(
+                Name=os.environ['LAYER_CDN_PRIVATE_KEY_PARAMETER'], WithDecryption=True
+            )
+            pem = parameter['Parameter']['Value']
+        _signer = CloudFrontSigner(key_pair_id, rsa_sha1_signer(pem))
+    return _signer
+
+
+def download_url(s3_client, bucket_name, s3_key, expires_in=DOWNLOAD_URL_EXPIRES_SECONDS):
+    """Signed CloudFront URL for a layer when the CDN is deployed, otherwise a presigned S3 URL"""
+    if s3_key.startswith(LAYER_CDN_PREFIX):
+        try:
+            signer = cdn_signer()
+            if signer:
+                url = f"https://{os.environ['LAYER_CDN_DOMAIN']}/{quote(s3_key)}"
+                expires = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+                return signer.generate_presigned_url(url, date_less_than=expires)
+        except Exception as e:
+            print(f"Could not sign a CloudFront URL for {s3_key}, using S3: {str(e)}")
+    return s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket_name, 'Key': s3_key},
+        ExpiresIn=expires_in,
+        HttpMethod='GET'
+    )
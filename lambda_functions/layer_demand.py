@@ -0,0 +1,168 @@
+"""
+Request telemetry and the prebuilt layers it drives.
+
+Every eligible build request is recorded as one small object under
+demand/<day>/<set key>/, where the set key hashes the part of the request that decides
+what goes into the layer: its normalized dependencies, runtime, platforms and Python
+versions. Writing a new object per request needs no read-modify-write, so concurrent
+builders never lose counts.
+
+layer_prewarm counts these objects to find the most requested sets and keeps a layer
+built for each one, recorded under prebuilt/<set key>.json with the versions pip resolved
+for it. A request for a set whose prebuilt layer was checked against the index within
+PREBUILT_MAX_AGE_SECONDS is answered with that layer instead of a new build.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from build_registry import normalize_dependencies
+from metrics import emit_metrics
+from s3_storage import resolve_layer_key
+
+DEMAND_PREFIX = 'demand/'
+PREBUILT_PREFIX = 'prebuilt/'
+# A little over one prewarm interval, so records stay servable between runs
+PREBUILT_MAX_AGE_SECONDS = int(os.environ.get('PREBUILT_MAX_AGE_SECONDS', str(2 * 60 * 60)))
+
+
+def telemetry_enabled():
+    return os.environ.get('LAYER_TELEMETRY', 'on').lower() != 'off'
+
+
+def prebuilt_enabled():
+    return os.environ.get('PREBUILT_LAYERS', 'on').lower() != 'off'
+
+
+def dependency_set(body):
+    """The part of a build request that decides the layer's contents, or None when it is not tracked.
+
+    Batches, dry runs and requests without dependencies to install are not tracked.
+    """
+    dependencies = normalize_dependencies(body.get('dependencies'))
+    if body.get('layers') is not None or body.get('dryRun') or not dependencies:
+        return None
+    if not body.get('installDependencies', True):
+        return None
+    return {
+        'dependencies': dependencies,
+        'runtime': body.get('runtime', 'python3.12'),
+        'platforms': sorted(body.get('platforms') or [body.get('platform', 'manylinux2014_x86_64')]),
+        'pythonVersions': sorted(body.get('pythonVersions') or [body.get('pythonVersion', '3.12')]),
+    }
+
+
+def set_key(dependency_set):
+    return hashlib.sha256(json.dumps(dependency_set, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def day_prefix(day):
+    return f"{DEMAND_PREFIX}{day.strftime('%Y-%m-%d')}/"
+
+
+def record_request(s3_client, bucket_name, body, served):
+    """Count one request for the body's dependency set; served is 'prebuilt' or 'build'"""
+    requested = dependency_set(body)
+    if requested is None or not telemetry_enabled():
+        return
+    emit_metrics({'LayerRequests': 1}, {'Served': served})
+    try:
+        key = f"{day_prefix(datetime.now(timezone.utc))}{set_key(requested)}/{uuid.uuid4().hex}.json"
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=json.dumps({
+                'set': requested,
+                'packageName': body.get('packageName', 'lambda-layer'),
+                'served': served,
+                'requestedAt': time.time()
+            }),
+            ContentType='application/json'
+        )
+    except Exception as e:
+        print(f"Could not record request telemetry: {str(e)}")
+
+
+def popular_sets(s3_client, bucket_name, top_k, window_days, min_requests=1, now=None):
+    """The top_k most requested dependency sets of the last window_days, most requested first"""
+    now = now or datetime.now(timezone.utc)
+    counts = Counter()
+    samples = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for offset in range(window_days):
+        prefix = day_prefix(now - timedelta(days=offset))
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key'][len(prefix):].split('/', 1)[0]
+                counts[key] += 1
+                samples.setdefault(key, obj['Key'])
+
+    popular = []
+    for key, requests in counts.most_common(top_k):
+        if requests < min_requests:
+            break
+        sample = json.loads(s3_client.get_object(Bucket=bucket_name, Key=samples[key])['Body'].read())
+        popular.append({'key': key, 'set': sample['set'], 'packageName': sample['packageName'], 'requests': requests})
+    return popular
+
+
+def read_prebuilt(s3_client, bucket_name, key):
+    try:
+        obj = s3_client.get_object(Bucket=bucket_name, Key=f'{PREBUILT_PREFIX}{key}.json')
+        return json.loads(obj['Body'].read())
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+
+def write_prebuilt(s3_client, bucket_name, key, record):
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=f'{PREBUILT_PREFIX}{key}.json',
+        Body=json.dumps(record),
+        ContentType='application/json'
+    )
+
+
+def current_layer_key(s3_client, bucket_name, key):
+    """The key holding a layer now, following the alias GC leaves when it collapses a duplicate.
+
+    None when the layer is gone or cannot be checked, so callers build it afresh.
+    """
+    try:
+        current_key, head = resolve_layer_key(s3_client, bucket_name, key)
+    except Exception as e:
+        print(f"Could not check layer {key}: {str(e)}")
+        return None
+    return current_key if head is not None else None
+
+
+def current_response(s3_client, bucket_name, response):
+    """A stored build response pointing at where its layers are now, or None if any is gone"""
+    body = json.loads(response['body'])
+    items = [item for item in [body] + body.get('variants', []) if item.get('s3Key')]
+    for item in items:
+        item['s3Key'] = current_layer_key(s3_client, bucket_name, item['s3Key'])
+        if item['s3Key'] is None:
+            return None
+    return dict(response, body=json.dumps(body)) if items else None
+
+
+def find_prebuilt(s3_client, bucket_name, body, now=None):
+    """Stored build response of a fresh prebuilt layer for this request, or None"""
+    requested = dependency_set(body)
+    if requested is None or body.get('upgradePackages') or body.get('profileImports') or not prebuilt_enabled():
+        return None
+    try:
+        record = read_prebuilt(s3_client, bucket_name, set_key(requested))
+    except Exception as e:
+        print(f"Could not read prebuilt layers: {str(e)}")
+        return None
+    if not record or not record.get('response'):
+        return None
+    if (now or time.time()) - record.get('checkedAt', 0) > PREBUILT_MAX_AGE_SECONDS:
+        return None
+    return current_response(s3_client, bucket_name, record['response'])
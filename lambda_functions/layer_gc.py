@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from edge_cache import purge_listing_cache
+from layer_archive import build_manifest, read_zip_entries, s3_range_reader
+from layer_catalog import rebuild_catalog
+from s3_storage import ALIASES_PREFIX, alias_key, list_sharded, shared_s3_client
+
+s3_client = shared_s3_client()
+
+RETENTION_DAYS = int(os.environ.get('GC_RETENTION_DAYS', '30'))
+NONCURRENT_VERSIONS_TO_KEEP = int(os.environ.get('GC_NONCURRENT_VERSIONS_TO_KEEP', '1'))
+VERSIONED_PREFIXES = ['layers/', 'metadata/', ALIASES_PREFIX, 'manifests/']
+
+
+def lambda_handler(event, context):
+    """Scheduled entry point: compact duplicate builds and expire old noncurrent versions"""
+    bucket_name = os.environ['BUCKET_NAME']
+    event = event or {}
+    dry_run = event.get('dryRun', os.environ.get('GC_DRY_RUN', 'false').lower() == 'true')
+
+    report = collect_garbage(
+        s3_client,
+        bucket_name,
+        retention_days=event.get('retentionDays', RETENTION_DAYS),
+        keep_noncurrent=event.get('keepNoncurrent', NONCURRENT_VERSIONS_TO_KEEP),
+        dry_run=dry_run
+    )
+    print(f"GC summary: {json.dumps(summarize(report))}")
+    return summarize(report)
+
+
+def collect_garbage(client, bucket_name, retention_days=RETENTION_DAYS,
+                    keep_noncurrent=NONCURRENT_VERSIONS_TO_KEEP, dry_run=True):
+    """Run every GC pass and return a report of what was (or would be) removed"""
+    report = {
+        'dryRun': dry_run,
+        'duplicates': [],
+        'expiredVersions': [],
+        'bytesReclaimed': 0
+    }
+    compact_duplicates(client, bucket_name, dry_run, report)
+    expire_noncurrent_versions(client, bucket_name, retention_days, keep_noncurrent, dry_run, report)
+    if not dry_run:
+        # A fresh scan drops collapsed builds and picks up any build whose catalog update was lost
+        rebuild_catalog(client, bucket_name)
+    if report['duplicates'] and not dry_run:
+        purge_listing_cache('gc')
+    return report
+
+
+def summarize(report):
+    """Counts-only view of a GC report for logs and Lambda responses"""
+    return {
+        'dryRun': report['dryRun'],
+        'duplicatesCollapsed': len(report['duplicates']),
+        'versionsExpired': len(report['expiredVersions']),
+        'bytesReclaimed': report['bytesReclaimed']
+    }
+
+
+def load_metadata_records(client, bucket_name, dry_run):
+    """Load every metadata document, backfilling contentHash for builds that predate it"""
+    records = []
+    for obj in list_sharded(client, bucket_name, 'metadata/'):
+        if not obj['Key'].endswith('.json'):
+            continue
+        try:
+            metadata_obj = client.get_object(Bucket=bucket_name, Key=obj['Key'])
+            metadata = json.loads(metadata_obj['Body'].read().decode('utf-8'))
+        except Exception as e:
+            print(f"Error reading metadata file {obj['Key']}: {str(e)}")
+            continue
+
+        if not metadata.get('contentHash') and metadata.get('packageKey'):
+            metadata['contentHash'] = hash_remote_layer(client, bucket_name, metadata['packageKey'])
+            if metadata['contentHash'] and not dry_run:
+                put_json(client, bucket_name, obj['Key'], metadata)
+
+        if metadata.get('contentHash'):
+            records.append({'metadataKey': obj['Key'], 'metadata': metadata})
+    return records
+
+
+def hash_remote_layer(client, bucket_name, package_key):
+    """Hash a layer that has no recorded contentHash from its central directory alone"""
+    try:
+        size = client.head_object(Bucket=bucket_name, Key=package_key)['ContentLength']
+        entries = read_zip_entries(s3_range_reader(client, bucket_name, package_key), size)
+        return build_manifest(entries)['contentHash']
+    except Exception as e:
+        print(f"Could not hash {package_key}: {str(e)}")
+        return None
+
+
+def compact_duplicates(client, bucket_name, dry_run, report):
+    """Collapse builds with identical contents onto the oldest copy, keeping the others as aliases"""
+    groups = defaultdict(list)
+    for record in load_metadata_records(client, bucket_name, dry_run):
+        # A pure-Python layer hashes the same for every target; each target stays listed on its own
+        metadata = record['metadata']
+        target = (metadata.get('platform', ''), metadata.get('pythonVersion', ''))
+        groups[(metadata['contentHash'],) + target].append(record)
+
+    for records in groups.values():
+        if len(records) < 2:
+            continue
+
+        records.sort(key=lambda r: (r['metadata'].get('createdAt', ''), r['metadataKey']))
+        canonical, duplicates = records[0], records[1:]
+        canonical_key = canonical['metadata']['packageKey']
+        aliases = list(canonical['metadata'].get('aliases', []))
+
+        for duplicate in duplicates:
+            metadata = duplicate['metadata']
+            if metadata['packageKey'] == canonical_key:
+                continue
+            aliases.extend(metadata.get('aliases', []))
+            aliases.append({
+                'packageName': metadata.get('packageName', ''),
+                'packageKey': metadata['packageKey'],
+                'createdAt': metadata.get('createdAt', ''),
+                'dependencies': metadata.get('dependencies', [])
+            })
+            report['duplicates'].append({
+                'packageKey': metadata['packageKey'],
+                'metadataKey': duplicate['metadataKey'],
+                'canonicalKey': canonical_key,
+                'bytes': metadata.get('packageSize', 0)
+            })
+            report['bytesReclaimed'] += metadata.get('packageSize', 0)
+
+        if dry_run:
+            continue
+
+        # Write the new pointers before deleting anything so a crash never loses a layer
+        canonical['metadata']['aliases'] = aliases
+        put_json(client, bucket_name, canonical['metadataKey'], canonical['metadata'])
+        for duplicate in duplicates:
+            package_key = duplicate['metadata']['packageKey']
+            if package_key == canonical_key:
+                continue
+            put_json(client, bucket_name, alias_key(package_key), {
+                'packageKey': canonical_key,
+                'contentHash': canonical['metadata']['contentHash']
+            })
+            client.delete_object(Bucket=bucket_name, Key=package_key)
+            client.delete_object(Bucket=bucket_name, Key=duplicate['metadataKey'])
+            client.delete_object(Bucket=bucket_name, Key=f'manifests/{package_key}.json')
+        print(f"Collapsed {len(duplicates)} duplicates onto {canonical_key}")
+
+
+def expire_noncurrent_versions(client, bucket_name, retention_days, keep_noncurrent, dry_run, report):
+    """Delete noncurrent versions older than the retention window, beyond the newest keep_noncurrent"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    paginator = client.get_paginator('list_object_versions')
+
+    for prefix in VERSIONED_PREFIXES:
+        versions_by_key = defaultdict(list)
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for version in page.get('Versions', []):
+                versions_by_key[version['Key']].append(dict(version, IsDeleteMarker=False))
+            for marker in page.get('DeleteMarkers', []):
+                versions_by_key[marker['Key']].append(dict(marker, IsDeleteMarker=True, Size=0))
+
+        for key, versions in versions_by_key.items():
+            versions.sort(key=lambda v: v['LastModified'], reverse=True)
+            expired = []
+            for index, version in enumerate(versions[1:], start=1):
+                # A version becomes noncurrent when the next newer version is written
+                noncurrent_since = versions[index - 1]['LastModified']
+                if index > keep_noncurrent and noncurrent_since < cutoff:
+                    expired.append(version)
+
+            # A delete marker with nothing left behind it is itself garbage
+            if versions[0]['IsDeleteMarker'] and len(expired) == len(versions) - 1:
+                expired.append(versions[0])
+
+            for version in expired:
+                report['expiredVersions'].append({'key': key, 'versionId': version['VersionId']})
+                report['bytesReclaimed'] += version.get('Size', 0)
+                if not dry_run:
+                    client.delete_object(Bucket=bucket_name, Key=key, VersionId=version['VersionId'])
+
+
+def put_json(client, bucket_name, key, document):
+    client.put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=json.dumps(document, indent=2),
+        ContentType='application/json'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact duplicate layer builds and expire old object versions')
+    parser.add_argument('--bucket', default=os.environ.get('BUCKET_NAME'), help='Packages bucket name')
+    parser.add_argument('--retention-days', type=int, default=RETENTION_DAYS)
+    parser.add_argument('--keep-noncurrent', type=int, default=NONCURRENT_VERSIONS_TO_KEEP)
+    parser.add_argument('--apply', action='store_true', help='Actually delete and rewrite objects (default: dry run)')
+    args = parser.parse_args()
+
+    if not args.bucket:
+        parser.error('--bucket or BUCKET_NAME is required')
+
+    report = collect_garbage(s3_client, args.bucket, args.retention_days, args.keep_noncurrent, dry_run=not args.apply)
+    print(json.dumps(report, indent=2, default=str))
+    print(json.dumps(summarize(report), indent=2))
+
+
+if __name__ == '__main__':
+    main()
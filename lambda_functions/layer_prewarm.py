@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import time
+
+import package_creator
+from build_checkpoint import BuildCheckpoint
+from layer_demand import current_response, popular_sets, read_prebuilt, write_prebuilt
+from metrics import emit_metrics
+from preflight import resolve
+from s3_storage import shared_s3_client
+from wheelhouse import variant_label
+
+s3_client = shared_s3_client()
+
+PREWARM_TOP_K = int(os.environ.get('PREWARM_TOP_K', '10'))
+PREWARM_WINDOW_DAYS = int(os.environ.get('PREWARM_WINDOW_DAYS', '7'))
+PREWARM_MIN_REQUESTS = int(os.environ.get('PREWARM_MIN_REQUESTS', '3'))
+# No new build starts with less time than this left in the invocation
+PREWARM_RESERVE_SECONDS = int(os.environ.get('PREWARM_RESERVE_SECONDS', '300'))
+# Prewarm builds are admitted in the batch class, so they never crowd out interactive users
+PREWARM_CLIENT = ('prewarm', 'batch')
+
+
+def lambda_handler(event, context):
+    """Scheduled entry point: keep the most requested dependency sets built against current releases"""
+    event = event or {}
+    # Prewarm builds that checkpoint resume in this function
+    if event.get('resumeBuild'):
+        return package_creator.lambda_handler(event, context)
+
+    report = prewarm(
+        s3_client,
+        os.environ['BUCKET_NAME'],
+        top_k=event.get('topK', PREWARM_TOP_K),
+        window_days=event.get('windowDays', PREWARM_WINDOW_DAYS),
+        min_requests=event.get('minRequests', PREWARM_MIN_REQUESTS),
+        dry_run=event.get('dryRun', False),
+        context=context
+    )
+    print(f"Prewarm summary: {json.dumps(summarize(report))}")
+    return summarize(report)
+
+
+def prewarm(client, bucket_name, top_k=PREWARM_TOP_K, window_days=PREWARM_WINDOW_DAYS,
+            min_requests=PREWARM_MIN_REQUESTS, dry_run=True, context=None):
+    """Rebuild every popular set whose prebuilt layer is missing or resolves to new versions"""
+    report = {'sets': []}
+    for entry in popular_sets(client, bucket_name, top_k, window_days, min_requests):
+        if not dry_run and package_creator.remaining_seconds(context) < PREWARM_RESERVE_SECONDS:
+            status = 'deferred'
+        else:
+            status = prewarm_set(client, bucket_name, entry, dry_run, context)
+        print(f"{status:>10}  {entry['requests']:>5} requests  {' '.join(entry['set']['dependencies'])}")
+        report['sets'].append({
+            'key': entry['key'],
+            'dependencies': entry['set']['dependencies'],
+            'requests': entry['requests'],
+            'status': status
+        })
+
+    emit_metrics({f'Prewarm{status.capitalize()}': count for status, count in summarize(report)['statuses'].items()})
+    return report
+
+
+def prewarm_set(client, bucket_name, entry, dry_run, context):
+    """current, stale (dry run), rebuilt, pending, unresolved, deferred or failed"""
+    record = read_prebuilt(client, bucket_name, entry['key']) or {'set': entry['set']}
+    if record.get('pendingBuild') and settle_pending_build(client, bucket_name, record) == 'running':
+        return 'pending'
+
+    resolved = resolve_versions(entry['set'])
+    if resolved is None:
+        return 'unresolved'
+
+    current = current_response(client, bucket_name, record['response']) if record.get('response') else None
+    if current and record.get('resolved') == resolved:
+        if not dry_run:
+            write_prebuilt(client, bucket_name, entry['key'], dict(record, response=current, checkedAt=time.time(),
+                                                                   requests=entry['requests']))
+        return 'current'
+    if dry_run:
+        return 'stale'
+
+    body = dict(entry['set'], packageName=entry['packageName'])
+    response = package_creator.run_build(body, context, PREWARM_CLIENT)
+    if response['statusCode'] == 200:
+        write_prebuilt(client, bucket_name, entry['key'], dict(
+            record, resolved=resolved, response=response, builtAt=time.time(), checkedAt=time.time(),
+            requests=entry['requests']
+        ))
+        return 'rebuilt'
+    if response['statusCode'] == 202:
+        # Checkpointed, queued or handed to another architecture's builder; settled next run
+        build_id = json.loads(response['body'])['buildId']
+        write_prebuilt(client, bucket_name, entry['key'], dict(record, pendingBuild=build_id, pendingResolved=resolved))
+        return 'pending'
+    if response['statusCode'] == 429:
+        return 'deferred'
+    print(f"Prewarm build failed: {json.loads(response['body']).get('error')}")
+    return 'failed'
+
+
+def settle_pending_build(client, bucket_name, record):
+    """Adopt the result of a build started by an earlier run; returns its status"""
+    checkpoint = BuildCheckpoint.load(client, bucket_name, record['pendingBuild'])
+    status = checkpoint.state['status'] if checkpoint else 'failed'
+    if status == 'running':
+        return status
+    if status == 'succeeded':
+        record.update(resolved=record['pendingResolved'], response=checkpoint.state['response'],
+                      builtAt=checkpoint.state.get('updatedAt', time.time()))
+    record.pop('pendingBuild')
+    record.pop('pendingResolved')
+    return status
+
+
+def resolve_versions(dependency_set):
+    """Versions pip would install today for each variant of a set, or None if any variant fails"""
+    resolved = {}
+    for platform in dependency_set['platforms']:
+        for python_version in dependency_set['pythonVersions']:
+            try:
+                report, stderr = resolve(dependency_set['dependencies'], platform, python_version)
+            except Exception as e:
+                report, stderr = None, str(e)
+            if report is None:
+                print(f"Could not resolve {dependency_set['dependencies']} for "
+                      f"{variant_label(platform, python_version)}: {stderr.strip()[-300:]}")
+                return None
+            resolved[variant_label(platform, python_version)] = {
+                item['metadata']['name'].lower(): item['metadata']['version'] for item in report.get('install', [])
+            }
+    return resolved
+
+
+def summarize(report):
+    statuses = {}
+    for entry in report['sets']:
+        statuses[entry['status']] = statuses.get(entry['status'], 0) + 1
+    return {'sets': len(report['sets']), 'statuses': statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the most requested layers when upstream releases change')
+    parser.add_argument('--bucket', default=os.environ.get('BUCKET_NAME'), help='Packages bucket name')
+    parser.add_argument('--top', type=int, default=PREWARM_TOP_K, help='Number of dependency sets to keep built')
+    parser.add_argument('--window-days', type=int, default=PREWARM_WINDOW_DAYS)
+    parser.add_argument('--min-requests', type=int, default=PREWARM_MIN_REQUESTS)
+    parser.add_argument('--wheelhouse', help='Resolve and build from this directory of wheels instead of PyPI')
+    parser.add_argument('--apply', action='store_true', help='Actually build and record layers (default: dry run)')
+    args = parser.parse_args()
+
+    if not args.bucket:
+        parser.error('--bucket or BUCKET_NAME is required')
+    os.environ['BUCKET_NAME'] = args.bucket
+    if args.wheelhouse:
+        os.environ['INDEX_MIRROR_DIR'] = os.path.abspath(args.wheelhouse)
+
+    report = prewarm(s3_client, args.bucket, args.top, args.window_days, args.min_requests, dry_run=not args.apply)
+    print(json.dumps(summarize(report), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import json
+import os
+import time
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'LambdaLayerBuilder')
+
+
+def emit_metrics(values, dimensions=None, units=None):
+    """Log values in CloudWatch Embedded Metric Format; CloudWatch turns the log line into metrics.
+
+    values maps metric names to numbers, dimensions maps dimension names to strings and
+    units maps metric names to a CloudWatch unit (Count by default).
+    """
+    dimensions = dimensions or {}
+    units = units or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [sorted(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': units.get(name, 'Count')} for name in values]
+            }]
+        },
+        **dimensions,
+        **values
+    }
+    print(json.dumps(record))
+    return record
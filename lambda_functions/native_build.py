@@ -0,0 +1,151 @@
+"""
+Builds on a builder whose architecture and Python match the layer being built.
+
+Cross-platform installs (pip's --platform/--python-version) can only use binary wheels,
+so packages that publish only an sdist for a platform cannot be built that way. When the
+builder matches the target, pip runs natively instead: sdists are compiled into wheels,
+the wheels are installed, and every wheel built from source is kept under
+wheels/compiled/<arch>/<python tag>/ in the packages bucket for the next build to reuse.
+Compiling always uses pip wheel; the wheels are then installed with the build's installer.
+"""
+import os
+import platform as host_platform
+import re
+import subprocess
+import sys
+
+from index_cache import pip_index_args
+from installer import select_installer
+from wheelhouse import list_wheels
+
+COMPILED_WHEELS_PREFIX = 'wheels/compiled/'
+NATIVE_BUILD_TIMEOUT_SECONDS = int(os.environ.get('NATIVE_BUILD_TIMEOUT_SECONDS', '600'))
+ARCHITECTURE_ALIASES = {'amd64': 'x86_64', 'x86_64': 'x86_64', 'arm64': 'aarch64', 'aarch64': 'aarch64'}
+# Environment variables naming the builder function for each target architecture
+BUILDER_FUNCTION_VARIABLES = {'aarch64': 'ARM64_BUILDER_FUNCTION', 'x86_64': 'X86_64_BUILDER_FUNCTION'}
+BUILT_WHEEL_PATTERN = re.compile(r'Created wheel for \S+: filename=(\S+\.whl)')
+
+
+def platform_architecture(platform):
+    """aarch64 or x86_64 for a pip platform tag such as manylinux2014_aarch64"""
+    for suffix in ('aarch64', 'x86_64'):
+        if platform.endswith(suffix):
+            return suffix
+    return None
+
+
+def host_architecture():
+    machine = host_platform.machine().lower()
+    return ARCHITECTURE_ALIASES.get(machine, machine)
+
+
+def matches_host(platform, python_version):
+    """True when this builder's interpreter can install for the target without cross-platform flags"""
+    return (platform_architecture(platform) == host_architecture()
+            and python_version == f'{sys.version_info.major}.{sys.version_info.minor}')
+
+
+def source_builds_enabled(platform, python_version):
+    """SOURCE_BUILDS=native compiles sdists when the builder matches the target; off (default) never does"""
+    return os.environ.get('SOURCE_BUILDS', 'off').lower() == 'native' and matches_host(platform, python_version)
+
+
+def builder_function(architecture):
+    """Name of the function building for architecture, or None when it is not deployed"""
+    return os.environ.get(BUILDER_FUNCTION_VARIABLES.get(architecture, ''), '') or None
+
+
+def compiled_prefix(platform, python_version):
+    return f"{COMPILED_WHEELS_PREFIX}{platform_architecture(platform)}/cp{python_version.replace('.', '')}/"
+
+
+def restore_compiled_wheels(s3_client, bucket_name, platform, python_version, dest_dir):
+    """Download the cached wheels compiled for this variant; returns how many are available"""
+    os.makedirs(dest_dir, exist_ok=True)
+    prefix = compiled_prefix(platform, python_version)
+    count = 0
+    try:
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                path = os.path.join(dest_dir, obj['Key'][len(prefix):])
+                if not os.path.exists(path):
+                    s3_client.download_file(bucket_name, obj['Key'], path)
+                count += 1
+    except Exception as e:
+        print(f"Compiled wheel cache not restored: {str(e)}")
+    return count
+
+
+def save_compiled_wheels(s3_client, bucket_name, platform, python_version, wheel_dir, filenames):
+    """Upload wheels this build compiled from source so later builds skip compiling them"""
+    prefix = compiled_prefix(platform, python_version)
+    saved = 0
+    for filename in filenames:
+        try:
+            s3_client.upload_file(os.path.join(wheel_dir, filename), bucket_name, prefix + filename)
+            saved += 1
+        except Exception as e:
+            print(f"Could not cache compiled wheel {filename}: {str(e)}")
+    if saved:
+        print(f"📦 Cached {saved} compiled wheels under {prefix}")
+    return saved
+
+
+def build_wheels(dependencies, wheel_dir, find_links=None):
+    """pip wheel with this interpreter, preferring binary wheels; returns (ok, compiled filenames, stderr)"""
+    pip_cmd = [
+        'python3', '-m', 'pip', 'wheel',
+        '--wheel-dir', wheel_dir,
+        '--prefer-binary',
+        *pip_index_args(),
+        '--disable-pip-version-check'
+    ]
+    for link in find_links or []:
+        pip_cmd.extend(['--find-links', link])
+    pip_cmd.extend(dependencies)
+
+    print(f"Running: {' '.join(pip_cmd)}")
+    result = subprocess.run(pip_cmd, capture_output=True, text=True, timeout=NATIVE_BUILD_TIMEOUT_SECONDS, cwd='/tmp')
+    compiled = [os.path.basename(name) for name in BUILT_WHEEL_PATTERN.findall(result.stdout)]
+    return result.returncode == 0, compiled, result.stderr
+
+
+def install_native(dependencies, target_dir, platform, python_version, s3_client, bucket_name, work_dir,
+                   upgrade_packages=False, installer=None):
+    """Install dependencies natively, compiling sdists and reusing wheels compiled by earlier builds.
+
+    pip prefers binary wheels, so a cached compiled wheel wins over a newer sdist; with
+    upgrade_packages the cache is not consulted and everything is resolved afresh.
+    """
+    installer = installer or select_installer()
+    cache_dir = os.path.join(work_dir, 'compiled-cache')
+    wheel_dir = os.path.join(work_dir, 'native-wheels')
+    os.makedirs(wheel_dir, exist_ok=True)
+    cached = 0
+    if not upgrade_packages:
+        cached = restore_compiled_wheels(s3_client, bucket_name, platform, python_version, cache_dir)
+    print(f"🔧 Native build for {platform} / Python {python_version} with {cached} cached compiled wheels")
+
+    try:
+        ok, compiled, stderr = build_wheels(dependencies, wheel_dir, [cache_dir] if cached else None)
+    except subprocess.TimeoutExpired:
+        print(f"⏱️ Native wheel build timed out after {NATIVE_BUILD_TIMEOUT_SECONDS}s")
+        return False
+    if not ok:
+        print(f"❌ Native wheel build failed\nSTDERR: {stderr}")
+        return False
+    save_compiled_wheels(s3_client, bucket_name, platform, python_version, wheel_dir, compiled)
+
+    # No --platform here: the wheels were built for exactly this interpreter
+    install_cmd = installer.local_command(target_dir, wheel_dir, dependencies)
+    print(f"Running {installer.name} command: {' '.join(install_cmd)}")
+    result = subprocess.run(install_cmd, capture_output=True, text=True, timeout=NATIVE_BUILD_TIMEOUT_SECONDS,
+                            cwd='/tmp')
+    if result.returncode != 0:
+        print(f"❌ Native install failed\nSTDERR: {result.stderr}")
+        return False
+    installer.finish(target_dir)
+    print(f"✅ Installed {len(list_wheels(wheel_dir))} wheels natively with {installer.name} "
+          f"({len(compiled)} compiled from source)")
+    return True
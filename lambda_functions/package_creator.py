@@ -5,14 +5,399 @@ import os
 import tempfile
 import subprocess
 import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-s3_client = boto3.client('s3')
+from build_checkpoint import BuildCheckpoint, BuildSuspended, TimeBudget
+from build_executor import select_executor
+from build_registry import LocalBuildRegistry, S3BuildRegistry, build_fingerprint
+from build_scheduler import MAX_WAIT_SECONDS, LocalBuildScheduler, S3BuildScheduler, build_priority, client_identity
+from edge_cache import purge_listing_cache
+from handler_profiler import profiled
+from import_profiler import profile_layer
+from index_cache import restore_index_cache, save_index_cache
+from installer import select_installer
+from layer_archive import content_hash
+from layer_catalog import record_layer
+from layer_demand import current_layer_key, find_prebuilt, record_request
+from layer_cdn import LAYER_CACHE_CONTROL, download_url as layer_download_url
+from native_build import install_native, matches_host, source_builds_enabled
+from preflight import run_preflight, summarize_errors
+from s3_storage import is_throttled, layer_key, metadata_key as layer_metadata_key, shared_s3_client, throttled_response
+from wheel_transcoder import (FETCH_MAX_WORKERS, extract_site_packages, fetch_wheel, fetch_wheels, merge_zips,
+                              transcode_wheels)
+from wheelhouse import download_wheels, install_from_wheelhouse, share_pure_wheels, variant_label
 
+s3_client = shared_s3_client()
+lambda_client = boto3.client('lambda')
+
+# Upper bound on platform x Python variants accepted in one matrix request
+MAX_MATRIX_VARIANTS = 8
+MATRIX_MAX_WORKERS = int(os.environ.get('MATRIX_MAX_WORKERS', '4'))
+# Upper bound on layers accepted in one POST /packages/batch request
+MAX_BATCH_LAYERS = 20
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, Idempotency-Key',
+    'Access-Control-Allow-Methods': 'POST, GET, OPTIONS'
+}
+
+# Seconds kept back from the Lambda budget when waiting on another identical build
+COALESCE_WAIT_MARGIN_SECONDS = 30
+# Seconds suggested to clients turned away because the builder is at capacity
+RETRY_AFTER_SECONDS = 30
+
+_local_build_registry = None
+_local_build_scheduler = None
+
+@profiled
 def lambda_handler(event, context):
+    # Asynchronous self-invocation continuing a checkpointed build
+    if event.get('resumeBuild'):
+        return resume_build(event['resumeBuild'], context)
+    
     try:
         # Parse the request
         body = json.loads(event['body']) if isinstance(event['body'], str) else event['body']
+        body = body or {}
+    except (KeyError, TypeError, ValueError) as e:
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'success': False, 'error': f'Invalid request body: {str(e)}'})
+        }
+    
+    if (event.get('resource') or '').endswith('/batch') and not isinstance(body.get('layers'), list):
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'success': False, 'error': 'A batch request needs a layers list'})
+        }
+    
+    # A dry run only preflights the request, so it is cheap enough to skip coalescing
+    if body.get('dryRun'):
+        return preflight_response(body)
+    
+    # Popular dependency sets are kept built by layer_prewarm; a fresh one answers at once
+    bucket_name = os.environ.get('BUCKET_NAME')
+    prebuilt = find_prebuilt(s3_client, bucket_name, body)
+    if prebuilt:
+        print("Serving prebuilt layer for this dependency set")
+        record_request(s3_client, bucket_name, body, 'prebuilt')
+        return serve_prebuilt(prebuilt)
+    
+    response = handle_build_request(event, body, context)
+    # Sets that cannot be built are no use to prewarm; requests turned away at capacity still count
+    if response['statusCode'] < 400 or response['statusCode'] == 429:
+        record_request(s3_client, bucket_name, body, 'build')
+    return response
+
+def handle_build_request(event, body, context):
+    """Build for a request, coalescing identical builds and replaying idempotent retries"""
+    client = (client_identity(event), build_priority(event, body))
+    registry = get_build_registry()
+    if registry is None:
+        return run_build(body, context, client)
+    
+    fingerprint = build_fingerprint(body)
+    idempotency_key = get_header(event, 'Idempotency-Key') or body.get('idempotencyKey')
+    
+    if idempotency_key:
+        record = registry.get_idempotent_response(idempotency_key)
+        if record:
+            if record['fingerprint'] != fingerprint:
+                return {
+                    'statusCode': 422,
+                    'headers': CORS_HEADERS,
+                    'body': json.dumps({
+                        'success': False,
+                        'error': 'Idempotency key was already used for a different request'
+                    })
+                }
+            print(f"Replaying stored response for idempotency key {idempotency_key}")
+            return refresh_download_urls(record['response'])
+    
+    response = run_single_flight(registry, fingerprint, body, context, client)
+    
+    # Server errors are not stored so that a retry with the same key gets a fresh attempt
+    if idempotency_key and response['statusCode'] < 500:
+        registry.put_idempotent_response(idempotency_key, fingerprint, response)
+    
+    return response
+
+def get_build_registry():
+    """Return the registry used to coalesce identical builds, or None when disabled"""
+    global _local_build_registry
+    mode = os.environ.get('BUILD_REGISTRY', 's3').lower()
+    if mode == 'off':
+        return None
+    if mode == 'local':
+        if _local_build_registry is None:
+            _local_build_registry = LocalBuildRegistry()
+        return _local_build_registry
+    return S3BuildRegistry(s3_client, os.environ.get('BUCKET_NAME'))
+
+def get_build_scheduler():
+    """Return the scheduler that admits builds, or None when admission control is disabled"""
+    global _local_build_scheduler
+    mode = os.environ.get('BUILD_SCHEDULER', 's3').lower()
+    if mode == 'off':
+        return None
+    if mode == 'local':
+        if _local_build_scheduler is None:
+            _local_build_scheduler = LocalBuildScheduler()
+        return _local_build_scheduler
+    return S3BuildScheduler(s3_client, os.environ.get('BUCKET_NAME'))
+
+def run_single_flight(registry, fingerprint, body, context, client=None):
+    """Run the build unless an identical one is already in flight, in which case share its result"""
+    build_id = uuid.uuid4().hex
+    try:
+        owner = registry.acquire(fingerprint, build_id)
+    except Exception as e:
+        print(f"Build registry unavailable, building without coalescing: {str(e)}")
+        return run_build(body, context, client)
+    
+    if owner:
+        print(f"Identical build {owner} is already running; waiting for its result")
+        wait_seconds = max(remaining_seconds(context) - COALESCE_WAIT_MARGIN_SECONDS, 0)
+        response = registry.wait_for_result(fingerprint, owner, wait_seconds)
+        if response:
+            response = dict(response)
+            response_body = json.loads(response['body'])
+            response_body['coalesced'] = True
+            response['body'] = json.dumps(response_body)
+            return response
+        print("In-flight build finished without a result; building independently")
+        return run_build(body, context, client)
+    
+    response = None
+    try:
+        response = run_build(body, context, client)
+        return response
+    finally:
+        try:
+            registry.release(fingerprint, build_id, response)
+        except Exception as e:
+            print(f"Could not release build lock {fingerprint}: {str(e)}")
+
+def run_build(body, context, client=None):
+    """Run create_layer on the executor chosen for this request (see build_executor).
+
+    Builds that run here or in the process pool first need a slot from the scheduler;
+    client is the (client ID, priority class) pair they are admitted as. Queued builds
+    skip admission because the container worker limits its own concurrency.
+    """
+    executor = select_executor(body, s3_client)
+    if executor.name != 'lambda':
+        print(f"Running build on the {executor.name} executor")
+    
+    scheduler = get_build_scheduler() if executor.name != 'queue' else None
+    admission = None
+    if scheduler:
+        client_id, priority = client or ('anonymous', 'interactive')
+        max_wait = min(MAX_WAIT_SECONDS[priority], max(remaining_seconds(context) - COALESCE_WAIT_MARGIN_SECONDS, 0))
+        try:
+            admission = scheduler.admit(client_id, priority, max_wait)
+        except Exception as e:
+            print(f"Build scheduler unavailable, building without admission control: {str(e)}")
+            scheduler = None
+        if scheduler and admission is None:
+            return {
+                'statusCode': 429,
+                'headers': {**CORS_HEADERS, 'Retry-After': str(RETRY_AFTER_SECONDS)},
+                'body': json.dumps({
+                    'success': False,
+                    'error': 'The builder is at capacity; please retry shortly',
+                    'retryAfter': RETRY_AFTER_SECONDS
+                })
+            }
+    
+    try:
+        response = executor.run(create_layer, body, context)
+    finally:
+        if admission:
+            scheduler.release(admission)
+    response.setdefault('headers', CORS_HEADERS)
+    return response
+
+def get_header(event, name):
+    """Case-insensitive lookup of a request header"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+def remaining_seconds(context, default=900):
+    """Seconds left in this invocation, falling back to the Lambda maximum outside Lambda"""
+    try:
+        return context.get_remaining_time_in_millis() / 1000
+    except Exception:
+        return default
+
+def refresh_download_urls(response):
+    """Re-sign the download URLs of a stored response so replays never return expired links"""
+    bucket_name = os.environ.get('BUCKET_NAME')
+    response = dict(response)
+    response_body = json.loads(response['body'])
+    for item in [response_body] + response_body.get('variants', []):
+        if item.get('s3Key') and item.get('downloadUrl'):
+            # GC may have collapsed the stored key into a duplicate since the response was stored
+            item['s3Key'] = current_layer_key(s3_client, bucket_name, item['s3Key']) or item['s3Key']
+            item['downloadUrl'] = generate_download_url(bucket_name, item['s3Key'])
+    response['body'] = json.dumps(response_body)
+    return response
+
+def serve_prebuilt(response):
+    """A prewarmed layer's stored build response, re-signed and marked as prebuilt"""
+    response = refresh_download_urls(response)
+    response_body = json.loads(response['body'])
+    response_body['prebuilt'] = True
+    response['body'] = json.dumps(response_body)
+    response['headers'] = CORS_HEADERS
+    return response
+
+def requested_variants(body):
+    """Every (platform, Python version) pair a request asks for"""
+    platforms = body.get('platforms') or [body.get('platform', 'manylinux2014_x86_64')]
+    python_versions = body.get('pythonVersions') or [body.get('pythonVersion', '3.12')]
+    return [(platform, python_version) for platform in platforms for python_version in python_versions]
+
+def preflight_enabled(body):
+    """Preflight runs unless disabled for the deployment or the request"""
+    if os.environ.get('PREFLIGHT', 'on').lower() == 'off':
+        return False
+    return bool(body.get('preflight', True) and body.get('installDependencies', True) and body.get('dependencies'))
+
+def direct_assembly_enabled():
+    """Layers are assembled straight from wheels unless LAYER_ASSEMBLY=pip"""
+    return os.environ.get('LAYER_ASSEMBLY', 'direct').lower() == 'direct'
+
+def assemble_from_wheels(preflight, zip_path, python_version, wheel_dir, dependencies, checkpoint=None, budget=None):
+    """Build the layer zip from the wheels a preflight pinned; False means fall back to pip install.
+
+    With a checkpoint, wheels finished by earlier invocations are skipped, and BuildSuspended
+    is raised once the budget runs out, leaving the wheels done so far in zip_path.
+    """
+    if not preflight or not preflight.get('ok') or preflight.get('skipped') or not preflight.get('packages'):
+        return False
+    if not direct_assembly_enabled():
+        return False
+    # A native builder may have resolved sdists; those are compiled by the pip path
+    if not all(package['wheel'].endswith('.whl') for package in preflight['packages']):
+        return False
+    try:
+        done = set(checkpoint.state['completed']) if checkpoint else set()
+        pending = [package for package in preflight['packages'] if package['wheel'] not in done]
+        wheels = fetch_wheels(pending, wheel_dir)
+        stats = transcode_wheels(
+            wheels, zip_path, python_version, {'requirements.txt': '\n'.join(dependencies)},
+            stop=budget.exhausted if budget else None
+        )
+        if checkpoint:
+            checkpoint.state['completed'].extend(package['wheel'] for package in pending[:stats['wheels']])
+        print(f"⚡ Assembled layer from {stats['wheels']} wheels: {stats['files']} files copied, "
+              f"{stats['skipped']} filtered, {stats['recompressed']} recompressed")
+        if stats['pending']:
+            raise BuildSuspended(f"{len(stats['pending'])} wheels left to assemble")
+        return True
+    except BuildSuspended:
+        raise
+    except Exception as e:
+        print(f"⚠️ Direct assembly failed, falling back to pip install: {str(e)}")
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+        return False
+
+def preflight_variants(dependencies, variants):
+    """Run the preflight for every variant concurrently, keyed by variant"""
+    with ThreadPoolExecutor(max_workers=MATRIX_MAX_WORKERS) as executor:
+        futures = {v: executor.submit(run_preflight, dependencies, *v) for v in variants}
+        return {v: future.result() for v, future in futures.items()}
+
+def preflight_response(body):
+    """Answer a dryRun request with the preflight report of each requested variant"""
+    variants = requested_variants(body)
+    if len(variants) > MAX_MATRIX_VARIANTS:
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({
+                'success': False,
+                'error': f'Build matrix has {len(variants)} variants; at most {MAX_MATRIX_VARIANTS} are allowed'
+            })
+        }
+    reports = list(preflight_variants(body.get('dependencies', []), variants).values())
+    ok = all(report['ok'] for report in reports)
+    return {
+        'statusCode': 200 if ok else 422,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({
+            'success': ok,
+            'dryRun': True,
+            'preflight': reports,
+            'error': None if ok else summarize_errors(reports)
+        })
+    }
+
+def checkpoints_enabled(context):
+    """Builds checkpoint and re-invoke themselves only inside Lambda, unless BUILD_CHECKPOINTS=off"""
+    if os.environ.get('BUILD_CHECKPOINTS', 'on').lower() == 'off':
+        return False
+    return isinstance(getattr(context, 'invoked_function_arn', None), str)
+
+def suspend_build(checkpoint, body, context, reason, part_path=None):
+    """Save a build's progress to S3 and continue it in a fresh asynchronous invocation"""
+    checkpoint.state['request'] = body
+    if part_path:
+        checkpoint.add_part(part_path)
+    checkpoint.save()
+    lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps({'resumeBuild': checkpoint.build_id})
+    )
+    print(f"⏸️ Suspended build {checkpoint.build_id} after invocation {checkpoint.state['invocations']}: {reason}")
+    return {
+        'statusCode': 202,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({
+            'success': True,
+            'status': 'running',
+            'buildId': checkpoint.build_id,
+            'statusUrl': f'/builds/{checkpoint.build_id}',
+            'completed': len(checkpoint.state['completed']),
+            'message': 'Build is taking longer than one invocation and continues in the background'
+        })
+    }
+
+def resume_build(build_id, context):
+    """Carry on with a checkpointed build and record its outcome once it stops suspending"""
+    checkpoint = BuildCheckpoint.load(s3_client, os.environ['BUCKET_NAME'], build_id)
+    if checkpoint is None or checkpoint.state['status'] != 'running':
+        print(f"Build {build_id} has nothing to resume")
+        return None
+    
+    checkpoint.state['invocations'] += 1
+    print(f"▶️ Resuming build {build_id} (invocation {checkpoint.state['invocations']}, "
+          f"{len(checkpoint.state['completed'])} units done)")
+    response = create_layer(checkpoint.state['request'], context, checkpoint)
+    if response['statusCode'] != 202:
+        checkpoint.finish(response)
+    return response
+
+def create_layer(body, context, checkpoint=None):
+    """Build a layer (or a matrix of layers) from a parsed request body.
+
+    Single-variant builds check the time budget between stages and packages; when it runs
+    low they checkpoint to S3, re-invoke the function and answer 202 with a build ID.
+    """
+    try:
+        restore_index_cache(s3_client, os.environ.get('BUCKET_NAME'))
+        if body.get('layers') is not None:
+            return build_batch(body)
         
         package_name = body.get('packageName', 'lambda-layer')
         dependencies = body.get('dependencies', [])
@@ -21,8 +406,48 @@ def lambda_handler(event, context):
         python_version = body.get('pythonVersion', '3.12')
         install_dependencies = body.get('installDependencies', True)
         upgrade_packages = body.get('upgradePackages', False)
+        profile_imports = body.get('profileImports', False)
+        installer = select_installer(body.get('installer'))
         package_type = 'layer'  # Always layer
         
+        run_preflight_stage = preflight_enabled(body)
+        
+        # Optional build matrix: every platform is built for every Python version
+        platforms = body.get('platforms') or [platform]
+        python_versions = body.get('pythonVersions') or [python_version]
+        if len(platforms) * len(python_versions) > 1:
+            return build_matrix(
+                package_name, dependencies, platforms, python_versions, install_dependencies, upgrade_packages,
+                profile_imports, run_preflight_stage, installer
+            )
+        platform = platforms[0]
+        python_version = python_versions[0]
+        
+        if checkpoint is None and checkpoints_enabled(context):
+            checkpoint = BuildCheckpoint(s3_client, os.environ['BUCKET_NAME'])
+        budget = None
+        if checkpoint and checkpoints_enabled(context) and checkpoint.can_suspend():
+            budget = TimeBudget(context)
+        
+        # Reject builds that cannot succeed before spending minutes downloading
+        preflight = checkpoint.state['preflight'] if checkpoint else None
+        if run_preflight_stage and preflight is None:
+            preflight = run_preflight(dependencies, platform, python_version)
+            if not preflight['ok']:
+                return {
+                    'statusCode': 422,
+                    'headers': CORS_HEADERS,
+                    'body': json.dumps({
+                        'success': False,
+                        'error': summarize_errors([preflight]),
+                        'preflight': preflight
+                    })
+                }
+            if checkpoint:
+                checkpoint.state['preflight'] = preflight
+                if budget and budget.exhausted():
+                    return suspend_build(checkpoint, body, context, 'preflight finished')
+        
         print(f"Creating Lambda layer: {package_name}")
         print(f"Architecture: {platform.replace('manylinux2014_', '')}, Python: {python_version}")
         print(f"Dependencies: {dependencies}")
@@ -33,102 +458,79 @@ def lambda_handler(event, context):
         with tempfile.TemporaryDirectory() as temp_dir:
             package_dir = os.path.join(temp_dir, 'package')
             os.makedirs(package_dir)
-            
-            # Install dependencies if requested and dependencies exist
-            if install_dependencies and dependencies:
-                print("Installing dependencies with pip...")
-                success = install_pip_dependencies(
-                    dependencies, package_dir, platform, python_version, package_type, upgrade_packages
-                )
-                if not success:
-                    raise Exception(f"Failed to install dependencies: {', '.join(dependencies)}. "
-                                  f"This may be due to: 1) Package not available for platform {platform}, "
-                                  f"2) Network connectivity issues, 3) Package name typos, or "
-                                  f"4) Incompatible package versions. Check CloudWatch logs for details.")
-            
-            # Create requirements.txt for reference
-            if dependencies:
-                requirements_path = os.path.join(package_dir, 'requirements.txt')
-                with open(requirements_path, 'w') as f:
-                    f.write('\n'.join(dependencies))
-            
-            # Create ZIP file
             zip_path = os.path.join(temp_dir, f'{package_name}.zip')
-            create_zip_package(package_dir, zip_path, package_type)
+            # Zipped output of earlier invocations of a checkpointed build
+            parts = checkpoint.download_parts(os.path.join(temp_dir, 'parts')) if checkpoint else []
             
-            # Upload to S3 with metadata
-            bucket_name = os.environ['BUCKET_NAME']
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            s3_key = f'layers/{package_name}-{timestamp}.zip'
+            try:
+                # Fast path: copy the pinned wheels preflight resolved straight into the zip
+                assembled = False
+                if install_dependencies and dependencies:
+                    assembled = assemble_from_wheels(
+                        preflight, zip_path, python_version, os.path.join(temp_dir, 'wheels'), dependencies,
+                        checkpoint, budget
+                    )
+                
+                # Install dependencies if requested and dependencies exist
+                if install_dependencies and dependencies and not assembled:
+                    print(f"Installing dependencies with {installer.name}...")
+                    success = install_pip_dependencies(
+                        dependencies, package_dir, platform, python_version, package_type, upgrade_packages,
+                        stop=budget.exhausted if budget else None,
+                        progress=checkpoint.state if checkpoint else None,
+                        installer=installer
+                    )
+                    if not success:
+                        raise Exception(f"Failed to install dependencies: {', '.join(dependencies)}. "
+                                      f"This may be due to: 1) Package not available for platform {platform}, "
+                                      f"2) Network connectivity issues, 3) Package name typos, or "
+                                      f"4) Incompatible package versions. Check CloudWatch logs for details.")
+            except BuildSuspended as e:
+                # The pip path suspends between packages; zip what is installed so far
+                if not os.path.exists(zip_path):
+                    create_zip_package(package_dir, zip_path, package_type)
+                return suspend_build(checkpoint, body, context, str(e), zip_path)
             
-            # Prepare metadata
-            metadata = {
-                'packageName': package_name,
-                'dependencies': ','.join(dependencies) if dependencies else '',
-                'runtime': runtime,
-                'platform': platform,
-                'pythonVersion': python_version,
-                'packageType': package_type,
-                'installDependencies': str(install_dependencies),
-                'upgradePackages': str(upgrade_packages),
-                'createdAt': timestamp,
-                'dependencyCount': str(len(dependencies))
-            }
+            if not assembled:
+                # Create requirements.txt for reference
+                if dependencies:
+                    requirements_path = os.path.join(package_dir, 'requirements.txt')
+                    with open(requirements_path, 'w') as f:
+                        f.write('\n'.join(dependencies))
+                
+                # Create ZIP file
+                create_zip_package(package_dir, zip_path, package_type)
             
-            # Upload file with metadata
-            s3_client.upload_file(
-                zip_path, 
-                bucket_name, 
-                s3_key,
-                ExtraArgs={'Metadata': metadata}
-            )
+            if parts:
+                merged_path = os.path.join(temp_dir, 'merged.zip')
+                merge_zips(parts + [zip_path], merged_path)
+                os.replace(merged_path, zip_path)
+                print(f"Merged {len(parts)} checkpointed parts into the layer")
             
-            # Also create a separate metadata JSON file for easier querying
-            metadata_key = f'metadata/{package_name}-{timestamp}.json'
-            metadata_json = {
-                'packageName': package_name,
-                'dependencies': dependencies,
-                'runtime': runtime,
-                'platform': platform,
-                'pythonVersion': python_version,
-                'packageType': package_type,
-                'installDependencies': install_dependencies,
-                'upgradePackages': upgrade_packages,
-                'createdAt': timestamp,
-                'packageKey': s3_key,
-                'packageSize': os.path.getsize(zip_path)
-            }
+            # Optionally measure how long each installed module takes to import
+            import_profile = None
+            if profile_imports and install_dependencies and dependencies:
+                if assembled or parts:
+                    target_dir = extract_site_packages(zip_path, python_version, os.path.join(temp_dir, 'profile'))
+                else:
+                    target_dir = os.path.join(package_dir, f'python/lib/python{python_version}/site-packages')
+                import_profile = profile_layer(target_dir, python_version, platform)
             
-            s3_client.put_object(
-                Bucket=bucket_name,
-                Key=metadata_key,
-                Body=json.dumps(metadata_json, indent=2),
-                ContentType='application/json'
+            # Upload to S3 with metadata and generate the download URL
+            published = publish_layer(
+                zip_path, package_name, dependencies, runtime, platform, python_version,
+                package_type, install_dependencies, upgrade_packages,
+                extra_details={'importProfile': import_profile} if import_profile else None
             )
-            
-            # Generate presigned URL for download
-            try:
-                download_url = s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': bucket_name, 'Key': s3_key},
-                    ExpiresIn=7200,  # 2 hours for more reliable downloads
-                    HttpMethod='GET'
-                )
-                print(f"Generated download URL: {download_url[:50]}...")
-            except Exception as url_error:
-                print(f"Error generating presigned URL: {str(url_error)}")
-                raise Exception(f"Failed to generate download URL: {str(url_error)}")
-            
-            # Get package size
-            package_size = os.path.getsize(zip_path)
+            purge_listing_cache('build')
+            download_url = published['downloadUrl']
+            s3_key = published['s3Key']
+            package_size = published['packageSize']
+            timestamp = published['createdAt']
             
             return {
                 'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'POST, GET, OPTIONS'
-                },
+                'headers': CORS_HEADERS,
                 'body': json.dumps({
                     'success': True,
                     'downloadUrl': download_url,
@@ -142,11 +544,17 @@ def lambda_handler(event, context):
                     'dependenciesInstalled': install_dependencies and len(dependencies) > 0,
                     'upgradePackages': upgrade_packages,
                     'createdAt': timestamp,
+                    'importProfile': import_profile,
+                    'preflight': preflight,
                     'message': f'Lambda layer "{package_name}" created successfully'
                 })
             }
             
     except Exception as e:
+        # Throttling that outlasted the client's retries is transient; ask the caller to retry
+        if is_throttled(e):
+            print(f"S3 throttled the build: {str(e)}")
+            return throttled_response(CORS_HEADERS)
         error_message = str(e)
         print(f"Error creating package: {error_message}")
         import traceback
@@ -174,24 +582,457 @@ def lambda_handler(event, context):
         
         return {
             'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'POST, GET, OPTIONS'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({
                 'success': False,
                 'error': user_error,
                 'details': error_message if error_message != user_error else None
             })
         }
+    finally:
+        save_index_cache(s3_client, os.environ.get('BUCKET_NAME'))
+
+def publish_layer(zip_path, package_name, dependencies, runtime, platform, python_version,
+                  package_type, install_dependencies, upgrade_packages, key_name=None, extra_metadata=None,
+                  extra_details=None):
+    """Upload a built layer zip with its metadata and return its download details.
+
+    extra_metadata is stored on both the object and the metadata JSON; extra_details
+    only in the JSON, for values too large for S3 object metadata.
+    """
+    bucket_name = os.environ['BUCKET_NAME']
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    # The random suffix keeps concurrent builds of the same name within one second apart
+    object_name = f'{key_name or package_name}-{timestamp}-{uuid.uuid4().hex[:8]}'
+    # Sharded under layers/<shard>/ so bursts of builds spread over several S3 partitions
+    s3_key = layer_key(object_name)
+    package_size = os.path.getsize(zip_path)
+    layer_hash = content_hash(zip_path)
+    extra_metadata = extra_metadata or {}
+    
+    # Prepare metadata
+    metadata = {
+        'packageName': package_name,
+        'dependencies': ','.join(dependencies) if dependencies else '',
+        'runtime': runtime,
+        'platform': platform,
+        'pythonVersion': python_version,
+        'packageType': package_type,
+        'installDependencies': str(install_dependencies),
+        'upgradePackages': str(upgrade_packages),
+        'createdAt': timestamp,
+        'dependencyCount': str(len(dependencies)),
+        'contentHash': layer_hash
+    }
+    metadata.update({key: str(value) for key, value in extra_metadata.items()})
+    
+    # Upload file with metadata; the key is never rewritten, so caches may keep it
+    s3_client.upload_file(
+        zip_path, 
+        bucket_name, 
+        s3_key,
+        ExtraArgs={'Metadata': metadata, 'CacheControl': LAYER_CACHE_CONTROL}
+    )
+    
+    # Also create a separate metadata JSON file for easier querying
+    metadata_key = layer_metadata_key(object_name)
+    metadata_json = {
+        'packageName': package_name,
+        'dependencies': dependencies,
+        'runtime': runtime,
+        'platform': platform,
+        'pythonVersion': python_version,
+        'packageType': package_type,
+        'installDependencies': install_dependencies,
+        'upgradePackages': upgrade_packages,
+        'createdAt': timestamp,
+        'packageKey': s3_key,
+        'packageSize': package_size,
+        'contentHash': layer_hash
+    }
+    metadata_json.update(extra_metadata)
+    metadata_json.update(extra_details or {})
+    
+    metadata_response = s3_client.put_object(
+        Bucket=bucket_name,
+        Key=metadata_key,
+        Body=json.dumps(metadata_json, indent=2),
+        ContentType='application/json'
+    )
+    # Filtered listings and GET /packages/stats read the catalog, not the metadata objects
+    record_layer(s3_client, bucket_name, metadata_json, metadata_key, metadata_response.get('ETag', ''))
+    
+    download_url = generate_download_url(bucket_name, s3_key)
+    
+    return {
+        'downloadUrl': download_url,
+        's3Key': s3_key,
+        'packageSize': package_size,
+        'createdAt': timestamp,
+        'contentHash': layer_hash
+    }
+
+def generate_download_url(bucket_name, s3_key):
+    """Generate a download URL for a layer (CloudFront when the layer CDN is deployed)"""
+    try:
+        download_url = layer_download_url(s3_client, bucket_name, s3_key)
+        print(f"Generated download URL: {download_url[:50]}...")
+        return download_url
+    except Exception as url_error:
+        print(f"Error generating presigned URL: {str(url_error)}")
+        raise Exception(f"Failed to generate download URL: {str(url_error)}")
+
+def build_matrix(package_name, dependencies, platforms, python_versions, install_dependencies, upgrade_packages,
+                 profile_imports=False, run_preflight_stage=False, installer=None):
+    """Build one layer per platform x Python version, sharing resolution and pure-Python wheels"""
+    variants = [(platform, python_version) for platform in platforms for python_version in python_versions]
+    if len(variants) > MAX_MATRIX_VARIANTS:
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({
+                'success': False,
+                'error': f'Build matrix has {len(variants)} variants; at most {MAX_MATRIX_VARIANTS} are allowed'
+            })
+        }
+    
+    group_id = uuid.uuid4().hex
+    
+    # Variants that cannot resolve are reported up front and never downloaded
+    rejected = []
+    reports = {}
+    if run_preflight_stage:
+        reports = preflight_variants(dependencies, variants)
+        rejected = [v for v in variants if not reports[v]['ok']]
+        if len(rejected) == len(variants):
+            return {
+                'statusCode': 422,
+                'headers': CORS_HEADERS,
+                'body': json.dumps({
+                    'success': False,
+                    'error': summarize_errors(reports.values()),
+                    'preflight': list(reports.values())
+                })
+            }
+        variants = [v for v in variants if v not in rejected]
+    
+    print(f"Building matrix {group_id} for {package_name}: {[variant_label(*v) for v in variants]}")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        shared_dir = os.path.join(temp_dir, 'wheelhouse', 'shared')
+        wheel_dirs = {v: os.path.join(temp_dir, 'wheelhouse', variant_label(*v)) for v in variants}
+        downloaded = {v: False for v in variants}
+        # With every variant pinned by preflight, each one assembles straight from its wheels
+        direct = direct_assembly_enabled() and all(reports.get(v) and not reports[v]['skipped'] for v in variants)
+        fetch_dir = os.path.join(temp_dir, 'wheelhouse', 'fetched')
+        
+        if install_dependencies and dependencies and not direct:
+            # The first variant resolves from the index; its pure-Python wheels then
+            # serve every other variant so only platform-specific wheels are fetched again
+            primary = variants[0]
+            downloaded[primary] = download_variant_wheels(dependencies, wheel_dirs[primary], primary)
+            if downloaded[primary]:
+                shared = share_pure_wheels(wheel_dirs[primary], shared_dir)
+                print(f"Sharing {len(shared)} pure-Python wheels across variants")
+            
+            with ThreadPoolExecutor(max_workers=MATRIX_MAX_WORKERS) as executor:
+                futures = {
+                    v: executor.submit(download_variant_wheels, dependencies, wheel_dirs[v], v, [shared_dir])
+                    for v in variants[1:]
+                }
+                for v, future in futures.items():
+                    downloaded[v] = future.result()
+        
+        with ThreadPoolExecutor(max_workers=MATRIX_MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(
+                    build_variant, package_name, dependencies, v, temp_dir, [wheel_dirs[v], shared_dir],
+                    downloaded[v], install_dependencies, upgrade_packages, group_id, profile_imports,
+                    reports.get(v) if direct else None, fetch_dir, installer
+                )
+                for v in variants
+            ]
+            results = [future.result() for future in futures]
+    
+    for platform, python_version in rejected:
+        report = reports[(platform, python_version)]
+        results.append({
+            'success': False,
+            'variant': variant_label(platform, python_version),
+            'platform': platform,
+            'pythonVersion': python_version,
+            'runtime': f'python{python_version}',
+            'groupId': group_id,
+            'error': summarize_errors([report]),
+            'preflight': report
+        })
+    
+    succeeded = [r for r in results if r['success']]
+    if succeeded:
+        purge_listing_cache('build')
+    return {
+        'statusCode': 200 if succeeded else 500,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({
+            'success': bool(succeeded),
+            'groupId': group_id,
+            'packageName': package_name,
+            'dependencies': dependencies,
+            'variants': results,
+            'failedVariants': len(results) - len(succeeded),
+            'message': f'Built {len(succeeded)} of {len(results)} variants of Lambda layer "{package_name}"',
+            'error': None if succeeded else 'All matrix variants failed to build'
+        })
+    }
+
+def build_batch(body):
+    """Build several layers in one request, fetching each wheel the layers share only once.
+
+    Every layer spec is a POST /packages body, with the batch's defaults applied. Single-
+    variant layers are preflighted concurrently, the union of their pinned wheels is fetched
+    once and their zips are assembled concurrently; any other layer (a matrix, or one that
+    cannot be assembled straight from wheels) is built on its own alongside them.
+    """
+    layers = body.get('layers')
+    error = None
+    if not isinstance(layers, list) or not layers:
+        error = 'layers must be a non-empty list of layer specs'
+    elif len(layers) > MAX_BATCH_LAYERS:
+        error = f'Batch has {len(layers)} layers; at most {MAX_BATCH_LAYERS} are allowed'
+    elif not all(isinstance(layer, dict) and 'layers' not in layer for layer in layers):
+        error = 'Every layer spec must be an object like a POST /packages body'
+    if error:
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'success': False, 'error': error})
+        }
+    
+    defaults = body.get('defaults') or {}
+    specs = [{**defaults, **layer} for layer in layers]
+    batch_id = uuid.uuid4().hex
+    results = [None] * len(specs)
+    
+    shareable = [
+        index for index, spec in enumerate(specs)
+        if len(requested_variants(spec)) == 1 and preflight_enabled(spec) and direct_assembly_enabled()
+    ]
+    with ThreadPoolExecutor(max_workers=MATRIX_MAX_WORKERS) as executor:
+        futures = {
+            index: executor.submit(run_preflight, specs[index]['dependencies'], *requested_variants(specs[index])[0])
+            for index in shareable
+        }
+        reports = {index: future.result() for index, future in futures.items()}
+    
+    for index, report in reports.items():
+        if not report['ok']:
+            results[index] = {
+                'success': False,
+                'packageName': specs[index].get('packageName', 'lambda-layer'),
+                'batchId': batch_id,
+                'error': summarize_errors([report]),
+                'preflight': report
+            }
+    ready = [index for index, report in reports.items() if report['ok'] and not report['skipped']]
+    separate = [index for index in range(len(specs)) if results[index] is None and index not in ready]
+    
+    unique = {}
+    for index in ready:
+        for package in reports[index]['packages']:
+            unique.setdefault(package['wheel'], package)
+    pinned = sum(len(reports[index]['packages']) for index in ready)
+    print(f"📦 Batch {batch_id}: {len(specs)} layers, {pinned} pinned wheels, {len(unique)} unique")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wheel_paths, fetch_errors = fetch_batch_wheels(unique.values(), os.path.join(temp_dir, 'wheels'))
+        with ThreadPoolExecutor(max_workers=MATRIX_MAX_WORKERS) as executor:
+            futures = {
+                index: executor.submit(
+                    build_batch_layer, specs[index], reports[index], wheel_paths, fetch_errors,
+                    os.path.join(temp_dir, str(index)), batch_id
+                )
+                for index in ready
+            }
+            futures.update({index: executor.submit(build_separate_layer, specs[index], batch_id) for index in separate})
+            for index, future in futures.items():
+                results[index] = future.result()
+    
+    succeeded = [r for r in results if r['success']]
+    if succeeded:
+        purge_listing_cache('build')
+        status_code = 200
+    elif all(r.get('preflight') for r in results):
+        status_code = 422
+    else:
+        status_code = 500
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({
+            'success': bool(succeeded),
+            'batchId': batch_id,
+            'layers': results,
+            'failedLayers': len(results) - len(succeeded),
+            'uniqueWheels': len(unique),
+            'sharedWheels': pinned - len(unique),
+            'message': f'Built {len(succeeded)} of {len(results)} layers',
+            'error': None if succeeded else 'Every layer in the batch failed to build'
+        })
+    }
+
+def fetch_batch_wheels(packages, wheel_dir):
+    """Fetch each unique pinned wheel once; returns paths and errors keyed by wheel filename"""
+    os.makedirs(wheel_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+        futures = {package['wheel']: executor.submit(fetch_wheel, package, wheel_dir) for package in packages}
+    paths = {}
+    errors = {}
+    for wheel, future in futures.items():
+        try:
+            paths[wheel] = future.result()
+        except Exception as e:
+            print(f"❌ Could not fetch {wheel}: {str(e)}")
+            errors[wheel] = str(e)
+    return paths, errors
+
+def build_batch_layer(spec, preflight, wheel_paths, fetch_errors, temp_dir, batch_id):
+    """Assemble and publish one batch layer from the batch's shared wheels"""
+    package_name = spec.get('packageName', 'lambda-layer')
+    dependencies = spec['dependencies']
+    platform, python_version = requested_variants(spec)[0]
+    
+    try:
+        missing = [package['wheel'] for package in preflight['packages'] if package['wheel'] not in wheel_paths]
+        if missing:
+            raise Exception(f"Failed to download {', '.join(missing)}: {fetch_errors.get(missing[0], 'unknown error')}")
+        
+        os.makedirs(temp_dir)
+        zip_path = os.path.join(temp_dir, f'{package_name}.zip')
+        stats = transcode_wheels(
+            [wheel_paths[package['wheel']] for package in preflight['packages']], zip_path, python_version,
+            {'requirements.txt': '\n'.join(dependencies)}
+        )
+        print(f"⚡ Assembled {package_name} from {stats['wheels']} wheels")
+        
+        import_profile = None
+        if spec.get('profileImports'):
+            target_dir = extract_site_packages(zip_path, python_version, os.path.join(temp_dir, 'profile'))
+            import_profile = profile_layer(target_dir, python_version, platform)
+        
+        published = publish_layer(
+            zip_path, package_name, dependencies, spec.get('runtime', 'python3.12'), platform, python_version,
+            'layer', True, spec.get('upgradePackages', False), extra_metadata={'batchId': batch_id},
+            extra_details={'importProfile': import_profile} if import_profile else None
+        )
+        return {
+            'success': True,
+            'packageName': package_name,
+            'platform': platform,
+            'pythonVersion': python_version,
+            'dependencies': dependencies,
+            'batchId': batch_id,
+            'importProfile': import_profile,
+            **published
+        }
+    except Exception as e:
+        print(f"❌ Batch layer {package_name} failed: {str(e)}")
+        return {'success': False, 'packageName': package_name, 'batchId': batch_id, 'error': str(e)}
+
+def build_separate_layer(spec, batch_id):
+    """Build a batch layer that cannot share the batch's wheels as an ordinary request"""
+    response = create_layer(spec, None)
+    result = json.loads(response['body'])
+    result['batchId'] = batch_id
+    result.setdefault('packageName', spec.get('packageName', 'lambda-layer'))
+    return result
+
+def download_variant_wheels(dependencies, wheel_dir, variant, find_links=None):
+    """Download wheels for one matrix variant, reporting failures instead of raising"""
+    platform, python_version = variant
+    try:
+        return download_wheels(dependencies, wheel_dir, platform, python_version, find_links)
+    except subprocess.TimeoutExpired:
+        print(f"⏱️ Timeout downloading wheels for {variant_label(platform, python_version)}")
+    except Exception as e:
+        print(f"❌ Error downloading wheels for {variant_label(platform, python_version)}: {str(e)}")
+    return False
+
+def build_variant(package_name, dependencies, variant, temp_dir, wheel_dirs, downloaded,
+                  install_dependencies, upgrade_packages, group_id, profile_imports=False,
+                  preflight=None, fetch_dir=None, installer=None):
+    """Install, zip and publish a single matrix variant from the shared wheelhouse"""
+    platform, python_version = variant
+    label = variant_label(platform, python_version)
+    runtime = f'python{python_version}'
+    
+    try:
+        package_dir = os.path.join(temp_dir, 'variants', label)
+        os.makedirs(package_dir)
+        zip_path = os.path.join(temp_dir, f'{package_name}-{label}.zip')
+        import_profile = None
+        assembled = False
+        
+        if install_dependencies and dependencies:
+            assembled = assemble_from_wheels(preflight, zip_path, python_version, fetch_dir, dependencies)
+            if assembled:
+                target_dir = extract_site_packages(zip_path, python_version, package_dir) if profile_imports else None
+            else:
+                if not downloaded and preflight:
+                    # The shared download stage was skipped for the direct path; fetch this variant now
+                    downloaded = download_variant_wheels(dependencies, wheel_dirs[0], variant, wheel_dirs[1:])
+                if not downloaded:
+                    raise Exception(f"Failed to download dependencies for {label}: {', '.join(dependencies)}")
+                target_dir = os.path.join(package_dir, f'python/lib/python{python_version}/site-packages')
+                if not install_from_wheelhouse(dependencies, target_dir, platform, python_version, wheel_dirs,
+                                               installer=installer):
+                    raise Exception(f"Failed to install dependencies for {label}: {', '.join(dependencies)}")
+                cleanup_installation(target_dir)
+            if profile_imports:
+                import_profile = profile_layer(target_dir, python_version, platform)
+        
+        if not assembled:
+            if dependencies:
+                with open(os.path.join(package_dir, 'requirements.txt'), 'w') as f:
+                    f.write('\n'.join(dependencies))
+            create_zip_package(package_dir, zip_path, 'layer')
+        
+        published = publish_layer(
+            zip_path, package_name, dependencies, runtime, platform, python_version, 'layer',
+            install_dependencies, upgrade_packages, key_name=f'{package_name}-{label}',
+            extra_metadata={'groupId': group_id, 'variant': label},
+            extra_details={'importProfile': import_profile} if import_profile else None
+        )
+        print(f"✅ Built variant {label}")
+        return {
+            'success': True,
+            'variant': label,
+            'platform': platform,
+            'pythonVersion': python_version,
+            'runtime': runtime,
+            'groupId': group_id,
+            'importProfile': import_profile,
+            **published
+        }
+    except Exception as e:
+        print(f"❌ Variant {label} failed: {str(e)}")
+        return {
+            'success': False,
+            'variant': label,
+            'platform': platform,
+            'pythonVersion': python_version,
+            'runtime': runtime,
+            'groupId': group_id,
+            'error': str(e)
+        }
 
-def install_pip_dependencies(dependencies, package_dir, platform, python_version, package_type, upgrade_packages=False):
-    """Install dependencies using pip with Lambda architecture-specific options"""
+def install_pip_dependencies(dependencies, package_dir, platform, python_version, package_type, upgrade_packages=False,
+                             stop=None, progress=None, installer=None):
+    """Install dependencies with pip (or the selected installer) using Lambda architecture-specific options"""
+    installer = installer or select_installer()
     try:
         # Add diagnostic information about the environment
         print("=== ENVIRONMENT DIAGNOSTICS ===")
-        print(f"Installing {len(dependencies)} dependencies: {dependencies}")
+        print(f"Installing {len(dependencies)} dependencies with {installer.name}: {dependencies}")
         
         # Check Python version
         try:
@@ -214,44 +1055,63 @@ def install_pip_dependencies(dependencies, package_dir, platform, python_version
         os.makedirs(target_dir, exist_ok=True)
         print(f"Created target directory: {target_dir}")
         
+        # On a builder matching the target, sdists are compiled instead of rejected. It runs in
+        # one go, so a resumed build that already installed packages one by one carries on that way.
+        if source_builds_enabled(platform, python_version) and not (progress and progress['completed']):
+            if install_native(dependencies, target_dir, platform, python_version, s3_client,
+                              os.environ.get('BUCKET_NAME'), os.path.dirname(package_dir), upgrade_packages,
+                              installer):
+                cleanup_installation(target_dir)
+                return True
+            print("Native build failed; falling back to binary wheels only")
+            shutil.rmtree(target_dir, ignore_errors=True)
+            os.makedirs(target_dir, exist_ok=True)
+        
         # Strategy: Install packages individually for better reliability with multiple packages
         if len(dependencies) > 2:
             print(f"🔄 Installing {len(dependencies)} packages individually for better reliability...")
-            return install_packages_individually(dependencies, target_dir, platform, python_version, upgrade_packages)
+            return install_packages_individually(
+                dependencies, target_dir, platform, python_version, upgrade_packages, stop, progress, installer
+            )
         else:
             print(f"🔄 Installing {len(dependencies)} packages together...")
-            return install_packages_together(dependencies, target_dir, platform, python_version, upgrade_packages)
+            return install_packages_together(
+                dependencies, target_dir, platform, python_version, upgrade_packages, installer
+            )
             
+    except BuildSuspended:
+        raise
     except Exception as e:
         print(f"Error during pip install: {str(e)}")
         import traceback
         traceback.print_exc()
         return False
 
-def install_packages_individually(dependencies, target_dir, platform, python_version, upgrade_packages):
-    """Install packages one by one for better reliability"""
-    installed_packages = []
-    failed_packages = []
+def install_packages_individually(dependencies, target_dir, platform, python_version, upgrade_packages,
+                                  stop=None, progress=None, installer=None):
+    """Install packages one by one for better reliability.
+
+    progress holds the completed and failed lists of a checkpointed build across invocations;
+    stop is asked between packages whether the time budget has run out.
+    """
+    installer = installer or select_installer()
+    progress = progress if progress is not None else {'completed': [], 'failed': []}
+    installed_packages = progress['completed']
+    failed_packages = progress['failed']
+    attempted = 0
     
     for i, package in enumerate(dependencies):
+        if package in installed_packages or package in failed_packages:
+            continue
+        if stop and attempted and stop():
+            installer.finish(target_dir)
+            cleanup_installation(target_dir)
+            raise BuildSuspended(f"{len(dependencies) - i} packages left to install")
+        attempted += 1
         print(f"\n🔄 Installing package {i+1}/{len(dependencies)}: {package}")
         
-        # Build pip command for single package
-        pip_cmd = [
-            'python3', '-m', 'pip', 'install',
-            '--target', target_dir,
-            '--implementation', 'cp',
-            '--python-version', python_version,
-            '--only-binary=:all:',
-            '--no-cache-dir',
-            '--disable-pip-version-check',
-            '--platform', platform
-        ]
-        
-        if upgrade_packages:
-            pip_cmd.append('--upgrade')
-        
-        pip_cmd.append(package)
+        # Build install command for single package
+        pip_cmd = installer.install_command(target_dir, platform, python_version, [package], upgrade_packages)
         
         print(f"Running: {' '.join(pip_cmd)}")
         
@@ -272,10 +1132,12 @@ def install_packages_individually(dependencies, target_dir, platform, python_ver
                 print(f"STDERR: {result.stderr}")
                 failed_packages.append(package)
                 
-                # Try simplified installation for common packages
-                if package in ['requests', 'boto3', 'urllib3', 'six', 'python-dateutil', 'certifi', 'charset-normalizer']:
+                # Try simplified installation for common packages; without --platform pip installs
+                # for this builder, so only when it matches the target architecture and Python
+                if (package in ['requests', 'boto3', 'urllib3', 'six', 'python-dateutil', 'certifi', 'charset-normalizer']
+                        and matches_host(platform, python_version)):
                     print(f"🔄 Trying simplified install for {package}...")
-                    simple_cmd = ['python3', '-m', 'pip', 'install', '--target', target_dir, package]
+                    simple_cmd = installer.host_command(target_dir, [package])
                     simple_result = subprocess.run(simple_cmd, capture_output=True, text=True, timeout=180)
                     
                     if simple_result.returncode == 0:
@@ -300,49 +1162,23 @@ def install_packages_individually(dependencies, target_dir, platform, python_ver
     print(f"📊 Success rate: {success_rate:.1%}")
     
     if success_rate >= 0.5:  # At least 50% success
+        installer.finish(target_dir)
         cleanup_installation(target_dir)
         return True
     else:
         return False
 
-def install_packages_together(dependencies, target_dir, platform, python_version, upgrade_packages):
+def install_packages_together(dependencies, target_dir, platform, python_version, upgrade_packages, installer=None):
     """Install packages together (for 2 or fewer packages)"""
+    installer = installer or select_installer()
     try:
-        # Try to ensure we have pip available
-        try:
-            pip_upgrade = subprocess.run(
-                ['python3', '-m', 'pip', 'install', '--upgrade', 'pip'],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-            if pip_upgrade.returncode == 0:
-                print("Successfully upgraded pip")
-            else:
-                print(f"Pip upgrade warning (continuing anyway): {pip_upgrade.stderr}")
-        except Exception as upgrade_error:
-            print(f"Could not upgrade pip (continuing anyway): {str(upgrade_error)}")
-        
-        # Build pip command
-        pip_cmd = [
-            'python3', '-m', 'pip', 'install',
-            '--target', target_dir,
-            '--implementation', 'cp',
-            '--python-version', python_version,
-            '--only-binary=:all:',
-            '--no-cache-dir',
-            '--disable-pip-version-check',
-            '--platform', platform,
-            '-v'
-        ]
-        
-        if upgrade_packages:
-            pip_cmd.append('--upgrade')
-        
-        # Add all dependencies
-        pip_cmd.extend(dependencies)
+        # The runtime's pip is used as shipped: upgrading it on every build cost a network
+        # round trip of up to a minute and changed nothing about the installed layout
+        pip_cmd = installer.install_command(
+            target_dir, platform, python_version, dependencies, upgrade_packages, verbose=True
+        )
         
-        print(f"Running pip command: {' '.join(pip_cmd)}")
+        print(f"Running {installer.name} command: {' '.join(pip_cmd)}")
         
         # Run pip install with extended timeout
         result = subprocess.run(
@@ -353,21 +1189,23 @@ def install_packages_together(dependencies, target_dir, platform, python_version
             cwd='/tmp'
         )
         
-        print(f"Pip command completed with return code: {result.returncode}")
+        print(f"{installer.name} command completed with return code: {result.returncode}")
         
         if result.returncode != 0:
             print(f"=== PIP INSTALL FAILED ===")
             print(f"STDOUT:\n{result.stdout}")
             print(f"STDERR:\n{result.stderr}")
             
-            # Try simplified approach for common packages
-            if len(dependencies) == 1 and dependencies[0] in ['requests', 'boto3', 'numpy', 'pandas']:
+            # Try simplified approach for common packages, only where it installs for the target
+            if (len(dependencies) == 1 and dependencies[0] in ['requests', 'boto3', 'numpy', 'pandas']
+                    and matches_host(platform, python_version)):
                 print(f"Trying simplified install for {dependencies[0]}...")
-                simple_cmd = ['python3', '-m', 'pip', 'install', '--target', target_dir, dependencies[0]]
+                simple_cmd = installer.host_command(target_dir, [dependencies[0]])
                 simple_result = subprocess.run(simple_cmd, capture_output=True, text=True, timeout=300)
                 
                 if simple_result.returncode == 0:
                     print("Simplified install succeeded!")
+                    installer.finish(target_dir)
                     cleanup_installation(target_dir)
                     return True
                 else:
@@ -389,6 +1227,7 @@ def install_packages_together(dependencies, target_dir, platform, python_version
         except:
             print("Could not list installed files")
         
+        installer.finish(target_dir)
         cleanup_installation(target_dir)
         return True
         
@@ -1,10 +1,39 @@
+import base64
 import json
-import boto3
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-s3_client = boto3.client('s3')
+from handler_profiler import profiled
+from layer_catalog import (CATALOG_KEY, FILTER_PARAMS, catalog_etag, filter_rows, listing_position, load_catalog,
+                           object_position, parse_filters)
+from s3_storage import LIST_MAX_WORKERS, is_throttled, list_sharded, shared_s3_client, throttled_response
 
+s3_client = shared_s3_client()
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Expose-Headers': 'ETag'
+}
+
+# Bump whenever the shape of a listing changes so cached copies stop validating
+LISTING_FORMAT_VERSION = '1'
+# Browsers always revalidate; the API's CloudFront distribution may serve a listing for
+# this long and is purged whenever a build or GC run changes the catalog
+EDGE_TTL_SECONDS = int(os.environ.get('LISTING_EDGE_TTL_SECONDS', '300'))
+CACHE_CONTROL = f'public, max-age=0, must-revalidate, s-maxage={EDGE_TTL_SECONDS}'
+# Searches, filters and pages cannot be purged without a wildcard that would also drop every
+# cached manifest, so they only stay at the edge this long
+QUERY_EDGE_TTL_SECONDS = int(os.environ.get('LISTING_QUERY_EDGE_TTL_SECONDS', '30'))
+QUERY_CACHE_CONTROL = f'public, max-age=0, must-revalidate, s-maxage={QUERY_EDGE_TTL_SECONDS}'
+QUERY_PARAMS = ('search',) + FILTER_PARAMS + ('limit', 'cursor')
+# Largest page a client may ask for with ?limit=
+MAX_PAGE_SIZE = 500
+
+@profiled
 def lambda_handler(event, context):
     try:
         bucket_name = os.environ['BUCKET_NAME']
@@ -14,63 +43,105 @@ def lambda_handler(event, context):
         if event.get('queryStringParameters'):
             search_query = event['queryStringParameters'].get('search', '').lower()
         
-        # List metadata files first for better data
-        metadata_response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix='metadata/'
-        )
+        # Facet filters are answered from the precomputed catalog without reading metadata;
+        # ?limit= pages through either listing, newest first, continuing after ?cursor=
+        try:
+            filters = parse_filters(event.get('queryStringParameters'))
+            page = parse_page(event.get('queryStringParameters'))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': HEADERS,
+                'body': json.dumps({'success': False, 'error': str(e)})
+            }
+        cache_control = listing_cache_control(event)
+        if filters:
+            return catalog_listing(event, bucket_name, filters, search_query, page)
+        
+        # List metadata files first for better data (flat keys and every shard)
+        metadata_objects = list_sharded(s3_client, bucket_name, 'metadata/')
+        
+        # The layers/ fallback below can only contribute when no metadata matches, so its
+        # listing is part of the ETag whenever that is possible
+        fallback_objects = None
+        has_metadata = any(obj['Key'].endswith('.json') for obj in metadata_objects)
+        if search_query or not has_metadata:
+            fallback_objects = list_sharded(s3_client, bucket_name, 'layers/')
+        
+        # The ETag depends only on the listings, so an unchanged catalog costs no object reads
+        etag = listing_etag(metadata_objects + (fallback_objects or []), search_query, page)
+        if etag_matches(get_header(event, 'If-None-Match'), etag):
+            return {
+                'statusCode': 304,
+                'headers': dict(HEADERS, **{'ETag': etag, 'Cache-Control': cache_control}),
+                'body': ''
+            }
         
         layers = []
+        read_errors = 0
+        next_cursor = None
         
-        # Process metadata files if available
-        if 'Contents' in metadata_response:
-            for obj in metadata_response['Contents']:
-                if obj['Key'].endswith('.json'):
-                    try:
-                        # Get metadata content
-                        metadata_obj = s3_client.get_object(Bucket=bucket_name, Key=obj['Key'])
-                        metadata_content = json.loads(metadata_obj['Body'].read().decode('utf-8'))
-                        
-                        # Apply search filter if provided
-                        if search_query:
-                            # Search in package name and dependencies
-                            package_name = metadata_content.get('packageName', '').lower()
-                            dependencies = metadata_content.get('dependencies', [])
-                            dependencies_str = ' '.join(dependencies).lower() if dependencies else ''
-                            
-                            if (search_query not in package_name and 
-                                search_query not in dependencies_str):
-                                continue
-                        
-                        layers.append({
-                            'key': metadata_content.get('packageKey', ''),
-                            'size': metadata_content.get('packageSize', 0),
-                            'lastModified': obj['LastModified'].isoformat(),
-                            'fileName': metadata_content.get('packageName', 'Unknown'),
-                            'etag': obj['ETag'].strip('"'),
-                            'dependencies': metadata_content.get('dependencies', []),
-                            'runtime': metadata_content.get('runtime', ''),
-                            'platform': metadata_content.get('platform', ''),
-                            'pythonVersion': metadata_content.get('pythonVersion', ''),
-                            'packageType': metadata_content.get('packageType', 'layer'),
-                            'installDependencies': metadata_content.get('installDependencies', False),
-                            'upgradePackages': metadata_content.get('upgradePackages', False),
-                            'createdAt': metadata_content.get('createdAt', ''),
-                            'dependencyCount': len(metadata_content.get('dependencies', []))
-                        })
-                    except Exception as e:
-                        print(f"Error processing metadata file {obj['Key']}: {str(e)}")
+        # Process metadata files if available; documents are read in parallel, newest first.
+        # A page reads them a page-sized chunk at a time and stops once it is full
+        metadata_files = [obj for obj in metadata_objects if obj['Key'].endswith('.json')]
+        metadata_files = items_after(metadata_files, page['after'] if page else None, object_position)
+        documents = iter_metadata_documents(bucket_name, metadata_files, page['limit'] if page else None)
+        for position, (obj, metadata_content) in enumerate(zip(metadata_files, documents)):
+            try:
+                if isinstance(metadata_content, Exception):
+                    raise metadata_content
+                
+                # Apply search filter if provided
+                if search_query:
+                    # Search in package name and dependencies
+                    package_name = metadata_content.get('packageName', '').lower()
+                    dependencies = metadata_content.get('dependencies', [])
+                    dependencies_str = ' '.join(dependencies).lower() if dependencies else ''
+                    # Builds collapsed by the GC job stay findable under their old names
+                    alias_names = ' '.join(
+                        alias.get('packageName', '') for alias in metadata_content.get('aliases', [])
+                    ).lower()
+                    
+                    if (search_query not in package_name and 
+                        search_query not in dependencies_str and
+                        search_query not in alias_names):
                         continue
+                
+                layers.append({
+                    'key': metadata_content.get('packageKey', ''),
+                    'size': metadata_content.get('packageSize', 0),
+                    'lastModified': obj['LastModified'].isoformat(),
+                    'fileName': metadata_content.get('packageName', 'Unknown'),
+                    'etag': obj['ETag'].strip('"'),
+                    'dependencies': metadata_content.get('dependencies', []),
+                    'runtime': metadata_content.get('runtime', ''),
+                    'platform': metadata_content.get('platform', ''),
+                    'pythonVersion': metadata_content.get('pythonVersion', ''),
+                    'packageType': metadata_content.get('packageType', 'layer'),
+                    'installDependencies': metadata_content.get('installDependencies', False),
+                    'upgradePackages': metadata_content.get('upgradePackages', False),
+                    'createdAt': metadata_content.get('createdAt', ''),
+                    'dependencyCount': len(metadata_content.get('dependencies', [])),
+                    'contentHash': metadata_content.get('contentHash', ''),
+                    'aliases': metadata_content.get('aliases', [])
+                })
+            except Exception as e:
+                print(f"Error processing metadata file {obj['Key']}: {str(e)}")
+                read_errors += 1
+                continue
+            if page and len(layers) == page['limit']:
+                if position + 1 < len(metadata_files):
+                    next_cursor = encode_cursor(object_position(obj))
+                break
         
-        # Fallback: List objects in the layers/ prefix for older packages without metadata
-        if not layers:
-            response = s3_client.list_objects_v2(
-                Bucket=bucket_name,
-                Prefix='layers/'
-            )
+        # Fallback: List objects in the layers/ prefix for older packages without metadata.
+        # Those are few and listed whole, so only the first page ever falls back
+        if not layers and not (page and page['after']):
+            if fallback_objects is None:
+                fallback_objects = list_sharded(s3_client, bucket_name, 'layers/')
             
-            if 'Contents' in response:
-                for obj in response['Contents']:
+            if fallback_objects:
+                for obj in fallback_objects:
                     # Skip directories
                     if obj['Key'].endswith('/'):
                         continue
@@ -112,6 +183,7 @@ def lambda_handler(event, context):
                         })
                     except Exception as e:
                         print(f"Error getting metadata for {obj['Key']}: {str(e)}")
+                        read_errors += 1
                         # Add basic info without metadata
                         if not search_query:  # Only include if no search filter
                             layers.append({
@@ -131,37 +203,166 @@ def lambda_handler(event, context):
                                 'dependencyCount': 0
                             })
         
-        # Sort by last modified date (newest first)
-        layers.sort(key=lambda x: x['lastModified'], reverse=True)
+        # Sort by build time (newest first); lastModified moves whenever GC rewrites metadata
+        layers.sort(key=listing_position, reverse=True)
         
+        # A listing degraded by read errors must not be cached under a strong validator
+        headers = dict(HEADERS, **{'Cache-Control': cache_control if not read_errors else 'no-store'})
+        if not read_errors:
+            headers['ETag'] = etag
+        
+        body = {
+            'success': True,
+            'packages': layers,  # Keep 'packages' for frontend compatibility
+            'count': len(layers),
+            'searchQuery': search_query
+        }
+        if page:
+            body.update({'limit': page['limit'], 'nextCursor': next_cursor})
         return {
             'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS'
-            },
-            'body': json.dumps({
-                'success': True,
-                'packages': layers,  # Keep 'packages' for frontend compatibility
-                'count': len(layers),
-                'searchQuery': search_query
-            })
+            'headers': headers,
+            'body': json.dumps(body)
         }
         
     except Exception as e:
+        # Throttling that outlasted the client's retries is transient; ask the caller to retry
+        if is_throttled(e):
+            print(f"S3 throttled the listing: {str(e)}")
+            return throttled_response(dict(HEADERS, **{'Cache-Control': 'no-store'}))
         print(f"Error listing layers: {str(e)}")
         import traceback
         traceback.print_exc()
         return {
             'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS'
-            },
+            'headers': HEADERS,
             'body': json.dumps({
                 'success': False,
                 'error': str(e)
             })
-        } 
\ No newline at end of file
+        } 
+
+def catalog_listing(event, bucket_name, filters, search_query, page=None):
+    """Filtered listing served from index/catalog.json, revalidated against the catalog's ETag"""
+    query = json.dumps({'search': search_query, **filters, **(page_query(page) if page else {})}, sort_keys=True)
+    cache_control = listing_cache_control(event)
+    try:
+        head = s3_client.head_object(Bucket=bucket_name, Key=CATALOG_KEY)
+        etag = catalog_etag(head['ETag'], query)
+        if etag_matches(get_header(event, 'If-None-Match'), etag):
+            return {
+                'statusCode': 304,
+                'headers': dict(HEADERS, **{'ETag': etag, 'Cache-Control': cache_control}),
+                'body': ''
+            }
+    except s3_client.exceptions.ClientError:
+        pass
+    
+    catalog, current_etag = load_catalog(s3_client, bucket_name)
+    if catalog is None:
+        raise Exception('Layer catalog is unavailable')
+    layers = items_after(filter_rows(catalog, filters, search_query), page['after'] if page else None, listing_position)
+    next_cursor = None
+    if page:
+        if len(layers) > page['limit']:
+            next_cursor = encode_cursor(listing_position(layers[page['limit'] - 1]))
+        layers = layers[:page['limit']]
+    body = {
+        'success': True,
+        'packages': layers,
+        'count': len(layers),
+        'searchQuery': search_query,
+        'filters': filters
+    }
+    if page:
+        body.update({'limit': page['limit'], 'nextCursor': next_cursor})
+    return {
+        'statusCode': 200,
+        'headers': dict(HEADERS, **{'ETag': catalog_etag(current_etag, query), 'Cache-Control': cache_control}),
+        'body': json.dumps(body)
+    }
+
+def listing_cache_control(event):
+    """Edge lifetime of a listing: only the plain one is purged when the catalog changes"""
+    params = event.get('queryStringParameters') or {}
+    return QUERY_CACHE_CONTROL if any(params.get(name) for name in QUERY_PARAMS) else CACHE_CONTROL
+
+def read_metadata_documents(bucket_name, objects):
+    """Parsed metadata documents in the order given, or the exception reading each one raised"""
+    def read(obj):
+        try:
+            metadata_obj = s3_client.get_object(Bucket=bucket_name, Key=obj['Key'])
+            return json.loads(metadata_obj['Body'].read().decode('utf-8'))
+        except Exception as e:
+            return e
+    if not objects:
+        return []
+    with ThreadPoolExecutor(max_workers=min(LIST_MAX_WORKERS, len(objects))) as executor:
+        return list(executor.map(read, objects))
+
+def iter_metadata_documents(bucket_name, objects, chunk_size=None):
+    """read_metadata_documents a chunk at a time, so a caller that stops early stops reading"""
+    chunk_size = chunk_size or max(len(objects), 1)
+    for start in range(0, len(objects), chunk_size):
+        yield from read_metadata_documents(bucket_name, objects[start:start + chunk_size])
+
+def parse_page(params):
+    """limit and the position to continue after from ?limit= and ?cursor=; None when not paging"""
+    params = params or {}
+    if not params.get('limit'):
+        if params.get('cursor'):
+            raise ValueError('cursor requires limit')
+        return None
+    limit = str(params['limit'])
+    if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return {'limit': int(limit), 'after': decode_cursor(params['cursor']) if params.get('cursor') else None}
+
+def page_query(page):
+    """The paging parameters as they shape a response, for its ETag"""
+    return {'limit': page['limit'], 'cursor': encode_cursor(page['after']) if page['after'] else ''}
+
+def encode_cursor(position):
+    """Opaque cursor for a listing_position in a newest-first listing"""
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if isinstance(position, list) and len(position) == 2 and all(isinstance(part, str) for part in position):
+            return tuple(position)
+    except ValueError:
+        pass
+    raise ValueError('cursor is not valid')
+
+def items_after(items, after, position):
+    """items newest first by position, keeping only those that come after the given position"""
+    items = sorted(items, key=position, reverse=True)
+    if after is None:
+        return items
+    return [item for item in items if position(item) < after]
+
+def listing_etag(objects, search_query, page=None):
+    """Strong ETag over the listed keys, their ETags and timestamps, and the query"""
+    query = search_query if page is None else json.dumps([search_query, page_query(page)])
+    digest = hashlib.sha256(f'{LISTING_FORMAT_VERSION}\0{query}\n'.encode('utf-8'))
+    for obj in sorted(objects, key=lambda o: o['Key']):
+        entry = f"{obj['Key']}\0{obj['ETag']}\0{obj['LastModified'].isoformat()}\0{obj.get('Size', 0)}\n"
+        digest.update(entry.encode('utf-8'))
+    return f'"{digest.hexdigest()[:32]}"'
+
+def etag_matches(if_none_match, etag):
+    """RFC 9110 If-None-Match comparison (weak comparison, as required for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in candidates]
+
+def get_header(event, name):
+    """Case-insensitive lookup of a request header"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
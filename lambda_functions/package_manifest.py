@@ -0,0 +1,103 @@
+import json
+import os
+from urllib.parse import unquote
+
+from layer_archive import build_manifest, read_zip_entries, s3_range_reader
+from s3_storage import is_throttled, resolve_layer_key, shared_s3_client, throttled_response
+
+s3_client = shared_s3_client()
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS'
+}
+# A layer key always names the same bytes, so its manifest can sit at the edge for a day
+CACHE_CONTROL = 'public, max-age=3600, s-maxage=86400'
+
+def lambda_handler(event, context):
+    try:
+        s3_key = (event.get('pathParameters') or {}).get('s3Key')
+        if not s3_key:
+            return error_response(400, 'S3 key is required')
+
+        s3_key = unquote(s3_key)
+        # Manifests are cached beside the layer, so only layer keys may be named
+        if not s3_key.startswith('layers/') or not s3_key.endswith('.zip') or '..' in s3_key.split('/'):
+            return error_response(400, 'Manifests are only available for layers')
+        bucket_name = os.environ['BUCKET_NAME']
+
+        # GC leaves an alias when it collapses a duplicate build
+        s3_key, head = resolve_layer_key(s3_client, bucket_name, s3_key)
+        if head is None:
+            return error_response(404, 'Package not found')
+
+        etag = head['ETag'].strip('"')
+        manifest = load_cached_manifest(bucket_name, s3_key, etag)
+        cached = manifest is not None
+
+        if not cached:
+            # Only the zip's tail and central directory are read, never the file data
+            stats = {}
+            entries = read_zip_entries(
+                s3_range_reader(s3_client, bucket_name, s3_key, stats), head['ContentLength']
+            )
+            manifest = build_manifest(entries)
+            manifest.update({
+                's3Key': s3_key,
+                'etag': etag,
+                'packageSize': head['ContentLength'],
+                'rangeRequests': stats.get('requests', 0),
+                'bytesRead': stats.get('bytesRead', 0)
+            })
+            print(f"Read manifest of {s3_key}: {manifest['fileCount']} files, "
+                  f"{manifest['bytesRead']} of {head['ContentLength']} bytes in {manifest['rangeRequests']} requests")
+
+            s3_client.put_object(
+                Bucket=bucket_name,
+                Key=manifest_key(s3_key),
+                Body=json.dumps(manifest),
+                ContentType='application/json'
+            )
+
+        return {
+            'statusCode': 200,
+            'headers': dict(HEADERS, **{'Cache-Control': CACHE_CONTROL}),
+            'body': json.dumps(dict(manifest, success=True, cached=cached))
+        }
+
+    except ValueError as e:
+        print(f"Could not parse layer archive: {str(e)}")
+        return error_response(422, f'Layer is not a readable zip archive: {str(e)}')
+    except Exception as e:
+        # Throttling that outlasted the client's retries is transient; ask the caller to retry
+        if is_throttled(e):
+            print(f"S3 throttled the manifest read: {str(e)}")
+            return throttled_response(dict(HEADERS, **{'Cache-Control': 'no-store'}))
+        print(f"Error reading manifest: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return error_response(500, str(e))
+
+def manifest_key(s3_key):
+    """Sidecar object that caches the parsed manifest of a layer"""
+    return f'manifests/{s3_key}.json'
+
+def load_cached_manifest(bucket_name, s3_key, etag):
+    """Return the sidecar manifest if it was built from the current version of the layer"""
+    try:
+        obj = s3_client.get_object(Bucket=bucket_name, Key=manifest_key(s3_key))
+        manifest = json.loads(obj['Body'].read().decode('utf-8'))
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return manifest if manifest.get('etag') == etag else None
+
+def error_response(status_code, message):
+    return {
+        'statusCode': status_code,
+        'headers': HEADERS,
+        'body': json.dumps({
+            'success': False,
+            'error': message
+        })
+    }
@@ -0,0 +1,51 @@
+import json
+import os
+
+from layer_catalog import CATALOG_KEY, catalog_etag, catalog_stats, load_catalog
+from package_lister import CACHE_CONTROL, etag_matches, get_header
+from s3_storage import shared_s3_client
+
+s3_client = shared_s3_client()
+
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Expose-Headers': 'ETag'
+}
+
+def lambda_handler(event, context):
+    """Catalog totals, per platform/Python version/month breakdowns and top dependencies"""
+    try:
+        bucket_name = os.environ['BUCKET_NAME']
+
+        # Unchanged catalog: answer from a HEAD request without reading it
+        try:
+            head = s3_client.head_object(Bucket=bucket_name, Key=CATALOG_KEY)
+            etag = catalog_etag(head['ETag'], 'stats')
+            if etag_matches(get_header(event, 'If-None-Match'), etag):
+                return {
+                    'statusCode': 304,
+                    'headers': dict(HEADERS, **{'ETag': etag, 'Cache-Control': CACHE_CONTROL}),
+                    'body': ''
+                }
+        except s3_client.exceptions.ClientError:
+            pass
+
+        catalog, current_etag = load_catalog(s3_client, bucket_name)
+        if catalog is None:
+            raise Exception('Layer catalog is unavailable')
+
+        return {
+            'statusCode': 200,
+            'headers': dict(HEADERS, **{'ETag': catalog_etag(current_etag, 'stats'), 'Cache-Control': CACHE_CONTROL}),
+            'body': json.dumps({'success': True, **catalog_stats(catalog)})
+        }
+
+    except Exception as e:
+        print(f"Error computing catalog stats: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': HEADERS,
+            'body': json.dumps({'success': False, 'error': str(e)})
+        }
@@ -0,0 +1,274 @@
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+from index_cache import pip_index_args
+from layer_archive import read_zip_entries
+from native_build import source_builds_enabled
+from wheelhouse import variant_label
+
+# Lambda's limit on the unzipped size of a function and all of its layers together
+LAMBDA_UNZIPPED_LIMIT_BYTES = 250 * 1024 * 1024
+PREFLIGHT_TIMEOUT_SECONDS = int(os.environ.get('PREFLIGHT_TIMEOUT_SECONDS', '120'))
+PREFLIGHT_MAX_WORKERS = int(os.environ.get('PREFLIGHT_MAX_WORKERS', '8'))
+HTTP_TIMEOUT_SECONDS = 15
+# Used only when a wheel's central directory cannot be read
+WHEEL_EXPANSION_RATIO = 3
+LARGEST_PACKAGES_REPORTED = 5
+
+NAME = r'[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?'
+VERSION_CLAUSE = r'(?:~=|===|==|!=|<=|>=|<|>)\s*[A-Za-z0-9.*+!_-]+'
+# The subset of PEP 508 pip accepts on a command line: name, extras, then either
+# version specifiers or a direct URL, and an optional environment marker
+REQUIREMENT_PATTERN = re.compile(
+    rf'^(?P<name>{NAME})\s*'
+    rf'(?:\[\s*{NAME}(?:\s*,\s*{NAME})*\s*\])?\s*'
+    rf'(?:{VERSION_CLAUSE}(?:\s*,\s*{VERSION_CLAUSE})*|@\s*https?://\S+)?\s*'
+    r'(?:;.+)?$'
+)
+NO_VERSION_PATTERN = re.compile(
+    r'Could not find a version that satisfies the requirement (?P<requirement>.+?) \(from versions: (?P<versions>.*)\)'
+)
+# pip versions without --dry-run/--report cannot preflight; the build falls back to a plain install
+UNSUPPORTED_PIP_MARKERS = ('no such option', 'unrecognized arguments')
+NETWORK_ERROR_MARKERS = ('NewConnectionError', 'Max retries exceeded', 'Temporary failure in name resolution')
+
+
+def validate_requirements(dependencies):
+    """Return an error entry for every dependency pip should never be handed"""
+    errors = []
+    for requirement in dependencies:
+        if not isinstance(requirement, str) or not requirement.strip():
+            errors.append({'requirement': requirement, 'reason': 'Requirement must be a non-empty string'})
+        elif requirement.strip().startswith('-'):
+            errors.append({'requirement': requirement, 'reason': 'pip options are not allowed in dependencies'})
+        elif not REQUIREMENT_PATTERN.match(requirement.strip()):
+            errors.append({
+                'requirement': requirement,
+                'reason': 'Not a valid requirement specifier (e.g. "requests>=2.31,<3")'
+            })
+    return errors
+
+
+def resolve(dependencies, platform, python_version, timeout=PREFLIGHT_TIMEOUT_SECONDS):
+    """Resolve dependencies for a variant without installing, returning (pip report, stderr)"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        report_path = os.path.join(temp_dir, 'report.json')
+        if source_builds_enabled(platform, python_version):
+            # A native builder can compile sdists, so they count as resolvable
+            target_args = ['--prefer-binary']
+        else:
+            target_args = [
+                '--implementation', 'cp',
+                '--python-version', python_version,
+                '--only-binary=:all:',
+                '--platform', platform
+            ]
+        pip_cmd = [
+            'python3', '-m', 'pip', 'install',
+            '--dry-run',
+            '--ignore-installed',
+            '--quiet',
+            '--report', report_path,
+            # pip only honours --platform together with --target, even for a dry run
+            '--target', os.path.join(temp_dir, 'target'),
+            *target_args,
+            *pip_index_args(),
+            '--disable-pip-version-check'
+        ]
+        pip_cmd.extend(dependencies)
+
+        result = subprocess.run(pip_cmd, capture_output=True, text=True, timeout=timeout, cwd='/tmp')
+        if result.returncode != 0 or not os.path.exists(report_path):
+            return None, result.stderr
+        with open(report_path) as f:
+            return json.load(f), result.stderr
+
+
+def explain_failure(stderr, label):
+    """Turn pip's resolver output into a single precise reason"""
+    match = NO_VERSION_PATTERN.search(stderr)
+    if match:
+        requirement = match.group('requirement')
+        versions = match.group('versions').strip()
+        if versions == 'none':
+            return requirement, (f'No wheel of {requirement} is available for {label}; the package does not exist '
+                                 f'or publishes no compatible binary wheels')
+        return requirement, (f'No wheel of {requirement} matches for {label}; '
+                             f'versions with compatible wheels: {versions}')
+
+    if 'ResolutionImpossible' in stderr or 'conflict is caused by' in stderr:
+        lines = stderr.splitlines()
+        start = next((i for i, line in enumerate(lines) if 'conflict is caused by' in line), None)
+        conflict = [line.strip() for line in lines[start + 1:] if line.strip()][:6] if start is not None else []
+        return None, 'Dependencies have conflicting requirements: ' + ('; '.join(conflict) or 'see pip output')
+
+    errors = [line[len('ERROR: '):] for line in stderr.splitlines() if line.startswith('ERROR: ')]
+    return None, errors[-1] if errors else 'Dependency resolution failed'
+
+
+def file_range_reader(path):
+    def read_range(start, end):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+    return read_range
+
+
+def http_range_reader(url):
+    def read_range(start, end):
+        request = urllib.request.Request(url, headers={'Range': f'bytes={start}-{end}'})
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT_SECONDS) as response:
+            if response.status != 206:
+                raise ValueError(f'{url} does not support range requests')
+            return response.read()
+    return read_range
+
+
+def measure_wheel(url):
+    """Size a wheel and its installed contents from its central directory, without downloading it"""
+    parsed = urlparse(url)
+    try:
+        if parsed.scheme == 'file':
+            path = unquote(parsed.path)
+            wheel_size = os.path.getsize(path)
+            read_range = file_range_reader(path)
+        else:
+            request = urllib.request.Request(url, method='HEAD')
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT_SECONDS) as response:
+                wheel_size = int(response.headers['Content-Length'])
+            read_range = http_range_reader(url)
+    except Exception as e:
+        print(f"Could not size {url}: {str(e)}")
+        return {'wheelSize': None, 'unzippedSize': None, 'sizeEstimated': True}
+
+    try:
+        entries = read_zip_entries(read_range, wheel_size)
+        # cleanup_installation deletes compiled bytecode, so it never reaches the layer
+        unzipped_size = sum(
+            e['uncompressedSize'] for e in entries
+            if not e['name'].endswith(('/', '.pyc', '.pyo'))
+        )
+        return {'wheelSize': wheel_size, 'unzippedSize': unzipped_size, 'sizeEstimated': False}
+    except Exception as e:
+        print(f"Could not read central directory of {url}: {str(e)}")
+        return {'wheelSize': wheel_size, 'unzippedSize': wheel_size * WHEEL_EXPANSION_RATIO, 'sizeEstimated': True}
+
+
+def run_preflight(dependencies, platform, python_version):
+    """Validate, resolve and size a dependency set for one variant before anything is installed"""
+    started = time.time()
+    label = variant_label(platform, python_version)
+    report = {
+        'ok': False,
+        'skipped': False,
+        'platform': platform,
+        'pythonVersion': python_version,
+        'errors': validate_requirements(dependencies),
+        'packages': [],
+        'wheelBytes': 0,
+        'estimatedUnzippedSize': 0,
+        'limit': LAMBDA_UNZIPPED_LIMIT_BYTES
+    }
+
+    if not report['errors']:
+        resolved = resolve_with_diagnosis(dependencies, platform, python_version, label, report)
+        if resolved:
+            installs = resolved.get('install', [])
+            with ThreadPoolExecutor(max_workers=PREFLIGHT_MAX_WORKERS) as executor:
+                sizes = list(executor.map(lambda item: measure_wheel(item['download_info']['url']), installs))
+
+            for item, size in zip(installs, sizes):
+                report['packages'].append({
+                    'name': item['metadata']['name'],
+                    'version': item['metadata']['version'],
+                    'wheel': unquote(item['download_info']['url'].rsplit('/', 1)[-1]),
+                    'url': item['download_info']['url'],
+                    'sha256': item['download_info'].get('archive_info', {}).get('hashes', {}).get('sha256'),
+                    'requested': item.get('requested', False),
+                    **size
+                })
+            report['wheelBytes'] = sum(p['wheelSize'] or 0 for p in report['packages'])
+            report['estimatedUnzippedSize'] = sum(p['unzippedSize'] or 0 for p in report['packages'])
+
+            if report['estimatedUnzippedSize'] > LAMBDA_UNZIPPED_LIMIT_BYTES:
+                largest = sorted(report['packages'], key=lambda p: p['unzippedSize'] or 0, reverse=True)
+                report['errors'].append({
+                    'requirement': None,
+                    'reason': (f"Estimated unzipped size {format_mb(report['estimatedUnzippedSize'])} exceeds "
+                               f"Lambda's {format_mb(LAMBDA_UNZIPPED_LIMIT_BYTES)} limit; largest packages: "
+                               + ', '.join(f"{p['name']} {format_mb(p['unzippedSize'] or 0)}"
+                                           for p in largest[:LARGEST_PACKAGES_REPORTED]))
+                })
+
+    report['ok'] = not report['errors']
+    report['durationMs'] = int((time.time() - started) * 1000)
+    status = 'skipped' if report['skipped'] else 'passed' if report['ok'] else 'failed'
+    print(f"Preflight {status} for {label} in {report['durationMs']} ms: "
+          f"{len(report['packages'])} packages, ~{format_mb(report['estimatedUnzippedSize'])} unzipped")
+    return report
+
+
+def resolve_with_diagnosis(dependencies, platform, python_version, label, report):
+    """Resolve the full set; on failure pinpoint every requirement that cannot be satisfied"""
+    try:
+        resolved, stderr = resolve(dependencies, platform, python_version)
+    except subprocess.TimeoutExpired:
+        return skip(report, f'Resolution took longer than {PREFLIGHT_TIMEOUT_SECONDS}s')
+    if resolved:
+        return resolved
+    if any(marker in stderr for marker in UNSUPPORTED_PIP_MARKERS):
+        return skip(report, 'The builder\'s pip does not support dry-run resolution reports')
+    if any(marker in stderr for marker in NETWORK_ERROR_MARKERS):
+        return skip(report, 'Package index is unreachable')
+
+    requirement, reason = explain_failure(stderr, label)
+    if requirement is None or len(dependencies) == 1:
+        report['errors'].append({'requirement': requirement, 'reason': reason})
+        return None
+
+    # pip stops at the first unsatisfiable requirement; check each one so the report lists them all
+    def check(dependency):
+        try:
+            resolved, stderr = resolve([dependency], platform, python_version)
+        except subprocess.TimeoutExpired:
+            return None
+        return None if resolved else explain_failure(stderr, label)[1]
+
+    with ThreadPoolExecutor(max_workers=PREFLIGHT_MAX_WORKERS) as executor:
+        reasons = list(executor.map(check, dependencies))
+    for dependency, dependency_reason in zip(dependencies, reasons):
+        if dependency_reason:
+            report['errors'].append({'requirement': dependency, 'reason': dependency_reason})
+    if not report['errors']:
+        report['errors'].append({'requirement': requirement, 'reason': reason})
+    return None
+
+
+def skip(report, reason):
+    print(f"Skipping preflight: {reason}")
+    report['skipped'] = True
+    report['reason'] = reason
+    return None
+
+
+def summarize_errors(reports):
+    """One line describing every preflight error, for the response's error field"""
+    reasons = []
+    for report in reports:
+        for error in report['errors']:
+            named = error['requirement'] and error['requirement'] not in error['reason']
+            prefix = f"{error['requirement']}: " if named else ''
+            if prefix + error['reason'] not in reasons:
+                reasons.append(prefix + error['reason'])
+    return 'Preflight failed: ' + ' | '.join(reasons)
+
+
+def format_mb(size):
+    return f'{size / (1024 * 1024):.1f} MB'
@@ -0,0 +1,235 @@
+"""
+Shared S3 access: one throttling-aware client per container, sharded key layout and parallel listing.
+
+Every handler uses the client from shared_s3_client(). Its adaptive retry mode retries
+SlowDown and 503s with jittered exponential backoff and rate-limits sends with a token
+bucket. Because the client is shared, the bucket covers the whole container and not one
+module's calls.
+
+New layers and their metadata are written under hash-sharded prefixes
+(layers/<shard>/..., metadata/<shard>/...), so S3 can spread a burst of builds over
+several partitions. Readers list the flat prefix and every shard, so flat keys written
+before sharding keep working. Run this module with --apply to move flat layers into
+their shards; each moved layer leaves an alias so old download links still resolve.
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# Hex digits of the shard in new keys: 1 gives 16 shards, 0 writes the flat layout
+KEY_SHARD_DIGITS = int(os.environ.get('KEY_SHARD_DIGITS', '1'))
+S3_MAX_ATTEMPTS = int(os.environ.get('S3_MAX_ATTEMPTS', '10'))
+LIST_MAX_WORKERS = int(os.environ.get('S3_LIST_MAX_WORKERS', '16'))
+RETRY_AFTER_SECONDS = 2
+THROTTLE_ERROR_CODES = ('SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+                        'TooManyRequestsException', 'ServiceUnavailable', '503')
+NOT_FOUND_ERROR_CODES = ('404', 'NoSuchKey', 'NotFound')
+# aliases/<old layer key>.json points at the key now holding a layer that GC collapsed or sharding moved
+ALIASES_PREFIX = 'aliases/'
+
+_s3_client = None
+
+
+def shared_s3_client():
+    """The container's S3 client, created on first use with adaptive retries"""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3', config=Config(
+            retries={'mode': 'adaptive', 'total_max_attempts': S3_MAX_ATTEMPTS},
+            # Parallel listing and metadata reads share the connection pool
+            max_pool_connections=max(LIST_MAX_WORKERS, 10)
+        ))
+    return _s3_client
+
+
+def is_throttled(error):
+    """True for S3 throttling that outlasted the client's retries"""
+    response = getattr(error, 'response', None) or {}
+    code = str(response.get('Error', {}).get('Code', ''))
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in THROTTLE_ERROR_CODES or status == 503
+
+
+def throttled_response(headers):
+    """503 telling the caller to come back shortly instead of reporting a failure"""
+    return {
+        'statusCode': 503,
+        'headers': {**headers, 'Retry-After': str(RETRY_AFTER_SECONDS)},
+        'body': json.dumps({
+            'success': False,
+            'error': 'Storage is busy; please retry shortly',
+            'retryAfter': RETRY_AFTER_SECONDS
+        })
+    }
+
+
+def is_not_found(error):
+    response = getattr(error, 'response', None) or {}
+    return str(response.get('Error', {}).get('Code', '')) in NOT_FOUND_ERROR_CODES
+
+
+def alias_key(layer_key):
+    """Location of the pointer that redirects an old layer key to the layer's current key"""
+    return f'{ALIASES_PREFIX}{layer_key}.json'
+
+
+def head_or_none(client, bucket_name, key):
+    """HEAD response of an object, or None if it does not exist"""
+    try:
+        return client.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if is_not_found(e):
+            return None
+        raise
+
+
+def resolve_layer_key(client, bucket_name, layer_key):
+    """(key, HEAD response) of the object holding a layer now, following its alias if it moved.
+
+    The HEAD response is None when neither the key nor the alias target exists; other
+    errors, such as throttling, are left to the caller.
+    """
+    head = head_or_none(client, bucket_name, layer_key)
+    if head is not None:
+        return layer_key, head
+    try:
+        alias = client.get_object(Bucket=bucket_name, Key=alias_key(layer_key))
+    except ClientError as e:
+        if is_not_found(e):
+            return layer_key, None
+        raise
+    current_key = json.loads(alias['Body'].read().decode('utf-8'))['packageKey']
+    print(f"Resolved alias {layer_key} -> {current_key}")
+    return current_key, head_or_none(client, bucket_name, current_key)
+
+
+def shard_of(object_name, digits=None):
+    digits = KEY_SHARD_DIGITS if digits is None else digits
+    return hashlib.sha256(object_name.encode('utf-8')).hexdigest()[:digits]
+
+
+def sharded_key(prefix, object_name, suffix, digits=None):
+    """prefix/<shard>/object_name+suffix, or prefix/object_name+suffix in the flat layout"""
+    shard = shard_of(object_name, digits)
+    return f'{prefix}{shard}/{object_name}{suffix}' if shard else f'{prefix}{object_name}{suffix}'
+
+
+def layer_key(object_name):
+    return sharded_key('layers/', object_name, '.zip')
+
+
+def metadata_key(object_name):
+    return sharded_key('metadata/', object_name, '.json')
+
+
+def list_prefix(client, bucket_name, prefix, delimiter=None):
+    """Every object under prefix, and the sub-prefixes when delimiter is given"""
+    objects, prefixes = [], []
+    options = {'Delimiter': delimiter} if delimiter else {}
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket_name, Prefix=prefix, **options):
+        objects.extend(page.get('Contents', []))
+        prefixes.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+    return objects, prefixes
+
+
+def list_sharded(client, bucket_name, prefix):
+    """Every object under a sharded prefix: flat keys and each shard, listed in parallel.
+
+    One delimited listing returns the flat keys and the shards in use, so a bucket that
+    has never been sharded costs a single LIST as before.
+    """
+    objects, shards = list_prefix(client, bucket_name, prefix, delimiter='/')
+    if shards:
+        with ThreadPoolExecutor(max_workers=min(LIST_MAX_WORKERS, len(shards))) as executor:
+            for shard_objects, _ in executor.map(lambda shard: list_prefix(client, bucket_name, shard), shards):
+                objects.extend(shard_objects)
+    return objects
+
+
+def migrate_to_shards(client, bucket_name, dry_run=True):
+    """Move layers and metadata from the flat layout into their shards.
+
+    Each layer is copied before anything is deleted. An aliases/<old key>.json pointer
+    keeps the old key downloadable, and aliases left by GC are repointed at the new key.
+    """
+    moved = []
+    flat_metadata, _ = list_prefix(client, bucket_name, 'metadata/', delimiter='/')
+    for obj in flat_metadata:
+        if not obj['Key'].endswith('.json'):
+            continue
+        object_name = obj['Key'][len('metadata/'):-len('.json')]
+        new_metadata_key = metadata_key(object_name)
+        if new_metadata_key == obj['Key']:
+            continue
+        try:
+            metadata = json.loads(client.get_object(Bucket=bucket_name, Key=obj['Key'])['Body'].read())
+        except Exception as e:
+            print(f"Skipping {obj['Key']}: {str(e)}")
+            continue
+
+        old_layer_key = metadata.get('packageKey', '')
+        new_layer_key = layer_key(object_name)
+        moved.append({'from': old_layer_key, 'to': new_layer_key, 'metadataKey': new_metadata_key})
+        if dry_run:
+            continue
+
+        try:
+            move_layer(client, bucket_name, metadata, obj['Key'], new_layer_key, new_metadata_key)
+        except Exception as e:
+            print(f"Could not move {old_layer_key}: {str(e)}")
+            moved[-1]['error'] = str(e)
+            continue
+        print(f"Moved {old_layer_key} -> {new_layer_key}")
+    return moved
+
+
+def move_layer(client, bucket_name, metadata, old_metadata_key, new_layer_key, new_metadata_key):
+    """Copy one layer and its metadata to sharded keys, alias the old keys, then delete the originals"""
+    old_layer_key = metadata.get('packageKey', '')
+    if old_layer_key:
+        client.copy_object(Bucket=bucket_name, Key=new_layer_key,
+                           CopySource={'Bucket': bucket_name, 'Key': old_layer_key}, MetadataDirective='COPY')
+    metadata = dict(metadata, packageKey=new_layer_key)
+    client.put_object(Bucket=bucket_name, Key=new_metadata_key, Body=json.dumps(metadata, indent=2),
+                      ContentType='application/json')
+    for old_key in [old_layer_key] + [alias.get('packageKey') for alias in metadata.get('aliases', [])]:
+        if old_key:
+            client.put_object(Bucket=bucket_name, Key=alias_key(old_key),
+                              Body=json.dumps({'packageKey': new_layer_key, 'contentHash': metadata.get('contentHash')}),
+                              ContentType='application/json')
+    if old_layer_key:
+        client.delete_object(Bucket=bucket_name, Key=old_layer_key)
+        # Manifests are keyed by layer key and rebuilt on demand for the new one
+        client.delete_object(Bucket=bucket_name, Key=f'manifests/{old_layer_key}.json')
+    client.delete_object(Bucket=bucket_name, Key=old_metadata_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move flat layers and metadata into hash-sharded prefixes')
+    parser.add_argument('--bucket', default=os.environ.get('BUCKET_NAME'), help='Packages bucket name')
+    parser.add_argument('--apply', action='store_true', help='Actually move objects (default: dry run)')
+    args = parser.parse_args()
+
+    if not args.bucket:
+        parser.error('--bucket or BUCKET_NAME is required')
+    if KEY_SHARD_DIGITS == 0:
+        parser.error('KEY_SHARD_DIGITS=0 selects the flat layout; there is nothing to migrate to')
+
+    moved = migrate_to_shards(shared_s3_client(), args.bucket, dry_run=not args.apply)
+    if moved and args.apply:
+        # Imported here: layer_catalog itself lists through this module
+        from edge_cache import purge_listing_cache
+        from layer_catalog import rebuild_catalog
+        rebuild_catalog(shared_s3_client(), args.bucket)
+        purge_listing_cache('migration')
+    print(json.dumps({'dryRun': not args.apply, 'moved': len(moved)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
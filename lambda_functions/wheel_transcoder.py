@@ -0,0 +1,177 @@
+import hashlib
+import os
+import struct
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+FETCH_MAX_WORKERS = int(os.environ.get('WHEEL_FETCH_MAX_WORKERS', '8'))
+FETCH_TIMEOUT_SECONDS = 120
+COPY_CHUNK_SIZE = 1024 * 1024
+# Only bytecode is dropped, which is all cleanup_installation removes after a pip install.
+# Directories such as docs/ or tests/ stay: packages import from them (botocore.docs), and
+# dist-info stays so that importlib.metadata lookups keep working inside Lambda.
+EXCLUDED_DIRS = {'__pycache__'}
+EXCLUDED_SUFFIXES = ('.pyc', '.pyo')
+# Only these .data subdirectories install into site-packages; scripts, headers and data do not
+SITE_PACKAGES_SCHEMES = ('purelib', 'platlib')
+RAW_COPY_COMPRESSION = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+LOCAL_HEADER_SIZE = 30
+
+
+def fetch_wheels(packages, wheel_dir):
+    """Make every pinned wheel from a preflight report available locally, verifying its hash"""
+    os.makedirs(wheel_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+        return list(executor.map(lambda package: fetch_wheel(package, wheel_dir), packages))
+
+
+def fetch_wheel(package, wheel_dir):
+    url = package['url']
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        # Local wheelhouses are read in place; nothing is copied to /tmp
+        return unquote(parsed.path)
+
+    path = os.path.join(wheel_dir, package['wheel'])
+    if os.path.exists(path):
+        return path
+
+    digest = hashlib.sha256()
+    partial_path = f'{path}.{os.getpid()}.{id(package)}.part'
+    with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT_SECONDS) as response, open(partial_path, 'wb') as f:
+        for chunk in iter(lambda: response.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            f.write(chunk)
+
+    if package.get('sha256') and digest.hexdigest() != package['sha256']:
+        os.remove(partial_path)
+        raise ValueError(f"Hash mismatch for {package['wheel']}")
+    os.replace(partial_path, path)
+    return path
+
+
+def layer_path(member, site_packages):
+    """Where a wheel member lands in the layer zip, or None if it is bytecode or not installed"""
+    if member.endswith('/'):
+        return None
+    parts = member.split('/')
+    if parts[0].endswith('.data'):
+        if len(parts) < 3 or parts[1] not in SITE_PACKAGES_SCHEMES:
+            return None
+        parts = parts[2:]
+    if member.endswith(EXCLUDED_SUFFIXES) or EXCLUDED_DIRS.intersection(parts[:-1]):
+        return None
+    return f"{site_packages}/{'/'.join(parts)}"
+
+
+def transcode_wheels(wheel_paths, zip_path, python_version, extra_files=None, stop=None):
+    """Write wheels straight into a layer zip, copying each member's compressed bytes unchanged.
+
+    stop is asked before every wheel after the first; once it returns True the remaining
+    wheels are left out and listed in the stats' pending entry.
+    """
+    site_packages = f'python/lib/python{python_version}/site-packages'
+    stats = {'wheels': 0, 'pending': [], 'files': 0, 'skipped': 0, 'duplicates': 0, 'rawBytes': 0, 'recompressed': 0}
+    written = set()
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as out:
+        for index, wheel_path in enumerate(wheel_paths):
+            if stop and index and stop():
+                stats['pending'] = list(wheel_paths[index:])
+                break
+            stats['wheels'] += 1
+            with zipfile.ZipFile(wheel_path) as wheel:
+                for info in wheel.infolist():
+                    arcname = layer_path(info.filename, site_packages)
+                    if arcname is None:
+                        stats['skipped'] += 1
+                        continue
+                    if arcname in written:
+                        # pip would overwrite; keeping the first copy avoids duplicate zip entries
+                        stats['duplicates'] += 1
+                        continue
+                    written.add(arcname)
+                    stats['files'] += 1
+
+                    if info.compress_type in RAW_COPY_COMPRESSION and not info.flag_bits & 0x1:
+                        copy_member_raw(out, wheel, info, arcname)
+                        stats['rawBytes'] += info.compress_size
+                    else:
+                        out.writestr(rename(info, arcname), wheel.read(info))
+                        stats['recompressed'] += 1
+
+        for arcname, content in (extra_files or {}).items():
+            out.writestr(arcname, content)
+
+    return stats
+
+
+def merge_zips(zip_paths, zip_path):
+    """Concatenate zips into one without recompressing; the first copy of a duplicate path wins"""
+    written = set()
+    with zipfile.ZipFile(zip_path, 'w') as out:
+        for source_path in zip_paths:
+            with zipfile.ZipFile(source_path) as source:
+                for info in source.infolist():
+                    if info.filename in written:
+                        continue
+                    written.add(info.filename)
+                    if info.compress_type in RAW_COPY_COMPRESSION and not info.flag_bits & 0x1:
+                        copy_member_raw(out, source, info, info.filename)
+                    else:
+                        out.writestr(rename(info, info.filename), source.read(info))
+    return len(written)
+
+
+def rename(info, arcname):
+    renamed = zipfile.ZipInfo(arcname, info.date_time)
+    renamed.external_attr = info.external_attr
+    renamed.compress_type = zipfile.ZIP_DEFLATED
+    return renamed
+
+
+def copy_member_raw(out, source, info, arcname):
+    """Append one member to out without decompressing it.
+
+    zipfile has no public raw copy, so this writes the local header with ZipInfo.FileHeader
+    and registers the entry the same way ZipFile.write does, leaving the central directory
+    (including zip64 records) to ZipFile.close.
+    """
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    source.fp.seek(info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length)
+
+    entry = zipfile.ZipInfo(arcname, info.date_time)
+    entry.compress_type = info.compress_type
+    entry.external_attr = info.external_attr
+    entry.CRC = info.CRC
+    entry.compress_size = info.compress_size
+    entry.file_size = info.file_size
+    entry.header_offset = out.fp.tell()
+
+    out.fp.write(entry.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = source.fp.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise ValueError(f'Truncated member {info.filename}')
+        out.fp.write(chunk)
+        remaining -= len(chunk)
+
+    out.filelist.append(entry)
+    out.NameToInfo[arcname] = entry
+    out.start_dir = out.fp.tell()
+    out._didModify = True
+
+
+def extract_site_packages(zip_path, python_version, dest_dir):
+    """Unpack the site-packages tree of a layer zip, for tools that need real files"""
+    prefix = f'python/lib/python{python_version}/site-packages/'
+    with zipfile.ZipFile(zip_path) as zf:
+        zf.extractall(dest_dir, [name for name in zf.namelist() if name.startswith(prefix)])
+    target_dir = os.path.join(dest_dir, prefix)
+    os.makedirs(target_dir, exist_ok=True)
+    return target_dir
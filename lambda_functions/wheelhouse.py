@@ -0,0 +1,90 @@
+import os
+import shutil
+import subprocess
+
+from index_cache import pip_index_args
+from installer import select_installer
+
+
+def variant_label(platform, python_version):
+    """Short human readable name for a platform/Python build variant"""
+    return f"{platform.replace('manylinux2014_', '')}-py{python_version}"
+
+
+def is_pure_wheel(filename):
+    """Return True for wheels that install identically on every platform"""
+    return filename.endswith('-none-any.whl')
+
+
+def list_wheels(wheel_dir):
+    """Return the wheel files found in a directory"""
+    if not os.path.isdir(wheel_dir):
+        return []
+    return sorted(f for f in os.listdir(wheel_dir) if f.endswith('.whl'))
+
+
+def download_wheels(dependencies, dest_dir, platform, python_version, find_links=None, timeout=600):
+    """Resolve dependencies and download their wheels for one platform/Python variant"""
+    os.makedirs(dest_dir, exist_ok=True)
+
+    pip_cmd = [
+        'python3', '-m', 'pip', 'download',
+        '--dest', dest_dir,
+        '--implementation', 'cp',
+        '--python-version', python_version,
+        '--only-binary=:all:',
+        *pip_index_args(),
+        '--disable-pip-version-check',
+        '--platform', platform
+    ]
+
+    for link in find_links or []:
+        pip_cmd.extend(['--find-links', link])
+
+    pip_cmd.extend(dependencies)
+
+    print(f"Running: {' '.join(pip_cmd)}")
+    result = subprocess.run(pip_cmd, capture_output=True, text=True, timeout=timeout, cwd='/tmp')
+
+    if result.returncode != 0:
+        print(f"❌ Download failed for {variant_label(platform, python_version)}")
+        print(f"STDERR: {result.stderr}")
+        return False
+
+    print(f"✅ Downloaded {len(list_wheels(dest_dir))} wheels for {variant_label(platform, python_version)}")
+    return True
+
+
+def share_pure_wheels(wheel_dir, shared_dir):
+    """Copy platform independent wheels into the shared wheelhouse"""
+    os.makedirs(shared_dir, exist_ok=True)
+    shared = []
+    for wheel in list_wheels(wheel_dir):
+        if is_pure_wheel(wheel) and not os.path.exists(os.path.join(shared_dir, wheel)):
+            shutil.copy2(os.path.join(wheel_dir, wheel), os.path.join(shared_dir, wheel))
+            shared.append(wheel)
+    return shared
+
+
+def install_from_wheelhouse(dependencies, target_dir, platform, python_version, wheel_dirs, timeout=600,
+                            installer=None):
+    """Install dependencies into target_dir using only previously downloaded wheels"""
+    installer = installer or select_installer()
+    os.makedirs(target_dir, exist_ok=True)
+
+    index_args = ['--no-index', '--no-cache-dir']
+    for wheel_dir in wheel_dirs:
+        index_args.extend(['--find-links', wheel_dir])
+
+    pip_cmd = installer.install_command(target_dir, platform, python_version, dependencies, index_args=index_args)
+
+    print(f"Running: {' '.join(pip_cmd)}")
+    result = subprocess.run(pip_cmd, capture_output=True, text=True, timeout=timeout, cwd='/tmp')
+
+    if result.returncode != 0:
+        print(f"❌ Offline install failed for {variant_label(platform, python_version)}")
+        print(f"STDERR: {result.stderr}")
+        return False
+
+    installer.finish(target_dir)
+    return True
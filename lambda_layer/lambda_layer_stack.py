@@ -9,8 +9,18 @@ from aws_cdk import (
     aws_route53 as route53,
     aws_route53_targets as targets,
     aws_certificatemanager as acm,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_ssm as ssm,
+    aws_sqs as sqs,
+    aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_ecs_patterns as ecs_patterns,
+    aws_ecr_assets as ecr_assets,
     RemovalPolicy,
     Duration,
+    Size,
+    BundlingOptions,
     CfnOutput,
 )
 from constructs import Construct
@@ -46,6 +56,29 @@ class LambdaLayerStack(Stack):
             versioned=True,
             removal_policy=RemovalPolicy.DESTROY,
             auto_delete_objects=True,
+            lifecycle_rules=[
+                # Build coordination records only matter while a build is running or being retried
+                s3.LifecycleRule(id="ExpireInflightLocks", prefix="inflight/", expiration=Duration.days(1)),
+                s3.LifecycleRule(id="ExpireBuildResults", prefix="builds/", expiration=Duration.days(1)),
+                s3.LifecycleRule(id="ExpireIdempotencyKeys", prefix="idempotency/", expiration=Duration.days(2)),
+                s3.LifecycleRule(id="ExpireBuildCheckpoints", prefix="checkpoints/", expiration=Duration.days(2)),
+                s3.LifecycleRule(id="ExpireSchedulerSlots", prefix="scheduler/", expiration=Duration.days(1)),
+                # The index cache snapshot is rewritten after builds; old copies are worthless
+                s3.LifecycleRule(
+                    id="ExpireIndexCacheVersions", prefix="cache/", noncurrent_version_expiration=Duration.days(1)
+                ),
+                # The layer catalog is rewritten on every build; only the current copy is read
+                s3.LifecycleRule(
+                    id="ExpireCatalogVersions", prefix="index/", noncurrent_version_expiration=Duration.days(1)
+                ),
+                # Wheels compiled by native builds are recompiled on demand once they expire
+                s3.LifecycleRule(id="ExpireCompiledWheels", prefix="wheels/compiled/", expiration=Duration.days(90)),
+                # Request telemetry only needs to cover the prewarm job's window
+                s3.LifecycleRule(id="ExpireRequestTelemetry", prefix="demand/", expiration=Duration.days(14)),
+                # Handler profiles are diagnostics for a specific slow request
+                s3.LifecycleRule(id="ExpireHandlerProfiles", prefix="profiles/", expiration=Duration.days(14)),
+                s3.LifecycleRule(id="AbortIncompleteUploads", abort_incomplete_multipart_upload_after=Duration.days(1)),
+            ],
             cors=[s3.CorsRule(
                 allowed_headers=["*"],
                 allowed_methods=[s3.HttpMethods.GET, s3.HttpMethods.POST, s3.HttpMethods.PUT],
@@ -88,7 +121,9 @@ class LambdaLayerStack(Stack):
                                 "s3:PutObject",
                                 "s3:DeleteObject",
                                 "s3:ListBucket",
-                                "s3:HeadObject"
+                                "s3:HeadObject",
+                                "s3:ListBucketVersions",
+                                "s3:DeleteObjectVersion"
                             ],
                             resources=[
                                 lambda_packages_bucket.bucket_arn,
@@ -100,15 +135,122 @@ class LambdaLayerStack(Stack):
             }
         )
 
+        # Optionally cap the builder's share of the account's Lambda concurrency so a burst of
+        # builds (each holding a scheduler slot or waiting for one) cannot throttle the read API.
+        # Not set by default: reserving concurrency fails on accounts with a low limit.
+        builder_concurrency = self.node.try_get_context("builderReservedConcurrency")
+
+        # Builders run the default Python version of a layer (3.12), so when the target
+        # architecture matches too they install natively and can compile sdists
+        builder_environment = {
+            'BUCKET_NAME': lambda_packages_bucket.bucket_name,
+            'CHECKPOINT_RESERVE_SECONDS': '120',
+            'MAX_BUILD_INVOCATIONS': '6',
+            'INDEX_CACHE': 's3',
+            'MAX_CONCURRENT_BUILDS': '10',
+            'MAX_BUILDS_PER_CLIENT': '2',
+            'SOURCE_BUILDS': 'native'
+        }
+
         # Lambda function for creating lambda packages
         package_creator_lambda = _lambda.Function(
             self, "PackageCreatorLambda",
-            runtime=_lambda.Runtime.PYTHON_3_9,
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.X86_64,
             handler="package_creator.lambda_handler",
             role=lambda_role,
             code=_lambda.Code.from_asset("lambda_functions"),
             timeout=Duration.minutes(15),  # Increased for dependency installation
             memory_size=1024,  # Increased for pip operations
+            # pip downloads, the staged layer and the index cache all live in /tmp
+            ephemeral_storage_size=Size.gibibytes(4),
+            # Only the builder invokes itself asynchronously, to resume checkpointed builds;
+            # a retried resume event would run the same continuation twice
+            retry_attempts=0,
+            reserved_concurrent_executions=int(builder_concurrency) if builder_concurrency else None,
+            environment=dict(builder_environment)
+        )
+
+        # Graviton builder for aarch64 layers, which the API's builder hands them to. It only
+        # runs builds recorded under checkpoints/ and is cheaper per build-minute. The managed
+        # runtime has no C compiler; deploy with -c nativeBuilderImage=true to build it from
+        # worker/builder.Dockerfile so sdists with C extensions compile as well.
+        arm64_builder_options = dict(
+            architecture=_lambda.Architecture.ARM_64,
+            role=lambda_role,
+            timeout=Duration.minutes(15),
+            memory_size=1024,
+            ephemeral_storage_size=Size.gibibytes(4),
+            retry_attempts=0,
+            reserved_concurrent_executions=int(builder_concurrency) if builder_concurrency else None,
+            environment=dict(builder_environment)
+        )
+        native_builder_image = str(self.node.try_get_context("nativeBuilderImage")).lower() == "true"
+        if native_builder_image:
+            arm64_builder_lambda = _lambda.DockerImageFunction(
+                self, "Arm64BuilderLambda",
+                code=_lambda.DockerImageCode.from_image_asset(
+                    ".",
+                    file="worker/builder.Dockerfile",
+                    platform=ecr_assets.Platform.LINUX_ARM64,
+                    exclude=["cdk.out", "frontend", "tests", "tools", ".git", "**/__pycache__"]
+                ),
+                **arm64_builder_options
+            )
+        else:
+            arm64_builder_lambda = _lambda.Function(
+                self, "Arm64BuilderLambda",
+                runtime=_lambda.Runtime.PYTHON_3_12,
+                handler="package_creator.lambda_handler",
+                code=_lambda.Code.from_asset("lambda_functions"),
+                **arm64_builder_options
+            )
+        package_creator_lambda.add_environment('ARM64_BUILDER_FUNCTION', arm64_builder_lambda.function_name)
+
+        # Scheduled job that keeps the most requested dependency sets built against current
+        # releases, so requests for them are answered from a prebuilt layer. It builds like
+        # the API's builder (batch priority) and resumes its own checkpointed builds.
+        layer_prewarm_lambda = _lambda.Function(
+            self, "LayerPrewarmLambda",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            architecture=_lambda.Architecture.X86_64,
+            handler="layer_prewarm.lambda_handler",
+            role=lambda_role,
+            code=_lambda.Code.from_asset("lambda_functions"),
+            timeout=Duration.minutes(15),
+            memory_size=1024,
+            ephemeral_storage_size=Size.gibibytes(4),
+            retry_attempts=0,
+            environment={
+                **builder_environment,
+                'ARM64_BUILDER_FUNCTION': arm64_builder_lambda.function_name,
+                'PREWARM_TOP_K': '10',
+                'PREWARM_WINDOW_DAYS': '7',
+                'PREWARM_MIN_REQUESTS': '3'
+            }
+        )
+        events.Rule(
+            self, "LayerPrewarmSchedule",
+            schedule=events.Schedule.rate(Duration.hours(1)),
+            targets=[events_targets.LambdaFunction(layer_prewarm_lambda)]
+        )
+
+        # Checkpointed builds re-invoke the builder. A wildcard over this stack's functions
+        # avoids a cycle between the shared role's policy and the function that uses it.
+        lambda_role.add_to_policy(iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=["lambda:InvokeFunction"],
+            resources=[f"arn:aws:lambda:{self.region}:{self.account}:function:{self.stack_name}-*"]
+        ))
+
+        # Lambda function reporting the progress of checkpointed builds
+        build_status_lambda = _lambda.Function(
+            self, "BuildStatusLambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="build_status.lambda_handler",
+            role=lambda_role,
+            code=_lambda.Code.from_asset("lambda_functions"),
+            timeout=Duration.seconds(30),
             environment={
                 'BUCKET_NAME': lambda_packages_bucket.bucket_name
             }
@@ -140,6 +282,55 @@ class LambdaLayerStack(Stack):
             }
         )
 
+        # Lambda function for reading layer manifests from the zip central directory
+        package_manifest_lambda = _lambda.Function(
+            self, "PackageManifestLambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="package_manifest.lambda_handler",
+            role=lambda_role,
+            code=_lambda.Code.from_asset("lambda_functions"),
+            timeout=Duration.minutes(1),
+            environment={
+                'BUCKET_NAME': lambda_packages_bucket.bucket_name
+            }
+        )
+
+        # Lambda function serving catalog statistics from the precomputed aggregates
+        package_stats_lambda = _lambda.Function(
+            self, "PackageStatsLambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="package_stats.lambda_handler",
+            role=lambda_role,
+            code=_lambda.Code.from_asset("lambda_functions"),
+            timeout=Duration.minutes(1),
+            environment={
+                'BUCKET_NAME': lambda_packages_bucket.bucket_name
+            }
+        )
+
+        # Lambda function that collapses duplicate builds and expires old object versions
+        layer_gc_lambda = _lambda.Function(
+            self, "LayerGcLambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            handler="layer_gc.lambda_handler",
+            role=lambda_role,
+            code=_lambda.Code.from_asset("lambda_functions"),
+            timeout=Duration.minutes(15),
+            memory_size=512,
+            environment={
+                'BUCKET_NAME': lambda_packages_bucket.bucket_name,
+                'GC_RETENTION_DAYS': '30',
+                'GC_NONCURRENT_VERSIONS_TO_KEEP': '1'
+            }
+        )
+
+        # Run the GC job once a day
+        events.Rule(
+            self, "LayerGcSchedule",
+            schedule=events.Schedule.rate(Duration.days(1)),
+            targets=[events_targets.LambdaFunction(layer_gc_lambda)]
+        )
+
         # API Gateway
         api = apigateway.RestApi(
             self, "LambdaBuilderApi",
@@ -148,7 +339,9 @@ class LambdaLayerStack(Stack):
             default_cors_preflight_options=apigateway.CorsOptions(
                 allow_origins=apigateway.Cors.ALL_ORIGINS,
                 allow_methods=apigateway.Cors.ALL_METHODS,
-                allow_headers=["Content-Type", "X-Amz-Date", "Authorization", "X-Api-Key"]
+                allow_headers=[
+                    "Content-Type", "X-Amz-Date", "Authorization", "X-Api-Key", "Idempotency-Key", "If-None-Match"
+                ]
             )
         )
 
@@ -156,17 +349,230 @@ class LambdaLayerStack(Stack):
         create_package_integration = apigateway.LambdaIntegration(package_creator_lambda)
         list_packages_integration = apigateway.LambdaIntegration(package_lister_lambda)
         download_url_integration = apigateway.LambdaIntegration(download_url_lambda)
+        manifest_integration = apigateway.LambdaIntegration(package_manifest_lambda)
+        stats_integration = apigateway.LambdaIntegration(package_stats_lambda)
+        build_status_integration = apigateway.LambdaIntegration(build_status_lambda)
 
         # API endpoints
         packages_resource = api.root.add_resource("packages")
         packages_resource.add_method("POST", create_package_integration)
         packages_resource.add_method("GET", list_packages_integration)
+        # Batch builds run on the same function as single builds
+        packages_resource.add_resource("batch").add_method("POST", create_package_integration)
+        packages_resource.add_resource("stats").add_method("GET", stats_integration)
         
         # Download endpoint: GET /packages/{s3Key}/download
         package_key_resource = packages_resource.add_resource("{s3Key}")
         download_resource = package_key_resource.add_resource("download")
         download_resource.add_method("GET", download_url_integration)
 
+        # Manifest endpoint: GET /packages/{s3Key}/manifest
+        manifest_resource = package_key_resource.add_resource("manifest")
+        manifest_resource.add_method("GET", manifest_integration)
+
+        # /builds/{buildId} - Progress of a build that continues across invocations
+        builds_resource = api.root.add_resource("builds")
+        build_resource = builds_resource.add_resource("{buildId}")
+        build_resource.add_method("GET", build_status_integration)
+
+        # CloudFront in front of the read endpoints: listings and searches are cached per
+        # query string, manifests per layer key, and presigned download URLs never
+        listing_cache_policy = cloudfront.CachePolicy(
+            self, "ListingCachePolicy",
+            comment="Package listings keyed on the search query and facet filters",
+            default_ttl=Duration.minutes(5),
+            min_ttl=Duration.seconds(0),
+            max_ttl=Duration.hours(1),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.allow_list(
+                "search", "platform", "pythonVersion", "minSize", "maxSize", "createdAfter", "createdBefore",
+                "limit", "cursor"
+            ),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True
+        )
+
+        manifest_cache_policy = cloudfront.CachePolicy(
+            self, "ManifestCachePolicy",
+            comment="Layer manifests, which never change for a given layer key",
+            default_ttl=Duration.days(1),
+            min_ttl=Duration.seconds(0),
+            max_ttl=Duration.days(7),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True
+        )
+
+        api_origin = origins.RestApiOrigin(api)
+        api_distribution = cloudfront.Distribution(
+            self, "ApiDistribution",
+            comment="Edge cache for the read endpoints of the Lambda Package Builder API",
+            default_behavior=cloudfront.BehaviorOptions(
+                origin=api_origin,
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD_OPTIONS,
+                cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD,
+                cache_policy=listing_cache_policy,
+                origin_request_policy=cloudfront.OriginRequestPolicy.ALL_VIEWER_EXCEPT_HOST_HEADER
+            ),
+            additional_behaviors={
+                "/packages/*/download": cloudfront.BehaviorOptions(
+                    origin=api_origin,
+                    viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                    allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD_OPTIONS,
+                    cache_policy=cloudfront.CachePolicy.CACHING_DISABLED,
+                    origin_request_policy=cloudfront.OriginRequestPolicy.ALL_VIEWER_EXCEPT_HOST_HEADER
+                ),
+                "/packages/*/manifest": cloudfront.BehaviorOptions(
+                    origin=api_origin,
+                    viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                    allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD_OPTIONS,
+                    cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD,
+                    cache_policy=manifest_cache_policy,
+                    origin_request_policy=cloudfront.OriginRequestPolicy.ALL_VIEWER_EXCEPT_HOST_HEADER
+                )
+            }
+        )
+
+        # Builds and GC purge cached listings. The distribution ID reaches the functions via SSM
+        # and the permission uses a wildcard ARN: referencing the distribution directly would make
+        # the functions depend on the distribution, which depends on their API.
+        api_distribution_parameter_name = f"/{construct_id}/api-distribution-id"
+        ssm.StringParameter(
+            self, "ApiDistributionIdParameter",
+            parameter_name=api_distribution_parameter_name,
+            string_value=api_distribution.distribution_id,
+            description="CloudFront distribution caching the package API"
+        )
+        lambda_role.add_to_policy(iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=["cloudfront:CreateInvalidation"],
+            resources=[f"arn:aws:cloudfront::{self.account}:distribution/*"]
+        ))
+        lambda_role.add_to_policy(iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=["ssm:GetParameter"],
+            resources=[f"arn:aws:ssm:{self.region}:{self.account}:parameter{api_distribution_parameter_name}"]
+        ))
+        for function in (package_creator_lambda, arm64_builder_lambda, layer_prewarm_lambda, layer_gc_lambda):
+            function.add_environment('API_DISTRIBUTION_PARAMETER', api_distribution_parameter_name)
+
+        # Optional container worker for builds too heavy for Lambda (cdk deploy -c containerWorker=true).
+        # The builder queues heavy requests; Fargate tasks with more CPU, memory and disk run them,
+        # scaling on queue depth down to zero. Queue depth does not count builds in progress, so a
+        # task holds ECS scale-in protection while it builds (see build_worker.py).
+        if str(self.node.try_get_context("containerWorker")).lower() == "true":
+            build_queue = sqs.Queue(
+                self, "BuildQueue",
+                # Longer than any build, so a running build is never handed to a second worker
+                visibility_timeout=Duration.hours(2),
+                retention_period=Duration.days(1),
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    # A build requeued by a stopping task is received again; leave room for that
+                    max_receive_count=3,
+                    queue=sqs.Queue(self, "BuildDeadLetterQueue", retention_period=Duration.days(7))
+                )
+            )
+
+            worker_vpc = ec2.Vpc(
+                self, "BuildWorkerVpc",
+                max_azs=2,
+                nat_gateways=0,
+                subnet_configuration=[ec2.SubnetConfiguration(name="public", subnet_type=ec2.SubnetType.PUBLIC)]
+            )
+
+            build_worker = ecs_patterns.QueueProcessingFargateService(
+                self, "BuildWorkerService",
+                vpc=worker_vpc,
+                queue=build_queue,
+                image=ecs.ContainerImage.from_asset(
+                    ".",
+                    file="worker/Dockerfile",
+                    exclude=["cdk.out", "frontend", "tests", "tools", ".git", "**/__pycache__"]
+                ),
+                cpu=4096,
+                memory_limit_mib=16384,
+                ephemeral_storage_gib=100,
+                assign_public_ip=True,
+                min_scaling_capacity=0,
+                max_scaling_capacity=4,
+                environment={
+                    'BUCKET_NAME': lambda_packages_bucket.bucket_name,
+                    'BUILD_QUEUE_URL': build_queue.queue_url,
+                    'BUILD_WORKER_CONCURRENCY': '4',
+                    'INDEX_CACHE': 's3',
+                    'API_DISTRIBUTION_PARAMETER': api_distribution_parameter_name
+                }
+            )
+            # Fargate's longest stop timeout; the worker requeues what it cannot finish within it
+            build_worker.task_definition.node.default_child.add_property_override(
+                "ContainerDefinitions.0.StopTimeout", 120
+            )
+            lambda_packages_bucket.grant_read_write(build_worker.task_definition.task_role)
+            build_worker.task_definition.task_role.add_to_principal_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["ecs:UpdateTaskProtection", "ecs:GetTaskProtection"],
+                resources=[f"arn:aws:ecs:{self.region}:{self.account}:task/{build_worker.cluster.cluster_name}/*"]
+            ))
+            build_worker.task_definition.task_role.add_to_principal_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["cloudfront:CreateInvalidation"],
+                resources=[f"arn:aws:cloudfront::{self.account}:distribution/*"]
+            ))
+            build_worker.task_definition.task_role.add_to_principal_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["ssm:GetParameter"],
+                resources=[f"arn:aws:ssm:{self.region}:{self.account}:parameter{api_distribution_parameter_name}"]
+            ))
+
+            build_queue.grant_send_messages(lambda_role)
+            for function in (package_creator_lambda, layer_prewarm_lambda):
+                function.add_environment('BUILD_QUEUE_URL', build_queue.queue_url)
+                function.add_environment('BUILD_EXECUTOR', 'auto')
+
+            CfnOutput(
+                self, "BuildQueueUrlOutput",
+                export_name="BuildQueueUrl",
+                value=build_queue.queue_url,
+                description="Queue feeding the container build worker"
+            )
+
+        # Optional edge delivery of layer downloads (cdk deploy -c layerCdnPublicKey="$(cat layer-cdn-public.pem)").
+        # The frontend distribution serves layers/ from the packages bucket, but only with URLs
+        # signed by the matching private key, which must be stored as a SecureString in SSM
+        # under /<stack>/layer-cdn-private-key before deploying.
+        layer_cdn_public_key = self.node.try_get_context("layerCdnPublicKey")
+        layer_behaviors = {}
+        if layer_cdn_public_key:
+            layer_cdn_key = cloudfront.PublicKey(
+                self, "LayerCdnPublicKey",
+                encoded_key=layer_cdn_public_key,
+                comment="Verifies signed layer download URLs"
+            )
+            # Layer keys are never rewritten, so edges keep them for a year. The signature
+            # parameters are checked before the cache lookup and stay out of the cache key.
+            layer_download_cache_policy = cloudfront.CachePolicy(
+                self, "LayerDownloadCachePolicy",
+                comment="Layer zips are immutable; cache them for a year",
+                default_ttl=Duration.days(365),
+                min_ttl=Duration.days(1),
+                max_ttl=Duration.days(365),
+                query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+                header_behavior=cloudfront.CacheHeaderBehavior.none(),
+                cookie_behavior=cloudfront.CacheCookieBehavior.none()
+            )
+            layer_behaviors["/layers/*"] = cloudfront.BehaviorOptions(
+                origin=origins.S3BucketOrigin.with_origin_access_control(lambda_packages_bucket),
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.HTTPS_ONLY,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD,
+                cache_policy=layer_download_cache_policy,
+                trusted_key_groups=[cloudfront.KeyGroup(self, "LayerCdnKeyGroup", items=[layer_cdn_key])]
+            )
+
         # CloudFront distribution for the frontend
         distribution = cloudfront.Distribution(
             self, "FrontendDistribution",
@@ -176,6 +582,7 @@ class LambdaLayerStack(Stack):
                 allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
                 cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD
             ),
+            additional_behaviors=layer_behaviors,
             domain_names=[full_domain],
             certificate=certificate,
             default_root_object="index.html",
@@ -188,6 +595,52 @@ class LambdaLayerStack(Stack):
             ]
         )
 
+        if layer_cdn_public_key:
+            layer_cdn_private_key_parameter = f"/{construct_id}/layer-cdn-private-key"
+            lambda_role.add_to_policy(iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["ssm:GetParameter"],
+                resources=[f"arn:aws:ssm:{self.region}:{self.account}:parameter{layer_cdn_private_key_parameter}"]
+            ))
+            # URLs are signed with the cryptography package, which the managed runtime lacks. It
+            # has compiled parts, so it is bundled into a layer per architecture and Python
+            # version; the arm64 builder image installs it itself.
+            signing_layers = {}
+
+            def cdn_signing_layer(function):
+                architecture, runtime = function.architecture, function.runtime
+                python_version = runtime.name.replace("python", "")
+                variant = (architecture.name, python_version)
+                if variant not in signing_layers:
+                    platform = ("manylinux2014_aarch64" if architecture == _lambda.Architecture.ARM_64
+                                else "manylinux2014_x86_64")
+                    signing_layers[variant] = _lambda.LayerVersion(
+                        self, f"CdnSigningLayer{architecture.name.title()}Py{python_version.replace('.', '')}",
+                        code=_lambda.Code.from_asset(
+                            "lambda_layer/cdn_signing",
+                            bundling=BundlingOptions(
+                                image=runtime.bundling_image,
+                                command=["bash", "-c", (
+                                    "pip install -r requirements.txt --target /asset-output/python "
+                                    f"--platform {platform} --implementation cp --python-version {python_version} "
+                                    "--only-binary=:all: --no-compile"
+                                )]
+                            )
+                        ),
+                        compatible_runtimes=[runtime],
+                        compatible_architectures=[architecture],
+                        description="cryptography, for signing CloudFront layer download URLs"
+                    )
+                return signing_layers[variant]
+
+            for function in (package_creator_lambda, arm64_builder_lambda, layer_prewarm_lambda, download_url_lambda,
+                             build_status_lambda):
+                if function is not arm64_builder_lambda or not native_builder_image:
+                    function.add_layers(cdn_signing_layer(function))
+                function.add_environment('LAYER_CDN_DOMAIN', distribution.distribution_domain_name)
+                function.add_environment('LAYER_CDN_KEY_PAIR_ID', layer_cdn_key.public_key_id)
+                function.add_environment('LAYER_CDN_PRIVATE_KEY_PARAMETER', layer_cdn_private_key_parameter)
+
         # Create Route 53 record pointing to CloudFront distribution
         route53.ARecord(
             self, "AliasRecord",
@@ -204,6 +657,13 @@ class LambdaLayerStack(Stack):
             description="API Gateway URL"
         )
 
+        CfnOutput(
+            self, "ApiCacheUrlOutput",
+            export_name="ApiCacheUrl",
+            value=f"https://{api_distribution.domain_name}",
+            description="CloudFront URL serving cached API reads"
+        )
+
         CfnOutput(
             self, "FrontendUrlOutput",
             export_name="FrontendUrl",
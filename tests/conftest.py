@@ -0,0 +1,54 @@
+"""
+Shared test fixtures.
+
+Lambda imports the handlers as top-level modules from lambda_functions/, so the
+directory is put on sys.path to let handlers import their sibling modules.
+"""
+import os
+import sys
+
+import pytest
+
+from tests.helpers import TEST_BUCKET, make_wheel
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_functions')
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+# Handlers create their boto3 clients at import time, as they do on Lambda where
+# AWS_REGION is always set; regional clients such as SSM need a region to exist
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """Create a moto-backed packages bucket and point BUCKET_NAME at it."""
+    boto3 = pytest.importorskip('boto3')
+    moto = pytest.importorskip('moto')
+
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('BUCKET_NAME', TEST_BUCKET)
+
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=TEST_BUCKET)
+        yield client
+
+
+@pytest.fixture
+def local_wheelhouse(tmp_path, monkeypatch):
+    """Serve pip from a local directory of test wheels instead of PyPI."""
+    wheel_dir = tmp_path / 'wheelhouse'
+    make_wheel(str(wheel_dir), 'purepkg', '1.0')
+    for platform in ('manylinux2014_x86_64', 'manylinux2014_aarch64'):
+        for python_tag in ('cp311', 'cp312'):
+            make_wheel(
+                str(wheel_dir), 'nativepkg', '2.0', tag=f'{python_tag}-{python_tag}-{platform}',
+                requires=['purepkg'],
+                files={'nativepkg/__init__.py': f'PLATFORM = "{platform}"\n'}
+            )
+    monkeypatch.setenv('PIP_NO_INDEX', '1')
+    monkeypatch.setenv('PIP_FIND_LINKS', str(wheel_dir))
+    return wheel_dir
@@ -0,0 +1,70 @@
+"""
+Helpers shared by the test modules.
+"""
+import io
+import os
+import tarfile
+import zipfile
+
+TEST_BUCKET = 'test-lambda-packages'
+
+
+def make_wheel(wheel_dir, name, version, tag='py3-none-any', requires=(), files=None):
+    """Write a minimal installable wheel and return its path."""
+    os.makedirs(wheel_dir, exist_ok=True)
+    path = os.path.join(wheel_dir, f'{name}-{version}-{tag}.whl')
+    dist_info = f'{name}-{version}.dist-info'
+    files = files or {f'{name}/__init__.py': f'VERSION = "{version}"\n'}
+    metadata = f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n'
+    metadata += ''.join(f'Requires-Dist: {requirement}\n' for requirement in requires)
+    wheel = f'Wheel-Version: 1.0\nGenerator: tests\nRoot-Is-Purelib: {str(tag.endswith("none-any")).lower()}\nTag: {tag}\n'
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for arcname, content in files.items():
+            zf.writestr(arcname, content)
+        zf.writestr(f'{dist_info}/METADATA', metadata)
+        zf.writestr(f'{dist_info}/WHEEL', wheel)
+        record = [f'{arcname},,' for arcname in files]
+        record += [f'{dist_info}/METADATA,,', f'{dist_info}/WHEEL,,', f'{dist_info}/RECORD,,']
+        zf.writestr(f'{dist_info}/RECORD', '\n'.join(record) + '\n')
+    return path
+
+
+# In-tree PEP 517 backend, so building the sdist needs nothing from an index
+SDIST_BACKEND = '''
+import os
+import zipfile
+
+NAME, VERSION = {name!r}, {version!r}
+
+
+def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
+    filename = f'{{NAME}}-{{VERSION}}-py3-none-any.whl'
+    dist_info = f'{{NAME}}-{{VERSION}}.dist-info'
+    with zipfile.ZipFile(os.path.join(wheel_directory, filename), 'w') as zf:
+        zf.writestr(f'{{NAME}}/__init__.py', 'BUILT_FROM_SOURCE = True\\n')
+        zf.writestr(f'{{dist_info}}/METADATA', f'Metadata-Version: 2.1\\nName: {{NAME}}\\nVersion: {{VERSION}}\\n')
+        zf.writestr(f'{{dist_info}}/WHEEL',
+                    'Wheel-Version: 1.0\\nGenerator: tests\\nRoot-Is-Purelib: true\\nTag: py3-none-any\\n')
+        zf.writestr(f'{{dist_info}}/RECORD', '')
+    return filename
+'''
+
+
+def make_sdist(sdist_dir, name, version):
+    """Write a source distribution that only builds into a pure wheel, and return its path."""
+    os.makedirs(sdist_dir, exist_ok=True)
+    path = os.path.join(sdist_dir, f'{name}-{version}.tar.gz')
+    root = f'{name}-{version}'
+    files = {
+        f'{root}/pyproject.toml': '[build-system]\nrequires = []\nbuild-backend = "backend"\nbackend-path = ["."]\n',
+        f'{root}/backend.py': SDIST_BACKEND.format(name=name, version=version),
+        f'{root}/PKG-INFO': f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n'
+    }
+    with tarfile.open(path, 'w:gz') as tar:
+        for arcname, content in files.items():
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return path
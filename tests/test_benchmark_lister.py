@@ -0,0 +1,40 @@
+"""
+Tests for the listing scalability benchmark in tools/.
+"""
+import copy
+
+import pytest
+
+pytest.importorskip('moto')
+
+from tools.benchmark_lister import compare_reports, run_benchmark, scaling_exponent  # noqa: E402
+
+
+def test_benchmark_counts_s3_calls_per_operation_and_size():
+    report = run_benchmark([10, 40], iterations=1, alias_fraction=0.5)
+    results = {(r['size'], r['operation']): r for r in report['results']}
+
+    assert all(r['statusCode'] in (200, 304) for r in report['results'])
+    # One LIST plus one GET per metadata document
+    assert results[(40, 'list')]['s3Calls'] == 41 and results[(40, 'list')]['items'] == 40
+    assert results[(40, 'revalidate')]['statusCode'] == 304
+    assert results[(40, 'filter')]['s3Calls'] == results[(10, 'filter')]['s3Calls']
+    assert report['scaling']['list']['s3Calls'] == pytest.approx(1, abs=0.1)
+    assert report['scaling']['download']['s3Calls'] == 0
+
+    legacy = run_benchmark([10], layout='legacy', iterations=1, operations=['list'])
+    assert legacy['results'][0]['s3CallsByOperation'] == {'HeadObject': 10, 'ListObjectsV2': 2}
+
+
+def test_regressions_against_a_baseline():
+    baseline = {
+        'layout': 'metadata', 'distribution': 'zipf', 'seed': 0, 'aliasFraction': 0.0,
+        'results': [{'size': 100, 'operation': 'list', 's3Calls': 101, 'p50Ms': 10.0, 's3Bytes': 1000,
+                     'peakMemoryBytes': 5000}]
+    }
+    report = copy.deepcopy(baseline)
+    report['results'][0].update(p50Ms=12.0, s3Calls=102)
+
+    assert compare_reports(report, baseline) == ['list @ 100: S3 calls 101 -> 102']
+    assert compare_reports(dict(report, layout='legacy'), baseline)[0].startswith('baseline was run with layout')
+    assert scaling_exponent([(10, 1.0), (100, 10.0), (1000, 100.0)]) == 1.0
@@ -0,0 +1,73 @@
+"""
+Tests for POST /packages/batch, which builds several layers from one shared set of wheels.
+"""
+import json
+import zipfile
+from unittest.mock import Mock
+
+import build_registry
+import package_creator
+import wheel_transcoder
+
+from tests.helpers import TEST_BUCKET
+
+
+def test_batch_fetches_shared_wheels_once_and_reports_each_layer(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    fetched = []
+
+    def counting_fetch(package, wheel_dir):
+        fetched.append(package['wheel'])
+        return wheel_transcoder.fetch_wheel(package, wheel_dir)
+
+    monkeypatch.setattr(package_creator, 'fetch_wheel', counting_fetch)
+    event = {
+        'resource': '/packages/batch',
+        'body': json.dumps({
+            'defaults': {'pythonVersion': '3.12'},
+            'layers': [
+                {'packageName': 'native', 'dependencies': ['nativepkg']},
+                {'packageName': 'pure', 'dependencies': ['purepkg']},
+                {'packageName': 'broken', 'dependencies': ['doesnotexist']},
+            ]
+        })
+    }
+
+    result = package_creator.lambda_handler(event, Mock())
+
+    assert result['statusCode'] == 200
+    body = json.loads(result['body'])
+    assert sorted(fetched) == sorted(set(fetched)) and len(fetched) == 2
+    assert body['uniqueWheels'] == 2 and body['sharedWheels'] == 1 and body['failedLayers'] == 1
+    native, pure, broken = body['layers']
+    assert not broken['success'] and 'doesnotexist' in broken['error']
+
+    site_packages = 'python/lib/python3.12/site-packages'
+    for layer, expected in ((native, {'nativepkg', 'purepkg'}), (pure, {'purepkg'})):
+        assert layer['success'] and layer['batchId'] == body['batchId']
+        obj = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=layer['s3Key'])
+        assert obj['Metadata']['batchid'] == body['batchId']
+        with zipfile.ZipFile(obj['Body']._raw_stream) as zf:
+            packages = {
+                name[len(site_packages) + 1:].split('/')[0] for name in zf.namelist()
+                if name.startswith(site_packages + '/') and name.endswith('/__init__.py')
+            }
+        assert packages == expected
+
+
+def test_batch_requests_are_validated_and_fingerprinted_by_layer(monkeypatch):
+    monkeypatch.setenv('BUCKET_NAME', TEST_BUCKET)
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+
+    missing = package_creator.lambda_handler({'resource': '/packages/batch', 'body': '{}'}, Mock())
+    assert missing['statusCode'] == 400
+    too_many = {'layers': [{'dependencies': ['purepkg']}] * (package_creator.MAX_BATCH_LAYERS + 1)}
+    assert package_creator.build_batch(too_many)['statusCode'] == 400
+
+    first = {'layers': [{'dependencies': ['a']}, {'dependencies': ['b']}]}
+    single = {'layers': [{'dependencies': ['a']}]}
+    assert build_registry.build_fingerprint(first) != build_registry.build_fingerprint(single)
+    assert build_registry.build_fingerprint(first) == build_registry.build_fingerprint(
+        {'defaults': {'runtime': 'python3.12'}, 'layers': [{'dependencies': ['A']}, {'dependencies': ['b']}]}
+    )
@@ -0,0 +1,93 @@
+"""
+Tests for builds that checkpoint to S3 and resume in a new invocation.
+"""
+import json
+import zipfile
+from unittest.mock import Mock
+
+import build_status
+import package_creator
+
+from tests.helpers import TEST_BUCKET, make_wheel
+
+SITE_PACKAGES = 'python/lib/python3.12/site-packages'
+
+
+class ShortContext:
+    """A Lambda context whose remaining time is always inside the checkpoint reserve"""
+    invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789012:function:LambdaLayerStack-PackageCreator'
+
+    def get_remaining_time_in_millis(self):
+        return 60 * 1000
+
+
+def _run_to_completion(body, lambda_client):
+    """Invoke the builder, then feed it each resume event it sends itself; returns every response"""
+    responses = [package_creator.lambda_handler({'body': json.dumps(body)}, ShortContext())]
+    while responses[-1]['statusCode'] == 202:
+        payload = json.loads(lambda_client.invoke.call_args.kwargs['Payload'])
+        responses.append(package_creator.lambda_handler(payload, ShortContext()))
+    return responses
+
+
+def _layer_names(client, s3_key, tmp_path):
+    path = str(tmp_path / 'layer.zip')
+    client.download_file(TEST_BUCKET, s3_key, path)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return set(zf.namelist())
+
+
+def _setup(s3_bucket, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    monkeypatch.setattr(build_status, 's3_client', s3_bucket)
+    lambda_client = Mock()
+    monkeypatch.setattr(package_creator, 'lambda_client', lambda_client)
+    return lambda_client
+
+
+def test_direct_build_resumes_wheel_by_wheel_and_reports_status(s3_bucket, local_wheelhouse, monkeypatch, tmp_path):
+    lambda_client = _setup(s3_bucket, monkeypatch)
+    body = {'packageName': 'resumable', 'dependencies': ['nativepkg'], 'pythonVersion': '3.12'}
+
+    responses = _run_to_completion(body, lambda_client)
+
+    # Preflight, then one wheel per invocation for nativepkg and purepkg
+    assert [r['statusCode'] for r in responses] == [202, 202, 200]
+    assert lambda_client.invoke.call_args.kwargs['InvocationType'] == 'Event'
+    build_id = json.loads(responses[0]['body'])['buildId']
+    names = _layer_names(s3_bucket, json.loads(responses[-1]['body'])['s3Key'], tmp_path)
+    assert {f'{SITE_PACKAGES}/nativepkg/__init__.py', f'{SITE_PACKAGES}/purepkg/__init__.py', 'requirements.txt'} <= names
+
+    status = json.loads(build_status.lambda_handler({'pathParameters': {'buildId': build_id}}, Mock())['body'])
+    assert status['status'] == 'succeeded' and status['invocations'] == 3
+    assert status['result']['downloadUrl'] and status['result']['s3Key'].startswith('layers/')
+    parts = s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix=f'checkpoints/{build_id}/part-')
+    assert parts['KeyCount'] == 0
+
+
+def test_pip_build_suspends_between_packages(s3_bucket, local_wheelhouse, monkeypatch, tmp_path):
+    lambda_client = _setup(s3_bucket, monkeypatch)
+    monkeypatch.setenv('LAYER_ASSEMBLY', 'pip')
+    monkeypatch.setenv('PREFLIGHT', 'off')
+    make_wheel(str(local_wheelhouse), 'otherpkg', '1.0')
+    body = {'packageName': 'resumable-pip', 'dependencies': ['purepkg', 'otherpkg', 'nativepkg'], 'pythonVersion': '3.12'}
+
+    responses = _run_to_completion(body, lambda_client)
+
+    assert [r['statusCode'] for r in responses] == [202, 202, 200]
+    names = _layer_names(s3_bucket, json.loads(responses[-1]['body'])['s3Key'], tmp_path)
+    for package in ('purepkg', 'otherpkg', 'nativepkg'):
+        assert f'{SITE_PACKAGES}/{package}/__init__.py' in names
+
+
+def test_builds_outside_lambda_never_checkpoint(s3_bucket, local_wheelhouse, monkeypatch):
+    lambda_client = _setup(s3_bucket, monkeypatch)
+    body = {'packageName': 'plain', 'dependencies': ['nativepkg'], 'pythonVersion': '3.12'}
+
+    response = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+
+    assert response['statusCode'] == 200
+    lambda_client.invoke.assert_not_called()
+    assert build_status.lambda_handler({'pathParameters': {'buildId': 'x' * 32}}, Mock())['statusCode'] == 400
@@ -0,0 +1,142 @@
+"""
+Tests for choosing a build executor and running builds outside the API's Lambda.
+"""
+import json
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from unittest.mock import Mock
+
+import boto3
+import pytest
+
+import build_executor
+import build_status
+import build_worker
+import package_creator
+
+
+class ThreadExecutor:
+    """Same submit interface as ProcessExecutor, but sharing the moto backend of the test process"""
+
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=2)
+
+    def submit(self, build, body):
+        return self.pool.submit(build, body, None)
+
+
+def test_auto_mode_queues_only_heavy_builds(monkeypatch):
+    light = {'dependencies': ['requests']}
+    heavy = {'dependencies': [f'pkg{i}' for i in range(6)], 'platforms': ['a', 'b'], 'pythonVersions': ['3.11', '3.12']}
+
+    assert build_executor.select_executor(heavy, Mock()).name == 'lambda'
+    monkeypatch.setenv('BUILD_QUEUE_URL', 'https://sqs.us-east-1.amazonaws.com/123456789012/builds')
+    assert build_executor.select_executor(light, Mock()).name == 'lambda'
+    assert build_executor.select_executor(heavy, Mock()).name == 'queue'
+
+    monkeypatch.setenv('BUILD_EXECUTOR', 'process')
+    assert build_executor.select_executor(heavy, Mock()).name == 'process'
+    monkeypatch.setenv('BUILD_EXECUTOR', 'queue')
+    monkeypatch.delenv('BUILD_QUEUE_URL')
+    assert build_executor.select_executor(light, Mock()).name == 'lambda'
+
+
+def test_queued_build_runs_on_the_worker(s3_bucket, local_wheelhouse, monkeypatch):
+    sqs = boto3.client('sqs', region_name='us-east-1')
+    queue_url = sqs.create_queue(QueueName='builds')['QueueUrl']
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_EXECUTOR', 'queue')
+    monkeypatch.setenv('BUILD_QUEUE_URL', queue_url)
+    for module in (package_creator, build_worker, build_status):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+    monkeypatch.setattr(build_executor, 'sqs_client', sqs)
+    monkeypatch.setattr(build_worker, 'sqs_client', sqs)
+
+    body = {'packageName': 'queued', 'dependencies': ['nativepkg'], 'pythonVersion': '3.12'}
+    response = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+    assert response['statusCode'] == 202 and response['headers']['Access-Control-Allow-Origin'] == '*'
+    build_id = json.loads(response['body'])['buildId']
+
+    def status():
+        return json.loads(build_status.lambda_handler({'pathParameters': {'buildId': build_id}}, Mock())['body'])
+
+    assert status()['status'] == 'queued'
+    assert build_worker.run_worker(queue_url, 'test-lambda-packages', executor=ThreadExecutor(), max_jobs=1) == 1
+
+    finished = status()
+    assert finished['status'] == 'succeeded'
+    assert finished['result']['s3Key'].startswith('layers/') and '/queued-' in finished['result']['s3Key']
+    assert 'Messages' not in sqs.receive_message(QueueUrl=queue_url, WaitTimeSeconds=0)
+
+
+# With concurrency 1 the only slot is busy, so the worker is waiting on the build alone
+@pytest.mark.parametrize('concurrency', [1, 2], ids=['all-slots-busy', 'free-slot'])
+def test_stopping_worker_requeues_unfinished_builds_and_drops_scale_in_protection(s3_bucket, monkeypatch,
+                                                                                  concurrency):
+    sqs = boto3.client('sqs', region_name='us-east-1')
+    queue_url = sqs.create_queue(QueueName='builds')['QueueUrl']
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_EXECUTOR', 'queue')
+    monkeypatch.setenv('BUILD_QUEUE_URL', queue_url)
+    for module in (package_creator, build_worker, build_status):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+    monkeypatch.setattr(build_executor, 'sqs_client', sqs)
+    monkeypatch.setattr(build_worker, 'sqs_client', sqs)
+    monkeypatch.setattr(build_worker, '_stopping', False)
+    monkeypatch.setattr(build_worker, 'STOP_GRACE_SECONDS', 0)
+
+    body = {'packageName': 'interrupted', 'dependencies': ['purepkg'], 'pythonVersion': '3.12'}
+    build_id = json.loads(package_creator.lambda_handler({'body': json.dumps(body)}, Mock())['body'])['buildId']
+
+    # ECS sends SIGTERM once the worker has gone back to waiting on the running build
+    released, waiting = threading.Event(), threading.Event()
+    waits = []
+
+    def long_build(request, context):
+        released.wait(10)
+
+    def tracked_wait(*args, **kwargs):
+        waits.append(kwargs.get('timeout'))
+        if len(waits) == 2:
+            waiting.set()
+        return wait(*args, **kwargs)
+
+    def sigterm():
+        waiting.wait(10)
+        time.sleep(0.2)
+        build_worker.stop(signal.SIGTERM, None)
+    monkeypatch.setattr(build_worker, 'create_layer', long_build)
+    monkeypatch.setattr(build_worker, 'wait', tracked_wait)
+    threading.Thread(target=sigterm, daemon=True).start()
+    protection = Mock()
+    try:
+        build_worker.run_worker(queue_url, 'test-lambda-packages', concurrency=concurrency,
+                                executor=ThreadExecutor(), protection=protection)
+    finally:
+        released.set()
+
+    assert [call.args for call in protection.update.call_args_list] == [(True,), (False,)]
+    state = json.loads(build_status.lambda_handler({'pathParameters': {'buildId': build_id}}, Mock())['body'])
+    assert state['status'] == 'queued'
+    redelivered = sqs.receive_message(QueueUrl=queue_url, WaitTimeSeconds=0)['Messages']
+    assert json.loads(redelivered[0]['Body'])['buildId'] == build_id
+
+
+def test_process_executor_builds_in_a_separate_process(local_wheelhouse, monkeypatch):
+    monkeypatch.setattr(build_executor, '_process_pool', None)
+    monkeypatch.setenv('BUILD_EXECUTOR', 'process')
+    # Fails in preflight, so the child process never needs S3
+    body = {'packageName': 'missing', 'dependencies': ['doesnotexist'], 'pythonVersion': '3.12'}
+
+    executor = build_executor.select_executor(body, Mock())
+    try:
+        futures = [executor.submit(package_creator.create_layer, body) for _ in range(2)]
+        responses = [future.result(timeout=120) for future in futures]
+    finally:
+        build_executor._process_pool.shutdown()
+
+    for response in responses:
+        assert response['statusCode'] == 422
+        assert 'doesnotexist' in json.loads(response['body'])['error']
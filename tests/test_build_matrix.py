@@ -0,0 +1,85 @@
+"""
+Tests for multi-platform / multi-Python matrix builds.
+"""
+import json
+import zipfile
+from unittest.mock import Mock
+
+import package_creator
+from wheelhouse import is_pure_wheel, share_pure_wheels, variant_label
+
+from tests.helpers import TEST_BUCKET, make_wheel
+
+
+def test_variant_label():
+    assert variant_label('manylinux2014_aarch64', '3.12') == 'aarch64-py3.12'
+
+
+def test_share_pure_wheels_copies_only_platform_independent_wheels(tmp_path):
+    make_wheel(str(tmp_path / 'variant'), 'purepkg', '1.0')
+    make_wheel(str(tmp_path / 'variant'), 'nativepkg', '2.0', tag='cp312-cp312-manylinux2014_x86_64')
+
+    shared = share_pure_wheels(str(tmp_path / 'variant'), str(tmp_path / 'shared'))
+
+    assert shared == ['purepkg-1.0-py3-none-any.whl']
+    assert all(is_pure_wheel(wheel) for wheel in shared)
+
+
+def test_matrix_build_returns_one_result_per_variant(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    event = {'body': json.dumps({
+        'packageName': 'matrix-layer',
+        'dependencies': ['nativepkg'],
+        'platforms': ['manylinux2014_x86_64', 'manylinux2014_aarch64'],
+        'pythonVersions': ['3.11', '3.12']
+    })}
+
+    result = package_creator.lambda_handler(event, Mock())
+
+    assert result['statusCode'] == 200
+    body = json.loads(result['body'])
+    assert body['success'] is True
+    assert len(body['variants']) == 4
+    assert {v['groupId'] for v in body['variants']} == {body['groupId']}
+
+    for variant in body['variants']:
+        assert variant['success'] is True
+        layer = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=variant['s3Key'])
+        assert layer['Metadata']['groupid'] == body['groupId']
+        with zipfile.ZipFile(layer['Body']._raw_stream) as zf:
+            names = zf.namelist()
+        site_packages = f"python/lib/python{variant['pythonVersion']}/site-packages"
+        assert f'{site_packages}/nativepkg/__init__.py' in names
+        assert f'{site_packages}/purepkg/__init__.py' in names
+
+
+def test_matrix_build_reports_partial_failures(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    event = {'body': json.dumps({
+        'packageName': 'partial-layer',
+        'dependencies': ['nativepkg'],
+        'platforms': ['manylinux2014_x86_64'],
+        'pythonVersions': ['3.12', '3.9']
+    })}
+
+    result = package_creator.lambda_handler(event, Mock())
+
+    body = json.loads(result['body'])
+    assert result['statusCode'] == 200
+    assert body['failedVariants'] == 1
+    failed = [v for v in body['variants'] if not v['success']]
+    assert failed[0]['pythonVersion'] == '3.9'
+
+
+def test_matrix_build_rejects_oversized_matrix(monkeypatch):
+    monkeypatch.setenv('BUCKET_NAME', TEST_BUCKET)
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    event = {'body': json.dumps({
+        'packageName': 'huge',
+        'platforms': ['manylinux2014_x86_64', 'manylinux2014_aarch64'],
+        'pythonVersions': ['3.8', '3.9', '3.10', '3.11', '3.12']
+    })}
+
+    result = package_creator.lambda_handler(event, Mock())
+
+    assert result['statusCode'] == 400
@@ -0,0 +1,151 @@
+"""
+Tests for single-flight build coalescing and idempotency keys.
+"""
+import json
+import threading
+import time
+from unittest.mock import Mock
+
+import build_registry
+import package_creator
+from build_registry import LocalBuildRegistry, S3BuildRegistry, build_fingerprint
+
+from tests.helpers import TEST_BUCKET
+
+
+def _ok_response(package_name):
+    return {
+        'statusCode': 200,
+        'headers': package_creator.CORS_HEADERS,
+        'body': json.dumps({'success': True, 'packageName': package_name})
+    }
+
+
+def test_fingerprint_ignores_dependency_order_and_case():
+    first = build_fingerprint({'packageName': 'web', 'dependencies': ['Requests', 'boto3']})
+    second = build_fingerprint({'packageName': 'web', 'dependencies': ['boto3', 'requests ']})
+    other = build_fingerprint({'packageName': 'web', 'dependencies': ['boto3'], 'platform': 'manylinux2014_aarch64'})
+
+    assert first == second
+    assert first != other
+
+
+def test_s3_registry_second_acquire_attaches_to_owner(s3_bucket):
+    registry = S3BuildRegistry(s3_bucket, TEST_BUCKET)
+
+    assert registry.acquire('abc', 'build-1') is None
+    assert registry.acquire('abc', 'build-2') == 'build-1'
+
+    registry.release('abc', 'build-1', _ok_response('web'))
+
+    assert registry.wait_for_result('abc', 'build-1', timeout=1) == _ok_response('web')
+    assert registry.acquire('abc', 'build-3') is None
+
+
+def test_s3_registry_takes_over_stale_lock(s3_bucket, monkeypatch):
+    registry = S3BuildRegistry(s3_bucket, TEST_BUCKET)
+    registry.acquire('abc', 'crashed-build')
+
+    monkeypatch.setattr(build_registry, 'LOCK_TTL_SECONDS', -1)
+
+    assert registry.acquire('abc', 'build-2') is None
+
+
+def test_s3_registry_stale_lock_is_taken_over_once_and_only_released_by_its_owner(s3_bucket, monkeypatch):
+    registry = S3BuildRegistry(s3_bucket, TEST_BUCKET)
+    registry.acquire('abc', 'crashed-build')
+    stale_lock = registry._read_json_with_etag('inflight/abc.json')
+    read = registry._read_json_with_etag
+    stale_reads = []
+    monkeypatch.setattr(registry, '_read_json_with_etag', lambda key: stale_reads.pop() if stale_reads else read(key))
+    monkeypatch.setattr(build_registry, 'LOCK_TTL_SECONDS', 60)
+
+    # Both waiters saw the same stale lock; only the first replaces it
+    stale_reads.append(({**stale_lock[0], 'startedAt': 0}, stale_lock[1]))
+    assert registry.acquire('abc', 'build-2') is None
+    stale_reads.append(({**stale_lock[0], 'startedAt': 0}, stale_lock[1]))
+    assert registry.acquire('abc', 'build-3') == 'build-2'
+
+    registry.release('abc', 'crashed-build', _ok_response('web'))
+    assert registry._read_json('inflight/abc.json')['owner'] == 'build-2'
+    registry.release('abc', 'build-2', _ok_response('web'))
+    assert registry._read_json('inflight/abc.json') is None
+
+
+def test_replayed_responses_follow_keys_collapsed_by_gc(s3_bucket, monkeypatch):
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='layers/canonical.zip', Body=b'PK')
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='aliases/layers/duplicate.zip.json',
+                         Body=json.dumps({'packageKey': 'layers/canonical.zip'}))
+    stored = dict(_ok_response('web'), body=json.dumps({
+        'success': True, 's3Key': 'layers/duplicate.zip', 'downloadUrl': 'https://expired'
+    }))
+
+    body = json.loads(package_creator.refresh_download_urls(stored)['body'])
+
+    assert body['s3Key'] == 'layers/canonical.zip' and 'canonical.zip' in body['downloadUrl']
+
+
+def test_concurrent_identical_requests_run_one_build(monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'local')
+    monkeypatch.setattr(package_creator, '_local_build_registry', LocalBuildRegistry())
+    calls = []
+
+    def slow_create_layer(body, context):
+        calls.append(body)
+        time.sleep(0.3)
+        return _ok_response(body['packageName'])
+
+    monkeypatch.setattr(package_creator, 'create_layer', slow_create_layer)
+    event = {'body': json.dumps({'packageName': 'web', 'dependencies': ['requests']})}
+    responses = []
+    threads = [
+        threading.Thread(target=lambda: responses.append(package_creator.lambda_handler(event, Mock())))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    bodies = [json.loads(r['body']) for r in responses]
+    assert all(body['success'] for body in bodies)
+    assert sum(1 for body in bodies if body.get('coalesced')) == 3
+
+
+def test_idempotency_key_replays_response(monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'local')
+    monkeypatch.setattr(package_creator, '_local_build_registry', LocalBuildRegistry())
+    create_layer = Mock(side_effect=lambda body, context: _ok_response(body['packageName']))
+    monkeypatch.setattr(package_creator, 'create_layer', create_layer)
+
+    event = {
+        'headers': {'idempotency-key': 'retry-123'},
+        'body': json.dumps({'packageName': 'web', 'dependencies': ['requests']})
+    }
+    first = package_creator.lambda_handler(event, Mock())
+    second = package_creator.lambda_handler(event, Mock())
+
+    assert create_layer.call_count == 1
+    assert first['body'] == second['body']
+
+    event['body'] = json.dumps({'packageName': 'web', 'dependencies': ['boto3']})
+    conflict = package_creator.lambda_handler(event, Mock())
+
+    assert conflict['statusCode'] == 422
+
+
+def test_published_keys_do_not_collide(s3_bucket, tmp_path, monkeypatch):
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    zip_path = tmp_path / 'layer.zip'
+    zip_path.write_bytes(b'PK\x05\x06' + b'\x00' * 18)
+
+    keys = {
+        package_creator.publish_layer(
+            str(zip_path), 'web', [], 'python3.12', 'manylinux2014_x86_64', '3.12', 'layer', True, False
+        )['s3Key']
+        for _ in range(3)
+    }
+
+    assert len(keys) == 3
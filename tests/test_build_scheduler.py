@@ -0,0 +1,148 @@
+"""
+Tests for build admission: priority classes, per-client limits and the capacity response.
+"""
+import json
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+import build_scheduler
+import package_creator
+
+from tests.helpers import TEST_BUCKET
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(build_scheduler, 'MAX_CONCURRENT_BUILDS', 3)
+    monkeypatch.setattr(build_scheduler, 'MAX_BUILDS_PER_CLIENT', 2)
+    monkeypatch.setattr(build_scheduler, 'BATCH_BUILD_SLOTS', 1)
+    monkeypatch.setattr(build_scheduler, 'POLL_INTERVAL_SECONDS', 0.05)
+
+
+def test_local_scheduler_enforces_client_and_batch_limits(limits, capsys):
+    scheduler = build_scheduler.LocalBuildScheduler()
+
+    batch = scheduler.admit('prewarm', 'batch', max_wait=0)
+    assert batch and scheduler.admit('prewarm', 'batch', max_wait=0) is None
+
+    first = scheduler.admit('alice', 'interactive', max_wait=0)
+    second = scheduler.admit('alice', 'interactive', max_wait=0)
+    assert first and second and scheduler.admit('alice', 'interactive', max_wait=0) is None
+    # The global slots are full too, so another client has to queue
+    assert scheduler.admit('bob', 'interactive', max_wait=0) is None
+
+    threading.Timer(0.2, scheduler.release, [first]).start()
+    started = time.time()
+    admitted = scheduler.admit('bob', 'interactive', max_wait=5)
+    assert admitted and time.time() - started < 2
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+    assert [r.get('BuildsAdmitted', 0) for r in records] == [1, 0, 1, 1, 0, 0, 1]
+    assert records[-1]['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Priority']]
+    assert records[-1]['QueueWaitTime'] >= 150 and records[-1]['RunningBuilds'] == 3
+
+
+def test_s3_scheduler_claims_slots_and_reclaims_stale_ones(limits, s3_bucket, monkeypatch):
+    scheduler = build_scheduler.S3BuildScheduler(s3_bucket, TEST_BUCKET)
+
+    held = [scheduler.admit(client, 'interactive', max_wait=0) for client in ('a', 'b', 'c')]
+    assert all(held) and held[-1]['running'] == 3
+    assert scheduler.admit('d', 'batch', max_wait=0) is None
+
+    scheduler.release(held[0])
+    assert scheduler.admit('d', 'interactive', max_wait=0)
+    assert scheduler.queue_depth() == 0
+
+    # Slots outlive their builds only when a build crashed; they are taken over after the TTL
+    monkeypatch.setattr(build_scheduler, 'LOCK_TTL_SECONDS', 0)
+    assert scheduler.admit('e', 'batch', max_wait=0)['slots'][1] == 'scheduler/slots/global/000'
+
+
+
+def test_s3_scheduler_leaves_a_stale_slot_that_another_request_reclaimed(limits, s3_bucket, monkeypatch):
+    scheduler = build_scheduler.S3BuildScheduler(s3_bucket, TEST_BUCKET)
+    assert all(scheduler.admit(client, 'interactive', max_wait=0) for client in ('a', 'b', 'c'))
+    monkeypatch.setattr(build_scheduler, 'LOCK_TTL_SECONDS', 0)
+
+    # Another request takes over every stale slot between this one's listing and its delete
+    list_objects = s3_bucket.list_objects_v2
+
+    def listed_then_reclaimed(**kwargs):
+        listing = list_objects(**kwargs)
+        if kwargs['Prefix'].endswith('global/'):
+            for obj in listing.get('Contents', []):
+                s3_bucket.put_object(Bucket=TEST_BUCKET, Key=obj['Key'], Body=b'other')
+        return listing
+
+    monkeypatch.setattr(s3_bucket, 'list_objects_v2', listed_then_reclaimed)
+    assert scheduler.admit('d', 'interactive', max_wait=0) is None
+    slot = s3_bucket.get_object(Bucket=TEST_BUCKET, Key='scheduler/slots/global/000')
+    assert slot['Body'].read() == b'other'
+
+def test_builds_over_capacity_get_429_with_retry_after(limits, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'local')
+    monkeypatch.setattr(package_creator, '_local_build_scheduler', build_scheduler.LocalBuildScheduler())
+    monkeypatch.setitem(build_scheduler.MAX_WAIT_SECONDS, 'interactive', 0)
+    monkeypatch.setattr(package_creator, 'create_layer', lambda body, context: {'statusCode': 200, 'body': '{}'})
+
+    event = {
+        'body': json.dumps({'dependencies': ['requests']}),
+        'requestContext': {'identity': {'sourceIp': '203.0.113.9'}}
+    }
+    package_creator.get_build_scheduler().admit('203.0.113.9', 'interactive', max_wait=0)
+    package_creator.get_build_scheduler().admit('203.0.113.9', 'interactive', max_wait=0)
+    response = package_creator.lambda_handler(event, Mock())
+    assert response['statusCode'] == 429
+    assert response['headers']['Retry-After'] == str(package_creator.RETRY_AFTER_SECONDS)
+
+    # Another client still has its own share of the free global slot
+    event['requestContext']['identity']['sourceIp'] = '198.51.100.7'
+    assert package_creator.lambda_handler(event, Mock())['statusCode'] == 200
+
+
+def test_api_callers_cannot_choose_their_client_or_priority(limits, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'local')
+    monkeypatch.setattr(package_creator, '_local_build_scheduler', build_scheduler.LocalBuildScheduler())
+    monkeypatch.setitem(build_scheduler.MAX_WAIT_SECONDS, 'interactive', 0)
+    started = []
+    release = threading.Event()
+
+    def held_build(body, context):
+        started.append(body)
+        release.wait(10)
+        return {'statusCode': 200, 'body': '{}'}
+    monkeypatch.setattr(package_creator, 'create_layer', held_build)
+
+    def request(client_id):
+        return {
+            'body': json.dumps({'dependencies': ['requests'], 'priority': 'batch'}),
+            'headers': {'X-Client-Id': client_id, 'X-Build-Priority': 'batch'},
+            'requestContext': {'identity': {'sourceIp': '203.0.113.9'}}
+        }
+    assert build_scheduler.client_identity(request('team-a')) == '203.0.113.9'
+    assert build_scheduler.build_priority(request('team-a'), {'priority': 'batch'}) == 'interactive'
+
+    # Two requests from one IP with different client IDs share that IP's budget of two
+    threads = [threading.Thread(target=package_creator.lambda_handler, args=(request(client), Mock()))
+               for client in ('team-a', 'team-b')]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 10
+    while len(started) < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    try:
+        assert package_creator.lambda_handler(request('team-c'), Mock())['statusCode'] == 429
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    # Direct invocations (no requestContext) come from IAM principals and may set both
+    internal = {'headers': {'X-Client-Id': 'prewarm', 'X-Build-Priority': 'batch'}}
+    assert build_scheduler.client_identity(internal) == 'prewarm'
+    assert build_scheduler.build_priority(internal, {}) == 'batch'
@@ -0,0 +1,93 @@
+"""
+Tests for on-demand profiling of handler invocations.
+"""
+import json
+import marshal
+import re
+from unittest.mock import Mock
+
+import pytest
+
+import download_url_generator
+import handler_profiler
+import package_creator
+import package_lister
+
+from tests.helpers import TEST_BUCKET
+
+
+@pytest.fixture(autouse=True)
+def request_mode(monkeypatch):
+    """Profiling is off by default; these tests ask for it per request"""
+    monkeypatch.setenv('HANDLER_PROFILING', 'request')
+
+
+def _profiles(s3_bucket):
+    listed = s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix='profiles/')
+    return sorted(obj['Key'] for obj in listed.get('Contents', []))
+
+
+def _use_bucket(s3_bucket, monkeypatch, *modules):
+    for module in (handler_profiler,) + modules:
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+
+
+def test_invocations_are_only_profiled_when_asked(s3_bucket, monkeypatch):
+    _use_bucket(s3_bucket, monkeypatch, package_lister, download_url_generator)
+    monkeypatch.setattr(handler_profiler, 'InvocationProfile', Mock(side_effect=AssertionError('profiled')))
+
+    response = package_lister.lambda_handler({'queryStringParameters': {'search': 'x'}}, Mock())
+    assert response['statusCode'] == 200 and 'profileKey' not in json.loads(response['body'])
+    assert download_url_generator.lambda_handler({'pathParameters': {}}, Mock())['statusCode'] == 400
+
+    monkeypatch.setenv('HANDLER_PROFILING', 'off')
+    assert package_lister.lambda_handler({'queryStringParameters': {'profile': '1'}}, Mock())['statusCode'] == 200
+    # Anonymous callers cannot turn profiling on unless request mode was deployed
+    monkeypatch.delenv('HANDLER_PROFILING')
+    assert package_lister.lambda_handler({'headers': {'X-Profile': '1'}}, Mock())['statusCode'] == 200
+    assert _profiles(s3_bucket) == []
+    assert handler_profiler.profiling_requested({'body': '{"profile": false, "packageName": "profile"}'}) is False
+
+
+def test_profiled_listing_stores_pstats_collapsed_stacks_and_memory(s3_bucket, monkeypatch):
+    _use_bucket(s3_bucket, monkeypatch, package_lister)
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='metadata/alpha.json', Body=json.dumps({
+        'packageName': 'alpha', 'dependencies': ['requests'], 'packageKey': 'layers/alpha.zip'
+    }))
+
+    response = package_lister.lambda_handler({'headers': {'x-profile': 'true'}}, Mock())
+    profile_key = json.loads(response['body'])['profileKey']
+    assert response['headers']['X-Profile-Key'] == profile_key and response['headers']['Cache-Control'] == 'no-store'
+    assert re.fullmatch(r'profiles/package_lister/\d{4}-\d{2}-\d{2}/[0-9a-f]{32}\.json', profile_key)
+    assert json.loads(response['body'])['count'] == 1
+
+    summary = json.loads(s3_bucket.get_object(Bucket=TEST_BUCKET, Key=profile_key)['Body'].read())
+    assert summary['handler'] == 'package_lister' and summary['statusCode'] == 200
+    assert any('lambda_handler (package_lister.py' in row['function'] for row in summary['cpu'])
+    assert summary['memory']['peakBytes'] > 0 and summary['memory']['top']
+    assert _profiles(s3_bucket) == sorted([profile_key, *summary['artifacts'].values()])
+
+    pstats_key, collapsed_key = summary['artifacts']['pstats'], summary['artifacts']['collapsedStacks']
+    assert marshal.loads(s3_bucket.get_object(Bucket=TEST_BUCKET, Key=pstats_key)['Body'].read())
+    collapsed = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=collapsed_key)['Body'].read().decode('utf-8')
+    assert all(re.fullmatch(r'[^;]+(;[^;]+)* \d+', line) for line in collapsed.splitlines())
+
+
+def test_profiled_builds_time_every_subprocess(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+    monkeypatch.setenv('LAYER_ASSEMBLY', 'pip')
+    _use_bucket(s3_bucket, monkeypatch, package_creator)
+    original_run = handler_profiler.subprocess.run
+
+    response = package_creator.lambda_handler({'body': json.dumps({
+        'packageName': 'profiled', 'dependencies': ['purepkg'], 'profile': True
+    })}, Mock())
+
+    assert response['statusCode'] == 200 and handler_profiler.subprocess.run is original_run
+    profile_key = json.loads(response['body'])['profileKey']
+    summary = json.loads(s3_bucket.get_object(Bucket=TEST_BUCKET, Key=profile_key)['Body'].read())
+    commands = [entry['command'] for entry in summary['subprocesses']]
+    assert any('pip install' in command and '--dry-run' in command for command in commands)
+    assert any('pip install --target' in command for command in commands)
+    assert all(entry['durationMs'] >= 0 and entry['returncode'] == 0 for entry in summary['subprocesses'])
@@ -0,0 +1,79 @@
+"""
+Tests for the import-time cold-start profiler.
+"""
+import json
+import platform
+import sys
+from unittest.mock import Mock
+
+import import_profiler
+import package_creator
+
+HOST_PLATFORM = f'manylinux2014_{platform.machine()}'
+HOST_PYTHON = '%d.%d' % sys.version_info[:2]
+
+
+def _site_packages(tmp_path):
+    site_packages = tmp_path / 'site-packages'
+    (site_packages / 'slowmod').mkdir(parents=True)
+    (site_packages / 'slowmod' / '__init__.py').write_text('import time\ntime.sleep(0.05)\nfrom . import sub\n')
+    (site_packages / 'slowmod' / 'sub.py').write_text('VALUE = 1\n')
+    (site_packages / 'fastmod.py').write_text('VALUE = 2\n')
+    (site_packages / 'brokenmod').mkdir()
+    (site_packages / 'brokenmod' / '__init__.py').write_text('raise ImportError("missing native library")\n')
+    (site_packages / 'bin').mkdir()
+    return site_packages
+
+
+def test_discover_top_level_modules(tmp_path):
+    modules = import_profiler.discover_top_level_modules(str(_site_packages(tmp_path)))
+
+    assert modules == ['brokenmod', 'fastmod', 'slowmod']
+
+
+def test_parse_import_times():
+    stderr = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       120 |        120 |     slowmod.sub\n'
+        'import time:     50100 |      50220 | slowmod\n'
+    )
+
+    assert import_profiler.parse_import_times(stderr) == [('slowmod.sub', 120, 120), ('slowmod', 50100, 50220)]
+
+
+def test_profile_layer_ranks_modules_by_cumulative_cost(tmp_path):
+    report = import_profiler.profile_layer(str(_site_packages(tmp_path)), HOST_PYTHON, HOST_PLATFORM)
+
+    assert report['skipped'] is False
+    assert report['slowestModule'] == 'slowmod'
+    slow = report['modules'][0]
+    assert slow['cumulativeUs'] >= 50000
+    assert {s['module'] for s in slow['slowestSubmodules']} == {'slowmod', 'slowmod.sub'}
+    assert report['failedModules'] == ['brokenmod']
+
+
+def test_profile_layer_skips_foreign_architecture(tmp_path):
+    other = 'manylinux2014_aarch64' if platform.machine() != 'aarch64' else 'manylinux2014_x86_64'
+
+    report = import_profiler.profile_layer(str(_site_packages(tmp_path)), HOST_PYTHON, other)
+
+    assert report['skipped'] is True
+
+
+def test_build_stores_import_profile(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    event = {'body': json.dumps({
+        'packageName': 'profiled',
+        'dependencies': ['nativepkg'],
+        'platform': HOST_PLATFORM,
+        'pythonVersion': HOST_PYTHON,
+        'profileImports': True
+    })}
+
+    body = json.loads(package_creator.lambda_handler(event, Mock())['body'])
+
+    assert body['success'] is True
+    assert {m['module'] for m in body['importProfile']['modules']} == {'nativepkg', 'purepkg'}
+    metadata_key = body['s3Key'].replace('layers/', 'metadata/').replace('.zip', '.json')
+    metadata = json.loads(s3_bucket.get_object(Bucket='test-lambda-packages', Key=metadata_key)['Body'].read())
+    assert metadata['importProfile']['slowestModule'] in ('nativepkg', 'purepkg')
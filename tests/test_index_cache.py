@@ -0,0 +1,150 @@
+"""
+Tests for the shared package index cache, its S3 snapshot and the local mirror mode.
+"""
+import hashlib
+import io
+import os
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import index_cache
+import preflight
+
+from tests.helpers import TEST_BUCKET, make_wheel
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / 'pip-cache'
+    monkeypatch.setattr(index_cache, 'INDEX_CACHE_DIR', str(path))
+    monkeypatch.setattr(index_cache, '_restored_etag', None)
+    monkeypatch.setattr(index_cache, '_saved_fingerprint', None)
+    return path
+
+
+@pytest.fixture
+def index_server(tmp_path, monkeypatch):
+    """A PEP 503 index that honours If-None-Match and records every request"""
+    wheel = make_wheel(str(tmp_path / 'files'), 'purepkg', '1.0')
+    wheel_name = os.path.basename(wheel)
+    with open(wheel, 'rb') as f:
+        wheel_bytes = f.read()
+    page = (f'<html><body><a href="/files/{wheel_name}#sha256={hashlib.sha256(wheel_bytes).hexdigest()}">'
+            f'{wheel_name}</a></body></html>').encode('utf-8')
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') == '/simple/purepkg':
+                if self.headers.get('If-None-Match') == '"page-v1"':
+                    requests.append(('page', 304))
+                    self.send_response(304)
+                    self.send_header('ETag', '"page-v1"')
+                    self.end_headers()
+                    return
+                requests.append(('page', 200))
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('ETag', '"page-v1"')
+                body = page
+            elif self.path == f'/files/{wheel_name}':
+                requests.append(('wheel', 200))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Cache-Control', 'max-age=365000000, immutable')
+                body = wheel_bytes
+            else:
+                self.send_response(404)
+                body = b''
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.delenv('PIP_NO_INDEX', raising=False)
+    monkeypatch.delenv('PIP_FIND_LINKS', raising=False)
+    monkeypatch.setenv('PIP_INDEX_URL', f'http://127.0.0.1:{server.server_port}/simple')
+    # pip only caches plain-HTTP indexes it is told to trust, as it does any HTTPS index
+    monkeypatch.setenv('PIP_TRUSTED_HOST', '127.0.0.1')
+    yield requests
+    server.shutdown()
+
+
+def test_repeated_resolution_revalidates_instead_of_refetching(cache_dir, index_server):
+    for _ in range(2):
+        report, stderr = preflight.resolve(['purepkg'], 'manylinux2014_x86_64', '3.12')
+        assert report and report['install'][0]['metadata']['name'] == 'purepkg', stderr
+
+    assert index_server == [('page', 200), ('wheel', 200), ('page', 304)]
+
+
+def test_mirror_mode_serves_resolution_from_a_directory(cache_dir, tmp_path, monkeypatch):
+    monkeypatch.delenv('PIP_NO_INDEX', raising=False)
+    monkeypatch.delenv('PIP_FIND_LINKS', raising=False)
+    mirror = tmp_path / 'mirror'
+    wheel = make_wheel(str(mirror / 'simple' / 'purepkg'), 'purepkg', '1.0')
+    (mirror / 'simple' / 'purepkg' / 'index.html').write_text(
+        f'<html><body><a href="{os.path.basename(wheel)}">{os.path.basename(wheel)}</a></body></html>'
+    )
+    monkeypatch.setenv('INDEX_MIRROR_DIR', str(mirror))
+
+    assert '--index-url' in index_cache.pip_index_args()
+    report = preflight.run_preflight(['purepkg'], 'manylinux2014_x86_64', '3.12')
+    assert report['ok'] and report['packages'][0]['name'] == 'purepkg'
+
+
+def test_s3_snapshot_carries_index_pages_but_not_wheels(cache_dir, s3_bucket, monkeypatch):
+    monkeypatch.setenv('INDEX_CACHE', 's3')
+    page = cache_dir / 'http-v2' / 'a' / 'page'
+    wheel = cache_dir / 'http-v2' / 'b' / 'wheel.body'
+    page.parent.mkdir(parents=True)
+    wheel.parent.mkdir(parents=True)
+    page.write_bytes(b'index page')
+    wheel.write_bytes(b'0' * (index_cache.SHARED_ENTRY_MAX_BYTES + 1))
+
+    assert index_cache.save_index_cache(s3_bucket, TEST_BUCKET)
+    assert not index_cache.save_index_cache(s3_bucket, TEST_BUCKET)
+
+    page.unlink()
+    wheel.unlink()
+    monkeypatch.setattr(index_cache, '_restored_etag', None)
+    assert index_cache.restore_index_cache(s3_bucket, TEST_BUCKET)
+    assert page.read_bytes() == b'index page' and not wheel.exists()
+
+    wheel.write_bytes(b'0' * (index_cache.SHARED_ENTRY_MAX_BYTES + 1))
+    assert index_cache.prune_index_cache(str(cache_dir), max_bytes=index_cache.SHARED_ENTRY_MAX_BYTES) == 1
+    assert page.exists() and not wheel.exists()
+
+
+def test_prune_keeps_the_cache_within_its_share_of_free_tmp_space(cache_dir, monkeypatch):
+    page = cache_dir / 'http-v2' / 'a' / 'page'
+    page.parent.mkdir(parents=True)
+    page.write_bytes(b'0' * 1000)
+    usage = index_cache.shutil.disk_usage(cache_dir)
+    monkeypatch.setattr(index_cache.shutil, 'disk_usage', lambda path: usage._replace(free=500))
+
+    assert index_cache.prune_index_cache(str(cache_dir), max_bytes=10 * 1024 * 1024) == 1
+    assert not page.exists()
+
+
+def test_restore_skips_snapshot_members_outside_the_cache(cache_dir, s3_bucket, monkeypatch):
+    monkeypatch.setenv('INDEX_CACHE', 's3')
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for name in ('http-v2/a/page', 'a/../../escaped', '/tmp/absolute'):
+            info = tarfile.TarInfo(name)
+            info.size = 4
+            tar.addfile(info, io.BytesIO(b'page'))
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key=index_cache.INDEX_CACHE_S3_KEY, Body=buffer.getvalue())
+
+    assert index_cache.restore_index_cache(s3_bucket, TEST_BUCKET)
+    assert (cache_dir / 'http-v2' / 'a' / 'page').read_bytes() == b'page'
+    assert not (cache_dir.parent / 'escaped').exists()
+    assert not os.path.exists('/tmp/absolute')
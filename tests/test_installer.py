@@ -0,0 +1,111 @@
+"""
+Tests for the pip and uv installer backends.
+"""
+import hashlib
+import io
+import json
+import os
+import subprocess
+import zipfile
+from unittest.mock import Mock
+
+import pytest
+
+import installer
+import package_creator
+import wheelhouse
+
+from tests.helpers import TEST_BUCKET, make_wheel
+
+needs_uv = pytest.mark.skipif(installer.uv_executable() is None, reason='uv is not installed')
+
+
+def _tree(root):
+    """Installed files with content hashes; dist-info directories by name only, as their records name the installer"""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            relative = os.path.relpath(path, root)
+            if '.dist-info' in relative:
+                files[relative.split(os.sep)[0]] = None
+                continue
+            with open(path, 'rb') as f:
+                files[relative] = hashlib.sha256(f.read()).hexdigest()
+    return files
+
+
+def _install(backend, dependencies, package_dir, platform='manylinux2014_aarch64'):
+    assert package_creator.install_pip_dependencies(
+        dependencies, str(package_dir), platform, '3.12', 'layer', installer=backend
+    )
+    return _tree(os.path.join(package_dir, 'python/lib/python3.12/site-packages'))
+
+
+@needs_uv
+@pytest.mark.parametrize('dependencies', [['nativepkg'], ['nativepkg', 'purepkg', 'extrapkg']],
+                         ids=['together', 'individually'])
+def test_uv_installs_the_same_layout_as_pip(local_wheelhouse, tmp_path, dependencies):
+    make_wheel(str(local_wheelhouse), 'extrapkg', '0.1')
+    pip_tree = _install(installer.PipInstaller(), dependencies, tmp_path / 'pip')
+    uv_tree = _install(installer.select_installer('uv'), dependencies, tmp_path / 'uv')
+
+    assert uv_tree == pip_tree
+    assert 'nativepkg/__init__.py' in uv_tree and 'purepkg/__init__.py' in uv_tree
+
+
+@needs_uv
+def test_uv_installs_from_a_wheelhouse_like_pip(local_wheelhouse, tmp_path):
+    trees = []
+    for backend in (installer.PipInstaller(), installer.select_installer('uv')):
+        target_dir = str(tmp_path / backend.name)
+        assert wheelhouse.install_from_wheelhouse(['nativepkg'], target_dir, 'manylinux2014_x86_64', '3.12',
+                                                  [str(local_wheelhouse)], installer=backend)
+        trees.append(_tree(target_dir))
+    assert trees[0] == trees[1]
+
+
+@needs_uv
+def test_requests_choose_the_installer_and_build_identical_layers(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+    monkeypatch.setenv('LAYER_ASSEMBLY', 'pip')
+    monkeypatch.setenv('PREBUILT_LAYERS', 'off')
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+
+    contents = {}
+    for name in ('pip', 'uv'):
+        response = package_creator.lambda_handler({'body': json.dumps({
+            'packageName': name, 'dependencies': ['nativepkg'], 'installer': name, 'preflight': False
+        })}, Mock())
+        assert response['statusCode'] == 200
+        s3_key = json.loads(response['body'])['s3Key']
+        body = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=s3_key)['Body'].read()
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            contents[name] = {info.filename: info.CRC for info in zf.infolist() if '.dist-info' not in info.filename}
+    assert contents['uv'] == contents['pip']
+
+
+def test_selection_falls_back_to_pip_and_pip_is_not_upgraded_per_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(installer, 'uv_executable', lambda: None)
+    assert installer.select_installer('uv').name == 'pip'
+    assert installer.select_installer('auto').name == 'pip'
+    assert installer.select_installer('conda').name == 'pip'
+    monkeypatch.setattr(installer, 'uv_executable', lambda: '/opt/uv')
+    monkeypatch.setenv('INSTALLER', 'auto')
+    assert installer.select_installer().name == 'uv'
+    assert installer.select_installer('pip').name == 'pip'
+    assert installer.uv_platform('manylinux2014_aarch64') == 'aarch64-manylinux2014'
+    assert installer.uv_platform('manylinux_2_28_x86_64') == 'x86_64-manylinux_2_28'
+
+    commands = []
+
+    def run(command, **kwargs):
+        commands.append(command)
+        return subprocess.CompletedProcess(command, 0, '', '')
+
+    monkeypatch.setattr(package_creator.subprocess, 'run', run)
+    assert package_creator.install_packages_together(
+        ['purepkg'], str(tmp_path), 'manylinux2014_x86_64', '3.12', False, installer.PipInstaller()
+    )
+    assert len(commands) == 1 and commands[0][-1] == 'purepkg'
@@ -0,0 +1,94 @@
+"""
+Tests for the precomputed layer catalog behind facet filters and GET /packages/stats.
+"""
+import json
+import zipfile
+
+import layer_catalog
+import layer_gc
+import package_creator
+import package_lister
+import package_stats
+
+from tests.helpers import TEST_BUCKET
+
+
+def publish(tmp_path, name, dependencies, platform='manylinux2014_x86_64', python_version='3.12', size=0):
+    zip_path = tmp_path / f'{name}.zip'
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        zf.writestr(f'python/{name}.txt', name)
+        zf.writestr('python/padding.bin', b'x' * size)
+    return package_creator.publish_layer(
+        str(zip_path), name, dependencies, f'python{python_version}', platform, python_version, 'layer', True, False
+    )
+
+
+def listing(params, headers=None):
+    response = package_lister.lambda_handler({'queryStringParameters': params, 'headers': headers or {}}, None)
+    return response, json.loads(response['body']) if response['body'] else None
+
+
+def test_builds_maintain_filters_and_stats(s3_bucket, tmp_path, monkeypatch):
+    for module in (package_creator, package_lister, package_stats):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+    publish(tmp_path, 'api', ['fastapi>=0.100', 'pydantic'])
+    publish(tmp_path, 'arm', ['pydantic[email]'], platform='manylinux2014_aarch64', size=200_000)
+    publish(tmp_path, 'old-python', ['requests'], python_version='3.11')
+
+    stats = json.loads(package_stats.lambda_handler({}, None)['body'])
+    assert stats['totals']['layers'] == 3
+    assert stats['byPlatform']['manylinux2014_x86_64']['layers'] == 2
+    assert stats['byPythonVersion'] == {'3.12': stats['byPythonVersion']['3.12'], '3.11': stats['byPythonVersion']['3.11']}
+    assert stats['topDependencies'][0] == {'name': 'pydantic', 'layers': 2}
+
+    response, body = listing({'platform': 'manylinux2014_x86_64', 'pythonVersion': '3.12'})
+    assert [layer['fileName'] for layer in body['packages']] == ['api']
+    _, body = listing({'minSize': '1000', 'search': 'PYDANTIC'.lower()})
+    assert [layer['fileName'] for layer in body['packages']] == ['arm']
+    _, body = listing({'createdBefore': '2000-01-01'})
+    assert body['count'] == 0
+
+    # An unchanged catalog revalidates without being read; a new build changes the ETag
+    params = {'platform': 'manylinux2014_x86_64'}
+    assert listing(params, {'If-None-Match': response['headers']['ETag']})[0]['statusCode'] == 200
+    etag = listing(params)[0]['headers']['ETag']
+    assert listing(params, {'If-None-Match': etag})[0]['statusCode'] == 304
+    publish(tmp_path, 'newer', ['httpx'])
+    assert listing(params, {'If-None-Match': etag})[0]['statusCode'] == 200
+
+    assert listing({'maxSize': 'big'})[0]['statusCode'] == 400
+
+
+def test_conflicting_builds_and_gc_keep_the_catalog_complete(s3_bucket, tmp_path, monkeypatch):
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    published = [publish(tmp_path, f'layer-{i}', [f'dep{i % 3}']) for i in range(11)]
+
+    # Another build updates the catalog between this build's read and its write
+    put_object = s3_bucket.put_object
+    conflicts = []
+
+    def racing_put_object(**kwargs):
+        if kwargs['Key'] == layer_catalog.CATALOG_KEY and not conflicts:
+            conflicts.append('racer')
+            published.append(publish(tmp_path, 'racer', ['dep2']))
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(s3_bucket, 'put_object', racing_put_object)
+    published.append(publish(tmp_path, 'layer-11', ['dep2']))
+    monkeypatch.setattr(s3_bucket, 'put_object', put_object)
+
+    catalog, _ = layer_catalog.read_catalog(s3_bucket, TEST_BUCKET)
+    assert sorted(catalog['columns']['key']) == sorted(p['s3Key'] for p in published)
+    assert catalog['aggregates']['dependencies'] == {'dep0': 4, 'dep1': 4, 'dep2': 5}
+
+    # A missing catalog is rebuilt from the metadata objects on first read
+    s3_bucket.delete_object(Bucket=TEST_BUCKET, Key=layer_catalog.CATALOG_KEY)
+    catalog, _ = layer_catalog.load_catalog(s3_bucket, TEST_BUCKET)
+    assert catalog['aggregates']['layers'] == 13
+
+    # Layers removed outside a build disappear once GC rewrites the catalog
+    metadata_key = f"metadata/{published[0]['s3Key'][len('layers/'):-len('.zip')]}.json"
+    s3_bucket.delete_object(Bucket=TEST_BUCKET, Key=metadata_key)
+    layer_gc.collect_garbage(s3_bucket, TEST_BUCKET, dry_run=False)
+    catalog, _ = layer_catalog.read_catalog(s3_bucket, TEST_BUCKET)
+    assert catalog['aggregates']['layers'] == 12 and published[0]['s3Key'] not in catalog['columns']['key']
@@ -0,0 +1,98 @@
+"""
+Tests for the duplicate-compaction and version-retention GC job.
+"""
+import json
+import zipfile
+from unittest.mock import Mock
+
+import download_url_generator
+import layer_gc
+import package_lister
+from layer_archive import content_hash
+
+from tests.helpers import TEST_BUCKET
+
+
+def _put_build(client, tmp_path, name, created_at, payload, **fields):
+    zip_path = tmp_path / f'{name}.zip'
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        zf.writestr('python/lib/python3.12/site-packages/pkg/__init__.py', payload)
+    package_key = f'layers/{name}-{created_at}.zip'
+    client.upload_file(str(zip_path), TEST_BUCKET, package_key)
+    client.put_object(Bucket=TEST_BUCKET, Key=f'metadata/{name}-{created_at}.json', Body=json.dumps({
+        'packageName': name,
+        'dependencies': ['pkg'],
+        'createdAt': created_at,
+        'packageKey': package_key,
+        'packageSize': zip_path.stat().st_size,
+        'contentHash': content_hash(str(zip_path)),
+        **fields
+    }))
+    return package_key
+
+
+def test_content_hash_ignores_timestamps(tmp_path):
+    paths = []
+    for index, date_time in enumerate([(2020, 1, 1, 0, 0, 0), (2024, 6, 1, 12, 0, 0)]):
+        path = tmp_path / f'{index}.zip'
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr(zipfile.ZipInfo('pkg/__init__.py', date_time=date_time), 'X = 1\n')
+        paths.append(str(path))
+
+    assert content_hash(paths[0]) == content_hash(paths[1])
+
+
+def test_dry_run_reports_duplicates_without_deleting(s3_bucket, tmp_path):
+    _put_build(s3_bucket, tmp_path, 'first', '20240101-000000', 'X = 1\n')
+    duplicate = _put_build(s3_bucket, tmp_path, 'second', '20240102-000000', 'X = 1\n')
+    _put_build(s3_bucket, tmp_path, 'other', '20240103-000000', 'X = 2\n')
+
+    report = layer_gc.collect_garbage(s3_bucket, TEST_BUCKET, dry_run=True)
+
+    assert [d['packageKey'] for d in report['duplicates']] == [duplicate]
+    s3_bucket.head_object(Bucket=TEST_BUCKET, Key=duplicate)
+
+
+def test_apply_collapses_duplicates_onto_oldest_build(s3_bucket, tmp_path, monkeypatch):
+    canonical = _put_build(s3_bucket, tmp_path, 'first', '20240101-000000', 'X = 1\n')
+    duplicate = _put_build(s3_bucket, tmp_path, 'second', '20240102-000000', 'X = 1\n')
+
+    layer_gc.collect_garbage(s3_bucket, TEST_BUCKET, dry_run=False)
+
+    keys = [obj['Key'] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix='metadata/')['Contents']]
+    assert keys == ['metadata/first-20240101-000000.json']
+    metadata = json.loads(s3_bucket.get_object(Bucket=TEST_BUCKET, Key=keys[0])['Body'].read())
+    assert metadata['aliases'][0]['packageName'] == 'second'
+
+    # Downloads of the collapsed build are redirected to the canonical copy
+    monkeypatch.setattr(download_url_generator, 's3_client', s3_bucket)
+    result = download_url_generator.lambda_handler({'pathParameters': {'s3Key': duplicate}}, Mock())
+    assert json.loads(result['body'])['s3Key'] == canonical
+
+
+def test_builds_for_other_targets_are_kept_and_listing_order_survives_gc(s3_bucket, tmp_path, monkeypatch):
+    monkeypatch.setattr(package_lister, 's3_client', s3_bucket)
+    x86 = _put_build(s3_bucket, tmp_path, 'pure', '20240101-000000', 'X = 1\n', platform='manylinux2014_x86_64')
+    arm = _put_build(s3_bucket, tmp_path, 'pure', '20240102-000000', 'X = 1\n', platform='manylinux2014_aarch64')
+    duplicate = _put_build(s3_bucket, tmp_path, 'again', '20240103-000000', 'X = 1\n', platform='manylinux2014_x86_64')
+    newest = _put_build(s3_bucket, tmp_path, 'newest', '20240104-000000', 'X = 2\n')
+
+    report = layer_gc.collect_garbage(s3_bucket, TEST_BUCKET, dry_run=False)
+
+    assert [(d['packageKey'], d['canonicalKey']) for d in report['duplicates']] == [(duplicate, x86)]
+    # The rewritten canonical metadata is the newest object, but it is still listed by build time
+    listing = json.loads(package_lister.lambda_handler({}, Mock())['body'])['packages']
+    assert [layer['key'] for layer in listing] == [newest, arm, x86]
+
+
+def test_expires_noncurrent_versions_beyond_retention(s3_bucket):
+    s3_bucket.put_bucket_versioning(Bucket=TEST_BUCKET, VersioningConfiguration={'Status': 'Enabled'})
+    for body in (b'v1', b'v2', b'v3'):
+        s3_bucket.put_object(Bucket=TEST_BUCKET, Key='layers/app.zip', Body=body)
+
+    report = layer_gc.collect_garbage(s3_bucket, TEST_BUCKET, retention_days=0, keep_noncurrent=1, dry_run=False)
+
+    assert len(report['expiredVersions']) == 1
+    versions = s3_bucket.list_object_versions(Bucket=TEST_BUCKET, Prefix='layers/')['Versions']
+    assert len(versions) == 2
+    assert s3_bucket.get_object(Bucket=TEST_BUCKET, Key='layers/app.zip')['Body'].read() == b'v3'
@@ -0,0 +1,73 @@
+"""
+Tests for request telemetry, the prewarm job and serving prebuilt layers.
+"""
+import json
+from unittest.mock import Mock
+
+import layer_demand
+import layer_prewarm
+import package_creator
+
+from tests.helpers import TEST_BUCKET, make_wheel
+
+
+def _request(body):
+    response = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+    return response['statusCode'], json.loads(response['body'])
+
+
+def _layers(s3_bucket):
+    return [obj['Key'] for obj in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix='layers/').get('Contents', [])]
+
+
+def test_popular_sets_are_prebuilt_and_rebuilt_when_upstream_changes(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+    for module in (package_creator, layer_prewarm):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+    body = {'packageName': 'common', 'dependencies': ['PurePkg'], 'pythonVersion': '3.12'}
+
+    for dependencies in (['PurePkg'], ['purepkg '], ['nativepkg']):
+        assert _request(dict(body, dependencies=dependencies))[0] == 200
+    assert len(_layers(s3_bucket)) == 3
+
+    report = layer_prewarm.prewarm(s3_bucket, TEST_BUCKET, top_k=5, min_requests=2, dry_run=False)
+    assert [(entry['dependencies'], entry['requests'], entry['status']) for entry in report['sets']] == [
+        (['purepkg'], 2, 'rebuilt')
+    ]
+
+    # The next request for the set is answered from the prebuilt layer without building
+    status, served = _request(dict(body, packageName='someone-else'))
+    assert status == 200 and served['prebuilt'] and served['s3Key'] in _layers(s3_bucket)
+    assert len(_layers(s3_bucket)) == 4
+    assert _request(dict(body, upgradePackages=True))[1].get('prebuilt') is None
+
+    assert layer_prewarm.prewarm(s3_bucket, TEST_BUCKET, min_requests=2, dry_run=False)['sets'][0]['status'] == 'current'
+    make_wheel(str(local_wheelhouse), 'purepkg', '1.1')
+    assert layer_prewarm.prewarm(s3_bucket, TEST_BUCKET, min_requests=2)['sets'][0]['status'] == 'stale'
+    assert layer_prewarm.prewarm(s3_bucket, TEST_BUCKET, min_requests=2, dry_run=False)['sets'][0]['status'] == 'rebuilt'
+    record = layer_demand.read_prebuilt(s3_bucket, TEST_BUCKET, report['sets'][0]['key'])
+    assert record['resolved'] == {'x86_64-py3.12': {'purepkg': '1.1'}}
+
+
+def test_prebuilt_layers_are_only_served_while_fresh(s3_bucket, monkeypatch):
+    monkeypatch.setenv('PREBUILT_LAYERS', 'on')
+    body = {'dependencies': ['purepkg']}
+    key = layer_demand.set_key(layer_demand.dependency_set(body))
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='layers/common.zip', Body=b'zip')
+    response = {'statusCode': 200, 'body': json.dumps({'s3Key': 'layers/common.zip'})}
+    layer_demand.write_prebuilt(s3_bucket, TEST_BUCKET, key, {'response': response, 'checkedAt': 1000})
+
+    assert layer_demand.find_prebuilt(s3_bucket, TEST_BUCKET, body, now=1000 + 60) == response
+    assert layer_demand.find_prebuilt(s3_bucket, TEST_BUCKET, body, now=1000 + 3 * 60 * 60) is None
+    assert layer_demand.find_prebuilt(s3_bucket, TEST_BUCKET, dict(body, dryRun=True), now=1060) is None
+    assert layer_demand.dependency_set({'layers': [body]}) is None
+
+    # GC collapsed the layer onto an identical build: follow the alias it left behind
+    s3_bucket.delete_object(Bucket=TEST_BUCKET, Key='layers/common.zip')
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='aliases/layers/common.zip.json',
+                         Body=json.dumps({'packageKey': 'layers/older.zip'}))
+    assert layer_demand.find_prebuilt(s3_bucket, TEST_BUCKET, body, now=1000 + 60) is None
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='layers/older.zip', Body=b'zip')
+    served = layer_demand.find_prebuilt(s3_bucket, TEST_BUCKET, body, now=1000 + 60)
+    assert json.loads(served['body'])['s3Key'] == 'layers/older.zip'
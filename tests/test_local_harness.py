@@ -0,0 +1,60 @@
+"""
+Tests for the local API server and load driver in tools/.
+"""
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+pytest.importorskip('moto')
+
+from tools.load_test import parse_mix, percentile, run_load  # noqa: E402
+from tools.local_api import LocalApi, make_server  # noqa: E402
+
+
+@pytest.fixture
+def local_api():
+    api = LocalApi().start()
+    api.seed_catalog(5)
+    yield api
+    api.stop()
+
+
+def test_routes_requests_as_api_gateway_events(local_api, local_wheelhouse):
+    listed = local_api.invoke('GET', '/packages?search=layer')
+    packages = json.loads(listed['body'])['packages']
+    assert listed['statusCode'] == 200 and len(packages) == 5
+
+    download = local_api.invoke('GET', f"/packages/{quote(packages[0]['key'], safe='')}/download")
+    assert json.loads(download['body'])['s3Key'] == packages[0]['key']
+
+    built = local_api.invoke('POST', '/packages', body=json.dumps({'packageName': 'harness', 'dependencies': ['purepkg']}))
+    assert built['statusCode'] == 200
+    assert local_api.invoke('DELETE', '/packages')['statusCode'] == 404
+
+
+def test_load_run_reports_percentiles_per_endpoint(local_api):
+    server = make_server(local_api, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = run_load(
+            f'http://127.0.0.1:{server.server_port}', parse_mix('list=2,search=1,download=1,manifest=1'),
+            concurrency=4, total_requests=40
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert report['totalRequests'] == 40 and report['errors'] == 0
+    assert set(report['endpoints']) == {'list', 'search', 'download', 'manifest'}
+    for stats in report['endpoints'].values():
+        assert stats['p50Ms'] <= stats['p95Ms'] <= stats['p99Ms'] <= stats['maxMs']
+
+
+def test_percentile_and_mix_parsing():
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50) == 5
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 99) == 10
+    assert parse_mix('list=3,build=1') == {'list': 0.75, 'build': 0.25}
+    with pytest.raises(ValueError):
+        parse_mix('delete=1')
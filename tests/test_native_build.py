@@ -0,0 +1,96 @@
+"""
+Tests for native-architecture builds: routing to the target's builder and compiling sdists.
+"""
+import io
+import json
+import sys
+import zipfile
+from unittest.mock import Mock
+
+import pytest
+
+import build_executor
+import build_status
+import installer
+import native_build
+import package_creator
+
+from tests.helpers import TEST_BUCKET, make_sdist
+
+HOST_PYTHON = f'{sys.version_info.major}.{sys.version_info.minor}'
+HOST_PLATFORM = f'manylinux2014_{native_build.host_architecture()}'
+
+
+def test_builds_for_another_architecture_go_to_its_builder(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setattr(build_executor, 'host_architecture', lambda: 'x86_64')
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+    monkeypatch.setenv('ARM64_BUILDER_FUNCTION', 'stack-Arm64Builder')
+    for module in (package_creator, build_status):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+    lambda_client = Mock()
+    monkeypatch.setattr(build_executor, 'lambda_client', lambda_client)
+
+    arm = {'packageName': 'arm', 'dependencies': ['nativepkg'], 'platform': 'manylinux2014_aarch64'}
+    assert build_executor.select_executor({'dependencies': ['nativepkg']}, s3_bucket).name == 'lambda'
+    assert build_executor.select_executor(
+        {'platforms': ['manylinux2014_x86_64', 'manylinux2014_aarch64']}, s3_bucket
+    ).name == 'lambda'
+
+    response = package_creator.lambda_handler({'body': json.dumps(arm)}, Mock())
+    assert response['statusCode'] == 202
+    build_id = json.loads(response['body'])['buildId']
+    invoke = lambda_client.invoke.call_args.kwargs
+    assert invoke['FunctionName'] == 'stack-Arm64Builder' and invoke['InvocationType'] == 'Event'
+
+    # What the arm64 builder does with the event it was sent
+    assert package_creator.lambda_handler(json.loads(invoke['Payload']), None)['statusCode'] == 200
+    finished = json.loads(build_status.lambda_handler({'pathParameters': {'buildId': build_id}}, Mock())['body'])
+    assert finished['status'] == 'succeeded'
+    assert finished['result']['platform'] == 'manylinux2014_aarch64'
+
+
+def test_matching_builder_compiles_sdists_and_caches_the_wheels(s3_bucket, local_wheelhouse, monkeypatch):
+    make_sdist(str(local_wheelhouse), 'srcpkg', '1.0')
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    body = {'packageName': 'native', 'dependencies': ['srcpkg', 'purepkg'], 'platform': HOST_PLATFORM,
+            'pythonVersion': HOST_PYTHON}
+
+    # Cross-platform builds only take binary wheels
+    rejected = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+    assert rejected['statusCode'] == 422 and 'srcpkg' in json.loads(rejected['body'])['error']
+
+    monkeypatch.setenv('SOURCE_BUILDS', 'native')
+    built = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+    assert built['statusCode'] == 200, built['body']
+    layer = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=json.loads(built['body'])['s3Key'])['Body'].read()
+    with zipfile.ZipFile(io.BytesIO(layer)) as zf:
+        assert f'python/lib/python{HOST_PYTHON}/site-packages/srcpkg/__init__.py' in zf.namelist()
+
+    cached = s3_bucket.list_objects_v2(Bucket=TEST_BUCKET, Prefix=native_build.COMPILED_WHEELS_PREFIX)
+    assert [obj['Key'] for obj in cached['Contents']] == [
+        native_build.compiled_prefix(HOST_PLATFORM, HOST_PYTHON) + 'srcpkg-1.0-py3-none-any.whl'
+    ]
+
+
+@pytest.mark.skipif(installer.uv_executable() is None, reason='uv is not installed')
+def test_native_builds_install_with_the_requested_installer(s3_bucket, local_wheelhouse, monkeypatch, capsys):
+    make_sdist(str(local_wheelhouse), 'srcpkg', '1.0')
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+    monkeypatch.setenv('SOURCE_BUILDS', 'native')
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+
+    contents = {}
+    for name in ('pip', 'uv'):
+        body = {'packageName': name, 'dependencies': ['srcpkg', 'purepkg'], 'platform': HOST_PLATFORM,
+                'pythonVersion': HOST_PYTHON, 'installer': name}
+        built = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+        assert built['statusCode'] == 200, built['body']
+        assert f'natively with {name}' in capsys.readouterr().out
+        layer = s3_bucket.get_object(Bucket=TEST_BUCKET, Key=json.loads(built['body'])['s3Key'])['Body'].read()
+        with zipfile.ZipFile(io.BytesIO(layer)) as zf:
+            contents[name] = {info.filename: info.CRC for info in zf.infolist() if '.dist-info' not in info.filename}
+    assert contents['uv'] == contents['pip']
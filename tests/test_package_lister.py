@@ -0,0 +1,108 @@
+"""
+Tests for conditional GETs on the package listing.
+"""
+import json
+from unittest.mock import Mock
+
+import package_lister
+
+from tests.helpers import TEST_BUCKET
+
+
+def _put_metadata(client, name):
+    client.put_object(Bucket=TEST_BUCKET, Key=f'metadata/{name}.json', Body=json.dumps({
+        'packageName': name,
+        'dependencies': ['requests'],
+        'packageKey': f'layers/{name}.zip'
+    }))
+
+
+def _list(headers=None, search=None):
+    event = {'headers': headers, 'queryStringParameters': {'search': search} if search else None}
+    return package_lister.lambda_handler(event, Mock())
+
+
+def test_unchanged_listing_revalidates_with_304_without_reading_objects(s3_bucket, monkeypatch):
+    monkeypatch.setattr(package_lister, 's3_client', s3_bucket)
+    _put_metadata(s3_bucket, 'alpha')
+    first = _list()
+    etag = first['headers']['ETag']
+    assert first['statusCode'] == 200 and first['headers']['Access-Control-Expose-Headers'] == 'ETag'
+
+    reads = []
+    s3_bucket.meta.events.register('before-call.s3.GetObject', lambda **kwargs: reads.append(1))
+    second = _list({'if-none-match': etag})
+
+    assert second['statusCode'] == 304 and second['body'] == ''
+    assert second['headers']['ETag'] == etag
+    assert reads == []
+    assert _list({'If-None-Match': f'"other", W/{etag}'})['statusCode'] == 304
+
+
+def test_etag_changes_with_catalog_and_query(s3_bucket, monkeypatch):
+    monkeypatch.setattr(package_lister, 's3_client', s3_bucket)
+    _put_metadata(s3_bucket, 'alpha')
+    etag = _list()['headers']['ETag']
+
+    assert _list(search='alpha')['headers']['ETag'] != etag
+
+    _put_metadata(s3_bucket, 'beta')
+    refreshed = _list({'If-None-Match': etag})
+    assert refreshed['statusCode'] == 200
+    assert json.loads(refreshed['body'])['count'] == 2
+    assert refreshed['headers']['ETag'] != etag
+
+
+def test_listing_is_cacheable_at_the_edge_and_builds_purge_it(s3_bucket, local_wheelhouse, monkeypatch):
+    import edge_cache
+    import package_creator
+
+    monkeypatch.setattr(package_lister, 's3_client', s3_bucket)
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('API_DISTRIBUTION_ID', 'E123EXAMPLE')
+    cloudfront = Mock()
+    cloudfront.create_invalidation.return_value = {'Invalidation': {'Id': 'I1'}}
+    monkeypatch.setattr(edge_cache, 'cloudfront_client', cloudfront)
+
+    assert f's-maxage={package_lister.EDGE_TTL_SECONDS}' in _list()['headers']['Cache-Control']
+    # Query variants are not purged, so they only stay at the edge briefly
+    assert f's-maxage={package_lister.QUERY_EDGE_TTL_SECONDS}' in _list(search='purged')['headers']['Cache-Control']
+
+    body = {'packageName': 'purged', 'dependencies': ['purepkg'], 'pythonVersion': '3.12'}
+    assert package_creator.lambda_handler({'body': json.dumps(body)}, Mock())['statusCode'] == 200
+
+    cloudfront.create_invalidation.assert_called_once()
+    kwargs = cloudfront.create_invalidation.call_args.kwargs
+    assert kwargs['DistributionId'] == 'E123EXAMPLE'
+    # Exact paths only: cached manifests under /packages/ survive a build
+    assert kwargs['InvalidationBatch']['Paths']['Items'] == ['/packages', '/packages/stats']
+
+
+def test_pages_are_read_incrementally_and_continue_after_the_cursor(s3_bucket, monkeypatch):
+    monkeypatch.setattr(package_lister, 's3_client', s3_bucket)
+    names = [f'layer{index:02d}' for index in range(7)]
+    for name in names:
+        _put_metadata(s3_bucket, name)
+    reads = []
+    s3_bucket.meta.events.register('before-call.s3.GetObject', lambda **kwargs: reads.append(1))
+
+    listed, cursor, etags = [], None, set()
+    while True:
+        params = {'limit': '3', **({'cursor': cursor} if cursor else {})}
+        response = package_lister.lambda_handler({'queryStringParameters': params}, Mock())
+        body = json.loads(response['body'])
+        assert response['statusCode'] == 200 and body['limit'] == 3 and body['count'] <= 3
+        listed += [layer['fileName'] for layer in body['packages']]
+        etags.add(response['headers']['ETag'])
+        if not cursor:
+            assert len(reads) == 3
+        cursor = body['nextCursor']
+        if not cursor:
+            break
+
+    assert listed == [layer['fileName'] for layer in json.loads(_list()['body'])['packages']]
+    assert sorted(listed) == names and len(etags) == 3
+    assert 'nextCursor' not in json.loads(_list()['body'])
+    for params in ({'limit': '0'}, {'limit': 'all'}, {'limit': '5', 'cursor': 'not-a-cursor'}, {'cursor': 'x'}):
+        assert package_lister.lambda_handler({'queryStringParameters': params}, Mock())['statusCode'] == 400
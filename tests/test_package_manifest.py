@@ -0,0 +1,119 @@
+"""
+Tests for the ranged-read layer manifest endpoint.
+"""
+import io
+import json
+import os
+import zipfile
+from unittest.mock import Mock
+
+from botocore.exceptions import ClientError
+
+import layer_archive
+import package_manifest
+
+from tests.helpers import TEST_BUCKET
+
+SITE_PACKAGES = 'python/lib/python3.12/site-packages'
+
+
+def _layer_bytes(extra_files=0):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f'{SITE_PACKAGES}/big/__init__.py', 'X = 1\n' * 1000)
+        # Incompressible data so the archive is much larger than its central directory
+        zf.writestr(f'{SITE_PACKAGES}/big/_native.so', os.urandom(2 * 1024 * 1024))
+        zf.writestr(f'{SITE_PACKAGES}/six.py', 'Y = 2\n')
+        for index in range(extra_files):
+            zf.writestr(f'{SITE_PACKAGES}/many/mod{index}.py', '')
+        zf.writestr('requirements.txt', 'big\nsix\n')
+    return buffer.getvalue()
+
+
+def _reader(data, calls):
+    def read_range(start, end):
+        calls.append((start, end))
+        return data[start:end + 1]
+    return read_range
+
+
+def test_read_zip_entries_matches_zipfile():
+    data = _layer_bytes()
+    calls = []
+
+    entries = layer_archive.read_zip_entries(_reader(data, calls), len(data))
+
+    expected = zipfile.ZipFile(io.BytesIO(data)).infolist()
+    assert [e['name'] for e in entries] == [i.filename for i in expected]
+    assert [e['compressedSize'] for e in entries] == [i.compress_size for i in expected]
+    assert sum(end - start + 1 for start, end in calls) < 32 * 1024
+
+
+def test_read_zip_entries_handles_zip64(monkeypatch):
+    monkeypatch.setattr(zipfile, 'ZIP_FILECOUNT_LIMIT', 2)
+    data = _layer_bytes(extra_files=5)
+
+    entries = layer_archive.read_zip_entries(_reader(data, []), len(data))
+
+    assert len(entries) == 9
+
+
+def test_manifest_groups_files_by_top_level_package():
+    entries = layer_archive.read_zip_entries(_reader(_layer_bytes(), []), len(_layer_bytes()))
+
+    manifest = layer_archive.build_manifest(entries)
+
+    packages = {p['name']: p for p in manifest['packages']}
+    assert set(packages) == {'big', 'six', 'requirements.txt'}
+    assert packages['big']['files'] == 2
+    assert manifest['packages'][0]['name'] == 'big'
+
+
+def test_manifest_endpoint_reads_only_the_central_directory(s3_bucket, monkeypatch):
+    monkeypatch.setattr(package_manifest, 's3_client', s3_bucket)
+    data = _layer_bytes()
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='layers/big-1.zip', Body=data)
+    event = {'pathParameters': {'s3Key': 'layers%2Fbig-1.zip'}}
+
+    first = json.loads(package_manifest.lambda_handler(event, Mock())['body'])
+    second = json.loads(package_manifest.lambda_handler(event, Mock())['body'])
+
+    assert first['success'] is True and first['cached'] is False
+    assert first['bytesRead'] < len(data) / 50
+    assert first['fileCount'] == 4
+    assert second['cached'] is True
+    s3_bucket.head_object(Bucket=TEST_BUCKET, Key='manifests/layers/big-1.zip.json')
+
+
+def test_manifest_endpoint_returns_404_for_missing_layer(s3_bucket, monkeypatch):
+    monkeypatch.setattr(package_manifest, 's3_client', s3_bucket)
+
+    result = package_manifest.lambda_handler({'pathParameters': {'s3Key': 'layers/missing.zip'}}, Mock())
+
+    assert result['statusCode'] == 404
+
+
+def test_manifest_endpoint_follows_gc_aliases_and_only_serves_layers(s3_bucket, monkeypatch):
+    monkeypatch.setattr(package_manifest, 's3_client', s3_bucket)
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='layers/big-1.zip', Body=_layer_bytes())
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='aliases/layers/big-2.zip.json',
+                         Body=json.dumps({'packageKey': 'layers/big-1.zip'}))
+
+    result = package_manifest.lambda_handler({'pathParameters': {'s3Key': 'layers/big-2.zip'}}, Mock())
+
+    assert result['statusCode'] == 200 and json.loads(result['body'])['s3Key'] == 'layers/big-1.zip'
+    s3_bucket.head_object(Bucket=TEST_BUCKET, Key='manifests/layers/big-1.zip.json')
+    for key in ('metadata/big-1.json', 'index/catalog.json', 'layers/../index/catalog.zip'):
+        assert package_manifest.lambda_handler({'pathParameters': {'s3Key': key}}, Mock())['statusCode'] == 400
+
+
+def test_manifest_endpoint_asks_the_caller_to_retry_when_throttled(monkeypatch):
+    client = Mock()
+    client.head_object.side_effect = ClientError({'Error': {'Code': 'SlowDown'}}, 'HeadObject')
+    client.exceptions.ClientError = ClientError
+    monkeypatch.setattr(package_manifest, 's3_client', client)
+    monkeypatch.setenv('BUCKET_NAME', TEST_BUCKET)
+
+    result = package_manifest.lambda_handler({'pathParameters': {'s3Key': 'layers/big-1.zip'}}, Mock())
+
+    assert result['statusCode'] == 503 and result['headers']['Retry-After'] == '2'
@@ -0,0 +1,78 @@
+"""
+Tests for the preflight stage that validates and sizes dependencies before a build.
+"""
+import json
+from unittest.mock import Mock
+
+import package_creator
+import preflight
+
+from tests.helpers import TEST_BUCKET
+
+
+def test_rejects_malformed_requirements_and_pip_options():
+    errors = preflight.validate_requirements([
+        'requests[security]>=2.31,<3; python_version >= "3.8"',
+        'wheelpkg @ https://example.com/wheelpkg-1.0-py3-none-any.whl',
+        '--index-url=https://evil.example/simple',
+        'requests>=',
+        ''
+    ])
+
+    assert [e['requirement'] for e in errors] == ['--index-url=https://evil.example/simple', 'requests>=', '']
+    assert 'pip options' in errors[0]['reason']
+
+
+def test_resolves_and_sizes_wheels_for_the_target_variant(local_wheelhouse):
+    report = preflight.run_preflight(['nativepkg'], 'manylinux2014_aarch64', '3.12')
+
+    assert report['ok'] and not report['skipped']
+    packages = {p['name']: p for p in report['packages']}
+    assert packages['nativepkg']['wheel'] == 'nativepkg-2.0-cp312-cp312-manylinux2014_aarch64.whl'
+    assert packages['nativepkg']['requested'] and not packages['purepkg']['requested']
+    assert not packages['purepkg']['sizeEstimated']
+    assert report['estimatedUnzippedSize'] == sum(p['unzippedSize'] for p in report['packages']) > 0
+
+
+def test_reports_every_unsatisfiable_requirement(local_wheelhouse):
+    report = preflight.run_preflight(['purepkg', 'nosuchpkg', 'purepkg==3.0'], 'manylinux2014_x86_64', '3.12')
+
+    assert not report['ok']
+    reasons = {e['requirement']: e['reason'] for e in report['errors']}
+    assert set(reasons) == {'nosuchpkg', 'purepkg==3.0'}
+    assert 'does not exist' in reasons['nosuchpkg']
+    assert 'versions with compatible wheels: 1.0' in reasons['purepkg==3.0']
+
+
+def test_missing_platform_wheel_fails_fast(local_wheelhouse):
+    report = preflight.run_preflight(['nativepkg'], 'manylinux2014_x86_64', '3.10')
+
+    assert not report['ok']
+    assert 'x86_64-py3.10' in report['errors'][0]['reason']
+
+
+def test_layer_over_size_limit_is_rejected(local_wheelhouse, monkeypatch):
+    monkeypatch.setattr(preflight, 'LAMBDA_UNZIPPED_LIMIT_BYTES', 10)
+
+    report = preflight.run_preflight(['nativepkg'], 'manylinux2014_x86_64', '3.12')
+
+    assert not report['ok']
+    assert 'exceeds' in report['errors'][0]['reason'] and 'nativepkg' in report['errors'][0]['reason']
+
+
+def test_handler_returns_422_without_building(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    body = {'packageName': 'typo', 'dependencies': ['purepkgg'], 'pythonVersion': '3.12'}
+
+    result = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+    assert result['statusCode'] == 422
+    assert 'purepkgg' in json.loads(result['body'])['error']
+    assert 'Contents' not in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET)
+
+    dry_run = package_creator.lambda_handler(
+        {'body': json.dumps(dict(body, dependencies=['nativepkg'], dryRun=True))}, Mock()
+    )
+    assert dry_run['statusCode'] == 200
+    assert json.loads(dry_run['body'])['preflight'][0]['ok']
+    assert 'Contents' not in s3_bucket.list_objects_v2(Bucket=TEST_BUCKET)
@@ -0,0 +1,131 @@
+"""
+Tests for the shared S3 client, sharded layer keys and the migration to them.
+"""
+import json
+import re
+from unittest.mock import Mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+import download_url_generator
+import layer_demand
+import package_creator
+import package_lister
+import package_manifest
+import s3_storage
+
+from tests.helpers import TEST_BUCKET
+
+
+def _listed(event=None):
+    response = package_lister.lambda_handler(event or {}, Mock())
+    return sorted(layer['key'] for layer in json.loads(response['body'])['packages'])
+
+
+def _put_flat_layer(client, name):
+    client.put_object(Bucket=TEST_BUCKET, Key=f'layers/{name}.zip', Body=b'PK')
+    client.put_object(Bucket=TEST_BUCKET, Key=f'metadata/{name}.json', Body=json.dumps({
+        'packageName': name,
+        'dependencies': ['purepkg'],
+        'packageKey': f'layers/{name}.zip',
+        'contentHash': f'hash-{name}',
+        'aliases': [{'packageKey': f'layers/{name}-duplicate.zip', 'packageName': name}]
+    }))
+
+
+def test_builds_write_sharded_keys_and_listing_reads_both_layouts(s3_bucket, local_wheelhouse, monkeypatch):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setenv('BUILD_SCHEDULER', 'off')
+    for module in (package_creator, package_lister):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+
+    response = package_creator.lambda_handler({'body': json.dumps({
+        'packageName': 'sharded', 'dependencies': ['purepkg'], 'pythonVersion': '3.12'
+    })}, Mock())
+    s3_key = json.loads(response['body'])['s3Key']
+    assert response['statusCode'] == 200
+    assert re.fullmatch(r'layers/[0-9a-f]/sharded-.*\.zip', s3_key)
+    object_name = s3_key.split('/')[-1][:-len('.zip')]
+    assert s3_bucket.head_object(Bucket=TEST_BUCKET, Key=s3_storage.metadata_key(object_name))
+
+    _put_flat_layer(s3_bucket, 'legacy')
+    assert _listed() == sorted([s3_key, 'layers/legacy.zip'])
+    assert _listed({'queryStringParameters': {'search': 'legacy'}}) == ['layers/legacy.zip']
+
+
+def test_migration_moves_flat_layers_and_keeps_old_links_working(s3_bucket, monkeypatch):
+    for module in (package_lister, download_url_generator):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+    _put_flat_layer(s3_bucket, 'legacy')
+    new_key = s3_storage.layer_key('legacy')
+
+    assert [entry['to'] for entry in s3_storage.migrate_to_shards(s3_bucket, TEST_BUCKET)] == [new_key]
+    assert _listed() == ['layers/legacy.zip']
+
+    s3_storage.migrate_to_shards(s3_bucket, TEST_BUCKET, dry_run=False)
+    assert _listed() == [new_key]
+    assert s3_storage.migrate_to_shards(s3_bucket, TEST_BUCKET, dry_run=False) == []
+    remaining = [obj['Key'] for obj in s3_storage.list_sharded(s3_bucket, TEST_BUCKET, 'layers/')]
+    assert remaining == [new_key]
+
+    # Links handed out before the move, and aliases GC left, resolve to the sharded key
+    for old_key in ('layers/legacy.zip', 'layers/legacy-duplicate.zip'):
+        response = download_url_generator.lambda_handler({'pathParameters': {'s3Key': old_key}}, Mock())
+        assert response['statusCode'] == 200 and json.loads(response['body'])['s3Key'] == new_key
+
+
+
+def test_alias_lookup_is_shared_by_every_reader(s3_bucket, monkeypatch):
+    for module in (download_url_generator, package_manifest):
+        monkeypatch.setattr(module, 's3_client', s3_bucket)
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key='layers/current.zip', Body=b'PK')
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key=s3_storage.alias_key('layers/old.zip'),
+                         Body=json.dumps({'packageKey': 'layers/current.zip'}))
+    s3_bucket.put_object(Bucket=TEST_BUCKET, Key=s3_storage.alias_key('layers/dangling.zip'),
+                         Body=json.dumps({'packageKey': 'layers/deleted.zip'}))
+
+    resolve = s3_storage.resolve_layer_key
+    assert resolve(s3_bucket, TEST_BUCKET, 'layers/current.zip')[0] == 'layers/current.zip'
+    key, head = resolve(s3_bucket, TEST_BUCKET, 'layers/old.zip')
+    assert key == 'layers/current.zip' and head['ContentLength'] == 2
+    assert resolve(s3_bucket, TEST_BUCKET, 'layers/missing.zip') == ('layers/missing.zip', None)
+    assert resolve(s3_bucket, TEST_BUCKET, 'layers/dangling.zip') == ('layers/deleted.zip', None)
+
+    # All three readers agree, including on an alias whose target is gone
+    for old_key, current in (('layers/old.zip', 'layers/current.zip'), ('layers/dangling.zip', None)):
+        assert layer_demand.current_layer_key(s3_bucket, TEST_BUCKET, old_key) == current
+        event = {'pathParameters': {'s3Key': old_key}}
+        download = download_url_generator.lambda_handler(event, Mock())
+        assert download['statusCode'] == (200 if current else 404)
+        if current:
+            assert json.loads(download['body'])['s3Key'] == current
+        # The stand-in layer is no zip, so a manifest that found it reports 422 rather than 404
+        assert package_manifest.lambda_handler(event, Mock())['statusCode'] == (422 if current else 404)
+
+    # Errors other than a missing object are left to the caller
+    throttled = Mock()
+    throttled.head_object.side_effect = ClientError({'Error': {'Code': 'SlowDown'}}, 'HeadObject')
+    with pytest.raises(ClientError) as raised:
+        resolve(throttled, TEST_BUCKET, 'layers/old.zip')
+    assert s3_storage.is_throttled(raised.value)
+
+def test_throttling_that_outlasts_retries_asks_the_caller_to_come_back(monkeypatch):
+    client = Mock()
+    client.get_paginator.side_effect = ClientError(
+        {'Error': {'Code': 'SlowDown', 'Message': 'Please reduce your request rate.'}}, 'ListObjectsV2'
+    )
+    monkeypatch.setattr(package_lister, 's3_client', client)
+    monkeypatch.setenv('BUCKET_NAME', TEST_BUCKET)
+
+    response = package_lister.lambda_handler({}, Mock())
+
+    assert response['statusCode'] == 503
+    assert response['headers']['Retry-After'] == '2' and response['headers']['Cache-Control'] == 'no-store'
+    assert not s3_storage.is_throttled(ClientError({'Error': {'Code': 'AccessDenied'}}, 'GetObject'))
+
+
+def test_handlers_share_one_client_with_adaptive_retries():
+    client = s3_storage.shared_s3_client()
+    assert client is s3_storage.shared_s3_client()
+    assert client.meta.config.retries == {'mode': 'adaptive', 'total_max_attempts': s3_storage.S3_MAX_ATTEMPTS}
@@ -0,0 +1,113 @@
+"""
+Tests for assembling layers directly from wheels without a pip install.
+"""
+import json
+import zipfile
+from unittest.mock import Mock
+
+import package_creator
+import wheel_transcoder
+
+from tests.helpers import TEST_BUCKET, make_wheel
+
+SITE_PACKAGES = 'python/lib/python3.12/site-packages'
+
+
+def _layer_names(client, response, tmp_path):
+    key = json.loads(response['body'])['s3Key']
+    path = str(tmp_path / key.replace('/', '_'))
+    client.download_file(TEST_BUCKET, key, path)
+    with zipfile.ZipFile(path) as zf:
+        return {name for name in zf.namelist() if '.dist-info/' not in name and '__pycache__' not in name}
+
+
+def _layer_contents(client, response, tmp_path):
+    """Every file but bytecode; RECORD as the set of paths it lists, without pip's INSTALLER and REQUESTED"""
+    key = json.loads(response['body'])['s3Key']
+    path = str(tmp_path / key.replace('/', '_'))
+    client.download_file(TEST_BUCKET, key, path)
+    installer_files = ('INSTALLER', 'REQUESTED')
+    contents = {}
+    with zipfile.ZipFile(path) as zf:
+        for name in zf.namelist():
+            if '__pycache__' in name or name.rsplit('/', 1)[-1] in installer_files:
+                continue
+            contents[name] = zf.read(name)
+            if name.endswith('.dist-info/RECORD'):
+                listed = {line.split(',')[0] for line in contents[name].decode().splitlines() if line}
+                contents[name] = {entry for entry in listed if entry.rsplit('/', 1)[-1] not in installer_files}
+    return contents
+
+
+def test_layer_path_maps_data_schemes_and_drops_only_bytecode():
+    assert wheel_transcoder.layer_path('pkg/core.py', SITE_PACKAGES) == f'{SITE_PACKAGES}/pkg/core.py'
+    for kept in ('pkg/docs/docstring.py', 'pkg/tests/test_core.py', 'pkg/examples/demo.py'):
+        assert wheel_transcoder.layer_path(kept, SITE_PACKAGES) == f'{SITE_PACKAGES}/{kept}'
+    assert wheel_transcoder.layer_path('pkg-1.0.data/platlib/_ext.so', SITE_PACKAGES) == f'{SITE_PACKAGES}/_ext.so'
+    assert (wheel_transcoder.layer_path('pkg-1.0.dist-info/METADATA', SITE_PACKAGES)
+            == f'{SITE_PACKAGES}/pkg-1.0.dist-info/METADATA')
+    for dropped in ('pkg/__pycache__/core.cpython-312.pyc', 'pkg/old.pyc',
+                    'pkg-1.0.data/scripts/tool', 'pkg/'):
+        assert wheel_transcoder.layer_path(dropped, SITE_PACKAGES) is None
+
+
+def test_members_are_copied_without_recompression(tmp_path):
+    payload = 'VALUES = [' + ', '.join(str(i) for i in range(5000)) + ']\n'
+    wheel = make_wheel(str(tmp_path), 'bigpkg', '1.0', files={
+        'bigpkg/__init__.py': payload,
+        'bigpkg-1.0.data/purelib/bigpkg_extra.py': 'EXTRA = True\n',
+        'bigpkg/__pycache__/__init__.cpython-312.pyc': b'bytecode'
+    })
+    zip_path = str(tmp_path / 'layer.zip')
+
+    stats = wheel_transcoder.transcode_wheels([wheel], zip_path, '3.12', {'requirements.txt': 'bigpkg'})
+
+    with zipfile.ZipFile(wheel) as source, zipfile.ZipFile(zip_path) as layer:
+        assert layer.testzip() is None
+        original = source.getinfo('bigpkg/__init__.py')
+        copied = layer.getinfo(f'{SITE_PACKAGES}/bigpkg/__init__.py')
+        assert (copied.CRC, copied.compress_size) == (original.CRC, original.compress_size)
+        assert layer.read(copied).decode() == payload
+        assert f'{SITE_PACKAGES}/bigpkg_extra.py' in layer.namelist()
+        assert not any('__pycache__' in name for name in layer.namelist())
+    assert stats['recompressed'] == 0 and stats['skipped'] == 1
+
+
+def test_direct_assembly_matches_pip_install(s3_bucket, local_wheelhouse, monkeypatch, tmp_path):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+    # Like botocore, docpkg imports from its own docs/ subpackage when it loads
+    make_wheel(str(local_wheelhouse), 'docpkg', '1.0', files={
+        'docpkg/__init__.py': 'from docpkg.docs.docstring import DOC\n',
+        'docpkg/docs/__init__.py': '',
+        'docpkg/docs/docstring.py': 'DOC = "loaded"\n',
+        'docpkg/tests/test_doc.py': 'def test(): pass\n'
+    })
+    body = {'packageName': 'equiv', 'dependencies': ['nativepkg', 'docpkg'], 'pythonVersion': '3.12'}
+
+    direct = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+    monkeypatch.setenv('LAYER_ASSEMBLY', 'pip')
+    installed = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+
+    assert direct['statusCode'] == installed['statusCode'] == 200
+    contents = _layer_contents(s3_bucket, direct, tmp_path)
+    assert contents == _layer_contents(s3_bucket, installed, tmp_path)
+    assert f'{SITE_PACKAGES}/nativepkg/__init__.py' in contents and 'requirements.txt' in contents
+    assert f'{SITE_PACKAGES}/nativepkg-2.0.dist-info/METADATA' in contents
+    assert f'{SITE_PACKAGES}/docpkg/docs/docstring.py' in contents
+    assert f'{SITE_PACKAGES}/docpkg/tests/test_doc.py' in contents
+
+
+def test_falls_back_to_pip_when_assembly_fails(s3_bucket, local_wheelhouse, monkeypatch, tmp_path):
+    monkeypatch.setenv('BUILD_REGISTRY', 'off')
+    monkeypatch.setattr(package_creator, 's3_client', s3_bucket)
+
+    def broken(*args, **kwargs):
+        raise ValueError('corrupt wheel')
+    monkeypatch.setattr(package_creator, 'transcode_wheels', broken)
+
+    body = {'packageName': 'fallback', 'dependencies': ['purepkg'], 'pythonVersion': '3.12'}
+    response = package_creator.lambda_handler({'body': json.dumps(body)}, Mock())
+
+    assert response['statusCode'] == 200
+    assert f'{SITE_PACKAGES}/purepkg/__init__.py' in _layer_names(s3_bucket, response, tmp_path)
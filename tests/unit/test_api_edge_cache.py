@@ -0,0 +1,60 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+
+from lambda_layer.lambda_layer_stack import LambdaLayerStack
+
+
+def _template():
+    app = core.App()
+    stack = LambdaLayerStack(app, "lambda-layer", env=core.Environment(account="123456789012", region="us-east-1"))
+    return assertions.Template.from_stack(stack)
+
+
+def test_listing_cache_key_only_varies_on_search_and_filters():
+    template = _template()
+    template.has_resource_properties("AWS::CloudFront::CachePolicy", {
+        "CachePolicyConfig": assertions.Match.object_like({
+            "ParametersInCacheKeyAndForwardedToOrigin": assertions.Match.object_like({
+                "QueryStringsConfig": {
+                    "QueryStringBehavior": "whitelist",
+                    "QueryStrings": [
+                        "search", "platform", "pythonVersion", "minSize", "maxSize", "createdAfter", "createdBefore",
+                        "limit", "cursor"
+                    ]
+                },
+                "EnableAcceptEncodingGzip": True,
+                "EnableAcceptEncodingBrotli": True
+            })
+        })
+    })
+
+
+def test_download_urls_bypass_the_edge_cache():
+    template = _template()
+    # Managed CachingDisabled policy
+    template.has_resource_properties("AWS::CloudFront::Distribution", {
+        "DistributionConfig": assertions.Match.object_like({
+            "CacheBehaviors": assertions.Match.array_with([assertions.Match.object_like({
+                "PathPattern": "/packages/*/download",
+                "CachePolicyId": "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+            })])
+        })
+    })
+
+
+def test_builder_can_purge_the_api_distribution():
+    template = _template()
+    template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {
+            "Statement": assertions.Match.array_with([assertions.Match.object_like({
+                "Action": "cloudfront:CreateInvalidation",
+                "Resource": "arn:aws:cloudfront::123456789012:distribution/*"
+            })])
+        }
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "package_creator.lambda_handler",
+        "Environment": {"Variables": assertions.Match.object_like({
+            "API_DISTRIBUTION_PARAMETER": "/lambda-layer/api-distribution-id"
+        })}
+    })
@@ -0,0 +1,59 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+
+from lambda_layer.lambda_layer_stack import LambdaLayerStack
+
+PUBLIC_KEY = "-----BEGIN PUBLIC KEY-----\nMIIBIjANBgkqhkiG9w0BAQEFAAOCAQ8AMIIBCgKCAQEA\n-----END PUBLIC KEY-----"
+
+
+def _template(context=None):
+    app = core.App(context=context)
+    stack = LambdaLayerStack(app, "lambda-layer", env=core.Environment(account="123456789012", region="us-east-1"))
+    return assertions.Template.from_stack(stack)
+
+
+def test_layers_are_served_from_the_edge_only_with_signed_urls():
+    # The signing layer is bundled with Docker; skip that, the layer itself still synthesizes
+    template = _template({"layerCdnPublicKey": PUBLIC_KEY, "aws:cdk:bundling-stacks": []})
+    template.resource_count_is("AWS::CloudFront::KeyGroup", 1)
+    template.has_resource_properties("AWS::CloudFront::Distribution", {
+        "DistributionConfig": assertions.Match.object_like({
+            "CacheBehaviors": assertions.Match.array_with([assertions.Match.object_like({
+                "PathPattern": "/layers/*",
+                "ViewerProtocolPolicy": "https-only",
+                "TrustedKeyGroups": [{"Ref": assertions.Match.string_like_regexp("LayerCdnKeyGroup")}]
+            })])
+        })
+    })
+    # Immutable keys: a year at the edge, with the signature kept out of the cache key
+    template.has_resource_properties("AWS::CloudFront::CachePolicy", {
+        "CachePolicyConfig": assertions.Match.object_like({
+            "DefaultTTL": 31536000,
+            "MaxTTL": 31536000,
+            "ParametersInCacheKeyAndForwardedToOrigin": assertions.Match.object_like({
+                "QueryStringsConfig": {"QueryStringBehavior": "none"}
+            })
+        })
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "download_url_generator.lambda_handler",
+        "Environment": {"Variables": assertions.Match.object_like({
+            "LAYER_CDN_KEY_PAIR_ID": {"Ref": assertions.Match.string_like_regexp("LayerCdnPublicKey")},
+            "LAYER_CDN_PRIVATE_KEY_PARAMETER": "/lambda-layer/layer-cdn-private-key"
+        })},
+        "Layers": [{"Ref": assertions.Match.string_like_regexp("CdnSigningLayerX8664Py39")}]
+    })
+    # One signing layer per architecture and Python version of the signing functions
+    template.resource_count_is("AWS::Lambda::LayerVersion", 3)
+
+
+def test_layer_cdn_is_off_without_a_public_key():
+    template = _template()
+    template.resource_count_is("AWS::CloudFront::KeyGroup", 0)
+    template.resource_count_is("AWS::Lambda::LayerVersion", 0)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "download_url_generator.lambda_handler",
+        "Environment": {"Variables": assertions.Match.object_equals({
+            "BUCKET_NAME": assertions.Match.any_value()
+        })}
+    })
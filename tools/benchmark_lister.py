@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Benchmark the listing and download-URL handlers against synthetic catalogs of growing size.
+
+Every catalog size gets a fresh S3 stand-in (moto in-process, or any S3-compatible
+endpoint) filled with synthetic layers. Each operation then runs through the real
+handlers, and the report covers latency, S3 calls issued, bytes read from S3, peak Python
+memory and how each of them scales with catalog size:
+
+    python -m tools.benchmark_lister --sizes 1000,10000,100000 --iterations 5 --json main.json
+    python -m tools.benchmark_lister --layout legacy --sizes 100,1000
+    python -m tools.benchmark_lister --sizes 1000,10000 --baseline main.json --tolerance 1.25
+
+Seeding the in-process stand-in takes a few milliseconds per object, so 100k layers take
+several minutes to set up before anything is measured.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import time
+import tracemalloc
+import uuid
+from urllib.parse import quote
+
+from tools.load_test import percentile
+
+OPERATIONS = {
+    'list': 'GET /packages',
+    'search': 'GET /packages?search=',
+    'filter': 'GET /packages?platform=',
+    'revalidate': 'GET /packages (If-None-Match)',
+    'download': 'GET /packages/{s3Key}/download'
+}
+LAYOUTS = ('metadata', 'legacy')
+DISTRIBUTIONS = ('uniform', 'zipf')
+PLATFORMS = ['manylinux2014_x86_64', 'manylinux2014_aarch64']
+PYTHON_VERSIONS = ['3.9', '3.10', '3.11', '3.12', '3.13']
+# Download requests cycle through this many layers; only they need a layer object when
+# the catalog is described by metadata documents
+DOWNLOAD_SAMPLE = 50
+
+
+class S3Meter:
+    """Counts the S3 calls a client makes and the response bytes it reads"""
+
+    def __init__(self, s3_client):
+        self.reset()
+        s3_client.meta.events.register('after-call.s3', self.after_call)
+
+    def reset(self):
+        self.calls = {}
+        self.bytes = 0
+
+    def after_call(self, http_response, parsed, model, **kwargs):
+        self.calls[model.name] = self.calls.get(model.name, 0) + 1
+        # Streaming bodies are read by the caller; the declared length is what it pulls
+        if model.has_streaming_output:
+            self.bytes += parsed.get('ContentLength', 0) or 0
+        else:
+            self.bytes += len(http_response.content or b'')
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+def weighted_choice(rng, values, distribution):
+    """Uniform pick, or a Zipf-like one where the first values dominate"""
+    if distribution == 'uniform':
+        return rng.choice(values)
+    return rng.choices(values, [1 / rank for rank in range(1, len(values) + 1)])[0]
+
+
+def synthetic_layers(count, distribution='zipf', dependency_pool=200, seed=0):
+    """Metadata documents for count layers, newest last"""
+    rng = random.Random(seed)
+    pool = [f'dep{index:04d}' for index in range(dependency_pool)]
+    layers = []
+    for index in range(count):
+        dependencies = set()
+        for _ in range(rng.randint(1, 8)):
+            dependencies.add(weighted_choice(rng, pool, distribution))
+        created_at = time.strftime('%Y%m%d-%H%M%S', time.gmtime(1700000000 + index * 60))
+        name = f'{sorted(dependencies)[0]}-layer-{index}'
+        python_version = weighted_choice(rng, PYTHON_VERSIONS[::-1], distribution)
+        layers.append({
+            'packageName': name,
+            'dependencies': sorted(dependencies),
+            'runtime': f'python{python_version}',
+            'platform': weighted_choice(rng, PLATFORMS, distribution),
+            'pythonVersion': python_version,
+            'packageType': 'layer',
+            'installDependencies': True,
+            'upgradePackages': False,
+            'createdAt': created_at,
+            'packageKey': f'layers/{name}-{created_at}-{index:08x}.zip',
+            'packageSize': int(rng.lognormvariate(16, 1))
+        })
+    return layers
+
+
+def seed_layers(s3_client, bucket_name, layers, layout='metadata'):
+    """Write the catalog the way current builds (metadata) or pre-metadata builds (legacy) left it"""
+    sampled = {layer['packageKey'] for layer in layers[-DOWNLOAD_SAMPLE:]}
+    for layer in layers:
+        key = layer['packageKey']
+        if layout == 'legacy':
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=b'PK', Metadata={
+                'packagename': layer['packageName'],
+                'dependencies': ','.join(layer['dependencies']),
+                'runtime': layer['runtime'],
+                'platform': layer['platform'],
+                'pythonversion': layer['pythonVersion'],
+                'createdat': layer['createdAt']
+            })
+            continue
+        if key in sampled:
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=b'PK')
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=f"metadata/{key[len('layers/'):-len('.zip')]}.json",
+            Body=json.dumps(layer),
+            ContentType='application/json'
+        )
+
+
+def most_common_dependency(layers):
+    counts = {}
+    for layer in layers:
+        for dependency in layer['dependencies']:
+            counts[dependency] = counts.get(dependency, 0) + 1
+    return max(sorted(counts), key=counts.get)
+
+
+def measure(api, meter, request, iterations):
+    """Latency samples plus S3 calls, bytes, peak memory and response size of one warm run"""
+    latencies = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(iterations + 1):
+            started = time.perf_counter()
+            response = api.invoke(*request())
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        # Tracing slows Python down several times over, so memory gets a run of its own
+        meter.reset()
+        tracemalloc.start()
+        try:
+            response = api.invoke(*request())
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    body = json.loads(response['body']) if response.get('body') else {}
+    warm = sorted(latencies[1:])
+    return {
+        'statusCode': response['statusCode'],
+        'coldMs': round(latencies[0], 2),
+        'p50Ms': round(percentile(warm, 50), 2),
+        'p95Ms': round(percentile(warm, 95), 2),
+        's3Calls': meter.total_calls(),
+        's3CallsByOperation': dict(sorted(meter.calls.items())),
+        's3Bytes': meter.bytes,
+        'peakMemoryBytes': peak,
+        'responseBytes': len(response.get('body') or ''),
+        'items': body.get('count', len(body.get('packages', [])))
+    }
+
+
+def benchmark_size(size, layout='metadata', distribution='zipf', iterations=5, operations=None, seed=0,
+                   endpoint_url=None, alias_fraction=0.0):
+    """Seed a fresh catalog of size layers and measure every operation against it"""
+    from tools.local_api import LocalApi
+
+    api = LocalApi(bucket_name=f'lister-bench-{size}-{uuid.uuid4().hex[:8]}', endpoint_url=endpoint_url).start()
+    try:
+        layers = synthetic_layers(size, distribution, seed=seed)
+        started = time.perf_counter()
+        seed_layers(api.s3_client, api.bucket_name, layers, layout)
+        seed_seconds = time.perf_counter() - started
+
+        # Some downloads go through the alias GC leaves behind for a collapsed duplicate
+        rng = random.Random(seed)
+        download_keys = []
+        for layer in layers[-DOWNLOAD_SAMPLE:]:
+            key = layer['packageKey']
+            if rng.random() < alias_fraction:
+                alias = key.replace('-layer-', '-dup-layer-')
+                api.s3_client.put_object(Bucket=api.bucket_name, Key=f'aliases/{alias}.json',
+                                         Body=json.dumps({'packageKey': key}))
+                key = alias
+            download_keys.append(key)
+        downloads = iter(download_keys * (iterations + 2))
+        search_term = most_common_dependency(layers)
+        etag = api.invoke('GET', '/packages').get('headers', {}).get('ETag', '')
+
+        requests = {
+            'list': lambda: ('GET', '/packages'),
+            'search': lambda: ('GET', f'/packages?search={search_term}'),
+            'filter': lambda: ('GET', f'/packages?platform={PLATFORMS[-1]}'),
+            'revalidate': lambda: ('GET', '/packages', {'If-None-Match': etag}),
+            'download': lambda: ('GET', f"/packages/{quote(next(downloads), safe='')}/download")
+        }
+        meter = S3Meter(api.s3_client)
+        results = []
+        for operation in operations or OPERATIONS:
+            result = measure(api, meter, requests[operation], iterations)
+            results.append({'size': size, 'operation': operation, **result})
+        return results, seed_seconds
+    finally:
+        if endpoint_url:
+            delete_bucket(api.s3_client, api.bucket_name)
+        api.stop()
+
+
+def delete_bucket(s3_client, bucket_name):
+    """Empty and remove a benchmark bucket on a real S3-compatible endpoint"""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if objects:
+            s3_client.delete_objects(Bucket=bucket_name, Delete={'Objects': objects, 'Quiet': True})
+    s3_client.delete_bucket(Bucket=bucket_name)
+
+
+def scaling_exponent(points):
+    """Least-squares slope of log(value) against log(size): ~0 is constant, ~1 linear"""
+    points = [(size, value) for size, value in points if size > 0 and value > 0]
+    if len(points) < 2:
+        return None
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(value) for _, value in points]
+    x_mean, y_mean = sum(xs) / len(xs), sum(ys) / len(ys)
+    spread = sum((x - x_mean) ** 2 for x in xs)
+    if not spread:
+        return None
+    return round(sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / spread, 2)
+
+
+def run_benchmark(sizes, layout='metadata', distribution='zipf', iterations=5, operations=None, seed=0,
+                  endpoint_url=None, alias_fraction=0.0, progress=None):
+    """Benchmark every size and fit a scaling curve per operation"""
+    results = []
+    for size in sorted(sizes):
+        size_results, seed_seconds = benchmark_size(size, layout, distribution, iterations, operations, seed,
+                                                    endpoint_url, alias_fraction)
+        results.extend(size_results)
+        if progress:
+            progress(f"✅ {size} layers seeded in {seed_seconds:.1f}s and measured")
+
+    scaling = {}
+    for operation in operations or OPERATIONS:
+        rows = [r for r in results if r['operation'] == operation]
+        scaling[operation] = {
+            metric: scaling_exponent([(r['size'], r[metric]) for r in rows])
+            for metric in ('p50Ms', 's3Calls', 's3Bytes', 'peakMemoryBytes')
+        }
+    return {
+        'layout': layout,
+        'distribution': distribution,
+        'iterations': iterations,
+        'seed': seed,
+        'aliasFraction': alias_fraction,
+        'results': results,
+        'scaling': scaling
+    }
+
+
+def compare_reports(report, baseline, tolerance=1.25):
+    """Regressions against an earlier report: S3 calls must not grow at all, time, bytes and memory within tolerance"""
+    for setting in ('layout', 'distribution', 'seed', 'aliasFraction'):
+        if baseline.get(setting) != report[setting]:
+            return [f"baseline was run with {setting}={baseline.get(setting)}, not {report[setting]}"]
+    previous = {(r['size'], r['operation']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['size'], result['operation']))
+        if not before:
+            continue
+        label = f"{result['operation']} @ {result['size']}"
+        if result['s3Calls'] > before['s3Calls']:
+            regressions.append(f"{label}: S3 calls {before['s3Calls']} -> {result['s3Calls']}")
+        for metric in ('p50Ms', 's3Bytes', 'peakMemoryBytes'):
+            if before[metric] and result[metric] > before[metric] * tolerance:
+                regressions.append(f"{label}: {metric} {before[metric]} -> {result[metric]}")
+    return regressions
+
+
+def print_report(report):
+    print(f"\n📊 {report['layout']} layout, {report['distribution']} distribution, "
+          f"{report['iterations']} warm iterations per operation")
+    print(f"{'operation':<12}{'layers':>9}{'status':>8}{'cold ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'S3 calls':>10}{'S3 KB':>10}{'peak MB':>9}{'items':>8}")
+    for r in report['results']:
+        print(f"{r['operation']:<12}{r['size']:>9}{r['statusCode']:>8}{r['coldMs']:>10}{r['p50Ms']:>10}"
+              f"{r['p95Ms']:>10}{r['s3Calls']:>10}{r['s3Bytes'] // 1024:>10}"
+              f"{r['peakMemoryBytes'] / (1024 * 1024):>9.1f}{r['items']:>8}")
+    print("\n📈 Scaling exponent with catalog size (0 = constant, 1 = linear)")
+    print(f"{'operation':<12}{'latency':>10}{'S3 calls':>10}{'S3 bytes':>10}{'memory':>10}")
+    for operation, exponents in report['scaling'].items():
+        cells = ''.join(f"{'-' if value is None else value:>10}" for value in exponents.values())
+        print(f"{operation:<12}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark package listing and download URLs against large catalogs')
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated catalog sizes (default: 100,1000,10000)')
+    parser.add_argument('--layout', choices=LAYOUTS, default='metadata',
+                        help='metadata documents (current builds) or bare layers/ objects (head_object fallback)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='zipf',
+                        help='How dependencies, platforms and Python versions are spread across layers')
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help='Comma-separated operations to measure')
+    parser.add_argument('--iterations', type=int, default=5, help='Warm runs per operation after the cold one')
+    parser.add_argument('--alias-fraction', type=float, default=0.0, help='Share of downloads requested by a GC alias')
+    parser.add_argument('--s3-endpoint', help='Use an S3-compatible server instead of the in-process stand-in')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--baseline', help='Earlier --json report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='Allowed ratio over the baseline (default: 1.25)')
+    args = parser.parse_args()
+
+    operations = [operation for operation in args.operations.split(',') if operation]
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f'Unknown operations {", ".join(sorted(unknown))}; expected some of {", ".join(OPERATIONS)}')
+
+    report = run_benchmark(
+        [int(size) for size in args.sizes.split(',') if size], args.layout, args.distribution, args.iterations,
+        operations, args.seed, args.s3_endpoint, args.alias_fraction, progress=print
+    )
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"⚠️  {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"✅ No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
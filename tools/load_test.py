@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Drive concurrent list/search/download/build workloads against the API and report
+throughput and p50/p95/p99 latency per endpoint.
+
+    python -m tools.load_test --serve --seed-layers 200 --concurrency 16 --duration 30
+    python -m tools.load_test --url https://abc.execute-api.us-east-1.amazonaws.com/prod --mix list=80,search=20
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+DEFAULT_MIX = 'list=50,search=25,download=20,build=5'
+ENDPOINTS = {
+    'list': 'GET /packages',
+    'search': 'GET /packages?search=',
+    'download': 'GET /packages/{s3Key}/download',
+    'manifest': 'GET /packages/{s3Key}/manifest',
+    'build': 'POST /packages'
+}
+
+
+def parse_mix(text):
+    """Parse "list=50,build=5" into normalised operation weights"""
+    weights = {}
+    for part in text.split(','):
+        operation, _, weight = part.partition('=')
+        operation = operation.strip()
+        if operation not in ENDPOINTS:
+            raise ValueError(f'Unknown operation "{operation}"; expected one of {", ".join(ENDPOINTS)}')
+        weights[operation] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError('Workload mix needs at least one positive weight')
+    return {operation: weight / total for operation, weight in weights.items()}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Client:
+    """One keep-alive connection per worker, reopened after any transport error"""
+
+    def __init__(self, base_url, timeout):
+        url = urlsplit(base_url)
+        self.scheme, self.netloc, self.base_path = url.scheme, url.netloc, url.path.rstrip('/')
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        if self.connection is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self.connection = connection_class(self.netloc, timeout=self.timeout)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.connection.request(method, self.base_path + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.connection.close()
+            self.connection = None
+            raise
+
+
+class Workload:
+    """Turns an operation name into a concrete request using the catalog discovered at startup"""
+
+    def __init__(self, keys, search_terms, build_dependencies, identical_builds=False):
+        self.keys = keys
+        self.search_terms = search_terms
+        self.build_dependencies = build_dependencies
+        self.identical_builds = identical_builds
+        self.build_counter = itertools.count()
+
+    def next_request(self, operation, rng):
+        if operation == 'list':
+            return 'GET', '/packages', None
+        if operation == 'search':
+            return 'GET', f'/packages?search={quote(rng.choice(self.search_terms))}', None
+        if operation in ('download', 'manifest'):
+            return 'GET', f'/packages/{quote(rng.choice(self.keys), safe="")}/{operation}', None
+        name = 'load-test' if self.identical_builds else f'load-test-{next(self.build_counter)}'
+        return 'POST', '/packages', json.dumps({'packageName': name, 'dependencies': self.build_dependencies})
+
+
+def discover_catalog(base_url, timeout):
+    """List the existing layers once so download and search requests hit real data"""
+    status, payload = Client(base_url, timeout).request('GET', '/packages')
+    if status != 200:
+        raise RuntimeError(f'Listing layers failed with HTTP {status}: {payload[:200]!r}')
+    layers = json.loads(payload).get('packages', [])
+    keys = [layer['key'] for layer in layers if layer.get('key')]
+    terms = sorted({layer.get('fileName', '').split('-')[0] for layer in layers} - {''})
+    terms += sorted({dependency for layer in layers for dependency in layer.get('dependencies', [])})
+    return keys, terms or ['layer']
+
+
+def run_load(base_url, mix, concurrency=8, duration=None, total_requests=None, build_dependencies=None,
+             identical_builds=False, seed=0, timeout=900):
+    """Run the workload and return per-endpoint latency and throughput statistics"""
+    if not duration and not total_requests:
+        raise ValueError('Either duration or total_requests is required')
+
+    keys, terms = discover_catalog(base_url, timeout)
+    if not keys and ({'download', 'manifest'} & set(mix)):
+        raise RuntimeError('No layers to download; seed the catalog or drop download/manifest from the mix')
+    workload = Workload(keys, terms, build_dependencies or [], identical_builds)
+
+    operations, weights = list(mix), list(mix.values())
+    results = []
+    issued = itertools.count()
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = Client(base_url, timeout)
+        while True:
+            if total_requests and next(issued) >= total_requests:
+                return
+            if deadline and time.perf_counter() >= deadline:
+                return
+            operation = rng.choices(operations, weights)[0]
+            method, path, body = workload.next_request(operation, rng)
+            request_started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+                error = None
+            except Exception as e:
+                status, error = None, f'{type(e).__name__}: {e}'
+            results.append((operation, status, time.perf_counter() - request_started, error))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return summarize(results, time.perf_counter() - started, concurrency)
+
+
+def summarize(results, elapsed, concurrency):
+    """Aggregate raw (operation, status, seconds, error) samples into a report"""
+    endpoints = {}
+    for operation in ENDPOINTS:
+        samples = [r for r in results if r[0] == operation]
+        if not samples:
+            continue
+        latencies = sorted(r[2] * 1000 for r in samples)
+        status_codes = {}
+        for _, status, _, _ in samples:
+            status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+        endpoints[operation] = {
+            'endpoint': ENDPOINTS[operation],
+            'count': len(samples),
+            # 4xx answers (e.g. a failed preflight) are valid responses; transport failures and 5xx are not
+            'errors': sum(1 for _, status, _, error in samples if error or status >= 500),
+            'statusCodes': status_codes,
+            'throughput': round(len(samples) / elapsed, 2) if elapsed else 0,
+            'p50Ms': round(percentile(latencies, 50), 2),
+            'p95Ms': round(percentile(latencies, 95), 2),
+            'p99Ms': round(percentile(latencies, 99), 2),
+            'meanMs': round(sum(latencies) / len(latencies), 2),
+            'maxMs': round(latencies[-1], 2)
+        }
+    return {
+        'concurrency': concurrency,
+        'elapsedSeconds': round(elapsed, 3),
+        'totalRequests': len(results),
+        'throughput': round(len(results) / elapsed, 2) if elapsed else 0,
+        'errors': sum(e['errors'] for e in endpoints.values()),
+        'sampleErrors': sorted({r[3] for r in results if r[3]})[:5],
+        'endpoints': endpoints
+    }
+
+
+def print_report(report):
+    print(f"\n📊 {report['totalRequests']} requests in {report['elapsedSeconds']}s "
+          f"at concurrency {report['concurrency']}: {report['throughput']} req/s, {report['errors']} errors")
+    print(f"{'endpoint':<34}{'count':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for stats in report['endpoints'].values():
+        print(f"{stats['endpoint']:<34}{stats['count']:>7}{stats['throughput']:>9}{stats['p50Ms']:>10}"
+              f"{stats['p95Ms']:>10}{stats['p99Ms']:>10}{stats['maxMs']:>10}{stats['errors']:>8}")
+    for error in report['sampleErrors']:
+        print(f"⚠️  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the Lambda Layer Builder API')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='Base URL of a running API (local or deployed)')
+    target.add_argument('--serve', action='store_true', help='Start the local API in-process and test it')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weighted operations (default: {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, help='Seconds to run for')
+    parser.add_argument('--requests', type=int, help='Total requests to send')
+    parser.add_argument('--build-deps', default='demo-http,demo-data', help='Comma-separated dependencies for builds')
+    parser.add_argument('--identical-builds', action='store_true', help='Send identical build requests to exercise coalescing')
+    parser.add_argument('--seed-layers', type=int, default=100, help='Synthetic layers to publish with --serve')
+    parser.add_argument('--wheelhouse', help='Wheel directory for --serve (default: generated demo wheels)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    if not args.duration and not args.requests:
+        args.duration = 30
+
+    api = server = None
+    base_url = args.url
+    if args.serve:
+        import tempfile
+        from tools.local_api import LocalApi, make_server, write_demo_wheelhouse
+
+        wheelhouse = args.wheelhouse or write_demo_wheelhouse(tempfile.mkdtemp(prefix='wheelhouse-'))
+        api = LocalApi(wheelhouse=wheelhouse).start()
+        api.seed_catalog(args.seed_layers, args.seed)
+        server = make_server(api, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        print(f"🚀 Serving local API on {base_url} with {args.seed_layers} seeded layers")
+
+    try:
+        report = run_load(
+            base_url, parse_mix(args.mix), args.concurrency, args.duration, args.requests,
+            [d for d in args.build_deps.split(',') if d], args.identical_builds, args.seed
+        )
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+            api.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
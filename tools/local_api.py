@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Serve the API handlers locally behind API Gateway-shaped events.
+
+S3 is replaced by an in-process moto stand-in (or any S3-compatible endpoint) and pip
+installs from a local wheelhouse, so the whole service runs without an AWS account:
+
+    python -m tools.local_api --port 8000 --seed-layers 200 --wheelhouse ./wheels
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_functions')
+DEFAULT_BUCKET = 'local-lambda-packages'
+
+# Mirrors the API Gateway resources defined in lambda_layer_stack.py
+ROUTES = [
+    ('POST', '/packages', re.compile(r'^/packages$'), 'package_creator'),
+    ('POST', '/packages/batch', re.compile(r'^/packages/batch$'), 'package_creator'),
+    ('GET', '/packages', re.compile(r'^/packages$'), 'package_lister'),
+    ('GET', '/packages/stats', re.compile(r'^/packages/stats$'), 'package_stats'),
+    ('GET', '/packages/{s3Key}/download', re.compile(r'^/packages/(?P<s3Key>[^/]+)/download$'), 'download_url_generator'),
+    ('GET', '/packages/{s3Key}/manifest', re.compile(r'^/packages/(?P<s3Key>[^/]+)/manifest$'), 'package_manifest'),
+    ('GET', '/builds/{buildId}', re.compile(r'^/builds/(?P<buildId>[^/]+)$'), 'build_status'),
+]
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, Idempotency-Key',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
+}
+SEED_NAMES = ['fastapi', 'requests', 'numpy', 'pandas', 'boto3', 'pydantic', 'httpx', 'sqlalchemy', 'jinja2', 'pyyaml']
+# Pure-Python packages written to a generated wheelhouse when none is given
+DEMO_WHEELS = {'demo-core': [], 'demo-http': ['demo-core'], 'demo-data': ['demo-core']}
+
+
+class LocalContext:
+    """Stand-in for the Lambda context object with a real remaining-time clock"""
+
+    def __init__(self, function_name, timeout_seconds=900):
+        self.function_name = function_name
+        self.aws_request_id = uuid.uuid4().hex
+        self.deadline = time.time() + timeout_seconds
+
+    def get_remaining_time_in_millis(self):
+        return max(int((self.deadline - time.time()) * 1000), 0)
+
+
+class LocalApi:
+    """The Lambda handlers wired to an S3 stand-in, callable with plain HTTP-style requests"""
+
+    def __init__(self, bucket_name=DEFAULT_BUCKET, wheelhouse=None, endpoint_url=None):
+        self.bucket_name = bucket_name
+        self.wheelhouse = wheelhouse
+        self.endpoint_url = endpoint_url
+        self.handlers = {}
+        self._mock = None
+        self._saved_env = {}
+        self._saved_clients = {}
+
+    def start(self):
+        """Start the S3 stand-in, point the handlers at it and create the bucket"""
+        import boto3
+
+        env = {
+            'BUCKET_NAME': self.bucket_name,
+            'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+            'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'testing'),
+            'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'testing'),
+        }
+        if self.wheelhouse:
+            env.update({'PIP_NO_INDEX': '1', 'PIP_FIND_LINKS': os.path.abspath(self.wheelhouse)})
+        for key, value in env.items():
+            self._saved_env[key] = os.environ.get(key)
+            os.environ[key] = value
+
+        if not self.endpoint_url:
+            from moto import mock_aws
+            self._mock = mock_aws()
+            self._mock.start()
+
+        if LAMBDA_DIR not in sys.path:
+            sys.path.insert(0, LAMBDA_DIR)
+        self.s3_client = boto3.client('s3', endpoint_url=self.endpoint_url)
+        for module_name in sorted({route[3] for route in ROUTES}):
+            module = importlib.import_module(module_name)
+            self._saved_clients[module_name] = module.s3_client
+            module.s3_client = self.s3_client
+            self.handlers[module_name] = module
+
+        try:
+            self.s3_client.create_bucket(Bucket=self.bucket_name)
+        except self.s3_client.exceptions.BucketAlreadyOwnedByYou:
+            pass
+        return self
+
+    def stop(self):
+        """Restore the handler clients and environment and shut the stand-in down"""
+        for module_name, client in self._saved_clients.items():
+            self.handlers[module_name].s3_client = client
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if self._mock:
+            self._mock.stop()
+            self._mock = None
+
+    def invoke(self, method, path, headers=None, body=None):
+        """Route a request to its handler as an API Gateway proxy event"""
+        url = urlsplit(path)
+        for route_method, resource, pattern, module_name in ROUTES:
+            match = pattern.match(url.path)
+            if route_method != method or not match:
+                continue
+            event = {
+                'resource': resource,
+                'path': url.path,
+                'httpMethod': method,
+                'headers': dict(headers or {}),
+                'queryStringParameters': dict(parse_qsl(url.query)) or None,
+                'pathParameters': match.groupdict() or None,
+                'body': body,
+                'isBase64Encoded': False,
+                'requestContext': {'requestId': uuid.uuid4().hex, 'stage': 'local', 'httpMethod': method}
+            }
+            return self.handlers[module_name].lambda_handler(event, LocalContext(module_name))
+
+        return {
+            'statusCode': 404,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'message': f'No route for {method} {url.path}'})
+        }
+
+    def seed_catalog(self, count, seed=0):
+        """Publish count small synthetic layers so list, search and download have data"""
+        rng = random.Random(seed)
+        for index in range(count):
+            name = f'{rng.choice(SEED_NAMES)}-layer-{index}'
+            dependencies = rng.sample(SEED_NAMES, rng.randint(1, 4))
+            created_at = time.strftime('%Y%m%d-%H%M%S', time.gmtime(1700000000 + index * 60))
+            object_name = f'{name}-{created_at}-{index:08x}'
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for dependency in dependencies:
+                    zf.writestr(f'python/lib/python3.12/site-packages/{dependency}/__init__.py', f'NAME = "{dependency}"\n')
+                zf.writestr('requirements.txt', '\n'.join(dependencies))
+            package_key = f'layers/{object_name}.zip'
+            self.s3_client.put_object(Bucket=self.bucket_name, Key=package_key, Body=buffer.getvalue())
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=f'metadata/{object_name}.json',
+                Body=json.dumps({
+                    'packageName': name,
+                    'dependencies': dependencies,
+                    'runtime': 'python3.12',
+                    'platform': 'manylinux2014_x86_64',
+                    'pythonVersion': '3.12',
+                    'packageType': 'layer',
+                    'installDependencies': True,
+                    'upgradePackages': False,
+                    'createdAt': created_at,
+                    'packageKey': package_key,
+                    'packageSize': buffer.tell()
+                }),
+                ContentType='application/json'
+            )
+
+
+def write_demo_wheelhouse(wheel_dir):
+    """Write a few tiny pure-Python wheels so builds work fully offline"""
+    os.makedirs(wheel_dir, exist_ok=True)
+    for name, requires in DEMO_WHEELS.items():
+        module = name.replace('-', '_')
+        dist_info = f'{module}-1.0.dist-info'
+        metadata = f'Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n'
+        metadata += ''.join(f'Requires-Dist: {requirement}\n' for requirement in requires)
+        files = {
+            f'{module}/__init__.py': f'NAME = "{name}"\n',
+            f'{dist_info}/METADATA': metadata,
+            f'{dist_info}/WHEEL': 'Wheel-Version: 1.0\nGenerator: local_api\nRoot-Is-Purelib: true\nTag: py3-none-any\n'
+        }
+        record = ''.join(f'{arcname},,\n' for arcname in files) + f'{dist_info}/RECORD,,\n'
+        with zipfile.ZipFile(os.path.join(wheel_dir, f'{module}-1.0-py3-none-any.whl'), 'w') as zf:
+            for arcname, content in files.items():
+                zf.writestr(arcname, content)
+            zf.writestr(f'{dist_info}/RECORD', record)
+    return wheel_dir
+
+
+def make_server(api, host='127.0.0.1', port=8000, verbose=False):
+    """HTTP server translating requests into handler invocations, one thread per connection"""
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_OPTIONS(self):
+            self.send_response(200)
+            for key, value in CORS_HEADERS.items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_GET(self):
+            self.dispatch()
+
+        def do_POST(self):
+            self.dispatch()
+
+        def dispatch(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8') if length else None
+            try:
+                response = api.invoke(self.command, self.path, dict(self.headers.items()), body)
+            except Exception as e:
+                # API Gateway answers an unhandled Lambda error with a bare 502
+                print(f"❌ Handler error for {self.command} {self.path}: {str(e)}")
+                response = {'statusCode': 502, 'headers': {}, 'body': json.dumps({'message': 'Internal server error'})}
+
+            payload = (response.get('body') or '').encode('utf-8')
+            self.send_response(response['statusCode'])
+            for key, value in (response.get('headers') or {}).items():
+                self.send_header(key, value)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Lambda Layer Builder API locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--bucket', default=DEFAULT_BUCKET)
+    parser.add_argument('--wheelhouse', help='Directory of wheels pip installs from (default: generated demo wheels)')
+    parser.add_argument('--s3-endpoint', help='Use an S3-compatible server instead of the in-process stand-in')
+    parser.add_argument('--seed-layers', type=int, default=0, help='Synthetic layers to publish at startup')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    wheelhouse = args.wheelhouse or write_demo_wheelhouse(tempfile.mkdtemp(prefix='wheelhouse-'))
+    api = LocalApi(args.bucket, wheelhouse, args.s3_endpoint).start()
+    if args.seed_layers:
+        api.seed_catalog(args.seed_layers)
+        print(f"🌱 Seeded {args.seed_layers} layers")
+
+    server = make_server(api, args.host, args.port, args.verbose)
+    print(f"🚀 Local API on http://{args.host}:{server.server_port} (wheelhouse: {wheelhouse})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()